@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: dev/benchmark/benchmark.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+"""
+End-to-end throughput and scaling benchmark of `BinanceWebSocketApiManager()` against `LocalStreamServer()`.
+
+Every scenario (number of streams x output mode x delivery mode) gets a fresh manager, runs a warmup and then
+measures the sent and received records per second, the CPU time per record, the memory per stream and the p50/p99
+ingest latency (send time of the server until the consumer got the record). The results are written as JSON, so the
+results of different releases can get compared.
+
+Example:
+
+    python dev/benchmark/benchmark.py --streams 1 10 100 500 --rate 100 --size 250 --duration 10 \
+                                      --result-file benchmark_2.9.0.json
+
+To use this library you need a valid UNICORN Binance Suite License: https://shop.lucit.services
+"""
+
+from local_stream_server import LocalStreamServer
+from unicorn_binance_websocket_api.manager import BinanceWebSocketApiManager, __version__ as ubwa_version
+from typing import Optional
+import argparse
+import logging
+import orjson
+import os
+import platform
+import psutil
+import sys
+import threading
+import time
+
+OUTPUT_MODES: tuple = ("raw_data", "dict", "UnicornFy")
+DELIVERY_MODES: tuple = ("stream_buffer", "callback", "async_callback", "asyncio_queue")
+
+logging.getLogger("unicorn_binance_websocket_api")
+logging.basicConfig(level=logging.ERROR,
+                    filename=os.path.basename(__file__) + '.log',
+                    format="{asctime} [{levelname:8}] {process} {thread} {module}: {message}",
+                    style="{")
+
+
+def get_percentile(values: list, percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percentile / 100 * (len(values) - 1))))]
+
+
+class Collector(object):
+    """
+    Counts the received records and samples their ingest latency.
+    """
+    def __init__(self, output: str, latency_sample_rate: int = 10):
+        self.output = output
+        self.latency_sample_rate = latency_sample_rate
+        self.lock = threading.Lock()
+        self.measuring = False
+        self.received = 0
+        self.latencies = []
+
+    def start(self) -> None:
+        with self.lock:
+            self.received = 0
+            self.latencies = []
+            self.measuring = True
+
+    def stop(self) -> None:
+        self.measuring = False
+
+    def get_send_time(self, stream_data) -> Optional[int]:
+        if self.output == "UnicornFy":
+            return stream_data.get('trade_id')
+        if self.output == "raw_data":
+            stream_data = orjson.loads(stream_data)
+        try:
+            return stream_data['data']['t']
+        except KeyError:
+            # e.g. the result of a subscription
+            return None
+
+    def process(self, stream_data) -> None:
+        if self.measuring is False:
+            return None
+        with self.lock:
+            self.received += 1
+            if self.received % self.latency_sample_rate != 0:
+                return None
+        send_time = self.get_send_time(stream_data)
+        if send_time is not None:
+            latency = time.time_ns() // 1000 - send_time
+            with self.lock:
+                self.latencies.append(latency)
+        return None
+
+
+def run_scenario(local_stream_server: LocalStreamServer,
+                 streams: int,
+                 output: str,
+                 delivery: str,
+                 warmup: float,
+                 duration: float,
+                 event_loop_pool_size: Optional[int] = None,
+                 lucit_api_secret: Optional[str] = None,
+                 lucit_license_token: Optional[str] = None) -> dict:
+    collector = Collector(output=output)
+    process = psutil.Process()
+
+    async def process_stream_data_async(stream_data):
+        collector.process(stream_data)
+
+    async def process_asyncio_queue(stream_id=None):
+        while ubwa.is_stop_request(stream_id) is False:
+            stream_data = await ubwa.get_stream_data_from_asyncio_queue(stream_id)
+            collector.process(stream_data)
+            ubwa.asyncio_queue_task_done(stream_id)
+
+    def process_stream_buffer():
+        while ubwa.is_manager_stopping() is False:
+            stream_data = ubwa.pop_stream_data_from_stream_buffer()
+            if stream_data is None:
+                time.sleep(0.001)
+            else:
+                collector.process(stream_data)
+
+    ubwa = BinanceWebSocketApiManager(exchange="binance.com",
+                                      websocket_base_uri=local_stream_server.get_websocket_base_uri(),
+                                      output_default=output,
+                                      high_performance=True,
+                                      warn_on_update=False,
+                                      disable_colorama=True,
+                                      event_loop_pool_size=event_loop_pool_size,
+                                      lucit_api_secret=lucit_api_secret,
+                                      lucit_license_token=lucit_license_token)
+    stream_buffer_thread = None
+    if delivery == "stream_buffer":
+        stream_buffer_thread = threading.Thread(target=process_stream_buffer, name="process_stream_buffer")
+        stream_buffer_thread.start()
+    # the memory of the manager itself does not count to the memory per stream
+    memory_before = process.memory_info().rss
+    for stream_number in range(streams):
+        market = f"sym{stream_number:04d}usdt"
+        if delivery == "callback":
+            ubwa.create_stream("trade", market, process_stream_data=collector.process)
+        elif delivery == "async_callback":
+            ubwa.create_stream("trade", market, process_stream_data_async=process_stream_data_async)
+        elif delivery == "asyncio_queue":
+            ubwa.create_stream("trade", market, process_asyncio_queue=process_asyncio_queue)
+        else:
+            ubwa.create_stream("trade", market)
+    time.sleep(warmup)
+    memory_after = process.memory_info().rss
+    cpu_times_start = process.cpu_times()
+    start_time = time.perf_counter()
+    sent_messages_start = local_stream_server.sent_messages
+    collector.start()
+    time.sleep(duration)
+    collector.stop()
+    sent = local_stream_server.sent_messages - sent_messages_start
+    elapsed_time = time.perf_counter() - start_time
+    cpu_times_end = process.cpu_times()
+    received = collector.received
+    latencies = list(collector.latencies)
+    cpu_seconds = (cpu_times_end.user - cpu_times_start.user) + (cpu_times_end.system - cpu_times_start.system)
+    result = {'streams': streams,
+              'output': output,
+              'delivery': delivery,
+              'duration': round(elapsed_time, 3),
+              'sent': sent,
+              'sent_per_second': round(sent / elapsed_time, 1),
+              'received': received,
+              'msgs_per_second': round(received / elapsed_time, 1),
+              'cpu_us_per_message': round(cpu_seconds / received * 1000000, 2) if received else None,
+              'memory_per_stream_bytes': int((memory_after - memory_before) / streams),
+              'latency_p50_us': get_percentile(latencies, 50),
+              'latency_p99_us': get_percentile(latencies, 99),
+              'latency_samples': len(latencies),
+              'dropped_records': ubwa.get_total_dropped_records()}
+    ubwa.stop_manager()
+    if stream_buffer_thread is not None:
+        stream_buffer_thread.join(timeout=10)
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="UNICORN Binance WebSocket API benchmark")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 10, 100, 500],
+                        help="Number of streams of the scenarios")
+    parser.add_argument("--outputs", nargs="+", default=list(OUTPUT_MODES), choices=OUTPUT_MODES)
+    parser.add_argument("--deliveries", nargs="+", default=list(DELIVERY_MODES), choices=DELIVERY_MODES)
+    parser.add_argument("--rate", type=float, default=100.0, help="Records per second and stream")
+    parser.add_argument("--size", type=int, default=250, help="Size of a record in bytes")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds before the measurement starts")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of the measurement")
+    parser.add_argument("--event-loop-pool-size", type=int, default=None)
+    parser.add_argument("--result-file", default=f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument("--lucit-api-secret", default=os.environ.get("LUCIT_API_SECRET"))
+    parser.add_argument("--lucit-license-token", default=os.environ.get("LUCIT_LICENSE_TOKEN"))
+    args = parser.parse_args()
+
+    local_stream_server = LocalStreamServer(messages_per_second=args.rate, message_size=args.size)
+    local_stream_server.start()
+    results = {'meta': {'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+                        'ubwa_version': ubwa_version,
+                        'python_version': platform.python_version(),
+                        'python_implementation': platform.python_implementation(),
+                        'platform': platform.platform(),
+                        'cpu_count': os.cpu_count(),
+                        'rate_per_stream': args.rate,
+                        'message_size': args.size,
+                        'warmup': args.warmup,
+                        'event_loop_pool_size': args.event_loop_pool_size},
+               'results': []}
+    try:
+        for streams in args.streams:
+            for output in args.outputs:
+                for delivery in args.deliveries:
+                    print(f"Running: streams={streams}, output={output}, delivery={delivery} ...")
+                    result = run_scenario(local_stream_server=local_stream_server,
+                                          streams=streams,
+                                          output=output,
+                                          delivery=delivery,
+                                          warmup=args.warmup,
+                                          duration=args.duration,
+                                          event_loop_pool_size=args.event_loop_pool_size,
+                                          lucit_api_secret=args.lucit_api_secret,
+                                          lucit_license_token=args.lucit_license_token)
+                    print(f"    {result['msgs_per_second']} of {result['sent_per_second']} sent msgs/s, "
+                          f"{result['cpu_us_per_message']} us CPU/msg, "
+                          f"p50={result['latency_p50_us']} us, p99={result['latency_p99_us']} us")
+                    results['results'].append(result)
+                    with open(args.result_file, "wb") as result_file:
+                        result_file.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    finally:
+        local_stream_server.stop()
+    print(f"Results written to '{args.result_file}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: dev/benchmark/local_stream_server.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+"""
+Local stand-in for the Binance websocket stream endpoint to run benchmarks without the live exchange.
+
+It accepts `/ws/<stream>` and `/stream?streams=<stream>/<stream>` connections, answers the `SUBSCRIBE`,
+`UNSUBSCRIBE` and `LIST_SUBSCRIPTIONS` requests like Binance and pushes synthetic `trade` records in the combined
+stream format with a configurable rate and size to every connection.
+
+The field `t` (trade id) of each record contains the send time in microseconds (`time.time_ns() // 1000`), it is
+kept by `UnicornFy` as `trade_id`, so the ingest latency can be measured with every output mode.
+"""
+
+from urllib.parse import parse_qs, urlparse
+from typing import Optional
+import asyncio
+import orjson
+import threading
+import time
+import websockets
+
+
+class LocalStreamServer(object):
+    """
+    :param host: Interface to listen on.
+    :type host: str
+    :param port: Port to listen on, 0 selects a free port.
+    :type port: int
+    :param messages_per_second: Records per second and subscription.
+    :type messages_per_second: float
+    :param message_size: Approximate size of a record in bytes, the record gets padded to this size.
+    :type message_size: int
+    """
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 messages_per_second: float = 100.0,
+                 message_size: int = 250):
+        self.host = host
+        self.port = port
+        self.messages_per_second = messages_per_second
+        self.message_size = message_size
+        self.connections = 0
+        self.sent_messages = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server = None
+        self.stop_event: Optional[asyncio.Event] = None
+        self.thread: Optional[threading.Thread] = None
+        self.ready = threading.Event()
+
+    @staticmethod
+    def dumps(response: dict) -> str:
+        return orjson.dumps(response).decode("utf-8")
+
+    def get_websocket_base_uri(self) -> str:
+        return f"ws://{self.host}:{self.port}/"
+
+    def create_record(self, stream: str, sequence: int) -> str:
+        symbol = stream.split("@")[0].upper()
+        data = {"e": "trade", "E": int(time.time() * 1000), "s": symbol, "t": time.time_ns() // 1000,
+                "p": "27000.01000000", "q": "0.00100000", "b": sequence, "a": sequence, "T": int(time.time() * 1000),
+                "m": True, "M": True}
+        record = orjson.dumps({"stream": stream, "data": data})
+        padding = self.message_size - len(record) - 8
+        if padding > 0:
+            data['x'] = "x" * padding
+            record = orjson.dumps({"stream": stream, "data": data})
+        # Binance sends text frames
+        return record.decode("utf-8")
+
+    async def handle_requests(self, websocket, subscriptions: list) -> None:
+        async for message in websocket:
+            try:
+                request = orjson.loads(message)
+            except orjson.JSONDecodeError:
+                await websocket.send(self.dumps({"error": {"code": 3, "msg": "Invalid JSON"}, "id": None}))
+                continue
+            method = str(request.get('method')).upper()
+            if method == "SUBSCRIBE":
+                for stream in request.get('params', []):
+                    if stream not in subscriptions:
+                        subscriptions.append(stream)
+                await websocket.send(self.dumps({"result": None, "id": request.get('id')}))
+            elif method == "UNSUBSCRIBE":
+                for stream in request.get('params', []):
+                    if stream in subscriptions:
+                        subscriptions.remove(stream)
+                await websocket.send(self.dumps({"result": None, "id": request.get('id')}))
+            elif method == "LIST_SUBSCRIPTIONS":
+                await websocket.send(self.dumps({"result": list(subscriptions), "id": request.get('id')}))
+            else:
+                await websocket.send(self.dumps({"error": {"code": 2, "msg": f"Invalid request: {method}"},
+                                                   "id": request.get('id')}))
+
+    async def handle_connection(self, websocket, path: str = None) -> None:
+        path = path or websocket.path
+        url = urlparse(path)
+        if url.path.startswith("/ws/"):
+            subscriptions = [url.path[4:]]
+        else:
+            subscriptions = [stream for stream in parse_qs(url.query).get('streams', [""])[0].split("/") if stream]
+        self.connections += 1
+        request_task = asyncio.create_task(self.handle_requests(websocket, subscriptions))
+        interval = 1 / self.messages_per_second
+        next_send_time = time.monotonic()
+        sequence = 0
+        try:
+            while request_task.done() is False:
+                next_send_time += interval
+                for stream in list(subscriptions):
+                    sequence += 1
+                    await websocket.send(self.create_record(stream, sequence))
+                    self.sent_messages += 1
+                delay = next_send_time - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    # Too slow for the requested rate, skip the missed intervals
+                    next_send_time = time.monotonic()
+                    await asyncio.sleep(0)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            request_task.cancel()
+            self.connections -= 1
+
+    async def serve(self) -> None:
+        self.stop_event = asyncio.Event()
+        async with websockets.serve(self.handle_connection, self.host, self.port, max_size=None) as self.server:
+            self.port = self.server.sockets[0].getsockname()[1]
+            self.ready.set()
+            await self.stop_event.wait()
+
+    def start(self) -> str:
+        """
+        Start the server in its own thread and event loop.
+
+        :return: str - the `websocket_base_uri` for `BinanceWebSocketApiManager()`
+        """
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(self.serve())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="LocalStreamServer", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self.get_websocket_base_uri()
+
+    def stop(self) -> None:
+        if self.loop is not None and self.stop_event is not None:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+        if self.thread is not None:
+            self.thread.join(timeout=10)
+
+
+if __name__ == "__main__":
+    local_stream_server = LocalStreamServer(port=8765)
+    print(f"Listening on {local_stream_server.start()} - Stop with CTRL+C")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        local_stream_server.stop()
@@ -5,3 +5,5 @@
 from .exceptions import *
 from .licensing_exceptions import *
 from .manager import BinanceWebSocketApiManager
+from .sharded_manager import BinanceWebSocketApiShardedManager
+from .order_book import BinanceWebSocketApiOrderBookManager
@@ -21,7 +21,6 @@
 
 from typing import Optional, Union, Literal
 import logging
-import threading
 
 __logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
 
@@ -200,25 +199,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.cancel_order() - Create payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def create_order(self,
                      activation_price: float = None,
@@ -517,24 +499,11 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.create_order() - Create payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
+        response_value = self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                                        process_response=process_response,
+                                                        return_response=return_response)
         if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
             return new_client_order_id, response_value
-
         return new_client_order_id
 
     def get_account_balance(self, process_response=None, recv_window: int = None, request_id: str = None,
@@ -650,25 +619,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.get_account_balance() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_account_position(self, process_response=None, recv_window: int = None, request_id: str = None,
                              return_response: bool = False, stream_id: str = None, stream_label: str = None,
@@ -848,25 +800,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.get_account_position() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_account_status(self, process_response=None, recv_window: int = None, request_id: str = None,
                            return_response: bool = False, stream_id: str = None, stream_label: str = None,
@@ -1136,25 +1071,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.get_account_status() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_listen_key(self, process_response=None, request_id: str = None, return_response: bool = False,
                        stream_id: str = None, stream_label: str = None) -> Union[str, dict, bool]:
@@ -1236,25 +1154,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.get_listen_key() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_order(self, order_id: int = None, orig_client_order_id: str = None, process_response=None,
                   recv_window: int = None, request_id: str = None, return_response: bool = False, stream_id: str = None,
@@ -1395,25 +1296,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.get_order() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_order_book(self, process_response=None, limit: int = None, recv_window: int = None, request_id: str = None,
                        return_response: bool = False, stream_id: str = None, stream_label: str = None,
@@ -1535,25 +1419,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.get_order_book() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
 
     def get_server_time(self, process_response=None, request_id: str = None, return_response: bool = False,
@@ -1629,25 +1496,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.get_server_time() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_ticker_order_book(self, process_response=None, request_id: str = None, return_response: bool = False,
                               stream_id: str = None, stream_label: str = None, symbol: str = None) \
@@ -1777,25 +1627,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.get_ticker_order_book() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_ticker_price(self, process_response=None, request_id: str = None, return_response: bool = False,
                          stream_id: str = None, stream_label: str = None, symbol: str = None) \
@@ -1916,25 +1749,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.get_ticker_price() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def modify_order(self,
                      order_id: int = None,
@@ -2128,25 +1944,8 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.modify_order() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def ping(self, process_response=None, request_id: str = None, return_response: bool = False,
              stream_id: str = None, stream_label: str = None) -> Union[str, dict, bool]:
@@ -2218,22 +2017,5 @@ class BinanceWebSocketApiApiFutures(object):
 
         logger.debug(f"BinanceWebSocketApiApiFutures.ping() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
@@ -21,7 +21,6 @@
 
 from typing import Optional, Union, Literal
 import logging
-import threading
 
 __logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
 
@@ -430,24 +429,11 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.cancel_and_replace_order() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
+        response_value = self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                                        process_response=process_response,
+                                                        return_response=return_response)
         if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
             return new_client_order_id, response_value
-
         return new_client_order_id
 
     def cancel_open_orders(self, process_response=None, return_response: bool = False, symbol: str = None,
@@ -628,25 +614,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.cancel_open_orders() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def cancel_order(self, cancel_restrictions: Optional[Literal['ONLY_NEW', 'ONLY_PARTIALLY_FILLED']] = None,
                      new_client_order_id: str = None, order_id: int = None, orig_client_order_id: str = None,
@@ -806,25 +775,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.cancel_order() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def create_order(self,
                      iceberg_qty: float = None,
@@ -1085,24 +1037,11 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.create_order() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
+        response_value = self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                                        process_response=process_response,
+                                                        return_response=return_response)
         if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
             return new_client_order_id, response_value
-
         return new_client_order_id
 
     def create_test_order(self, iceberg_qty: float = None,
@@ -1431,25 +1370,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_account_status() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_aggregate_trades(self, process_response=None, end_time: int = None, from_id: int = None, limit: int = None,
                              request_id: str = None, return_response: bool = False, start_time: int = None,
@@ -1578,25 +1500,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_aggregate_trades() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
 
     def get_current_average_price(self, process_response=None, request_id: str = None,
@@ -1688,25 +1593,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_current_average_price() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_exchange_info(self, permissions: list = None, process_response=None, recv_window: int = None,
                           request_id: str = None, return_response: bool = False, stream_id: str = None,
@@ -1887,25 +1775,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_exchange_info() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_historical_trades(self, process_response=None, from_id: int = None, limit: int = None,
                               request_id: str = None, return_response: bool = False, stream_id: str = None,
@@ -2013,25 +1884,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_historical_trades() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_klines(self, process_response=None,
                    end_time: int = None,
@@ -2183,25 +2037,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_klines() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_listen_key(self, process_response=None, request_id: str = None, return_response: bool = False,
                        stream_id: str = None, stream_label: str = None) -> Union[str, dict, bool]:
@@ -2283,25 +2120,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_listen_key() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_open_orders(self, process_response=None, recv_window: int = None, request_id: str = None,
                         return_response: bool = False, stream_id: str = None, stream_label: str = None,
@@ -2434,25 +2254,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_open_orders() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_order(self, order_id: int = None, orig_client_order_id: str = None, process_response=None,
                   recv_window: int = None, request_id: str = None, return_response: bool = False, stream_id: str = None,
@@ -2595,25 +2398,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_order() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_order_book(self, process_response=None, limit: int = None, recv_window: int = None, request_id: str = None,
                        return_response: bool = False, stream_id: str = None, stream_label: str = None,
@@ -2766,25 +2552,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_order_book() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_recent_trades(self, process_response=None, limit: int = None,
                           request_id: str = None, return_response: bool = False, stream_id: str = None,
@@ -2891,25 +2660,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_recent_trades() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_server_time(self, process_response=None, request_id: str = None, return_response: bool = False,
                         stream_id: str = None, stream_label: str = None) -> Union[str, dict, bool]:
@@ -2984,25 +2736,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_server_time() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def ping(self, process_response=None, request_id: str = None, return_response: bool = False,
              stream_id: str = None, stream_label: str = None) -> Union[str, dict, bool]:
@@ -3074,25 +2809,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.ping() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_ui_klines(self,
                       process_response=None,
@@ -3237,25 +2955,8 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_ui_klines() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
 
     def get_unfilled_order_count(self, process_response=None, request_id: str = None, return_response: bool = False,
                                  stream_id: str = None, stream_label: str = None) -> Union[str, dict, bool]:
@@ -3356,22 +3057,5 @@ class BinanceWebSocketApiApiSpot(object):
 
         logger.debug(f"BinanceWebSocketApiApiSpot.get_unfilled_order_count() - Created payload: {payload}")
 
-        if self._manager.send_with_stream(stream_id=stream_id, payload=payload) is False:
-            self._manager.add_payload_to_stream(stream_id=stream_id, payload=payload)
-
-        if process_response is not None:
-            with self._manager.process_response_lock:
-                entry = {'callback_function': process_response}
-                self._manager.process_response[request_id] = entry
-
-        if return_response is True:
-            with self._manager.return_response_lock:
-                entry = {'event_return_response': threading.Event()}
-                self._manager.return_response[request_id] = entry
-            self._manager.return_response[request_id]['event_return_response'].wait()
-            with self._manager.return_response_lock:
-                response_value = self._manager.return_response[request_id]['response_value']
-                del self._manager.return_response[request_id]
-            return response_value
-
-        return True
+        return self._manager.send_api_request(stream_id=stream_id, payload=payload,
+                                              process_response=process_response, return_response=return_response)
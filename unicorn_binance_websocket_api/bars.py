@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/bars.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+from typing import Callable, Dict, List, Literal, Optional, Union
+import logging
+import orjson
+import threading
+import time
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+BAR_TYPES: tuple = ("time", "tick", "volume", "quote_volume")
+
+
+class BinanceWebSocketApiBarAggregator(object):
+    """
+    Build OHLCV bars from the records of `trade` or `aggTrade` streams.
+
+    - `time`: A bar per `bar_size` seconds, e.g. 5 or 15 seconds. Bars without trades are not created.
+    - `tick`: A bar per `bar_size` trades.
+    - `volume`: A bar closes as soon as its volume (base asset) reaches `bar_size`.
+    - `quote_volume`: A bar closes as soon as its quote volume (price * quantity) reaches `bar_size`.
+
+    Trades are not split, the trade that reaches the size of a `volume` or `quote_volume` bar belongs completely to
+    this bar.
+
+    Closed bars are passed to `process_bar`, if not provided they are added to the `stream_buffer` of `manager`.
+    The current, not yet closed, bar of a symbol is available via `get_partial_bar()`. Trades of a time bar that is
+    already closed are counted in `late_trades` and ignored.
+
+    :param bar_type: "time", "tick", "volume" or "quote_volume"
+    :type bar_type: str
+    :param bar_size: Seconds, number of trades, volume or quote volume of a bar, depending on `bar_type`.
+    :type bar_size: float
+    :param process_bar: Function that gets called with each closed bar.
+    :type process_bar: function
+    :param manager: A `BinanceWebSocketApiManager()` to add the bars to its `stream_buffer`.
+    :type manager: BinanceWebSocketApiManager
+    :param stream_buffer_name: The `stream_buffer` for the bars.
+    :type stream_buffer_name: False or str
+    :param close_delay_ms: Time bars get closed by `close_due_bars()` this number of milliseconds after their end, to
+                           include trades that are still on the way. The end is compared to the clock of Binance
+                           corrected by the `clock_offset_ms` of `manager`.
+    :type close_delay_ms: int
+    """
+    def __init__(self,
+                 bar_type: Literal['time', 'tick', 'volume', 'quote_volume'] = "time",
+                 bar_size: Union[int, float] = 60,
+                 process_bar: Optional[Callable] = None,
+                 manager=None,
+                 stream_buffer_name: Union[Literal[False], str] = False,
+                 close_delay_ms: int = 500):
+        if bar_type not in BAR_TYPES:
+            raise ValueError(f"Parameter `bar_type` must be one of {BAR_TYPES}, received: {bar_type}")
+        if bar_size <= 0:
+            raise ValueError(f"Parameter `bar_size` must be higher than 0, received: {bar_size}")
+        self.bar_type = bar_type
+        self.bar_size = bar_size
+        self.bar_size_ms = int(bar_size * 1000)
+        self.process_bar = process_bar
+        self.manager = manager
+        self.stream_buffer_name = stream_buffer_name
+        self.close_delay_ms = close_delay_ms
+        self.bars: Dict[str, dict] = {}
+        self.closed_open_times: Dict[str, int] = {}
+        self.late_trades = 0
+        self.lock = threading.Lock()
+
+    def _deliver(self, bars: List[dict]) -> None:
+        for bar in bars:
+            if self.process_bar is not None:
+                self.process_bar(bar)
+            elif self.manager is not None:
+                self.manager.add_to_stream_buffer(bar, stream_buffer_name=self.stream_buffer_name)
+        return None
+
+    def _new_bar(self, symbol: str, price: float, trade_time: int) -> dict:
+        if self.bar_type == "time":
+            open_time = trade_time - trade_time % self.bar_size_ms
+            close_time = open_time + self.bar_size_ms - 1
+        else:
+            open_time = trade_time
+            close_time = trade_time
+        return {'event_type': "bar",
+                'symbol': symbol,
+                'bar_type': self.bar_type,
+                'bar_size': self.bar_size,
+                'open_time': open_time,
+                'close_time': close_time,
+                'open': price,
+                'high': price,
+                'low': price,
+                'close': price,
+                'volume': 0.0,
+                'quote_volume': 0.0,
+                'trades': 0,
+                'is_closed': False}
+
+    def _is_complete(self, bar: dict) -> bool:
+        if self.bar_type == "tick":
+            return bar['trades'] >= self.bar_size
+        elif self.bar_type == "volume":
+            return bar['volume'] >= self.bar_size
+        elif self.bar_type == "quote_volume":
+            return bar['quote_volume'] >= self.bar_size
+        return False
+
+    def add_trade(self, symbol: str, price: float, quantity: float, trade_time: int) -> Optional[dict]:
+        """
+        Add a trade and deliver the bar it closes.
+
+        :param symbol: The symbol of the trade.
+        :type symbol: str
+        :param price: Price of the trade.
+        :type price: float
+        :param quantity: Quantity of the trade.
+        :type quantity: float
+        :param trade_time: Time of the trade in milliseconds.
+        :type trade_time: int
+        :return: The closed bar or None
+        """
+        closed_bars = []
+        with self.lock:
+            bar = self.bars.get(symbol)
+            if self.bar_type == "time":
+                if trade_time - trade_time % self.bar_size_ms <= self.closed_open_times.get(symbol, -1):
+                    # The bar of this trade is already closed
+                    self.late_trades += 1
+                    return None
+                if bar is not None and trade_time > bar['close_time']:
+                    bar['is_closed'] = True
+                    closed_bars.append(bar)
+                    self.closed_open_times[symbol] = bar['open_time']
+                    bar = None
+            if bar is None:
+                bar = self._new_bar(symbol=symbol, price=price, trade_time=trade_time)
+                self.bars[symbol] = bar
+            if price > bar['high']:
+                bar['high'] = price
+            elif price < bar['low']:
+                bar['low'] = price
+            bar['close'] = price
+            bar['volume'] += quantity
+            bar['quote_volume'] += price * quantity
+            bar['trades'] += 1
+            if self.bar_type != "time":
+                bar['close_time'] = trade_time
+                if self._is_complete(bar) is True:
+                    bar['is_closed'] = True
+                    closed_bars.append(bar)
+                    del self.bars[symbol]
+        self._deliver(closed_bars)
+        return closed_bars[-1] if closed_bars else None
+
+    def close_due_bars(self, now: Optional[int] = None) -> List[dict]:
+        """
+        Close and deliver all time bars whose end plus `close_delay_ms` has passed, also if no new trade was
+        received. The `BinanceWebSocketApiManager()` calls this method frequently for all bar streams.
+
+        :param now: The current time of Binance in milliseconds, default is now corrected by the clock offset of
+                    `manager`.
+        :type now: int
+        :return: list of the closed bars
+        """
+        if self.bar_type != "time":
+            return []
+        if now is None:
+            clock_offset_ms = self.manager.clock_offset_ms if self.manager is not None else 0.0
+            now = int(time.time() * 1000 - clock_offset_ms)
+        closed_bars = []
+        with self.lock:
+            for symbol in [symbol for symbol, bar in self.bars.items()
+                           if bar['close_time'] + self.close_delay_ms < now]:
+                bar = self.bars.pop(symbol)
+                bar['is_closed'] = True
+                closed_bars.append(bar)
+                self.closed_open_times[symbol] = bar['open_time']
+        self._deliver(closed_bars)
+        return closed_bars
+
+    def get_partial_bar(self, symbol: str = None) -> Optional[dict]:
+        """
+        Get a copy of the current, not yet closed, bar of a symbol.
+
+        :param symbol: The symbol, e.g. "BTCUSDT"
+        :type symbol: str
+        :return: dict or None
+        """
+        with self.lock:
+            bar = self.bars.get(symbol.upper())
+            return dict(bar) if bar is not None else None
+
+    def process_stream_data(self, stream_data) -> None:
+        """
+        Callback for `create_stream()`: Accepts `trade` and `aggTrade` records as raw data, dict or UnicornFy dict
+        and lists of them (micro-batching).
+
+        :param stream_data: A received record.
+        :type stream_data: str, bytes, dict or list
+        :return: None
+        """
+        if isinstance(stream_data, list):
+            for record in stream_data:
+                self.process_stream_data(record)
+            return None
+        if not isinstance(stream_data, dict):
+            stream_data = orjson.loads(stream_data)
+        trade = stream_data.get('data', stream_data)
+        event_type = trade.get('e') or trade.get('event_type')
+        if event_type != "trade" and event_type != "aggTrade":
+            return None
+        if 'e' in trade:
+            self.add_trade(symbol=trade['s'], price=float(trade['p']), quantity=float(trade['q']),
+                           trade_time=int(trade['T']))
+        else:
+            self.add_trade(symbol=trade['symbol'], price=float(trade['price']), quantity=float(trade['quantity']),
+                           trade_time=int(trade['trade_time']))
+        return None
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/buffers.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+from collections import deque
+from typing import Callable, Hashable, Literal, Optional
+import asyncio
+import logging
+import orjson
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+BACKPRESSURE_POLICIES: tuple = ("block", "drop_oldest", "drop_newest", "coalesce_by_key")
+
+
+def get_record_key(stream_data) -> Hashable:
+    """
+    Get the default key of a record for `coalesce_by_key`: the stream name and the symbol of the record, because
+    all market streams like `!bookTicker` deliver the records of all symbols with the same stream name. Records
+    without a symbol are keyed by the stream name alone and records without a stream name by their event type and
+    symbol.
+
+    :param stream_data: A received record in any output format.
+    :type stream_data: str, bytes or dict
+    :return: Hashable
+    """
+    if isinstance(stream_data, (str, bytes, bytearray, memoryview)):
+        stream_data = orjson.loads(stream_data)
+    if not isinstance(stream_data, dict):
+        # e.g. `!ticker@arr`: Every record replaces the previous one
+        return None
+    data = stream_data.get('data', stream_data)
+    symbol = (data.get('s') or data.get('symbol')) if isinstance(data, dict) else None
+    stream = stream_data.get('stream') or stream_data.get('stream_type')
+    if stream is not None:
+        return stream if symbol is None else (stream, symbol)
+    return stream_data.get('e') or stream_data.get('event_type'), symbol
+
+
+class BinanceWebSocketApiStreamBuffer(object):
+    """
+    A bounded `stream_buffer` with a backpressure policy that counts all records it drops. It provides the methods of
+    `collections.deque` that are used for the `stream_buffer`, `append()` and `extend()` return the number of dropped
+    records.
+
+    - `block`: Never drops, the streams writing to it stop receiving while it is full (TCP backpressure).
+    - `drop_oldest`: Drops the oldest record if it is full (like `deque(maxlen=...)`).
+    - `drop_newest`: Drops the new record if it is full.
+    - `coalesce_by_key`: A new record replaces the waiting record with the same key, if it is full the oldest record
+      gets dropped.
+
+    :param maxlen: Max number of records, `None` for unbounded.
+    :type maxlen: int or None
+    :param backpressure_policy: "block", "drop_oldest" (default), "drop_newest" or "coalesce_by_key"
+    :type backpressure_policy: str
+    :param record_key: Function to get the key of a record for `coalesce_by_key`, default is `get_record_key()`.
+    :type record_key: function
+    """
+    def __init__(self,
+                 maxlen: Optional[int] = None,
+                 backpressure_policy: Literal['block', 'drop_oldest', 'drop_newest', 'coalesce_by_key'] = "drop_oldest",
+                 record_key: Optional[Callable] = None):
+        if backpressure_policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {backpressure_policy}")
+        self.maxlen = maxlen
+        self.backpressure_policy = backpressure_policy
+        self.record_key = record_key or get_record_key
+        self.dropped_records = 0
+        self.records = {} if self.backpressure_policy == "coalesce_by_key" else deque()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def is_full(self) -> bool:
+        """
+        Is the buffer full?
+
+        :return: bool
+        """
+        return self.maxlen is not None and len(self.records) >= self.maxlen
+
+    def append(self, stream_data) -> int:
+        """
+        Add a record.
+
+        :param stream_data: The record
+        :type stream_data: str, bytes or dict
+        :return: Number of dropped records (int)
+        """
+        dropped = 0
+        if self.backpressure_policy == "coalesce_by_key":
+            key = self.record_key(stream_data)
+            if key in self.records:
+                dropped = 1
+            elif self.is_full():
+                del self.records[next(iter(self.records))]
+                dropped = 1
+            self.records[key] = stream_data
+        elif self.is_full() is False or self.backpressure_policy == "block":
+            self.records.append(stream_data)
+        elif self.backpressure_policy == "drop_oldest":
+            self.records.popleft()
+            self.records.append(stream_data)
+            dropped = 1
+        else:
+            dropped = 1
+        self.dropped_records += dropped
+        return dropped
+
+    def extend(self, stream_data_batch) -> int:
+        """
+        Add a list of records.
+
+        :param stream_data_batch: The records
+        :type stream_data_batch: list
+        :return: Number of dropped records (int)
+        """
+        dropped = 0
+        for stream_data in stream_data_batch:
+            dropped += self.append(stream_data)
+        return dropped
+
+    def clear(self) -> None:
+        self.records.clear()
+
+    def popleft(self):
+        """
+        Remove and return the oldest record, raises `IndexError` if the buffer is empty.
+        """
+        if self.backpressure_policy == "coalesce_by_key":
+            try:
+                return self.records.pop(next(iter(self.records)))
+            except StopIteration:
+                raise IndexError("pop from an empty stream_buffer")
+        return self.records.popleft()
+
+    def pop(self):
+        """
+        Remove and return the newest record, raises `IndexError` if the buffer is empty.
+        """
+        if self.backpressure_policy == "coalesce_by_key":
+            try:
+                return self.records.popitem()[1]
+            except KeyError:
+                raise IndexError("pop from an empty stream_buffer")
+        return self.records.pop()
+
+
+class BinanceWebSocketApiConflationBuffer(object):
+    """
+    A `stream_buffer` that keeps one slot per key (stream name and symbol by default, e.g.
+    `("!bookTicker", "BTCUSDT")`) with the newest record. A new record overwrites the slot in place, so the memory
+    usage depends on the number of keys and not on the receiving rate.
+
+    Consumers drain only the keys that changed since their last read with `drain()` or read them one by one with
+    `popleft()`. The newest record of every key stays available via `get()`.
+
+    :param record_key: Function to get the key of a record, default is `get_record_key()`.
+    :type record_key: function
+    """
+    maxlen = None
+
+    def __init__(self, record_key: Optional[Callable] = None):
+        self.record_key = record_key or get_record_key
+        self.dropped_records = 0
+        self.slots: dict = {}
+        self.changed: dict = {}
+
+    def __len__(self) -> int:
+        return len(self.changed)
+
+    def append(self, stream_data) -> int:
+        """
+        Write a record into the slot of its key.
+
+        :param stream_data: The record
+        :type stream_data: str, bytes or dict
+        :return: Number of overwritten records that were not read yet (int)
+        """
+        key = self.record_key(stream_data)
+        self.slots[key] = stream_data
+        if key in self.changed:
+            self.dropped_records += 1
+            return 1
+        self.changed[key] = None
+        return 0
+
+    def extend(self, stream_data_batch) -> int:
+        """
+        Write a list of records into the slots of their keys.
+
+        :param stream_data_batch: The records
+        :type stream_data_batch: list
+        :return: Number of overwritten records that were not read yet (int)
+        """
+        dropped = 0
+        for stream_data in stream_data_batch:
+            dropped += self.append(stream_data)
+        return dropped
+
+    def clear(self) -> None:
+        self.slots.clear()
+        self.changed.clear()
+
+    def drain(self) -> dict:
+        """
+        Get the newest record of all keys that changed since the last read.
+
+        :return: dict (key: record)
+        """
+        changed = self.changed
+        self.changed = {}
+        return {key: self.slots[key] for key in changed}
+
+    def get(self, key: Hashable, default=None):
+        """
+        Get the newest record of a key, no matter if it was read already.
+
+        :param key: The key of the record.
+        :type key: Hashable
+        :param default: Returned if there is no record with this key.
+        :return: stream_data or `default`
+        """
+        return self.slots.get(key, default)
+
+    def keys(self) -> list:
+        """
+        Get all known keys.
+
+        :return: list
+        """
+        return list(self.slots)
+
+    def popleft(self):
+        """
+        Get the record of the key that changed first, raises `IndexError` if no key changed.
+        """
+        try:
+            key = next(iter(self.changed))
+        except StopIteration:
+            raise IndexError("pop from an empty stream_buffer")
+        del self.changed[key]
+        return self.slots[key]
+
+    def pop(self):
+        """
+        Get the record of the key that changed last, raises `IndexError` if no key changed.
+        """
+        try:
+            key = self.changed.popitem()[0]
+        except KeyError:
+            raise IndexError("pop from an empty stream_buffer")
+        return self.slots[key]
+
+
+class BinanceWebSocketApiCoalescingQueue(asyncio.Queue):
+    """
+    An `asyncio.Queue` that keeps only the newest waiting record per key. A new record replaces the waiting record
+    with the same key at its position in the queue.
+
+    :param maxsize: Max number of waiting records, if it is full the oldest record gets dropped. `0` is unbounded.
+    :type maxsize: int
+    :param record_key: Function to get the key of a record, default is `get_record_key()`.
+    :type record_key: function
+    """
+    def __init__(self, maxsize: int = 0, record_key: Optional[Callable] = None):
+        self.record_key = record_key or get_record_key
+        self.dropped_records = 0
+        super().__init__(maxsize=maxsize)
+
+    def _init(self, maxsize):
+        self._queue = {}
+        self._pending_key = None
+
+    def _get(self):
+        return self._queue.pop(next(iter(self._queue)))
+
+    def _put(self, item):
+        self._queue[self._pending_key] = item
+
+    def put_nowait(self, item) -> int:
+        """
+        Put a record into the queue without blocking.
+
+        :param item: The record
+        :return: Number of dropped records (int)
+        """
+        key = self.record_key(item)
+        if key in self._queue:
+            self._queue[key] = item
+            self.dropped_records += 1
+            return 1
+        dropped = 0
+        if self.full():
+            self.get_nowait()
+            self.task_done()
+            self.dropped_records += 1
+            dropped = 1
+        self._pending_key = key
+        super().put_nowait(item)
+        return dropped
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/columnar.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+from typing import Dict, Iterable, List, Optional
+import logging
+import orjson
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+
+def _get_field(record: dict, field: str):
+    if field in record:
+        return record[field]
+    value = record
+    for key in field.split("."):
+        value = value[key]
+    return value
+
+
+def get_dtype_of_value(value) -> str:
+    """
+    Get the NumPy dtype that is used for the values of a field.
+
+    Binance sends timestamps, ids and flags as JSON numbers and booleans, prices and quantities as strings. The dtype
+    is taken from the value, because the same field name has different meanings in different channels (e.g. `a` is
+    the aggregate trade id of an aggTrade, but the best ask price of a bookTicker).
+
+    :param value: A value of the field.
+    :return: str ("int64" or "float64")
+    """
+    if isinstance(value, (list, dict)):
+        raise ValueError(f"Can not export a field holding a {type(value).__name__} into a column, use a nested field "
+                         f"name or a single value field!")
+    if isinstance(value, (bool, int)):
+        return "int64"
+    return "float64"
+
+
+def check_export_parameters(fields: List[str], dtypes: Optional[Dict[str, str]] = None) -> None:
+    """
+    Check the parameters of a columnar export before any record gets consumed.
+
+    :param fields: Names of the fields to export.
+    :type fields: list
+    :param dtypes: Override the dtype of fields.
+    :type dtypes: dict
+    :return: None - raises `ImportError` if NumPy is not installed, `ValueError` if `fields` is empty and `TypeError`
+             if a dtype is unknown.
+    """
+    if numpy is None:
+        raise ImportError("The columnar export requires NumPy, please install it with `pip install numpy`!")
+    if not fields:
+        raise ValueError("Parameter `fields` must contain at least one field name!")
+    for dtype in (dtypes or {}).values():
+        numpy.dtype(dtype)
+    return None
+
+
+def records_to_arrays(records: Iterable,
+                      fields: List[str],
+                      dtypes: Optional[Dict[str, str]] = None,
+                      structured: bool = False,
+                      skipped_records: Optional[list] = None):
+    """
+    Convert records of the `stream_buffer` to typed NumPy column arrays.
+
+    The records are decoded once with `orjson`, the dtype of a field is taken from its value in the first record that
+    contains it (numbers and booleans become `int64`, strings and floats `float64`) and the columns get preallocated
+    and filled row by row. Records of combined streams (`{"stream": ..., "data": {...}}`) get unwrapped.
+
+    Records that do not contain all `fields` (e.g. subscription results) or whose values do not fit the dtype of the
+    column are not part of the arrays. They are appended to `skipped_records` if a list is provided, otherwise their
+    number gets logged as a warning.
+
+    :param records: Records as `str`, `bytes` or `dict` (raw, `dict` or UnicornFy output).
+    :type records: list
+    :param fields: Names of the fields to export, nested fields are addressed with a dot, e.g. `k.c`.
+    :type fields: list
+    :param dtypes: Override the dtype of fields, e.g. `{"T": "float64"}`.
+    :type dtypes: dict
+    :param structured: Return one structured array instead of a dict of column arrays.
+    :type structured: bool
+    :param skipped_records: A list to which the records that are not part of the arrays get appended.
+    :type skipped_records: list
+    :return: dict of `numpy.ndarray` or `numpy.ndarray`
+    """
+    check_export_parameters(fields, dtypes=dtypes)
+    skipped = []
+    rows = []
+    for record in records:
+        data = orjson.loads(record) if isinstance(record, (str, bytes, bytearray, memoryview)) else record
+        if isinstance(data, dict):
+            data = data.get('data', data)
+        if not isinstance(data, dict):
+            skipped.append(record)
+            continue
+        try:
+            rows.append((record, [_get_field(data, field) for field in fields]))
+        except (KeyError, TypeError):
+            skipped.append(record)
+    dtypes = dict(dtypes or {})
+    for index, field in enumerate(fields):
+        if field not in dtypes:
+            dtypes[field] = get_dtype_of_value(rows[0][1][index]) if rows else "float64"
+    columns = {field: numpy.empty(len(rows), dtype=dtypes[field]) for field in fields}
+    row = 0
+    for record, values in rows:
+        try:
+            for field, value in zip(fields, values):
+                columns[field][row] = value
+        except (TypeError, ValueError):
+            skipped.append(record)
+            continue
+        row += 1
+    if skipped:
+        if skipped_records is not None:
+            skipped_records.extend(skipped)
+        else:
+            logger.warning(f"records_to_arrays() - {len(skipped)} records do not contain the fields {fields} or do "
+                           f"not fit their dtypes and are not part of the arrays!")
+    if structured is True:
+        result = numpy.empty(row, dtype=[(field, columns[field].dtype) for field in fields])
+        for field in fields:
+            result[field] = columns[field][:row]
+        return result
+    return {field: columns[field][:row] for field in fields}
@@ -20,12 +20,18 @@
 # All rights reserved.
 
 from .exceptions import *
+from .metrics import get_event_time_of_frame
+from typing import List, Optional
 from urllib.parse import urlparse
+from websockets.client import WebSocketClientProtocol
+from websockets.exceptions import ProtocolError
+from websockets.frames import OP_BINARY, OP_CONT, OP_TEXT
 import asyncio
 import copy
 import logging
 import socks  # PySocks https://pypi.org/project/PySocks/
 import sys
+import time
 import websockets
 
 __logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
@@ -34,6 +40,39 @@ logger = __logger__
 connect:  websockets.connect = websockets.connect
 
 
+class BinanceWebSocketApiClientProtocol(WebSocketClientProtocol):
+    """
+    Websocket client protocol that returns text frames as received `bytes` without decoding them to `str`.
+
+    `orjson` and `UnicornFy` are able to parse `bytes` directly, so the UTF-8 decoding and the copy it creates can get
+    skipped.
+    """
+    async def read_message(self) -> Optional[bytes]:
+        frame = await self.read_data_frame(max_size=self.max_size)
+        if frame is None:
+            # A close frame was received.
+            return None
+        if frame.opcode != OP_TEXT and frame.opcode != OP_BINARY:
+            raise ProtocolError("unexpected opcode")
+        if frame.fin:
+            # Shortcut for the common case - no fragmentation
+            return frame.data
+        fragments: List[bytes] = [frame.data]
+        max_size = self.max_size
+        if max_size is not None:
+            max_size -= len(frame.data)
+        while not frame.fin:
+            frame = await self.read_data_frame(max_size=max_size)
+            if frame is None:
+                raise ProtocolError("incomplete fragmented message")
+            if frame.opcode != OP_CONT:
+                raise ProtocolError("unexpected opcode")
+            fragments.append(frame.data)
+            if max_size is not None:
+                max_size -= len(frame.data)
+        return b"".join(fragments)
+
+
 class BinanceWebSocketApiConnection(object):
     def __init__(self,
                  manager,
@@ -52,15 +91,29 @@ class BinanceWebSocketApiConnection(object):
         self.markets = copy.deepcopy(markets)
         self.symbols = copy.deepcopy(symbols)
         self.websocket = None
+        self.metrics = self.manager.stream_metrics[self.stream_id]
         self.api = copy.deepcopy(self.manager.stream_list[self.stream_id]['api'])
         self.add_timeout = True if "!userData" in f"{channels}{markets}" or self.api is True else False
         self.timeout_disabled = False
+        raw_data_type = self.manager.stream_list[self.stream_id].get('raw_data_type')
+        self.receive_bytes = True if raw_data_type == "bytes" or raw_data_type == "memoryview" else False
+        self.create_protocol = BinanceWebSocketApiClientProtocol if self.receive_bytes is True else None
+        record_file = self.manager.stream_list[self.stream_id].get('record_file')
+        self.recorder = self.manager.get_frame_recorder(record_file) if record_file is not None else None
+        self.enable_latency_histograms = self.manager.enable_latency_histograms
 
     async def __aenter__(self):
         logger.debug(f"Entering with-context of BinanceWebSocketApiConnection() ...")
         self.raise_exceptions()
-        uri = self.manager.create_websocket_uri(self.channels,
-                                                self.markets,
+        channels = self.channels
+        markets = self.markets
+        if self.api is False:
+            # the socket was started with the channels and markets of its creation, the current subscriptions of the
+            # stream are in the `stream_list`
+            channels = self.manager.stream_list[self.stream_id].get('channels', channels)
+            markets = self.manager.stream_list[self.stream_id].get('markets', markets)
+        uri = self.manager.create_websocket_uri(channels,
+                                                markets,
                                                 self.stream_id,
                                                 symbols=self.symbols,
                                                 api=self.manager.stream_list[self.stream_id]['api'])
@@ -100,11 +153,22 @@ class BinanceWebSocketApiConnection(object):
                             f"channels={self.channels}), markets={self.markets}) - error: 1 - "
                             f"KeyError: {error_msg}")
             print(f"KeyError: {error_msg}")
+        uri_subscription_names = self.manager.get_websocket_uri_subscription_names(uri)
+        if uri_subscription_names is not None:
+            # a new connection has only the subscriptions of the URI, the rest gets queued
+            if self.manager.set_stream_subscription_names(stream_id=self.stream_id,
+                                                          subscription_names=uri_subscription_names) is False:
+                error_msg = "Can not queue the subscriptions which are not part of the URI!"
+                logger.critical(f"BinanceWebSocketApiConnection.__aenter__(stream_id={self.stream_id}), channels="
+                                f"{self.channels}), markets={self.markets}) - error: 6 - {error_msg}")
+                self.manager.set_socket_is_ready(stream_id=self.stream_id)
+                raise StreamIsRestarting(stream_id=self.stream_id, reason=error_msg)
         if self.manager.socks5_proxy_address is None or self.manager.socks5_proxy_port is None:
             self._conn = connect(str(uri),
                                  ping_interval=self.ping_interval,
                                  ping_timeout=self.ping_timeout,
                                  close_timeout=self.close_timeout,
+                                 create_protocol=self.create_protocol,
                                  extra_headers={'User-Agent': str(self.manager.get_user_agent())})
             logger.info(f"BinanceWebSocketApiConnection.__aenter__({self.stream_id}, {self.channels}"
                         f", {self.markets}) - No proxy used!")
@@ -144,6 +208,7 @@ class BinanceWebSocketApiConnection(object):
                                  ping_interval=self.ping_interval,
                                  ping_timeout=self.ping_timeout,
                                  close_timeout=self.close_timeout,
+                                 create_protocol=self.create_protocol,
                                  extra_headers={'User-Agent': str(self.manager.get_user_agent())})
             logger.info(f"BinanceWebSocketApiConnection.__aenter__(\"{self.stream_id}, {self.channels}"
                         f", {self.markets}\") - Using proxy: {self.manager.socks5_proxy_address} "
@@ -165,10 +230,25 @@ class BinanceWebSocketApiConnection(object):
         self.manager.set_heartbeat(self.stream_id)
         return await self.websocket.close()
 
-    async def receive(self):
-        logger.debug(f"BinanceWebSocketApiConnection.receive({str(self.stream_id)})")
+    async def receive(self, timeout: float = None):
+        received_data_json, receive_time = await self.receive_frame(timeout=timeout)
+        self.add_frame(received_data_json, receive_time)
+        return received_data_json
+
+    async def receive_frame(self, timeout: float = None) -> tuple:
+        """
+        Receive the next frame without counting and recording it, `add_frame()` does that.
+
+        :param timeout: Max seconds to wait for a frame.
+        :type timeout: float
+        :return: tuple (frame, receive_time)
+        """
+        logger.debug(f"BinanceWebSocketApiConnection.receive_frame({str(self.stream_id)})")
         self.raise_exceptions()
-        if self.add_timeout:
+        if timeout is not None:
+            # The caller needs the control back in time (e.g. to flush a batch)
+            received_data_json = await asyncio.wait_for(self.websocket.recv(), timeout=timeout)
+        elif self.add_timeout:
             if self.api is True:
                 timeout = 0.1
             else:
@@ -178,21 +258,39 @@ class BinanceWebSocketApiConnection(object):
             if self.timeout_disabled is True and self.manager.stream_list[self.stream_id]['subscriptions'] != 0:
                 received_data_json = await self.websocket.recv()
             else:
-                if self.manager.stream_list[self.stream_id]['processed_receives_total'] > 10:
+                if self.metrics.processed_receives_total > 10:
                     self.timeout_disabled = True
                 received_data_json = await asyncio.wait_for(self.websocket.recv(), timeout=1)
-        self.manager.set_heartbeat(self.stream_id)
-        size = sys.getsizeof(str(received_data_json))
-        self.manager.add_total_received_bytes(size)
-        self.manager.increase_received_bytes_per_second(self.stream_id, size)
-        self.manager.increase_processed_receives_statistic(self.stream_id)
-        return received_data_json
+        return received_data_json, time.monotonic()
+
+    def add_frame(self, received_data_json, receive_time: float) -> None:
+        """
+        Count a received frame in the metrics of the stream and write it to the frame recorder.
+
+        :param received_data_json: The received frame.
+        :type received_data_json: str, bytes or memoryview
+        :param receive_time: `time.monotonic()` of the receive.
+        :type receive_time: float
+        :return: None
+        """
+        if self.receive_bytes is True:
+            size = len(received_data_json)
+        else:
+            size = sys.getsizeof(str(received_data_json))
+        self.metrics.add_receive(size)
+        if self.enable_latency_histograms is True:
+            event_time, channel = get_event_time_of_frame(received_data_json)
+            if event_time is not None:
+                self.metrics.add_latency(self.manager.get_latency(event_time, receive_time), channel)
+        if self.recorder is not None:
+            self.recorder.write(self.stream_id, received_data_json, receive_time=receive_time)
+        return None
 
     async def send(self, data):
         logger.debug(f"BinanceWebSocketApiConnection.send({str(self.stream_id)})")
         self.raise_exceptions()
         response = await self.websocket.send(data)
-        self.manager.set_heartbeat(self.stream_id)
+        self.metrics.set_heartbeat()
         self.manager.increase_transmitted_counter(self.stream_id)
         return response
 
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/connection_rotation.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+from .connection import BinanceWebSocketApiConnection
+from collections import Counter, deque
+from typing import Optional
+import asyncio
+import hashlib
+import logging
+import time
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+
+class BinanceWebSocketApiConnectionRotation(object):
+    """
+    Make-before-break rotation of the connection of a socket ahead of the 24 hour limit of Binance.
+
+    A replacement connection with the subscriptions of the stream gets opened in the background while the socket keeps
+    delivering the records of the old connection. The records of the new connection are buffered till it is live:
+    it is open for `overlap` seconds and all its SUBSCRIBE messages are sent (at the latest after `max_overlap`
+    seconds). Then the socket switches over, delivers the buffered records, drops the records which were already
+    delivered by the old connection and closes the old connection. Only the delivered records of the new connection
+    get counted in the metrics and written to the frame recorder.
+
+    The frames of the old connection get remembered as compact digests from the moment the replacement connection
+    gets opened, digests older than `overlap` seconds before the oldest frame that still has to be compared get
+    dropped.
+
+    :param socket: The socket of the stream.
+    :type socket: BinanceWebSocketApiSocket
+    :param overlap: Min seconds both connections run in parallel, this is also the time records get deduplicated
+                    after the switch.
+    :type overlap: float
+    :param max_overlap: Max seconds to wait for the queued SUBSCRIBE messages of the new connection.
+    :type max_overlap: float
+    """
+    def __init__(self, socket, overlap: float = 5.0, max_overlap: float = 60.0):
+        self.socket = socket
+        self.manager = socket.manager
+        self.stream_id: str = socket.stream_id
+        self.overlap: float = overlap
+        self.max_overlap: float = max_overlap
+        self.connection: Optional[BinanceWebSocketApiConnection] = None
+        self.connect_task: Optional[asyncio.Task] = None
+        self.connected_time: Optional[float] = None
+        self.switch_time: Optional[float] = None
+        self.failed: bool = False
+        self.buffer: deque = deque()
+        self.delivered: Counter = Counter()
+        self.delivered_times: deque = deque()
+        self.matched: Counter = Counter()
+        self.record_delivered: bool = False
+        self.previous_subscription_names: Optional[set] = None
+
+    @staticmethod
+    def _get_key(frame) -> bytes:
+        if isinstance(frame, str):
+            frame = frame.encode("utf-8")
+        return hashlib.blake2b(frame, digest_size=16).digest()
+
+    def _drop_delivered(self, receive_time: float) -> None:
+        # a duplicate arrives within `overlap` seconds of the delivered frame
+        while self.delivered_times and self.delivered_times[0][0] < receive_time - self.overlap:
+            key = self.delivered_times.popleft()[1]
+            # a match consumes the oldest frame with the same key
+            counter = self.matched if self.matched[key] > 0 else self.delivered
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+        return None
+
+    async def _connect(self) -> None:
+        try:
+            priority = self.manager.stream_list[self.stream_id].get('reconnect_priority') or 0
+            if await self.manager.reconnect_scheduler.acquire(stream_id=self.stream_id, priority=priority) is False:
+                self.failed = True
+                return None
+            # queued payloads must not be sent to the old connection anymore, the URI of the new connection and its
+            # outbound scheduler take care of them
+            await self.socket.stop_outbound_scheduler()
+            # the URI of the new connection replaces the subscriptions of the stream, `abort()` restores them
+            if self.stream_id in self.manager.stream_subscription_names:
+                self.previous_subscription_names = set(self.manager.stream_subscription_names[self.stream_id])
+            # frames delivered from now on can be received by the new connection too
+            self.record_delivered = True
+            connection = BinanceWebSocketApiConnection(self.manager,
+                                                       self.stream_id,
+                                                       self.socket.channels,
+                                                       self.socket.markets,
+                                                       symbols=self.socket.symbols)
+            self.connection = await connection.__aenter__()
+            self.manager.reconnect_scheduler.report_connected(stream_id=self.stream_id)
+            self.socket.start_outbound_scheduler(self.connection)
+            self.connected_time = time.monotonic()
+            logger.info(f"BinanceWebSocketApiConnectionRotation._connect({self.stream_id}) - Replacement connection "
+                        f"is open!")
+            while True:
+                try:
+                    self.buffer.append(await self.connection.receive_frame(timeout=1.0))
+                except asyncio.TimeoutError:
+                    continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as error_msg:
+            logger.error(f"BinanceWebSocketApiConnectionRotation._connect({self.stream_id}) - Rotation failed with "
+                         f"{type(error_msg).__name__} - error_msg: {error_msg}")
+            self.failed = True
+        return None
+
+    async def abort(self, restore_outbound_scheduler: bool = True) -> None:
+        """
+        Stop the rotation and close the replacement connection, the socket keeps the old connection.
+
+        :param restore_outbound_scheduler: Restart the outbound scheduler of the old connection.
+        :type restore_outbound_scheduler: bool
+        :return: None
+        """
+        if self.connect_task is not None and not self.connect_task.done():
+            self.connect_task.cancel()
+            try:
+                await self.connect_task
+            except asyncio.CancelledError:
+                pass
+        if self.connection is not None:
+            if restore_outbound_scheduler is True:
+                await self.socket.stop_outbound_scheduler()
+            try:
+                await self.connection.close()
+            except Exception as error_msg:
+                logger.debug(f"BinanceWebSocketApiConnectionRotation.abort({self.stream_id}) - Can not close the "
+                             f"replacement connection: {type(error_msg).__name__} - error_msg: {error_msg}")
+        if self.previous_subscription_names is not None:
+            # the old connection still has its subscriptions
+            try:
+                self.manager.set_stream_subscription_names(stream_id=self.stream_id,
+                                                           subscription_names=self.previous_subscription_names)
+            except KeyError:
+                pass
+            self.previous_subscription_names = None
+        if restore_outbound_scheduler is True and self.socket.outbound_scheduler_task is None:
+            self.socket.start_outbound_scheduler(self.socket.websocket)
+        return None
+
+    def add_delivered(self, frame) -> None:
+        """
+        Remember a frame which was delivered from the old connection while the replacement connection is opened or
+        open.
+
+        :param frame: The received frame.
+        :return: None
+        """
+        if self.record_delivered is False or frame is None:
+            return None
+        now = time.monotonic()
+        # buffered frames of the new connection still have to be compared with older frames
+        self._drop_delivered(self.buffer[0][1] if self.buffer else now)
+        key = self._get_key(frame)
+        self.delivered[key] += 1
+        self.delivered_times.append((now, key))
+        return None
+
+    def is_connected(self) -> bool:
+        """
+        Is the replacement connection open?
+
+        :return: bool
+        """
+        return self.connection is not None and self.failed is False
+
+    def is_duplicate(self, frame, receive_time: Optional[float] = None) -> bool:
+        """
+        Was the frame already delivered from the old connection?
+
+        :param frame: The received frame.
+        :param receive_time: The monotonic receive time of the frame.
+        :type receive_time: float
+        :return: bool
+        """
+        self._drop_delivered(time.monotonic() if receive_time is None else receive_time)
+        if not self.delivered:
+            return False
+        key = self._get_key(frame)
+        if self.delivered[key] > 0:
+            self.delivered[key] -= 1
+            if self.delivered[key] == 0:
+                del self.delivered[key]
+            self.matched[key] += 1
+            return True
+        return False
+
+    def is_live(self) -> bool:
+        """
+        Is the replacement connection ready to take over?
+
+        :return: bool
+        """
+        if self.is_connected() is False:
+            return False
+        connected_seconds = time.monotonic() - self.connected_time
+        if connected_seconds < self.overlap:
+            return False
+        if connected_seconds >= self.max_overlap:
+            return True
+        outbound_scheduler = self.socket.outbound_scheduler
+        if outbound_scheduler is not None and outbound_scheduler.queue:
+            return False
+        return not self.manager.stream_list[self.stream_id]['payload']
+
+    def is_over(self) -> bool:
+        """
+        Is the deduplication after the switch over?
+
+        :return: bool
+        """
+        return self.switch_time is not None and not self.buffer \
+            and time.monotonic() - self.switch_time >= self.overlap
+
+    def start(self) -> None:
+        """
+        Open the replacement connection in the background.
+
+        :return: None
+        """
+        logger.info(f"BinanceWebSocketApiConnectionRotation.start({self.stream_id}) - Opening a replacement "
+                    f"connection ...")
+        self.connect_task = asyncio.ensure_future(self._connect())
+        return None
+
+    async def switch(self) -> None:
+        """
+        Stop reading the replacement connection in the background, from now on the socket reads it.
+
+        :return: None
+        """
+        if self.connect_task is not None and not self.connect_task.done():
+            self.connect_task.cancel()
+            try:
+                await self.connect_task
+            except asyncio.CancelledError:
+                pass
+        self.switch_time = time.monotonic()
+        return None
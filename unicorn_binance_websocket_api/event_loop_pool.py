@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/event_loop_pool.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from typing import Coroutine, List, Optional
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+
+def new_event_loop(use_uvloop: bool = False) -> asyncio.AbstractEventLoop:
+    """
+    Create a new asyncio event loop, if `use_uvloop` is `True` and `uvloop` is installed, an `uvloop` loop is
+    created.
+
+    :param use_uvloop: Use `uvloop <https://github.com/MagicStack/uvloop>`__ if it is installed.
+    :type use_uvloop: bool
+    :return: asyncio.AbstractEventLoop
+    """
+    if use_uvloop is True:
+        if uvloop is not None:
+            return uvloop.new_event_loop()
+        logger.warning(f"new_event_loop() - `uvloop` is not installed, using the default asyncio event loop!")
+    return asyncio.new_event_loop()
+
+
+class BinanceWebSocketApiEventLoopPool(object):
+    """
+    A fixed number of threads, each running one asyncio event loop forever. The coroutines of the streams get
+    scheduled onto the loop with the fewest streams.
+
+    :param size: Number of loop threads.
+    :type size: int
+    :param use_uvloop: Use `uvloop <https://github.com/MagicStack/uvloop>`__ if it is installed.
+    :type use_uvloop: bool
+    :param debug: Enable the debug mode of the loops.
+    :type debug: bool
+    """
+    def __init__(self, size: int = 1, use_uvloop: bool = False, debug: bool = False):
+        if size < 1:
+            raise ValueError(f"The size of the event loop pool must be 1 or higher, received: {size}")
+        self.size = size
+        self.use_uvloop = use_uvloop
+        self.debug = debug
+        self.loops: List[asyncio.AbstractEventLoop] = []
+        self.threads: List[threading.Thread] = []
+        self.streams_per_loop: List[int] = []
+        self.lock = threading.Lock()
+        for index in range(0, self.size):
+            loop = new_event_loop(use_uvloop=self.use_uvloop)
+            if self.debug is True:
+                loop.set_debug(enabled=True)
+            thread = threading.Thread(target=self._run_loop,
+                                      args=(loop, ),
+                                      name=f"BinanceWebSocketApiEventLoopPool: loop={index}, time={time.time()}",
+                                      daemon=True)
+            self.loops.append(loop)
+            self.threads.append(thread)
+            self.streams_per_loop.append(0)
+            thread.start()
+        logger.info(f"BinanceWebSocketApiEventLoopPool() - Started {self.size} event loop threads "
+                    f"(uvloop={self.use_uvloop})")
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            try:
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                if tasks:
+                    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            except RuntimeError as error_msg:
+                logger.debug(f"BinanceWebSocketApiEventLoopPool._run_loop() - RuntimeError: {error_msg}")
+            loop.close()
+        return None
+
+    def get_thread(self, loop: asyncio.AbstractEventLoop) -> Optional[threading.Thread]:
+        """
+        Get the thread that runs the provided loop.
+
+        :param loop: An event loop of this pool.
+        :type loop: asyncio.AbstractEventLoop
+        :return: threading.Thread or None
+        """
+        try:
+            return self.threads[self.loops.index(loop)]
+        except ValueError:
+            return None
+
+    def acquire_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Get the loop with the fewest streams and count a new stream on it.
+
+        :return: asyncio.AbstractEventLoop
+        """
+        with self.lock:
+            index = self.streams_per_loop.index(min(self.streams_per_loop))
+            self.streams_per_loop[index] += 1
+            return self.loops[index]
+
+    def release_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Remove a stream from the counter of a loop.
+
+        :param loop: An event loop of this pool.
+        :type loop: asyncio.AbstractEventLoop
+        :return: None
+        """
+        with self.lock:
+            try:
+                index = self.loops.index(loop)
+            except ValueError:
+                return None
+            if self.streams_per_loop[index] > 0:
+                self.streams_per_loop[index] -= 1
+        return None
+
+    @staticmethod
+    def run_coroutine(coroutine: Coroutine, loop: asyncio.AbstractEventLoop) -> concurrent.futures.Future:
+        """
+        Schedule a coroutine on a loop of this pool.
+
+        :param coroutine: The coroutine to run.
+        :type coroutine: Coroutine
+        :param loop: An event loop of this pool.
+        :type loop: asyncio.AbstractEventLoop
+        :return: concurrent.futures.Future
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, loop)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stop all loops of the pool. Waits max `timeout` seconds for the streams on the loops to finish.
+
+        :param timeout: Time in seconds to wait for running streams.
+        :type timeout: float
+        :return: None
+        """
+        timeout_time = time.time() + timeout
+        while sum(self.streams_per_loop) > 0 and time.time() < timeout_time:
+            time.sleep(0.1)
+        for loop in self.loops:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(loop.stop)
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=max(timeout_time - time.time(), 1.0))
+        logger.info(f"BinanceWebSocketApiEventLoopPool.stop() - All event loops are stopped!")
+        return None
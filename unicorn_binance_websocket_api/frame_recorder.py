@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/frame_recorder.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+from .exceptions import *
+from typing import Iterator, Optional, Tuple
+import asyncio
+import copy
+import gzip
+import logging
+import struct
+import threading
+import time
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+# Frame header: monotonic receive time, length of the stream_id, length of the frame
+FRAME_HEADER: struct.Struct = struct.Struct("<dHI")
+
+
+def read_frames(file_path: str, stream_id: Optional[str] = None) -> Iterator[Tuple[float, str, bytes]]:
+    """
+    Read the frames of a segment file that was written by `BinanceWebSocketApiFrameRecorder()`.
+
+    :param file_path: Path of the segment file.
+    :type file_path: str
+    :param stream_id: Only yield the frames of this stream_id, `None` yields all frames.
+    :type stream_id: str or None
+    :return: Iterator of tuples (receive_time, stream_id, frame)
+    """
+    with gzip.open(file_path, "rb") as segment_file:
+        while True:
+            header = segment_file.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                # End of file or an incomplete last frame of a recorder that was killed
+                return None
+            receive_time, stream_id_length, frame_length = FRAME_HEADER.unpack(header)
+            frame_stream_id = segment_file.read(stream_id_length).decode("utf-8")
+            frame = segment_file.read(frame_length)
+            if len(frame) < frame_length:
+                return None
+            if stream_id is None or frame_stream_id == stream_id:
+                yield receive_time, frame_stream_id, frame
+
+
+class BinanceWebSocketApiFrameRecorder(object):
+    """
+    Write every raw frame the streams receive with its monotonic receive time and stream_id to an append-only gzip
+    compressed segment file.
+
+    Opening an existing file appends a new gzip member, the file can be read with `read_frames()` and replayed with
+    the parameter `replay_file` of `create_stream()`.
+
+    :param file_path: Path of the segment file.
+    :type file_path: str
+    :param flush_interval: Flush the compressed data to the file at least every `flush_interval` seconds.
+    :type flush_interval: float
+    :param compresslevel: gzip compression level (1 = fastest, 9 = smallest).
+    :type compresslevel: int
+    """
+    def __init__(self, file_path: str, flush_interval: float = 1.0, compresslevel: int = 1):
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self.frames = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.segment_file = gzip.open(file_path, "ab", compresslevel=compresslevel)
+        logger.info(f"BinanceWebSocketApiFrameRecorder() - Recording frames to '{file_path}'")
+
+    def close(self) -> None:
+        """
+        Flush and close the segment file.
+
+        :return: None
+        """
+        with self.lock:
+            if self.segment_file is not None:
+                self.segment_file.close()
+                self.segment_file = None
+        return None
+
+    def flush(self) -> None:
+        """
+        Flush the compressed data to the segment file.
+
+        :return: None
+        """
+        with self.lock:
+            if self.segment_file is not None:
+                self.segment_file.flush()
+                self.last_flush = time.monotonic()
+        return None
+
+    def write(self, stream_id: str, frame, receive_time: Optional[float] = None) -> None:
+        """
+        Append a frame to the segment file.
+
+        :param stream_id: The stream_id of the stream that received the frame.
+        :type stream_id: str
+        :param frame: The frame as received.
+        :type frame: str, bytes or memoryview
+        :param receive_time: Monotonic receive time, default is `time.monotonic()`.
+        :type receive_time: float
+        :return: None
+        """
+        if receive_time is None:
+            receive_time = time.monotonic()
+        if isinstance(frame, str):
+            frame = frame.encode("utf-8")
+        stream_id = str(stream_id).encode("utf-8")
+        with self.lock:
+            if self.segment_file is None:
+                return None
+            self.segment_file.write(FRAME_HEADER.pack(receive_time, len(stream_id), len(frame)))
+            self.segment_file.write(stream_id)
+            self.segment_file.write(frame)
+            self.frames += 1
+            if receive_time - self.last_flush > self.flush_interval:
+                self.segment_file.flush()
+                self.last_flush = receive_time
+        return None
+
+
+class BinanceWebSocketApiReplayConnection(object):
+    """
+    Replaces `BinanceWebSocketApiConnection()` for streams with a `replay_file` and returns the recorded frames
+    instead of receiving them via network, so they pass the same decode and dispatch path of `start_socket()`.
+
+    With `replay_speed` 1.0 the frames are returned in the recorded timing, with 10.0 ten times faster and with `None`
+    or 0 as fast as possible. The stream stops after the last frame.
+    """
+    def __init__(self,
+                 manager,
+                 stream_id,
+                 channels,
+                 markets,
+                 symbols):
+        self.manager = manager
+        self.stream_id = copy.deepcopy(stream_id)
+        self.channels = copy.deepcopy(channels)
+        self.markets = copy.deepcopy(markets)
+        self.symbols = copy.deepcopy(symbols)
+        self.metrics = self.manager.stream_metrics[self.stream_id]
+        self.replay_file = self.manager.stream_list[self.stream_id]['replay_file']
+        self.replay_speed = self.manager.stream_list[self.stream_id].get('replay_speed')
+        self.replay_stream_id = self.manager.stream_list[self.stream_id].get('replay_stream_id')
+        raw_data_type = self.manager.stream_list[self.stream_id].get('raw_data_type')
+        self.receive_bytes = True if raw_data_type == "bytes" or raw_data_type == "memoryview" else False
+        self.frames = None
+        self.pending_frame = None
+        self.first_receive_time = None
+        self.start_time = None
+        self.replayed_frames = 0
+
+    async def __aenter__(self):
+        logger.debug(f"Entering with-context of BinanceWebSocketApiReplayConnection() ...")
+        self.raise_exceptions()
+        try:
+            self.frames = read_frames(self.replay_file, stream_id=self.replay_stream_id)
+        except OSError as error_msg:
+            raise StreamIsCrashing(stream_id=self.stream_id, reason=f"Can not open replay file: {error_msg}")
+        self.manager.stream_list[self.stream_id]['websocket_uri'] = f"replay://{self.replay_file}"
+        logger.info(f"BinanceWebSocketApiReplayConnection.__aenter__({self.stream_id}) - Replaying "
+                    f"'{self.replay_file}' with speed {self.replay_speed}")
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        logger.debug(f"Leaving asynchronous with-context of BinanceWebSocketApiReplayConnection() ...")
+        self.manager.set_heartbeat(self.stream_id)
+        await self.close()
+
+    async def close(self):
+        logger.info(f"BinanceWebSocketApiReplayConnection.close({str(self.stream_id)})")
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+        return None
+
+    async def receive(self, timeout: float = None):
+        self.raise_exceptions()
+        if self.pending_frame is None:
+            try:
+                self.pending_frame = next(self.frames)
+            except (StopIteration, TypeError, EOFError, OSError) as error_msg:
+                logger.info(f"BinanceWebSocketApiReplayConnection.receive({self.stream_id}) - Replay finished after "
+                            f"{self.replayed_frames} frames ({error_msg or 'end of file'})")
+                self.manager.stop_stream(self.stream_id, delete_listen_key=False)
+                raise StreamIsStopping(stream_id=self.stream_id, reason="end of replay")
+        receive_time, _, frame = self.pending_frame
+        if self.replay_speed:
+            if self.first_receive_time is None:
+                self.first_receive_time = receive_time
+                self.start_time = time.monotonic()
+            delay = self.start_time + (receive_time - self.first_receive_time) / self.replay_speed - time.monotonic()
+            if timeout is not None and delay > timeout:
+                # Same behaviour as `asyncio.wait_for()`, the frame is returned by the next call
+                await asyncio.sleep(max(timeout, 0))
+                raise asyncio.TimeoutError
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif self.replayed_frames % 1000 == 0:
+            # Give the other tasks of the event loop a chance
+            await asyncio.sleep(0)
+        self.pending_frame = None
+        self.replayed_frames += 1
+        self.metrics.add_receive(len(frame))
+        if self.receive_bytes is True:
+            return frame
+        return frame.decode("utf-8")
+
+    async def send(self, data):
+        logger.debug(f"BinanceWebSocketApiReplayConnection.send({str(self.stream_id)}) - Not sent during a replay: "
+                     f"{data}")
+        return None
+
+    def raise_exceptions(self):
+        if self.manager.is_stop_request(self.stream_id):
+            raise StreamIsStopping(stream_id=self.stream_id, reason="stop request")
+        if self.manager.is_crash_request(self.stream_id):
+            raise StreamIsCrashing(stream_id=self.stream_id, reason="crash request")
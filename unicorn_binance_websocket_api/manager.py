@@ -20,10 +20,22 @@
 # All rights reserved.
 
 from .licensing_manager import LucitLicensingManager, NoValidatedLucitLicense
+from .bars import BinanceWebSocketApiBarAggregator
+from .buffers import BACKPRESSURE_POLICIES, BinanceWebSocketApiCoalescingQueue, BinanceWebSocketApiConflationBuffer, \
+    BinanceWebSocketApiStreamBuffer
+from .columnar import check_export_parameters, records_to_arrays
 from .connection_settings import CEX_EXCHANGES, DEX_EXCHANGES, CONNECTION_SETTINGS
+from .event_loop_pool import BinanceWebSocketApiEventLoopPool, new_event_loop
 from .exceptions import *
+from .frame_recorder import BinanceWebSocketApiFrameRecorder
+from .multiplexed_stream import BinanceWebSocketApiMultiplexedStream
+from .rate_limiter import pack_payloads
+from .reconnect_scheduler import BinanceWebSocketApiReconnectScheduler
+from .metrics import BinanceWebSocketApiGlobalMetrics, BinanceWebSocketApiLatencyHistogram, \
+    BinanceWebSocketApiStreamMetrics
 from .restclient import BinanceWebSocketApiRestclient
 from .restserver import BinanceWebSocketApiRestServer
+from .shared_memory_ring_buffer import BinanceWebSocketApiSharedMemoryRingBuffer
 from .sockets import BinanceWebSocketApiSocket
 from .api.api import WsApi
 from unicorn_binance_rest_api import BinanceRestApiManager, BinanceAPIException
@@ -31,11 +43,13 @@ from unicorn_fy.unicorn_fy import UnicornFy
 from cheroot import wsgi
 from collections import deque
 from datetime import datetime, timezone
-from flask import Flask, redirect
+from flask import Flask, Response, redirect
 from flask_restful import Api
 from operator import itemgetter
-from typing import Optional, Union, Callable, List, Set, Literal
+from types import MappingProxyType
+from typing import Optional, Union, Callable, Iterable, List, Set, Literal
 import asyncio
+import bisect
 import colorama
 import copy
 import cython
@@ -216,6 +230,18 @@ class BinanceWebSocketApiManager(threading.Thread):
     :type lucit_license_token:  str
     :param ubra_manager: Provide a shared unicorn_binance_rest_api.manager instance
     :type ubra_manager: BinanceRestApiManager
+    :param event_loop_pool_size: By default each stream runs in its own thread with its own asyncio event loop. Set
+                                 this to a number of threads (e.g. 1 or the number of cores) to run all streams within
+                                 a fixed pool of event loops instead.
+    :type event_loop_pool_size: int
+    :param use_uvloop: Set to `True` to use `uvloop <https://github.com/MagicStack/uvloop>`__ for the event loops of
+                       the streams if it is installed. Default is `False`.
+    :type use_uvloop: bool
+    :param enable_latency_histograms: Set to `True` to record the latency between the event time (`E`) of the
+                                      received records and their local receive time in a histogram per stream and
+                                      per channel. The offset of the local clock to the clock of Binance is
+                                      corrected, see `update_clock_offset()`. Default is `False`.
+    :type enable_latency_histograms: bool
     """
 
     def __init__(self,
@@ -250,7 +276,10 @@ class BinanceWebSocketApiManager(threading.Thread):
                  lucit_license_ini: str = None,
                  lucit_license_profile: str = None,
                  lucit_license_token: str = None,
-                 ubra_manager: BinanceRestApiManager = None):
+                 ubra_manager: BinanceRestApiManager = None,
+                 event_loop_pool_size: Optional[int] = None,
+                 use_uvloop: bool = False,
+                 enable_latency_histograms: bool = False):
         threading.Thread.__init__(self)
         self.name = __app_name__
         self.version = __version__
@@ -286,6 +315,16 @@ class BinanceWebSocketApiManager(threading.Thread):
         self.specific_process_asyncio_queue = {}
         self.specific_process_stream_data = {}
         self.specific_process_stream_data_async = {}
+        self.stream_data_middleware = {}
+        self.stream_record_key = {}
+        self.bar_aggregators = {}
+        self.frame_recorders = {}
+        self.frame_recorders_lock = threading.Lock()
+        self.enable_latency_histograms = enable_latency_histograms
+        # local clock minus the clock of Binance in milliseconds
+        self.clock_offset_ms: float = 0.0
+        self.clock_offset_last_update: Optional[float] = None
+        self.monotonic_time_offset: float = time.time() - time.monotonic()
         self.process_asyncio_queue: Optional[Callable] = None
         self.process_stream_data: Optional[Callable] = None
         self.process_stream_data_async: Optional[Callable] = None
@@ -315,6 +354,15 @@ class BinanceWebSocketApiManager(threading.Thread):
         self.exchange = exchange
         self.stream_list = {}
         self.stream_list_lock = threading.Lock()
+        self.stream_metrics = {}
+        self.stream_snapshots = {}
+        self.multiplexed_streams = {}
+        self.stream_subscription_names = {}
+        self.stream_snapshot_excluded_fields = ('api_key', 'api_secret', 'last_received_data_record')
+        # live counters which do not change the `version` of a stream snapshot
+        self.stream_snapshot_counter_fields = ('dropped_records_total', 'last_heartbeat', 'processed_receives_total',
+                                               'processed_transmitted_total')
+        self.stream_snapshots_lock = threading.Lock()
 
         if exchange not in CONNECTION_SETTINGS:
             error_msg = f"Unknown exchange '{str(exchange)}'! List of supported exchanges:\r\n" \
@@ -365,6 +413,14 @@ class BinanceWebSocketApiManager(threading.Thread):
                                    'status_code': None}
         self.dex_user_address = None
         self.event_loops = {}
+        self.event_loop_pool: Optional[BinanceWebSocketApiEventLoopPool] = None
+        self.event_loop_pool_size = event_loop_pool_size
+        self.use_uvloop = use_uvloop
+        if self.event_loop_pool_size is not None:
+            logger.info(f"Using an event loop pool with {self.event_loop_pool_size} threads ...")
+            self.event_loop_pool = BinanceWebSocketApiEventLoopPool(size=self.event_loop_pool_size,
+                                                                    use_uvloop=self.use_uvloop,
+                                                                    debug=self.debug)
         self.frequent_checks_list = {}
         self.frequent_checks_list_lock = threading.Lock()
         self.receiving_speed_average = 0
@@ -372,6 +428,8 @@ class BinanceWebSocketApiManager(threading.Thread):
                                      'timestamp': time.time()}
         self.high_performance = high_performance
         self.keep_max_received_last_second_entries = 5
+        self.global_metrics = BinanceWebSocketApiGlobalMetrics(
+            keep_max_entries=self.keep_max_received_last_second_entries)
         self.keepalive_streams_list = {}
         self.last_entry_added_to_stream_buffer = 0
         self.last_monitoring_check = time.time()
@@ -380,6 +438,13 @@ class BinanceWebSocketApiManager(threading.Thread):
         self.listen_key_refresh_interval = 15*60
         self.max_send_messages_per_second = 5
         self.max_send_messages_per_second_reserve = 2
+        self.max_send_payload_bytes = 8000
+        self.max_websocket_uri_length = 4096
+        self.reconnect_scheduler = BinanceWebSocketApiReconnectScheduler(manager=self)
+        # Binance closes every connection after 24 hours, the sockets rotate their connection before
+        self.connection_max_age = 86400
+        self.connection_rotation_margin = 900
+        self.connection_rotation_overlap = 5.0
         self.most_receives_per_second = 0
         self.monitoring_api_server = None
         self.monitoring_total_received_bytes = 0
@@ -401,7 +466,11 @@ class BinanceWebSocketApiManager(threading.Thread):
         self.show_secrets_in_logs = show_secrets_in_logs
         self.start_time = time.time()
         self.stream_buffer_maxlen = stream_buffer_maxlen
-        self.stream_buffer = deque(maxlen=self.stream_buffer_maxlen)
+        if self.stream_buffer_maxlen is None:
+            self.stream_buffer = deque()
+        else:
+            # The bounded generic stream_buffer counts the records it drops
+            self.stream_buffer = BinanceWebSocketApiStreamBuffer(maxlen=self.stream_buffer_maxlen)
         self.stream_buffer_lock = threading.Lock()
         self.stream_buffer_locks = {}
         self.stream_buffers = {}
@@ -409,10 +478,12 @@ class BinanceWebSocketApiManager(threading.Thread):
         self.stream_signal_buffer_lock = threading.Lock()
         self.socket_is_ready = {}
         self.sockets = {}
+        self.stream_tasks = {}
         self.stream_threads = {}
         self.total_received_bytes = 0
         self.total_received_bytes_lock = threading.Lock()
         self.total_receives = 0
+        self.total_dropped_records = 0
         self.total_receives_lock = threading.Lock()
         self.total_transmitted = 0
         self.total_transmitted_lock = threading.Lock()
@@ -456,6 +527,15 @@ class BinanceWebSocketApiManager(threading.Thread):
         """ Execute a provided coroutine within the loop and process the exception results asynchronously."""
         if stream_id is None:
             return False
+        if self.is_stop_request(stream_id=stream_id) is True \
+                or self.is_crash_request(stream_id=stream_id) is True \
+                or self.stream_list.get(stream_id, {}).get('has_stopped') is not None:
+            # The stream ended before this coroutine got started on its loop, `_run_stream()` has already cancelled
+            # the tasks of the stream and would not cancel this one anymore.
+            logger.debug(f"BinanceWebSocketApiManager._run_process_asyncio_queue({stream_id}) - The stream has "
+                         f"already ended!")
+            return False
+        self._add_stream_task(stream_id=stream_id, task=asyncio.current_task())
         stream_label = self.get_stream_label(stream_id=stream_id)
         if stream_label is None:
             stream_label = ""
@@ -495,9 +575,18 @@ class BinanceWebSocketApiManager(threading.Thread):
     async def _run_socket(self, stream_id, channels, markets) -> None:
         while self.is_stop_request(stream_id=stream_id) is False \
                 and self.is_crash_request(stream_id=stream_id) is False:
+            rate_limited = False
+            retry_after = None
+            if self.stream_list[stream_id].get('replay_file') is None:
+                # the reconnect scheduler spreads the connection attempts within the limits of binance
+                if await self.reconnect_scheduler.acquire(stream_id=stream_id,
+                                                          priority=self.stream_list[stream_id].get(
+                                                              'reconnect_priority') or 0) is False:
+                    continue
             try:
                 async with BinanceWebSocketApiSocket(self, stream_id, channels, markets) as socket:
                     if socket is not None:
+                        self.reconnect_scheduler.report_connected(stream_id=stream_id)
                         await socket.start_socket()
                     if self.is_stop_request(stream_id=stream_id) is False:
                         self._stream_is_restarting(stream_id=stream_id)
@@ -543,8 +632,12 @@ class BinanceWebSocketApiManager(threading.Thread):
                 elif "Status code not 101: 429" in str(error_msg):
                     logger.critical(f"BinanceWebSocketApiManager._run_socket(stream_id={stream_id}), channels="
                                     f"{channels}), markets={markets}) - websockets.InvalidStatusCode: {error_msg}")
-                    self._stream_is_crashing(stream_id=stream_id, error_msg=str(error_msg))
-                    return None
+                    self._stream_is_restarting(stream_id=stream_id, error_msg=str(error_msg))
+                    rate_limited = True
+                    try:
+                        retry_after = float(error_msg.headers['Retry-After'])
+                    except (AttributeError, KeyError, TypeError, ValueError):
+                        retry_after = None
                 elif "Status code not 101: 500" in str(error_msg):
                     logger.error(f"BinanceWebSocketApiManager._run_socket(stream_id={stream_id}), channels="
                                  f"{channels}), markets={markets}) - websockets.InvalidStatusCode: {error_msg}")
@@ -569,7 +662,12 @@ class BinanceWebSocketApiManager(threading.Thread):
                 logger.error(f"BinanceWebSocketApiManager._run_socket(stream_id={stream_id}), channels="
                              f"{channels}), markets={markets}) - Socks5ProxyConnectionError: {error_msg}")
                 self._stream_is_restarting(stream_id=stream_id, error_msg=str(error_msg))
-            await asyncio.sleep(0.1)
+            if self.stream_list[stream_id].get('replay_file') is None:
+                self.reconnect_scheduler.report_disconnect(stream_id=stream_id,
+                                                           rate_limited=rate_limited,
+                                                           retry_after=retry_after)
+            else:
+                await asyncio.sleep(0.1)
         if self.is_stop_request(stream_id=stream_id) is True:
             self._stream_is_stopping(stream_id=stream_id)
         elif self.is_crash_request(stream_id=stream_id) is True:
@@ -684,6 +782,44 @@ class BinanceWebSocketApiManager(threading.Thread):
             logger.error(f"BinanceWebSocketApiManager.send_with_stream({stream_id} - No valid asyncio loop!")
             return False
 
+    def send_api_request(self,
+                         stream_id: str = None,
+                         payload: dict = None,
+                         process_response: Optional[Callable] = None,
+                         return_response: bool = False):
+        """
+        Send a request of the Websocket API and route its response.
+
+        The callback function and the waiter get registered with the `id` of the payload before the payload is sent,
+        so a response that arrives immediately can not miss them. If the stream is not ready, the payload gets queued.
+
+        :param stream_id: id of the stream to be used for sending.
+        :type stream_id: str
+        :param payload: The request with its `id`.
+        :type payload: dict
+        :param process_response: Provide a function/method to process the response (callback).
+        :type process_response: function
+        :param return_response: If `True` the response is waited for and returned.
+        :type return_response: bool
+        :return: The response if `return_response` is `True`, else `True`
+        """
+        request_id = payload['id']
+        if process_response is not None:
+            with self.process_response_lock:
+                self.process_response[request_id] = {'callback_function': process_response}
+        if return_response is True:
+            with self.return_response_lock:
+                self.return_response[request_id] = {'event_return_response': threading.Event()}
+        if self.send_with_stream(stream_id=stream_id, payload=payload) is False:
+            self.add_payload_to_stream(stream_id=stream_id, payload=payload)
+        if return_response is True:
+            self.return_response[request_id]['event_return_response'].wait()
+            with self.return_response_lock:
+                response_value = self.return_response[request_id]['response_value']
+                del self.return_response[request_id]
+            return response_value
+        return True
+
     def _add_stream_to_stream_list(self,
                                    stream_id=None,
                                    channels=None,
@@ -703,7 +839,21 @@ class BinanceWebSocketApiManager(threading.Thread):
                                    api=False,
                                    process_stream_data: Optional[Callable] = None,
                                    process_stream_data_async: Optional[Callable] = None,
-                                   process_asyncio_queue: Optional[Callable] = None):
+                                   process_asyncio_queue: Optional[Callable] = None,
+                                   stream_data_middleware: Optional[List[Callable]] = None,
+                                   batch_max_items: Optional[int] = None,
+                                   batch_max_delay_ms: Optional[int] = None,
+                                   raw_data_type: Optional[Literal['str', 'bytes', 'memoryview']] = None,
+                                   backpressure_policy: Optional[Literal['block', 'drop_oldest', 'drop_newest',
+                                                                         'coalesce_by_key']] = None,
+                                   asyncio_queue_maxsize: Optional[int] = None,
+                                   record_key: Optional[Callable] = None,
+                                   conflate: bool = False,
+                                   record_file: Optional[str] = None,
+                                   replay_file: Optional[str] = None,
+                                   replay_speed: Optional[float] = 1.0,
+                                   replay_stream_id: Optional[str] = None,
+                                   reconnect_priority: Optional[int] = None):
         """
         Create a list entry for new streams
 
@@ -783,7 +933,38 @@ class BinanceWebSocketApiManager(threading.Thread):
                                       processing of the data in the correct receiving sequence.
                                       https://unicorn-binance-websocket-api.docs.lucit.tech/readme.html#or-await-the-webstream-data-in-an-asyncio-coroutine
         :type process_asyncio_queue: Optional[Callable]
-        """
+        :param stream_data_middleware: A list of functions that get called one after another with the converted
+                                       stream data. Each function has to return the (modified) stream data or `None`
+                                       to drop the record. Responses of the Websocket API to pending requests do not
+                                       pass the middleware.
+        :type stream_data_middleware: Optional[List[Callable]]
+        :param batch_max_items: Deliver the received records in lists of max `batch_max_items` records.
+        :type batch_max_items: Optional[int]
+        :param batch_max_delay_ms: Deliver a started batch at the latest after `batch_max_delay_ms` milliseconds.
+        :type batch_max_delay_ms: Optional[int]
+        :param raw_data_type: Receive the frames as "str" (default), "bytes" or "memoryview".
+        :type raw_data_type: Optional[str]
+        :param backpressure_policy: "block", "drop_oldest", "drop_newest" or "coalesce_by_key"
+        :type backpressure_policy: Optional[str]
+        :param asyncio_queue_maxsize: Max number of records waiting in the `asyncio_queue` of the stream.
+        :type asyncio_queue_maxsize: Optional[int]
+        :param record_key: Function to get the key of a record for `coalesce_by_key`.
+        :type record_key: Optional[Callable]
+        :param conflate: Keep only the newest record per key in the `stream_buffer`.
+        :type conflate: bool
+        :param record_file: Record all received frames to this segment file.
+        :type record_file: Optional[str]
+        :param replay_file: Replay the frames of this segment file instead of connecting to Binance.
+        :type replay_file: Optional[str]
+        :param replay_speed: Speed factor of the replay, `None` or 0 for max speed.
+        :type replay_speed: Optional[float]
+        :param replay_stream_id: Only replay the frames that were recorded from this stream_id.
+        :type replay_stream_id: Optional[str]
+        :param reconnect_priority: Streams with a higher priority get reconnected first.
+        :type reconnect_priority: Optional[int]
+        """
+        if reconnect_priority is None:
+            reconnect_priority = 1 if api is True or "!userData" in f"{channels}{markets}" else 0
         output = output or self.output_default
         close_timeout = close_timeout or self.close_timeout_default
         ping_interval = ping_interval or self.ping_interval_default
@@ -791,6 +972,11 @@ class BinanceWebSocketApiManager(threading.Thread):
         self.specific_process_asyncio_queue[stream_id] = process_asyncio_queue
         self.specific_process_stream_data[stream_id] = process_stream_data
         self.specific_process_stream_data_async[stream_id] = process_stream_data_async
+        self.stream_data_middleware[stream_id] = list(stream_data_middleware or [])
+        self.stream_record_key[stream_id] = record_key
+        self.stream_metrics[stream_id] = BinanceWebSocketApiStreamMetrics(
+            keep_max_entries=self.keep_max_received_last_second_entries,
+            global_metrics=self.global_metrics)
         with self.stream_list_lock:
             logger.debug(f"BinanceWebSocketApiManager._add_stream_to_stream_list() - `stream_list_lock` was entered!")
             self.stream_list[stream_id] = {'exchange': self.exchange,
@@ -801,6 +987,19 @@ class BinanceWebSocketApiManager(threading.Thread):
                                            'stream_label': copy.deepcopy(stream_label),
                                            'stream_buffer_name': copy.deepcopy(stream_buffer_name),
                                            'stream_buffer_maxlen': copy.deepcopy(stream_buffer_maxlen),
+                                           'batch_max_items': copy.deepcopy(batch_max_items),
+                                           'batch_max_delay_ms': copy.deepcopy(batch_max_delay_ms),
+                                           'raw_data_type': copy.deepcopy(raw_data_type or "str"),
+                                           'backpressure_policy': copy.deepcopy(backpressure_policy),
+                                           'asyncio_queue_maxsize': copy.deepcopy(asyncio_queue_maxsize),
+                                           'dropped_records_total': 0,
+                                           'conflate': copy.deepcopy(conflate),
+                                           'record_file': copy.deepcopy(record_file),
+                                           'replay_file': copy.deepcopy(replay_file),
+                                           'replay_speed': copy.deepcopy(replay_speed),
+                                           'replay_stream_id': copy.deepcopy(replay_stream_id),
+                                           'reconnect_priority': copy.deepcopy(reconnect_priority),
+                                           'connection_rotations': 0,
                                            'symbols': copy.deepcopy(symbols),
                                            'output': copy.deepcopy(output),
                                            'subscriptions': 0,
@@ -870,32 +1069,19 @@ class BinanceWebSocketApiManager(threading.Thread):
         :type stream_buffer_maxlen: int or None
         :return:
         """
-        if stream_buffer_name is not False:
-            self.stream_buffer_locks[stream_buffer_name] = threading.Lock()
-            try:
-                # Not resetting the stream_buffer during a restart:
-                if self.stream_buffers[stream_buffer_name]:
-                    pass
-            except KeyError:
-                # Resetting
-                self.stream_buffers[stream_buffer_name] = deque(maxlen=stream_buffer_maxlen)
+        self._create_stream_buffer(stream_buffer_name=stream_buffer_name,
+                                   stream_buffer_maxlen=stream_buffer_maxlen,
+                                   backpressure_policy=self.stream_list[stream_id]['backpressure_policy'],
+                                   record_key=self.stream_record_key.get(stream_id),
+                                   conflate=self.stream_list[stream_id]['conflate'])
         loop = None
         try:
-            loop = asyncio.new_event_loop()
+            loop = new_event_loop(use_uvloop=self.use_uvloop)
             asyncio.set_event_loop(loop)
             if self.debug is True:
                 loop.set_debug(enabled=True)
             self.event_loops[stream_id] = loop
-            self.asyncio_queue[stream_id] = asyncio.Queue()
-            if (self.stream_list[stream_id]['api'] is False
-                    and ("!userData" in self.stream_list[stream_id]['markets']
-                         or "!userData" in self.stream_list[stream_id]['channels'])):
-                logger.debug(f"BinanceWebSocketApiManager._create_stream_thread({stream_id} - "
-                             f"Adding `_ping_listen_key({stream_id})` to asyncio loop ...")
-                loop.create_task(self._ping_listen_key(stream_id=stream_id))
-            logger.debug(f"BinanceWebSocketApiManager._create_stream_thread({stream_id} - "
-                         f"Adding `_run_socket({stream_id})` to asyncio loop ...")
-            loop.run_until_complete(self._run_socket(stream_id=stream_id, channels=channels, markets=markets))
+            loop.run_until_complete(self._run_stream(stream_id=stream_id, channels=channels, markets=markets))
         except OSError as error_msg:
             logger.critical(f"BinanceWebSocketApiManager._create_stream_thread({str(stream_id)} - OSError  - can not "
                             f"create stream - error_msg: {str(error_msg)}")
@@ -960,6 +1146,134 @@ class BinanceWebSocketApiManager(threading.Thread):
                              f"KeyError `error: 15` - {error_msg}")
             self.set_socket_is_ready(stream_id)
 
+    def _create_stream_buffer(self,
+                              stream_buffer_name: Union[Literal[False], str] = False,
+                              stream_buffer_maxlen=None,
+                              backpressure_policy: Optional[str] = None,
+                              record_key: Optional[Callable] = None,
+                              conflate: bool = False) -> None:
+        """
+        Create the specific `stream_buffer` of a stream if it does not exist yet.
+
+        :param stream_buffer_name: Name of the `stream_buffer`, `False` for the generic `stream_buffer`.
+        :type stream_buffer_name: False or str
+        :param stream_buffer_maxlen: Set a max len for the `stream_buffer`.
+        :type stream_buffer_maxlen: int or None
+        :param backpressure_policy: "block", "drop_oldest", "drop_newest" or "coalesce_by_key"
+        :type backpressure_policy: str or None
+        :param record_key: Function to get the key of a record for `coalesce_by_key` and `conflate`.
+        :type record_key: function or None
+        :param conflate: Create a `BinanceWebSocketApiConflationBuffer()`.
+        :type conflate: bool
+        :return: None
+        """
+        if stream_buffer_name is not False:
+            self.stream_buffer_locks[stream_buffer_name] = threading.Lock()
+            try:
+                # Not resetting the stream_buffer during a restart:
+                if self.stream_buffers[stream_buffer_name]:
+                    pass
+            except KeyError:
+                # Resetting
+                if conflate is True:
+                    self.stream_buffers[stream_buffer_name] = BinanceWebSocketApiConflationBuffer(
+                        record_key=record_key)
+                elif stream_buffer_maxlen is None and backpressure_policy is None:
+                    self.stream_buffers[stream_buffer_name] = deque()
+                else:
+                    # Bounded stream_buffers count the records they drop
+                    self.stream_buffers[stream_buffer_name] = BinanceWebSocketApiStreamBuffer(
+                        maxlen=stream_buffer_maxlen,
+                        backpressure_policy=backpressure_policy or "drop_oldest",
+                        record_key=record_key)
+        return None
+
+    def _add_stream_task(self, stream_id=None, task: asyncio.Task = None) -> None:
+        """
+        Register an asyncio task that belongs to a stream, it gets cancelled as soon the stream ends.
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param task: The task to register.
+        :type task: asyncio.Task
+        :return: None
+        """
+        if task is not None:
+            self.stream_tasks.setdefault(stream_id, set()).add(task)
+        return None
+
+    async def _run_stream(self, stream_id, channels, markets) -> None:
+        """
+        Run a stream with all its coroutines in the current event loop (own thread or event loop pool).
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param channels: provide the channels to create the URI
+        :type channels: str, list, set
+        :param markets: provide the markets to create the URI
+        :type markets: str, list, set
+        :return: None
+        """
+        if self.stream_list[stream_id]['backpressure_policy'] == "coalesce_by_key":
+            self.asyncio_queue[stream_id] = BinanceWebSocketApiCoalescingQueue(
+                maxsize=self.stream_list[stream_id]['asyncio_queue_maxsize'] or 0,
+                record_key=self.stream_record_key.get(stream_id))
+        else:
+            self.asyncio_queue[stream_id] = asyncio.Queue(maxsize=self.stream_list[stream_id]['asyncio_queue_maxsize']
+                                                          or 0)
+        try:
+            if (self.stream_list[stream_id]['api'] is False
+                    and ("!userData" in self.stream_list[stream_id]['markets']
+                         or "!userData" in self.stream_list[stream_id]['channels'])):
+                logger.debug(f"BinanceWebSocketApiManager._run_stream({stream_id} - "
+                             f"Adding `_ping_listen_key({stream_id})` to asyncio loop ...")
+                self._add_stream_task(stream_id=stream_id,
+                                      task=asyncio.create_task(self._ping_listen_key(stream_id=stream_id)))
+            logger.debug(f"BinanceWebSocketApiManager._run_stream({stream_id} - "
+                         f"Adding `_run_socket({stream_id})` to asyncio loop ...")
+            await self._run_socket(stream_id=stream_id, channels=channels, markets=markets)
+        finally:
+            for task in self.stream_tasks.pop(stream_id, set()):
+                task.cancel()
+        return None
+
+    async def _run_stream_in_event_loop_pool(self, stream_id, channels, markets) -> None:
+        """
+        Co function of self.create_stream to run a stream within a loop of the event loop pool
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param channels: provide the channels to create the URI
+        :type channels: str, list, set
+        :param markets: provide the markets to create the URI
+        :type markets: str, list, set
+        :return: None
+        """
+        try:
+            await self._run_stream(stream_id=stream_id, channels=channels, markets=markets)
+        except asyncio.CancelledError as error_msg:
+            logger.debug(f"BinanceWebSocketApiManager._run_stream_in_event_loop_pool() stream_id={str(stream_id)} "
+                         f" - asyncio.CancelledError: {str(error_msg)}")
+        except Exception as error_msg:
+            stream_label = self.get_stream_label(stream_id=stream_id)
+            if stream_label is None:
+                stream_label = ""
+            else:
+                stream_label = f" ({stream_label})"
+            error_msg_wrapper = (f"Exception within a coroutine of stream '{stream_id}'{stream_label}: "
+                                 f"\033[1m\033[31m{type(error_msg).__name__} - {error_msg}\033[0m\r\n"
+                                 f"{traceback.format_exc()}")
+            print(f"\r\n{error_msg_wrapper}")
+            error_msg_wrapper = (f"Exception within a coroutine of stream '{stream_id}'{stream_label}: "
+                                 f"{type(error_msg).__name__} - {error_msg}\r\n"
+                                 f"{traceback.format_exc()}")
+            logger.critical(error_msg_wrapper)
+            self._crash_stream(stream_id=stream_id, error_msg=error_msg_wrapper)
+        finally:
+            self.event_loop_pool.release_loop(asyncio.get_running_loop())
+            self.set_socket_is_ready(stream_id)
+        return None
+
     def generate_signature(self, api_secret=None, data=None):
         """
         Signe the request.
@@ -1050,12 +1364,6 @@ class BinanceWebSocketApiManager(threading.Thread):
             with self.frequent_checks_list_lock:
                 self.frequent_checks_list[frequent_checks_id]['last_heartbeat'] = time.time()
             await asyncio.sleep(0.5)
-            current_timestamp = int(time.time())
-            last_timestamp = current_timestamp - 1
-            next_to_last_timestamp = current_timestamp - 2
-            total_most_stream_receives_last_timestamp = 0
-            total_most_stream_receives_next_to_last_timestamp = 0
-            active_stream_list = self.get_active_stream_list()
             # check CPU stats
             cpu = self.get_process_usage_cpu()
             if cpu >= 95:
@@ -1068,97 +1376,23 @@ class BinanceWebSocketApiManager(threading.Thread):
                     cpu_usage_time = False
             else:
                 cpu_usage_time = False
-            # count most_receives_per_second total last second
-            if active_stream_list:
-                for stream_id in active_stream_list:
-                    # set the streams `most_receives_per_second` value
-                    try:
-                        if self.stream_list[stream_id]['receives_statistic_last_second']['entries'][last_timestamp] > \
-                                self.stream_list[stream_id]['receives_statistic_last_second']['most_receives_per_second']:
-                            with self.stream_list_lock:
-                                logger.debug(f"BinanceWebSocketApiManager._frequent_checks() - `stream_list_lock` was "
-                                             f"entered!")
-                                self.stream_list[stream_id]['receives_statistic_last_second']['most_receives_per_second'] = \
-                                    self.stream_list[stream_id]['receives_statistic_last_second']['entries'][last_timestamp]
-                                logger.debug(f"BinanceWebSocketApiManager._frequent_checks() - Leaving "
-                                             f"`stream_list_lock`!")
-                    except KeyError:
-                        pass
-                    try:
-                        total_most_stream_receives_last_timestamp += self.stream_list[stream_id]['receives_statistic_last_second']['entries'][last_timestamp]
-                    except KeyError:
-                        pass
-                    try:
-                        total_most_stream_receives_next_to_last_timestamp += self.stream_list[stream_id]['receives_statistic_last_second']['entries'][next_to_last_timestamp]
-                    except KeyError:
-                        pass
-                    # delete list entries older than `keep_max_received_last_second_entries`
-                    # receives_statistic_last_second
-                    delete_index = []
-                    if len(self.stream_list[stream_id]['receives_statistic_last_second']['entries']) > \
-                            self.keep_max_received_last_second_entries:
-                        with self.stream_list_lock:
-                            logger.debug(f"BinanceWebSocketApiManager._frequent_checks() - `stream_list_lock` was "
-                                         f"entered!")
-                            temp_entries = copy.deepcopy(self.stream_list[stream_id]['receives_statistic_last_second']['entries'])
-                            logger.debug(f"BinanceWebSocketApiManager._frequent_checks() - Leaving "
-                                         f"`stream_list_lock`!")
-                        for timestamp_key in temp_entries:
-                            try:
-                                if timestamp_key < current_timestamp - self.keep_max_received_last_second_entries:
-                                    delete_index.append(timestamp_key)
-                            except ValueError as error_msg:
-                                logger.error("BinanceWebSocketApiManager._frequent_checks() timestamp_key=" +
-                                             str(timestamp_key) + " current_timestamp=" + str(current_timestamp) +
-                                             " keep_max_received_last_second_entries=" +
-                                             str(self.keep_max_received_last_second_entries) + " error_msg=" +
-                                             str(error_msg))
-                    for timestamp_key in delete_index:
-                        with self.stream_list_lock:
-                            logger.debug(f"BinanceWebSocketApiManager._frequent_checks() - `stream_list_lock` was "
-                                         f"entered!")
-                            self.stream_list[stream_id]['receives_statistic_last_second']['entries'].pop(timestamp_key,
-                                                                                                         None)
-                            logger.debug(f"BinanceWebSocketApiManager._frequent_checks() - Leaving "
-                                         f"`stream_list_lock`!")
-                    # transfer_rate_per_second
-                    delete_index = []
-                    if len(self.stream_list[stream_id]['transfer_rate_per_second']['bytes']) > \
-                            self.keep_max_received_last_second_entries:
-                        try:
-                            temp_bytes = self.stream_list[stream_id]['transfer_rate_per_second']['bytes']
-                            for timestamp_key in temp_bytes:
-                                try:
-                                    if timestamp_key < current_timestamp - self.keep_max_received_last_second_entries:
-                                        delete_index.append(timestamp_key)
-                                except ValueError as error_msg:
-                                    logger.error(
-                                        "BinanceWebSocketApiManager._frequent_checks() timestamp_key="
-                                        + str(timestamp_key) +
-                                        " current_timestamp=" + str(current_timestamp) +
-                                        " keep_max_received_last_second_"
-                                        "entries=" + str(self.keep_max_received_last_second_entries) + " error_msg=" +
-                                        str(error_msg))
-                        except RuntimeError as error_msg:
-                            logger.info("BinanceWebSocketApiManager._frequent_checks() - "
-                                        "Caught RuntimeError: " + str(error_msg))
-                    for timestamp_key in delete_index:
-                        with self.stream_list_lock:
-                            logger.debug(f"BinanceWebSocketApiManager._frequent_checks() - `stream_list_lock` was "
-                                         f"entered!")
-                            self.stream_list[stream_id]['transfer_rate_per_second']['bytes'].pop(timestamp_key, None)
-                            logger.debug(f"BinanceWebSocketApiManager._frequent_checks() - Leaving "
-                                         f"`stream_list_lock`!")
-            # set most_receives_per_second
-            try:
-                if int(self.most_receives_per_second) < int(total_most_stream_receives_last_timestamp):
-                    self.most_receives_per_second = int(total_most_stream_receives_last_timestamp)
-            except ValueError as error_msg:
-                logger.error("BinanceWebSocketApiManager._frequent_checks() self.most_receives_per_second"
-                             "=" + str(self.most_receives_per_second) + " total_most_stream_receives_last_timestamp"
-                             "=" + str(total_most_stream_receives_last_timestamp) + " total_most_stream_receives_next_"
-                             "to_last_timestamp=" + str(total_most_stream_receives_next_to_last_timestamp) + " error_"
-                             "msg=" + str(error_msg))
+            # close the time bars of bar streams without new trades
+            for bar_aggregator in list(self.bar_aggregators.values()):
+                try:
+                    bar_aggregator.close_due_bars()
+                except Exception as error_msg:
+                    logger.error(f"BinanceWebSocketApiManager._frequent_checks() - Exception in `close_due_bars()`: "
+                                 f"{type(error_msg).__name__} - {error_msg}")
+            # refresh the clock offset for the latency histograms and the time bars every 10 minutes
+            if (self.enable_latency_histograms is True or len(self.bar_aggregators) > 0) and len(self.stream_list) > 0:
+                if self.clock_offset_last_update is None or time.time() - self.clock_offset_last_update > 600:
+                    self.clock_offset_last_update = time.time()
+                    threading.Thread(target=self.update_clock_offset,
+                                     name=f"update_clock_offset: time={time.time()}").start()
+            # set most_receives_per_second, the global metrics sum up the per second counters of the streams
+            total_receives_last_second = self.global_metrics.get_receives_last_second()
+            if self.most_receives_per_second < total_receives_last_second:
+                self.most_receives_per_second = total_receives_last_second
             # check receiving_speed_peak
             last_second_receiving_speed = self.get_current_receiving_speed_global()
             try:
@@ -1173,6 +1407,57 @@ class BinanceWebSocketApiManager(threading.Thread):
                 pass
         logger.debug(f"BinanceWebSocketApiManager._frequent_checks() - Leaving thread ...")
 
+    @staticmethod
+    def _get_subscription_names(channels, markets, all_channels=None, all_markets=None) -> set:
+        """
+        Get the names of the CEX subscriptions (e.g. `bnbbtc@trade` or `!miniTicker@arr`) of channels * markets.
+
+        :param channels: The channels.
+        :type channels: list
+        :param markets: The markets.
+        :type markets: list
+        :param all_channels: All channels of the stream, used for the suffix of global markets. Default is `channels`.
+        :type all_channels: list
+        :param all_markets: All markets of the stream, used for the suffix of global channels. Default is `markets`.
+        :type all_markets: list
+        :return: set
+        """
+        final_market = "@arr"
+        for market in all_markets if all_markets is not None else markets or []:
+            if "arr@" in market:
+                final_market = "@" + market
+        final_channel = "@arr"
+        for channel in all_channels if all_channels is not None else channels or []:
+            if "arr@" in channel:
+                final_channel = "@" + channel
+        subscription_names = set()
+        for channel in channels or []:
+            if "!" in channel:
+                subscription_names.add(channel + final_market)
+                continue
+            for market in markets or []:
+                if "!" in market:
+                    subscription_names.add(market + final_channel)
+                else:
+                    subscription_names.add(market.lower() + "@" + channel)
+        return subscription_names
+
+    def _wake_outbound_scheduler(self, stream_id) -> None:
+        """
+        Wake the outbound scheduler of a running stream up to send new queued payloads without delay.
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :return: None
+        """
+        try:
+            outbound_scheduler = self.sockets[stream_id].outbound_scheduler
+        except (AttributeError, KeyError):
+            return None
+        if outbound_scheduler is not None:
+            outbound_scheduler.wake()
+        return None
+
     async def _ping_listen_key(self, stream_id=None):
         logger.info(f"BinanceWebSocketApiManager._ping_listen_key(stream_id={stream_id}) - asyncio task running!")
         if isinstance(self.stream_list[stream_id]['markets'], str):
@@ -1270,6 +1555,11 @@ class BinanceWebSocketApiManager(threading.Thread):
             return redirect("https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/wiki/"
                             "UNICORN-Monitoring-API-Service", code=302)
 
+        @app.route('/metrics')
+        def metrics():
+            logger.debug("BinanceWebSocketApiManager._start_monitoring_api_thread() 200 - /metrics")
+            return Response(self.get_monitoring_status_prometheus(), mimetype="text/plain; version=0.0.4")
+
         api = Api(app)
         api.add_resource(BinanceWebSocketApiRestServer,
                          "/status/<string:statusformat>/",
@@ -1318,8 +1608,70 @@ class BinanceWebSocketApiManager(threading.Thread):
                     logger.debug(f"BinanceWebSocketApiManager.add_payload_to_stream() - Leaving `stream_list_lock`!")
             except KeyError:
                 return False
+            self._wake_outbound_scheduler(stream_id)
             return True
 
+    def add_stream_data_middleware(self, stream_id: str = None, middleware: Callable = None) -> bool:
+        """
+        Append a middleware function to the stream data pipeline of a stream.
+
+        The function gets called with the converted stream data (`output` of the stream) and must return the
+        (modified) stream data or `None` to drop the record. Middleware functions are executed in the order they were
+        added. A running stream starts using the new middleware with the next received record.
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param middleware: The function to add.
+        :type middleware: Callable
+        :return: bool
+        """
+        if stream_id is None or middleware is None:
+            return False
+        try:
+            self.stream_data_middleware[stream_id].append(middleware)
+        except KeyError:
+            logger.error(f"BinanceWebSocketApiManager.add_stream_data_middleware({stream_id}) - Unknown `stream_id`!")
+            return False
+        try:
+            self.sockets[stream_id].build_stream_data_pipeline()
+        except KeyError:
+            # The stream has no active socket, the pipeline gets built with the next connect.
+            pass
+        logger.info(f"BinanceWebSocketApiManager.add_stream_data_middleware({stream_id}, {middleware}) - Added!")
+        return True
+
+    def add_batch_to_stream_buffer(self, stream_data_batch: list,
+                                   stream_buffer_name: Union[Literal[False], str] = False,
+                                   stream_id: Optional[str] = None) -> bool:
+        """
+        Add a batch of records to the
+        `stream_buffer <https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/wiki/%60stream_buffer%60>`__
+        with one lock acquisition.
+
+        The records can get popped one by one with `pop_stream_data_from_stream_buffer()`.
+
+        :param stream_data_batch: A list of records
+        :type stream_data_batch: list
+        :param stream_buffer_name: If `False` the data is going to get written to the default stream_buffer,
+                                   set to `True` to read the data via `pop_stream_data_from_stream_buffer(stream_id)` or
+                                   provide a string to create and use a shared stream_buffer and read it via
+                                   `pop_stream_data_from_stream_buffer('string')`.
+        :type stream_buffer_name: False or str
+        :param stream_id: The stream that receives the dropped records in its statistic (`dropped_records_total`).
+        :type stream_id: str
+        :return: bool
+        """
+        if stream_buffer_name is False:
+            with self.stream_buffer_lock:
+                dropped_records = self.stream_buffer.extend(stream_data_batch)
+        else:
+            with self.stream_buffer_locks[stream_buffer_name]:
+                dropped_records = self.stream_buffers[stream_buffer_name].extend(stream_data_batch)
+        if dropped_records and stream_id is not None:
+            self.increase_dropped_records_counter(stream_id=stream_id, count=dropped_records)
+        self.last_entry_added_to_stream_buffer = time.time()
+        return True
+
     def add_to_ringbuffer_error(self, error):
         """
         Add received error messages from websocket endpoints to the error ringbuffer
@@ -1346,7 +1698,8 @@ class BinanceWebSocketApiManager(threading.Thread):
         self.ringbuffer_result.append(str(result))
         return True
 
-    def add_to_stream_buffer(self, stream_data, stream_buffer_name: Union[Literal[False], str] = False):
+    def add_to_stream_buffer(self, stream_data, stream_buffer_name: Union[Literal[False], str] = False,
+                             stream_id: Optional[str] = None):
         """
         Kick back data to the
         `stream_buffer <https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/wiki/%60stream_buffer%60>`__
@@ -1364,14 +1717,18 @@ class BinanceWebSocketApiManager(threading.Thread):
                                    provide a string to create and use a shared stream_buffer and read it via
                                    `pop_stream_data_from_stream_buffer('string')`.
         :type stream_buffer_name: False or str
+        :param stream_id: The stream that receives the dropped records in its statistic (`dropped_records_total`).
+        :type stream_id: str
         :return: bool
         """
         if stream_buffer_name is False:
             with self.stream_buffer_lock:
-                self.stream_buffer.append(stream_data)
+                dropped_records = self.stream_buffer.append(stream_data)
         else:
             with self.stream_buffer_locks[stream_buffer_name]:
-                self.stream_buffers[stream_buffer_name].append(stream_data)
+                dropped_records = self.stream_buffers[stream_buffer_name].append(stream_data)
+        if dropped_records and stream_id is not None:
+            self.increase_dropped_records_counter(stream_id=stream_id, count=dropped_records)
         self.last_entry_added_to_stream_buffer = time.time()
         return True
 
@@ -1481,6 +1838,149 @@ class BinanceWebSocketApiManager(threading.Thread):
             except KeyError:
                 return False
 
+    def create_bar_stream(self,
+                          markets: Union[str, List[str], Set[str], None] = None,
+                          bar_type: Literal['time', 'tick', 'volume', 'quote_volume'] = "time",
+                          bar_size: Union[int, float] = 60,
+                          channel: Literal['trade', 'aggTrade'] = "aggTrade",
+                          process_bar: Optional[Callable] = None,
+                          stream_buffer_name: Union[Literal[False], str] = False,
+                          stream_label: str = None,
+                          close_delay_ms: int = 500) -> Optional[str]:
+        """
+        Create a `trade` or `aggTrade` stream that delivers OHLCV bars instead of trades. Time bars can have any
+        resolution in seconds (e.g. 5 or 15), tick, volume and quote volume bars close after a number of trades or a
+        traded amount.
+
+        The bars are dicts with the keys `symbol`, `bar_type`, `bar_size`, `open_time`, `close_time`, `open`,
+        `high`, `low`, `close`, `volume`, `quote_volume`, `trades` and `is_closed`. The not yet closed bar of a
+        symbol can be read with `get_bar_aggregator(stream_id).get_partial_bar(symbol)`.
+
+        :param markets: provide the markets you wish to stream
+        :type markets: str, list, set
+        :param bar_type: "time" (default), "tick", "volume" or "quote_volume"
+        :type bar_type: str
+        :param bar_size: Seconds, number of trades, volume or quote volume of a bar, depending on `bar_type`.
+        :type bar_size: int or float
+        :param channel: "aggTrade" (default) or "trade"
+        :type channel: str
+        :param process_bar: Provide a function/method to process the closed bars. If not provided, the bars get
+                            stored in the `stream_buffer`.
+        :type process_bar: function
+        :param stream_buffer_name: The `stream_buffer` for the bars if `process_bar` is not used.
+        :type stream_buffer_name: False or str
+        :param stream_label: provide a stream_label to identify the stream
+        :type stream_label: str
+        :param close_delay_ms: Time bars are closed this number of milliseconds after their end, also if no new trade
+                               was received.
+        :type close_delay_ms: int
+        :return: stream_id or 'None'
+        """
+        bar_aggregator = BinanceWebSocketApiBarAggregator(bar_type=bar_type,
+                                                          bar_size=bar_size,
+                                                          process_bar=process_bar,
+                                                          manager=self,
+                                                          stream_buffer_name=stream_buffer_name,
+                                                          close_delay_ms=close_delay_ms)
+        if stream_buffer_name is not False and stream_buffer_name not in self.stream_buffers:
+            self._create_stream_buffer(stream_buffer_name=stream_buffer_name)
+        stream_id = self.create_stream(channels=channel,
+                                       markets=markets,
+                                       stream_label=stream_label,
+                                       output="dict",
+                                       process_stream_data=bar_aggregator.process_stream_data)
+        if stream_id is not None:
+            self.bar_aggregators[stream_id] = bar_aggregator
+        return stream_id
+
+    def create_shared_memory_stream_buffer(self,
+                                           stream_buffer_name: str = None,
+                                           size: int = 64 * 1024 * 1024,
+                                           shared_memory_name: str = None) -> str:
+        """
+        Create a `stream_buffer` in shared memory that can be read by other processes.
+
+        Use `stream_buffer_name` in `create_stream()` to write to it. Other processes attach to it with
+        `BinanceWebSocketApiSharedMemoryRingBuffer(name=shared_memory_name, create=False)` and read it with their own
+        read cursor via `popleft()`. Records that are not read before the ring is full get overwritten.
+
+        Call `stream_buffers[stream_buffer_name].close()` and `stream_buffers[stream_buffer_name].unlink()` after
+        all streams writing to it are stopped to release the shared memory.
+
+        :param stream_buffer_name: Name of the `stream_buffer`.
+        :type stream_buffer_name: str
+        :param size: Size of the ring in bytes.
+        :type size: int
+        :param shared_memory_name: Name of the shared memory block, default is `ubwa_{stream_buffer_name}`.
+        :type shared_memory_name: str
+        :return: The name of the shared memory block (str)
+        """
+        if stream_buffer_name is None or stream_buffer_name is False or stream_buffer_name is True:
+            raise ValueError(f"Parameter `stream_buffer_name` must be a string!")
+        if shared_memory_name is None:
+            shared_memory_name = f"ubwa_{stream_buffer_name}"
+        stream_buffer = BinanceWebSocketApiSharedMemoryRingBuffer(name=shared_memory_name, size=size, create=True)
+        self.stream_buffer_locks[stream_buffer_name] = threading.Lock()
+        self.stream_buffers[stream_buffer_name] = stream_buffer
+        logger.info(f"BinanceWebSocketApiManager.create_shared_memory_stream_buffer() - Created `stream_buffer` "
+                    f"'{stream_buffer_name}' in shared memory '{stream_buffer.name}' with {size} bytes")
+        return stream_buffer.name
+
+    def create_multiplexed_stream(self,
+                                  channels: Union[str, List[str], Set[str], None] = None,
+                                  markets: Union[str, List[str], Set[str], None] = None,
+                                  market_weights: Optional[dict] = None,
+                                  max_subscriptions_per_stream: Optional[int] = None,
+                                  stream_label: str = None,
+                                  stream_buffer_name: Union[bool, str] = False,
+                                  **kwargs) -> BinanceWebSocketApiMultiplexedStream:
+        """
+        Create a logical stream for any number of channels and markets, which opens as many streams as needed to stay
+        below `max_subscriptions_per_stream` (1024 spot / 200 futures).
+
+        Every market with all its channels is placed in exactly one stream (shard) and the markets are spread so that
+        the expected message rate of the shards is balanced. All shards deliver to the same consumer. Adding or
+        removing markets with `subscribe()` and `unsubscribe()` of the returned object only touches the affected
+        shards.
+
+            Example:
+
+                ``multiplexed_stream = ubwa.create_multiplexed_stream(['trade', 'kline_1m', 'depth'], markets,
+                market_weights={'btcusdt': 50}, stream_buffer_name=True)``
+
+                ``ubwa.pop_stream_data_from_stream_buffer(multiplexed_stream.multiplexed_stream_id)``
+
+        :param channels: provide the channels you wish to stream
+        :type channels: str, list, set
+        :param markets: provide the markets you wish to stream
+        :type markets: str, list, set
+        :param market_weights: Expected message rate per market (e.g. trades per second), markets without an entry get
+                               the weight 1.0.
+        :type market_weights: dict
+        :param max_subscriptions_per_stream: Subscription slots per shard, default is the limit of the manager.
+        :type max_subscriptions_per_stream: int
+        :param stream_label: provide a stream_label to identify the stream, the shards get the label
+                             `{stream_label}_{index}`
+        :type stream_label: str
+        :param stream_buffer_name: `False` for the default `stream_buffer`, `True` for a shared `stream_buffer` named
+                                   by the `multiplexed_stream_id` or a string.
+        :type stream_buffer_name: bool or str
+        :param kwargs: Further parameters of `create_stream()`, e.g. `process_stream_data` or `output`.
+        :type kwargs: dict
+        :return: BinanceWebSocketApiMultiplexedStream
+        """
+        multiplexed_stream = BinanceWebSocketApiMultiplexedStream(
+            self,
+            channels=channels,
+            markets=markets,
+            market_weights=market_weights,
+            max_subscriptions_per_stream=max_subscriptions_per_stream,
+            stream_label=stream_label,
+            stream_buffer_name=stream_buffer_name,
+            **kwargs)
+        self.multiplexed_streams[multiplexed_stream.multiplexed_stream_id] = multiplexed_stream
+        return multiplexed_stream
+
     def create_payload(self, stream_id, method, channels=None, markets=None):
         """
         Create the payload for subscriptions
@@ -1582,19 +2082,8 @@ class BinanceWebSocketApiManager(threading.Thread):
                     if "arr@" in channel:
                         final_channel = "@" + channel
             if method == "subscribe":
-                params = []
-                for channel in channels:
-                    if "!" in channel:
-                        params.append(channel + final_market)
-                        continue
-                    else:
-                        for market in markets:
-                            if "!" in market:
-                                params.append(market + final_channel)
-                            else:
-                                params.append(market.lower() + "@" + channel)
+                params = list(self._get_subscription_names(channels, markets))
                 if len(params) > 0:
-                    params = list(set(params))
                     payload = self.split_payload(params, "SUBSCRIBE")
             elif method == "unsubscribe":
                 if markets:
@@ -1659,7 +2148,21 @@ class BinanceWebSocketApiManager(threading.Thread):
                       api: bool = False,
                       process_stream_data: Optional[Callable] = None,
                       process_stream_data_async: Optional[Callable] = None,
-                      process_asyncio_queue: Optional[Callable] = None):
+                      process_asyncio_queue: Optional[Callable] = None,
+                      stream_data_middleware: Optional[List[Callable]] = None,
+                      batch_max_items: Optional[int] = None,
+                      batch_max_delay_ms: Optional[int] = None,
+                      raw_data_type: Optional[Literal['str', 'bytes', 'memoryview']] = None,
+                      backpressure_policy: Optional[Literal['block', 'drop_oldest', 'drop_newest',
+                                                            'coalesce_by_key']] = None,
+                      asyncio_queue_maxsize: Optional[int] = None,
+                      record_key: Optional[Callable] = None,
+                      conflate: bool = False,
+                      record_file: Optional[str] = None,
+                      replay_file: Optional[str] = None,
+                      replay_speed: Optional[float] = 1.0,
+                      replay_stream_id: Optional[str] = None,
+                      reconnect_priority: Optional[int] = None):
         """
         Create a websocket stream
 
@@ -1785,9 +2288,75 @@ class BinanceWebSocketApiManager(threading.Thread):
                                       the data in the correct receiving sequence.
                                       https://unicorn-binance-websocket-api.docs.lucit.tech/readme.html#or-await-the-webstream-data-in-an-asyncio-coroutine
         :type process_asyncio_queue: Optional[Callable]
+        :param stream_data_middleware: A list of functions that get called one after another with the converted
+                                       stream data before it gets delivered. Each function has to return the (modified)
+                                       stream data or `None` to drop the record. More functions can be added later with
+                                       `add_stream_data_middleware()`. Responses of the Websocket API to pending
+                                       requests do not pass the middleware.
+        :type stream_data_middleware: Optional[List[Callable]]
+        :param batch_max_items: Activates the micro-batched delivery: `process_stream_data`,
+                                `process_stream_data_async` and the `asyncio_queue` receive a list of max
+                                `batch_max_items` records instead of single records. With a `stream_buffer` the
+                                records of a batch get added with one lock acquisition and can get popped one by one as
+                                usual. (Default is `None` - no batching)
+        :type batch_max_items: Optional[int]
+        :param batch_max_delay_ms: The maximum time in milliseconds a batch collects records before it gets delivered,
+                                   also activates the micro-batched delivery. If only `batch_max_items` is set, the
+                                   default is 100 ms.
+        :type batch_max_delay_ms: Optional[int]
+        :param raw_data_type: With "bytes" or "memoryview" the received frames are not getting decoded to `str`, their
+                              size is counted with `len()` and `orjson`/`UnicornFy` parse the `bytes` directly. With
+                              `output="raw_data"` the records are delivered as `bytes` or `memoryview`.
+                              (Default is "str")
+        :type raw_data_type: Optional[str]
+        :param backpressure_policy: What happens if the consumer is too slow and the `stream_buffer` of this stream
+                                    (`stream_buffer_maxlen`) or its `asyncio_queue` (`asyncio_queue_maxsize`) is full:
+                                    "block" stops receiving until there is space again (TCP backpressure),
+                                    "drop_oldest" drops the oldest waiting record, "drop_newest" drops the new record
+                                    and "coalesce_by_key" replaces the waiting record with the same key (symbol and
+                                    channel) and otherwise drops the oldest. All dropped records are counted in
+                                    `dropped_records_total` of `get_stream_info()`. (Default is `None`: "drop_oldest"
+                                    for the `stream_buffer` and "block" for the `asyncio_queue`)
+        :type backpressure_policy: Optional[str]
+        :param asyncio_queue_maxsize: Max number of records waiting in the `asyncio_queue` of this stream. (Default is
+                                      `None` - unbounded)
+        :type asyncio_queue_maxsize: Optional[int]
+        :param record_key: A function that returns the key of a record for `coalesce_by_key` and `conflate`. The
+                           default uses the stream name or the event type and symbol of the record.
+        :type record_key: Optional[Callable]
+        :param conflate: Deliver into a conflating `stream_buffer` that keeps one slot per key (e.g. symbol and stream
+                         name) with the newest record, useful for `!bookTicker`, `@ticker` or `@depth5` streams. Read
+                         the keys that changed since the last read with
+                         `pop_conflated_stream_data_from_stream_buffer()` or one by one with
+                         `pop_stream_data_from_stream_buffer()`. If no `stream_buffer_name` is provided, the stream_id
+                         is used. (Default is `False`)
+        :type conflate: bool
+        :param record_file: Write every received raw frame with its monotonic receive time and the stream_id to this
+                            append-only gzip compressed segment file. Several streams can record to the same file.
+                            (Default is `None`)
+        :type record_file: Optional[str]
+        :param replay_file: Do not connect to Binance, feed the frames of this segment file through the same decode
+                            and dispatch path instead. The stream stops after the last frame. `channels` and `markets`
+                            are only used for the `stream_list`. (Default is `None`)
+        :type replay_file: Optional[str]
+        :param replay_speed: 1.0 replays the frames in the recorded timing, 10.0 ten times faster and `None` or 0 as
+                             fast as possible. (Default is 1.0)
+        :type replay_speed: Optional[float]
+        :param replay_stream_id: Only replay the frames that were recorded from this stream_id. (Default is `None` -
+                                 all frames of the file)
+        :type replay_stream_id: Optional[str]
+        :param reconnect_priority: If many streams have to reconnect at the same time, the streams with a higher
+                                   priority get reconnected first. (Default is `None` - 1 for userData and websocket
+                                   API streams, 0 for all other streams)
+        :type reconnect_priority: Optional[int]
 
         :return: stream_id or 'None'
         """
+        if backpressure_policy is not None and backpressure_policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Parameter `backpressure_policy` must be one of {BACKPRESSURE_POLICIES}, received: "
+                             f"{backpressure_policy}")
+        if backpressure_policy == "coalesce_by_key" and (batch_max_items is not None or batch_max_delay_ms is not None):
+            raise ValueError(f"`backpressure_policy='coalesce_by_key'` can not be combined with batching!")
         # handle Websocket API streams: https://developers.binance.com/docs/binance-trading-api/websocket_api
         if api is True:
             if api_key is None or api_secret is None:
@@ -1813,6 +2382,8 @@ class BinanceWebSocketApiManager(threading.Thread):
         markets_new = []
         if stream_buffer_name is True:
             stream_buffer_name = stream_id
+        if conflate is True and stream_buffer_name is False:
+            stream_buffer_name = stream_id
         for market in markets:
             if "!" in market \
                     or market == "allMiniTickers" \
@@ -1849,18 +2420,45 @@ class BinanceWebSocketApiManager(threading.Thread):
                                         api=api,
                                         process_stream_data=process_stream_data,
                                         process_stream_data_async=process_stream_data_async,
-                                        process_asyncio_queue=process_asyncio_queue)
+                                        process_asyncio_queue=process_asyncio_queue,
+                                        stream_data_middleware=stream_data_middleware,
+                                        batch_max_items=batch_max_items,
+                                        batch_max_delay_ms=batch_max_delay_ms,
+                                        raw_data_type=raw_data_type,
+                                        backpressure_policy=backpressure_policy,
+                                        asyncio_queue_maxsize=asyncio_queue_maxsize,
+                                        record_key=record_key,
+                                        conflate=conflate,
+                                        record_file=record_file,
+                                        replay_file=replay_file,
+                                        replay_speed=replay_speed,
+                                        replay_stream_id=replay_stream_id,
+                                        reconnect_priority=reconnect_priority)
         self.set_socket_is_not_ready(stream_id)
         self.event_loops[stream_id] = None
-        thread = threading.Thread(target=self._create_stream_thread,
-                                  args=(stream_id,
-                                        channels,
-                                        markets_new,
-                                        stream_buffer_name,
-                                        stream_buffer_maxlen),
-                                  name=f"_create_stream_thread:  stream_id={stream_id}, time={time.time()}")
-        thread.start()
-        self.stream_threads[stream_id] = thread
+        if self.event_loop_pool is None:
+            thread = threading.Thread(target=self._create_stream_thread,
+                                      args=(stream_id,
+                                            channels,
+                                            markets_new,
+                                            stream_buffer_name,
+                                            stream_buffer_maxlen),
+                                      name=f"_create_stream_thread:  stream_id={stream_id}, time={time.time()}")
+            thread.start()
+            self.stream_threads[stream_id] = thread
+        else:
+            self._create_stream_buffer(stream_buffer_name=stream_buffer_name,
+                                       stream_buffer_maxlen=stream_buffer_maxlen,
+                                       backpressure_policy=backpressure_policy,
+                                       record_key=record_key,
+                                       conflate=conflate)
+            loop = self.event_loop_pool.acquire_loop()
+            self.event_loops[stream_id] = loop
+            self.stream_threads[stream_id] = self.event_loop_pool.get_thread(loop)
+            self.event_loop_pool.run_coroutine(self._run_stream_in_event_loop_pool(stream_id=stream_id,
+                                                                                   channels=channels,
+                                                                                   markets=markets_new),
+                                               loop)
         while self.is_socket_ready(stream_id=stream_id) is False:
             if self.is_stop_request(stream_id=stream_id) is True \
                     or self.is_crash_request(stream_id=stream_id) is True \
@@ -2091,16 +2689,6 @@ class BinanceWebSocketApiManager(threading.Thread):
             return self.websocket_base_uri + str(query)
         else:
             query = "stream?streams="
-            final_market = "@arr"
-            market = ""
-            channel = ""
-            for market in markets:
-                if "arr@" in market:
-                    final_market = "@" + market
-            final_channel = "@arr"
-            for channel in channels:
-                if "arr@" in channel:
-                    final_channel = "@" + channel
             for channel in channels:
                 if channel == "!userData":
                     logger.error("BinanceWebSocketApiManager.create_websocket_uri(" + str(channels) + ", " +
@@ -2119,22 +2707,37 @@ class BinanceWebSocketApiManager(threading.Thread):
                                  "Use create_stream([\"arr\"], [\"!userData\"]) to "
                                  "initiate an extra connection.")
                     return None
-            if "!" in channel:
-                query += channel + final_market
-            elif "!" in market:
-                query += market + final_channel
-            else:
-                query += market.lower() + "@" + channel
-            try:
-                if self.subscribe_to_stream(stream_id=stream_id, markets=markets, channels=channels) is False:
-                    return None
-            except KeyError:
-                pass
+            channels = [channels] if type(channels) is str else list(channels)
+            markets = [markets] if type(markets) is str else list(markets)
+            # as many subscriptions as the URI length allows are part of the combined stream URI, the connection
+            # subscribes the rest with SUBSCRIBE messages after the connect
+            uri_subscription_names = []
+            uri_length = len(self.websocket_base_uri) + len(query) - 1
+            for subscription_name in sorted(self._get_subscription_names(channels, markets)):
+                if uri_length + 1 + len(subscription_name) > self.max_websocket_uri_length \
+                        and len(uri_subscription_names) > 0:
+                    break
+                uri_subscription_names.append(subscription_name)
+                uri_length += 1 + len(subscription_name)
+            query += "/".join(uri_subscription_names)
             logger.info("BinanceWebSocketApiManager.create_websocket_uri(" + str(channels) + ", " +
                         str(markets) + ", " + ", " + str(symbols) + ") - Created websocket URI for stream_id=" +
                         str(stream_id) + " is " + self.websocket_base_uri + str(query))
             return self.websocket_base_uri + str(query)
 
+    def get_websocket_uri_subscription_names(self, websocket_uri=None) -> Optional[list]:
+        """
+        Get the subscriptions which are part of a combined stream URI created by `create_websocket_uri()`.
+
+        :param websocket_uri: The websocket URI.
+        :type websocket_uri: str
+        :return: list or None if it is not a combined stream URI
+        """
+        query = self.websocket_base_uri + "stream?streams="
+        if not isinstance(websocket_uri, str) or not websocket_uri.startswith(query):
+            return None
+        return [subscription_name for subscription_name in websocket_uri[len(query):].split("/") if subscription_name]
+
     def delete_listen_key_by_stream_id(self, stream_id) -> bool:
         """
         Delete a binance listen_key from a specific !userData stream
@@ -2228,10 +2831,39 @@ class BinanceWebSocketApiManager(threading.Thread):
                 del self.specific_process_stream_data_async[stream_id]
             except KeyError:
                 pass
+            try:
+                del self.stream_data_middleware[stream_id]
+            except KeyError:
+                pass
+            try:
+                del self.stream_record_key[stream_id]
+            except KeyError:
+                pass
+            try:
+                del self.bar_aggregators[stream_id]
+            except KeyError:
+                pass
+            try:
+                stream_metrics = self.stream_metrics.pop(stream_id)
+                self.global_metrics.remove_stream_metrics(stream_metrics)
+                with self.total_receives_lock:
+                    self.total_receives += stream_metrics.processed_receives_total
+                with self.total_received_bytes_lock:
+                    self.total_received_bytes += stream_metrics.received_bytes_total
+                self.total_dropped_records += stream_metrics.dropped_records_total
+            except KeyError:
+                pass
             try:
                 del self.socket_is_ready[stream_id]
             except KeyError:
                 pass
+            with self.stream_snapshots_lock:
+                self.stream_snapshots.pop(stream_id, None)
+            try:
+                del self.stream_subscription_names[stream_id]
+            except KeyError:
+                pass
+            self.reconnect_scheduler.remove_stream(stream_id=stream_id)
             try:
                 del self.stream_threads[stream_id]
             except KeyError:
@@ -2338,19 +2970,20 @@ class BinanceWebSocketApiManager(threading.Thread):
         :return: int
         """
         all_receives_last_second = 0
-        last_second_timestamp = int(time.time()) - 1
-        with self.stream_list_lock:
-            logger.debug(f"BinanceWebSocketApiManager.get_all_receives_last_second() - `stream_list_lock` "
-                         f"was entered!")
-            for stream_id in self.stream_list:
-                try:
-                    all_receives_last_second += self.stream_list[stream_id]['receives_statistic_last_second']['entries'][
-                        last_second_timestamp]
-                except KeyError:
-                    pass
-            logger.debug(f"BinanceWebSocketApiManager.get_all_receives_last_second() - Leaving `stream_list_lock`!")
+        for stream_metrics in list(self.stream_metrics.values()):
+            all_receives_last_second += stream_metrics.get_receives_last_second()
         return all_receives_last_second
 
+    def get_bar_aggregator(self, stream_id: str = None) -> Optional[BinanceWebSocketApiBarAggregator]:
+        """
+        Get the bar aggregator of a stream created with `create_bar_stream()`.
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :return: BinanceWebSocketApiBarAggregator or None
+        """
+        return self.bar_aggregators.get(stream_id)
+
     def get_binance_api_status(self):
         """
         `get_binance_api_status()` is obsolete and will be removed in future releases, please use `get_used_weight()`
@@ -2406,26 +3039,10 @@ class BinanceWebSocketApiManager(threading.Thread):
 
         :return: int
         """
-        current_timestamp = int(time.time())
-        last_timestamp = current_timestamp - 1
         try:
-            if self.stream_list[stream_id]['transfer_rate_per_second']['bytes'][last_timestamp] > 0:
-                with self.stream_list_lock:
-                    logger.debug(f"BinanceWebSocketApiManager.get_current_receiving_speed() - `stream_list_lock` "
-                                 f"was entered!")
-                    self.stream_list[stream_id]['transfer_rate_per_second']['speed'] = \
-                        self.stream_list[stream_id]['transfer_rate_per_second']['bytes'][last_timestamp]
-                    logger.debug(f"BinanceWebSocketApiManager.get_current_receiving_speed() - Leaving "
-                                 f"`stream_list_lock`!")
-        except TypeError:
-            return 0
+            return self.stream_metrics[stream_id].get_receiving_speed()
         except KeyError:
             return 0
-        try:
-            current_receiving_speed = self.stream_list[stream_id]['transfer_rate_per_second']['speed']
-        except KeyError:
-            current_receiving_speed = 0
-        return current_receiving_speed
 
     def get_current_receiving_speed_global(self):
         """
@@ -2433,25 +3050,7 @@ class BinanceWebSocketApiManager(threading.Thread):
 
         :return: int
         """
-        current_receiving_speed = 0
-        try:
-            with self.stream_list_lock:
-                logger.debug(f"BinanceWebSocketApiManager.get_current_receiving_speed_global() - `stream_list_lock` "
-                             f"was entered!")
-                temp_stream_list = copy.deepcopy(self.stream_list)
-                logger.debug(f"BinanceWebSocketApiManager.get_current_receiving_speed_global() - Leaving "
-                             f"`stream_list_lock`!")
-        except RuntimeError as error_msg:
-            logger.debug(f"BinanceWebSocketApiManager.get_current_receiving_speed_global() - RuntimeError: "
-                         f"{str(error_msg)}")
-            return 0
-        except TypeError as error_msg:
-            logger.debug(f"BinanceWebSocketApiManager.get_current_receiving_speed_global() - RuntimeError: "
-                         f"{str(error_msg)}")
-            return 0
-        for stream_id in temp_stream_list:
-            current_receiving_speed += self.get_current_receiving_speed(stream_id)
-        return current_receiving_speed
+        return self.global_metrics.get_receiving_speed()
 
     @staticmethod
     def get_date_of_timestamp(timestamp):
@@ -2496,6 +3095,22 @@ class BinanceWebSocketApiManager(threading.Thread):
         """
         return self.exchange
 
+    def get_frame_recorder(self, record_file: str = None) -> Optional[BinanceWebSocketApiFrameRecorder]:
+        """
+        Get the frame recorder that writes to `record_file`, it gets created if it does not exist yet. All streams
+        with the same `record_file` share one recorder.
+
+        :param record_file: Path of the segment file.
+        :type record_file: str
+        :return: BinanceWebSocketApiFrameRecorder or None
+        """
+        if record_file is None:
+            return None
+        with self.frame_recorders_lock:
+            if record_file not in self.frame_recorders:
+                self.frame_recorders[record_file] = BinanceWebSocketApiFrameRecorder(file_path=record_file)
+            return self.frame_recorders[record_file]
+
     @staticmethod
     def get_human_bytesize(amount_bytes, suffix=""):
         """
@@ -2549,6 +3164,39 @@ class BinanceWebSocketApiManager(threading.Thread):
             uptime = str(int(uptime)) + " seconds"
         return uptime
 
+    def get_latency(self, event_time: int, receive_time: float) -> int:
+        """
+        Get the latency between the event time of a record and its local receive time, corrected by the clock offset.
+
+        :param event_time: The event time (`E`) of the record in milliseconds.
+        :type event_time: int
+        :param receive_time: The receive time from `time.monotonic()`.
+        :type receive_time: float
+        :return: int (microseconds)
+        """
+        return int(((receive_time + self.monotonic_time_offset) * 1000 - self.clock_offset_ms - event_time) * 1000)
+
+    def get_latency_statistic(self, stream_id: str = None) -> Optional[dict]:
+        """
+        Get count, p50, p99, p999 and max of the latency between the event time (`E`) of the received records and
+        their local receive time in milliseconds. Needs `enable_latency_histograms=True`.
+
+        :param stream_id: id of a stream, if `None` the statistic of all streams is returned.
+        :type stream_id: str
+        :return: dict or None
+        """
+        if stream_id is not None:
+            try:
+                return self.stream_metrics[stream_id].get_latency_statistic()
+            except KeyError:
+                return None
+        latency_histogram = BinanceWebSocketApiLatencyHistogram()
+        for stream_metrics in list(self.stream_metrics.values()):
+            latency_histogram.merge(stream_metrics.latency_histogram)
+        statistic = latency_histogram.get_statistic()
+        statistic['clock_offset_ms'] = self.clock_offset_ms
+        return statistic
+
     @staticmethod
     def get_latest_release_info():
         """
@@ -2716,6 +3364,16 @@ class BinanceWebSocketApiManager(threading.Thread):
         """
         return self.most_receives_per_second
 
+    def get_multiplexed_stream(self, multiplexed_stream_id: str) -> Optional[BinanceWebSocketApiMultiplexedStream]:
+        """
+        Get a multiplexed stream created with `create_multiplexed_stream()`.
+
+        :param multiplexed_stream_id: id of the multiplexed stream
+        :type multiplexed_stream_id: str
+        :return: BinanceWebSocketApiMultiplexedStream or None
+        """
+        return self.multiplexed_streams.get(multiplexed_stream_id)
+
     def get_number_of_streams_in_stream_list(self):
         """
         Get the number of streams that are stored in the stream_list
@@ -2730,6 +3388,10 @@ class BinanceWebSocketApiManager(threading.Thread):
 
         :return: int
         """
+        try:
+            return len(self.stream_subscription_names[stream_id])
+        except KeyError:
+            pass
         count_subscriptions = 0
         with self.stream_list_lock:
             logger.debug(f"BinanceWebSocketApiManager.get_number_of_subscriptions() - `stream_list_lock` "
@@ -2783,7 +3445,9 @@ class BinanceWebSocketApiManager(threading.Thread):
         - stream_buffer size
         - stream_buffer length
         - reconnects
+        - dropped records
         - uptime
+        - latency p50, p99 and p999 (with `enable_latency_histograms=True`)
 
         :param check_command_version: is the version of the calling `check_command <https://github.com/LUCIT-Systems-and-Development/check_lucit_collector.py>`__
         :type check_command_version: str
@@ -2808,7 +3472,12 @@ class BinanceWebSocketApiManager(threading.Thread):
                         "received_size=" + str(result['total_received_mb']) + "MB;;;0 stream_buffer_size=" + \
                         str(result['stream_buffer_mb']) + "MB;;;0 stream_buffer_length=" + \
                         str(result['stream_buffer_items']) + ";;;0 reconnects=" + str(result['reconnects']) + "c;;;0 " \
+                        "dropped_records=" + str(result['dropped_records']) + "c;;;0 " \
                         "uptime_days=" + str(result['uptime']) + "c;;;0"
+        if self.enable_latency_histograms is True:
+            for percentile in ("p50", "p99", "p999"):
+                if result[f"latency_{percentile}_ms"] is not None:
+                    check_message += f" latency_{percentile}=" + str(result[f"latency_{percentile}_ms"]) + "ms;;;0"
         status = {'text': check_message,
                   'time': int(result['timestamp']),
                   'return_code': result['return_code']}
@@ -2819,7 +3488,8 @@ class BinanceWebSocketApiManager(threading.Thread):
         Get plain monitoring status data:
         active_streams, crashed_streams, restarting_streams, stopped_streams, return_code, status_text,
         timestamp, update_msg, average_receives_per_second, average_speed_per_second, total_received_mb,
-        stream_buffer_items, stream_buffer_mb, reconnects, uptime
+        stream_buffer_items, stream_buffer_mb, reconnects, dropped_records, uptime and with
+        `enable_latency_histograms=True` latency_p50_ms, latency_p99_ms and latency_p999_ms
 
         :param check_command_version: is the version of the calling `check_command <https://github.com/LUCIT-Systems-and-Development/check_lucit_collector.py>`__
         :type check_command_version: False or str
@@ -2838,33 +3508,23 @@ class BinanceWebSocketApiManager(threading.Thread):
                   'timestamp': time.time(),
                   'update_msg': ""}
         time_period = result['timestamp'] - self.last_monitoring_check
-        timestamp_last_hour = time.time() - (60*60)
         is_update_available_unicorn_fy = UnicornFy().is_update_available()
         if check_command_version:
             is_update_available_check_command = self.is_update_available_check_command(
                                                                             check_command_version=check_command_version)
         else:
             is_update_available_check_command = True
-        with self.stream_list_lock:
-            logger.debug(f"BinanceWebSocketApiManager.get_monitoring_status_plain() - `stream_list_lock` "
-                         f"was entered!")
-            for stream_id in self.stream_list:
-                stream_restarts_last_hour = 0
-                for reconnect in self.stream_list[stream_id]['logged_reconnects']:
-                    if reconnect > timestamp_last_hour:
-                        stream_restarts_last_hour += 1
-                if stream_restarts_last_hour > result['highest_restart_per_stream_last_hour']:
-                    result['highest_restart_per_stream_last_hour'] = stream_restarts_last_hour
-            for stream_id in self.stream_list:
-                if self.stream_list[stream_id]['status'] == "running":
-                    result['active_streams'] += 1
-                elif self.stream_list[stream_id]['status'] == "stopped":
-                    result['stopped_streams'] += 1
-                elif self.stream_list[stream_id]['status'] == "restarting":
-                    result['restarting_streams'] += 1
-                elif "crashed" in self.stream_list[stream_id]['status']:
-                    result['crashed_streams'] += 1
-            logger.debug(f"BinanceWebSocketApiManager.get_monitoring_status_plain() - Leaving `stream_list_lock`!")
+        for stream_snapshot in self.get_stream_snapshots().values():
+            if stream_snapshot['logged_reconnects_last_hour'] > result['highest_restart_per_stream_last_hour']:
+                result['highest_restart_per_stream_last_hour'] = stream_snapshot['logged_reconnects_last_hour']
+            if stream_snapshot['status'] == "running":
+                result['active_streams'] += 1
+            elif stream_snapshot['status'] == "stopped":
+                result['stopped_streams'] += 1
+            elif stream_snapshot['status'] == "restarting":
+                result['restarting_streams'] += 1
+            elif "crashed" in stream_snapshot['status']:
+                result['crashed_streams'] += 1
         if self.is_update_available() and is_update_available_unicorn_fy and is_update_available_check_command:
             result['update_msg'] = " Update available: UNICORN Binance WebSocket API, UnicornFy and " \
                                    "check_lucit_collector.py!"
@@ -2916,21 +3576,119 @@ class BinanceWebSocketApiManager(threading.Thread):
             result['return_code'] = 1
             result['status_msg'] = " Restart rate per stream last hour: " + \
                                    str(result['highest_restart_per_stream_last_hour'])
-        result['average_receives_per_second'] = ((self.total_receives - self.monitoring_total_receives) /
+        total_receives = self.get_total_receives()
+        total_received_bytes = self.get_total_received_bytes()
+        result['average_receives_per_second'] = ((total_receives - self.monitoring_total_receives) /
                                                  time_period).__round__(2)
-        result['average_speed_per_second'] = (((self.total_received_bytes - self.monitoring_total_received_bytes) /
+        result['average_speed_per_second'] = (((total_received_bytes - self.monitoring_total_received_bytes) /
                                                time_period) / 1024).__round__(2)
-        result['total_received_mb'] = (self.get_total_received_bytes() / (1024 * 1024)).__round__(2)
-        result['total_received_length'] = self.total_receives
+        result['total_received_mb'] = (total_received_bytes / (1024 * 1024)).__round__(2)
+        result['total_received_length'] = total_receives
         result['stream_buffer_items'] = str(self.get_stream_buffer_length())
         result['stream_buffer_mb'] = (self.get_stream_buffer_byte_size() / (1024 * 1024)).__round__(4)
         result['reconnects'] = self.get_reconnects()
-        self.monitoring_total_receives = self.get_total_receives()
-        self.monitoring_total_received_bytes = self.get_total_received_bytes()
+        result['dropped_records'] = self.get_total_dropped_records()
+        if self.enable_latency_histograms is True:
+            latency_statistic = self.get_latency_statistic()
+            result['latency_p50_ms'] = latency_statistic['p50_ms']
+            result['latency_p99_ms'] = latency_statistic['p99_ms']
+            result['latency_p999_ms'] = latency_statistic['p999_ms']
+        self.monitoring_total_receives = total_receives
+        self.monitoring_total_received_bytes = total_received_bytes
         self.last_monitoring_check = result['timestamp']
         result['uptime'] = ((result['timestamp'] - self.start_time) / (60*60*24)).__round__(3)
         return result
 
+    def get_monitoring_status_prometheus(self) -> str:
+        """
+        Get global and per stream counters and gauges in the
+        `Prometheus text exposition format <https://prometheus.io/docs/instrumenting/exposition_formats/>`__.
+
+        The values are read from the live counters of the streams without copying the `stream_list`, so frequent
+        scraping of many streams does not slow down the receiving streams. The monitoring API serves it on `/metrics`.
+
+        :return: str
+        """
+        def escape(value) -> str:
+            return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+        metrics = {}
+
+        def add(name: str, metric_type: str, help_text: str, value, labels: Optional[dict] = None,
+                suffix: str = "") -> None:
+            # `suffix` adds a sample like `_sum` or `_count` to the metric family `name`
+            if value is None:
+                return None
+            if name not in metrics:
+                metrics[name] = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            if labels:
+                label_text = ",".join(f'{key}="{escape(label)}"' for key, label in labels.items())
+                metrics[name].append(f"{name}{suffix}{{{label_text}}} {value}")
+            else:
+                metrics[name].append(f"{name}{suffix} {value}")
+            return None
+
+        now = time.time()
+        add("ubwa_info", "gauge", "Version and exchange of the manager.", 1,
+            {'version': self.get_version(), 'exchange': self.exchange})
+        add("ubwa_uptime_seconds", "gauge", "Seconds since the start of the manager.", round(now - self.start_time, 3))
+        add("ubwa_receives_total", "counter", "Received records of all streams.", self.get_total_receives())
+        add("ubwa_received_bytes_total", "counter", "Received bytes of all streams.", self.get_total_received_bytes())
+        add("ubwa_transmitted_total", "counter", "Transmitted payloads of all streams.", self.total_transmitted)
+        add("ubwa_reconnects_total", "counter", "Reconnects of all streams.", self.get_reconnects())
+        add("ubwa_dropped_records_total", "counter", "Records dropped by the backpressure policies.",
+            self.get_total_dropped_records())
+        add("ubwa_receiving_speed_bytes", "gauge", "Received bytes of all streams in the last second.",
+            self.get_current_receiving_speed_global())
+        add("ubwa_stream_buffer_length", "gauge", "Records waiting in the stream_buffer.",
+            len(self.stream_buffer), {'stream_buffer_name': "generic"})
+        for stream_buffer_name, stream_buffer in list(self.stream_buffers.items()):
+            add("ubwa_stream_buffer_length", "gauge", "Records waiting in the stream_buffer.",
+                len(stream_buffer), {'stream_buffer_name': stream_buffer_name})
+        statuses = {"running": 0, "restarting": 0, "stopped": 0, "crashed": 0, "starting": 0}
+        for stream_id, stream in list(self.stream_list.items()):
+            status = str(stream.get('status'))
+            status = "crashed" if status.startswith("crashed") else status
+            statuses[status] = statuses.get(status, 0) + 1
+            labels = {'stream_id': stream_id, 'stream_label': stream.get('stream_label') or ""}
+            stream_metrics = self.stream_metrics.get(stream_id)
+            add("ubwa_stream_up", "gauge", "1 if the stream is running.", 1 if status == "running" else 0, labels)
+            add("ubwa_stream_subscriptions", "gauge", "Subscriptions of the stream.", stream.get('subscriptions'),
+                labels)
+            add("ubwa_stream_reconnects_total", "counter", "Reconnects of the stream.", stream.get('reconnects'),
+                labels)
+            if stream_metrics is not None:
+                add("ubwa_stream_receives_total", "counter", "Received records of the stream.",
+                    stream_metrics.processed_receives_total, labels)
+                add("ubwa_stream_received_bytes_total", "counter", "Received bytes of the stream.",
+                    stream_metrics.received_bytes_total, labels)
+                add("ubwa_stream_transmitted_total", "counter", "Transmitted payloads of the stream.",
+                    stream_metrics.processed_transmitted_total, labels)
+                add("ubwa_stream_dropped_records_total", "counter", "Records dropped by the backpressure policy.",
+                    stream_metrics.dropped_records_total, labels)
+                add("ubwa_stream_receiving_speed_bytes", "gauge", "Received bytes of the stream in the last second.",
+                    stream_metrics.get_receiving_speed(), labels)
+                if stream_metrics.last_heartbeat is not None:
+                    add("ubwa_stream_last_heartbeat_age_seconds", "gauge", "Seconds since the last heartbeat.",
+                        round(now - stream_metrics.last_heartbeat, 3), labels)
+                if self.enable_latency_histograms is True and stream_metrics.latency_histogram.count > 0:
+                    latency_histogram = stream_metrics.latency_histogram
+                    for quantile, value in zip(("0.5", "0.99", "0.999"),
+                                               latency_histogram.get_percentiles((50, 99, 99.9))):
+                        add("ubwa_stream_latency_seconds", "summary", "Receive time minus event time.",
+                            value / 1000000, {**labels, 'quantile': quantile})
+                    add("ubwa_stream_latency_seconds", "summary", "Receive time minus event time.",
+                        latency_histogram.sum_value / 1000000, labels, suffix="_sum")
+                    add("ubwa_stream_latency_seconds", "summary", "Receive time minus event time.",
+                        latency_histogram.count, labels, suffix="_count")
+            asyncio_queue = self.asyncio_queue.get(stream_id)
+            if asyncio_queue is not None:
+                add("ubwa_stream_asyncio_queue_depth", "gauge", "Records waiting in the asyncio_queue of the stream.",
+                    asyncio_queue.qsize(), labels)
+        for status, number in statuses.items():
+            add("ubwa_streams", "gauge", "Number of streams by status.", number, {'status': status})
+        return "\n".join("\n".join(lines) for lines in metrics.values()) + "\n"
+
     @staticmethod
     def get_new_uuid_id() -> str:
         """
@@ -3126,6 +3884,9 @@ class BinanceWebSocketApiManager(threading.Thread):
         try:
             with self.stream_list_lock:
                 logger.debug(f"BinanceWebSocketApiManager.get_stream_info() - `stream_list_lock` was entered!")
+                # the counters are not synced periodically anymore, so the `stream_list` entry gets refreshed here
+                if stream_id in self.stream_metrics:
+                    self.stream_list[stream_id].update(self.stream_metrics[stream_id].get_stream_list_values())
                 temp_stream_list = copy.deepcopy(self.stream_list[stream_id])
                 logger.debug(f"BinanceWebSocketApiManager.get_stream_info() - Leaving `stream_list_lock`!")
         except RuntimeError:
@@ -3134,9 +3895,18 @@ class BinanceWebSocketApiManager(threading.Thread):
         except KeyError:
             logger.error("BinanceWebSocketApiManager.get_stream_info(" + str(stream_id) + ") Info: KeyError")
             return False
+        try:
+            if self.enable_latency_histograms is True:
+                temp_stream_list['latency'] = self.stream_metrics[stream_id].get_latency_statistic()
+        except KeyError:
+            pass
+        stream_buffer = self.stream_buffers.get(temp_stream_list['stream_buffer_name'])
+        if isinstance(stream_buffer, BinanceWebSocketApiSharedMemoryRingBuffer):
+            # records the consumer processes missed because the ring got overwritten before they read them
+            temp_stream_list['stream_buffer_overruns'] = stream_buffer.get_overruns()
         if temp_stream_list['last_heartbeat'] is not None:
             temp_stream_list['seconds_to_last_heartbeat'] = \
-                current_timestamp - self.stream_list[stream_id]['last_heartbeat']
+                current_timestamp - temp_stream_list['last_heartbeat']
         if temp_stream_list['has_stopped'] is not None:
             temp_stream_list['seconds_since_has_stopped'] = \
                 int(current_timestamp) - int(self.stream_list[stream_id]['has_stopped'])
@@ -3147,11 +3917,6 @@ class BinanceWebSocketApiManager(threading.Thread):
                 logger.debug(f"BinanceWebSocketApiManager.get_stream_info() - Leaving `stream_list_lock`!")
         except ZeroDivisionError:
             pass
-        current_receiving_speed = self.get_current_receiving_speed(stream_id)
-        with self.stream_list_lock:
-            logger.debug(f"BinanceWebSocketApiManager.get_stream_info() - `stream_list_lock` was entered!")
-            self.stream_list[stream_id]['transfer_rate_per_second']['speed'] = current_receiving_speed
-            logger.debug(f"BinanceWebSocketApiManager.get_stream_info() - Leaving `stream_list_lock`!")
         return temp_stream_list
 
     def get_stream_label(self, stream_id=None):
@@ -3211,6 +3976,7 @@ class BinanceWebSocketApiManager(threading.Thread):
                     logger.debug(f"BinanceWebSocketApiManager.get_stream_subscriptions() - Leaving `stream_list_lock`!")
             except KeyError:
                 return None
+            self._wake_outbound_scheduler(stream_id)
             logger.info("BinanceWebSocketApiManager.get_stream_subscriptions(" + str(stream_id) + ", " +
                         str(request_id) + ") payload added!")
             return request_id
@@ -3263,12 +4029,92 @@ class BinanceWebSocketApiManager(threading.Thread):
         :type stream_id: str
         :return: int
         """
-        last_second_timestamp = int(time.time()) - 1
         try:
-            return self.stream_list[stream_id]['receives_statistic_last_second']['entries'][last_second_timestamp]
+            return self.stream_metrics[stream_id].get_receives_last_second()
         except KeyError:
             return 0
 
+    def get_stream_snapshot(self, stream_id, include: Optional[Iterable[str]] = None) -> Optional[MappingProxyType]:
+        """
+        Get a cheap read-only view of a specific stream.
+
+        In contrast to `get_stream_info()` the `stream_list` entry is not deep copied: the view contains only the scalar
+        values of the stream (status, stream_label, start_time, reconnects, ...), the live counters of the stream and
+        the number and the time of the logged reconnects. Lists, dicts, the `last_received_data_record` and the API
+        secrets are only added if they are named in `include`, those values are copies.
+
+        The `version` of the view gets increased whenever a scalar value of the `stream_list` entry or the logged
+        reconnects changed since the last snapshot, so dashboards can skip unchanged streams. The live counters do
+        not change the `version`.
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param include: Names of additional `stream_list` fields, e.g. `("markets", "channels")`
+        :type include: Iterable[str]
+        :return: MappingProxyType or None
+        """
+        current_timestamp = time.time()
+        try:
+            with self.stream_list_lock:
+                logger.debug(f"BinanceWebSocketApiManager.get_stream_snapshot() - `stream_list_lock` was entered!")
+                stream = self.stream_list[stream_id]
+                versioned_values = {key: value for key, value in stream.items()
+                                    if isinstance(value, (str, int, float, bool, type(None)))
+                                    and key not in self.stream_snapshot_excluded_fields
+                                    and key not in self.stream_snapshot_counter_fields}
+                logged_reconnects = stream['logged_reconnects']
+                versioned_values['logged_reconnects_count'] = len(logged_reconnects)
+                versioned_values['last_reconnect'] = logged_reconnects[-1] if len(logged_reconnects) > 0 else None
+                snapshot = dict(versioned_values)
+                for key in self.stream_snapshot_counter_fields:
+                    snapshot[key] = stream.get(key)
+                snapshot['logged_reconnects_last_hour'] = \
+                    len(logged_reconnects) - bisect.bisect_left(logged_reconnects, current_timestamp - 60 * 60)
+                for key in include or ():
+                    if key in stream:
+                        snapshot[key] = copy.deepcopy(stream[key])
+                logger.debug(f"BinanceWebSocketApiManager.get_stream_snapshot() - Leaving `stream_list_lock`!")
+        except KeyError:
+            return None
+        stream_metrics = self.stream_metrics.get(stream_id)
+        if stream_metrics is not None:
+            snapshot['dropped_records_total'] = stream_metrics.dropped_records_total
+            snapshot['last_heartbeat'] = stream_metrics.last_heartbeat
+            snapshot['most_receives_per_second'] = stream_metrics.get_most_receives_per_second()
+            snapshot['processed_receives_total'] = stream_metrics.processed_receives_total
+            snapshot['processed_transmitted_total'] = stream_metrics.processed_transmitted_total
+            snapshot['received_bytes_total'] = stream_metrics.received_bytes_total
+            snapshot['receives_last_second'] = stream_metrics.get_receives_last_second()
+            snapshot['receiving_speed'] = stream_metrics.get_receiving_speed()
+        with self.stream_snapshots_lock:
+            version, previous_versioned_values = self.stream_snapshots.get(stream_id, (0, None))
+            if versioned_values != previous_versioned_values:
+                version += 1
+                self.stream_snapshots[stream_id] = (version, versioned_values)
+        view = dict(snapshot)
+        view['version'] = version
+        view['snapshot_time'] = current_timestamp
+        view['seconds_to_last_heartbeat'] = current_timestamp - snapshot['last_heartbeat'] \
+            if snapshot['last_heartbeat'] is not None else None
+        view['seconds_since_has_stopped'] = int(current_timestamp) - int(snapshot['has_stopped']) \
+            if snapshot['has_stopped'] is not None else None
+        return MappingProxyType(view)
+
+    def get_stream_snapshots(self, include: Optional[Iterable[str]] = None) -> dict:
+        """
+        Get a read-only view of all streams, see `get_stream_snapshot()`.
+
+        :param include: Names of additional `stream_list` fields, e.g. `("markets", "channels")`
+        :type include: Iterable[str]
+        :return: dict of MappingProxyType
+        """
+        snapshots = {}
+        for stream_id in list(self.stream_list):
+            snapshot = self.get_stream_snapshot(stream_id, include=include)
+            if snapshot is not None:
+                snapshots[stream_id] = snapshot
+        return snapshots
+
     def get_stream_statistic(self, stream_id):
         """
         Get the statistic of a specific stream
@@ -3295,7 +4141,7 @@ class BinanceWebSocketApiManager(threading.Thread):
             else:
                 stream_statistic['uptime'] = time.time() - self.stream_list[stream_id]['start_time']
             try:
-                stream_receives_per_second = self.stream_list[stream_id]['processed_receives_total'] / stream_statistic['uptime']
+                stream_receives_per_second = self.stream_metrics[stream_id].processed_receives_total / stream_statistic['uptime']
             except ZeroDivisionError:
                 stream_receives_per_second = 0
             stream_statistic['stream_receives_per_second'] = stream_receives_per_second
@@ -3340,6 +4186,17 @@ class BinanceWebSocketApiManager(threading.Thread):
                          f"- `found_entries` = {found_entries}")
             return None
 
+    def get_total_dropped_records(self) -> int:
+        """
+        Get the number of records that got dropped or coalesced by the backpressure policies of all streams
+
+        :return: int
+        """
+        total_dropped_records = self.total_dropped_records
+        for stream_metrics in list(self.stream_metrics.values()):
+            total_dropped_records += stream_metrics.dropped_records_total
+        return total_dropped_records
+
     def get_total_received_bytes(self):
         """
         Get number of total received bytes
@@ -3347,7 +4204,10 @@ class BinanceWebSocketApiManager(threading.Thread):
         :return: int
         """
         # how many bytes did we receive till now?
-        return self.total_received_bytes
+        total_received_bytes = self.total_received_bytes
+        for stream_metrics in list(self.stream_metrics.values()):
+            total_received_bytes += stream_metrics.received_bytes_total
+        return total_received_bytes
 
     def get_total_receives(self):
         """
@@ -3355,7 +4215,10 @@ class BinanceWebSocketApiManager(threading.Thread):
 
         :return: int
         """
-        return self.total_receives
+        total_receives = self.total_receives
+        for stream_metrics in list(self.stream_metrics.values()):
+            total_receives += stream_metrics.processed_receives_total
+        return total_receives
 
     def get_user_agent(self):
         """
@@ -3394,6 +4257,20 @@ class BinanceWebSocketApiManager(threading.Thread):
         """
         print("Ctrl+D to close")
 
+    def increase_dropped_records_counter(self, stream_id, count: int = 1):
+        """
+        Increase the counter of dropped records of a stream
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param count: Number of dropped records
+        :type count: int
+        """
+        try:
+            self.stream_metrics[stream_id].add_dropped(count)
+        except KeyError:
+            pass
+
     def increase_received_bytes_per_second(self, stream_id, size):
         """
         Add the amount of received bytes per second
@@ -3403,22 +4280,8 @@ class BinanceWebSocketApiManager(threading.Thread):
         :param size: amount of bytes to add
         :type size: int
         """
-        current_timestamp = int(time.time())
         try:
-            if self.stream_list[stream_id]['transfer_rate_per_second']['bytes'][current_timestamp]:
-                pass
-        except KeyError:
-            with self.stream_list_lock:
-                logger.debug(f"BinanceWebSocketApiManager.increase_received_bytes_per_second() - `stream_list_lock` "
-                             f"was entered!")
-                self.stream_list[stream_id]['transfer_rate_per_second']['bytes'][current_timestamp] = 0
-                logger.debug(f"BinanceWebSocketApiManager.increase_received_bytes_per_second() - Leaving `stream_list_lock`!")
-        try:
-            with self.stream_list_lock:
-                logger.debug(f"BinanceWebSocketApiManager.increase_received_bytes_per_second() - `stream_list_lock` "
-                             f"was entered!")
-                self.stream_list[stream_id]['transfer_rate_per_second']['bytes'][current_timestamp] += size
-                logger.debug(f"BinanceWebSocketApiManager.increase_received_bytes_per_second() - Leaving `stream_list_lock`!")
+            self.stream_metrics[stream_id].add_bytes_per_second(size)
         except KeyError:
             pass
 
@@ -3429,32 +4292,10 @@ class BinanceWebSocketApiManager(threading.Thread):
         :param stream_id: id of a stream
         :type stream_id: str
         """
-        current_timestamp = int(time.time())
         try:
-            with self.stream_list_lock:
-                logger.debug(f"BinanceWebSocketApiManager.increase_processed_receives_statistic() - `stream_list_lock` "
-                             f"was entered!")
-                self.stream_list[stream_id]['processed_receives_total'] += 1
-                logger.debug(f"BinanceWebSocketApiManager.increase_processed_receives_statistic() - Leaving "
-                             f"`stream_list_lock`!")
+            self.stream_metrics[stream_id].add_receive_statistic()
         except KeyError:
             return False
-        try:
-            with self.stream_list_lock:
-                logger.debug(f"BinanceWebSocketApiManager.increase_processed_receives_statistic() - `stream_list_lock` "
-                             f"was entered!")
-                self.stream_list[stream_id]['receives_statistic_last_second']['entries'][current_timestamp] += 1
-                logger.debug(f"BinanceWebSocketApiManager.increase_processed_receives_statistic() - Leaving "
-                             f"`stream_list_lock`!")
-        except KeyError:
-            with self.stream_list_lock:
-                logger.debug(f"BinanceWebSocketApiManager.increase_processed_receives_statistic() - `stream_list_lock` "
-                             f"was entered!")
-                self.stream_list[stream_id]['receives_statistic_last_second']['entries'][current_timestamp] = 1
-                logger.debug(f"BinanceWebSocketApiManager.increase_processed_receives_statistic() - Leaving "
-                             f"`stream_list_lock`!")
-        with self.total_receives_lock:
-            self.total_receives += 1
 
     def increase_reconnect_counter(self, stream_id=None):
         """
@@ -3477,10 +4318,10 @@ class BinanceWebSocketApiManager(threading.Thread):
         :param stream_id: id of a stream
         :type stream_id: str
         """
-        with self.stream_list_lock:
-            logger.debug(f"BinanceWebSocketApiManager.increase_transmitted_counter() - `stream_list_lock` was entered!")
-            self.stream_list[stream_id]['processed_transmitted_total'] += 1
-            logger.debug(f"BinanceWebSocketApiManager.increase_transmitted_counter() - Leaving `stream_list_lock`!")
+        try:
+            self.stream_metrics[stream_id].add_transmitted()
+        except KeyError:
+            pass
         with self.total_transmitted_lock:
             logger.debug(f"BinanceWebSocketApiManager.increase_transmitted_counter() - `stream_list_lock` was entered!")
             self.total_transmitted += 1
@@ -3598,6 +4439,21 @@ class BinanceWebSocketApiManager(threading.Thread):
         else:
             return True
 
+    def pop_conflated_stream_data_from_stream_buffer(self, stream_buffer_name: str = None) -> Optional[dict]:
+        """
+        Get the newest record of all keys that changed since the last read from a conflating `stream_buffer` (see
+        parameter `conflate` of `create_stream()`).
+
+        :param stream_buffer_name: The stream_id or the name of the conflating `stream_buffer`.
+        :type stream_buffer_name: str
+        :return: dict (key: stream_data) or None if it is not a conflating `stream_buffer`
+        """
+        try:
+            with self.stream_buffer_locks[stream_buffer_name]:
+                return self.stream_buffers[stream_buffer_name].drain()
+        except (AttributeError, KeyError):
+            return None
+
     def pop_stream_data_from_stream_buffer(self, stream_buffer_name: Union[Literal[False], str] = None, mode="FIFO"):
         """
         Get oldest or latest entry from
@@ -3638,6 +4494,72 @@ class BinanceWebSocketApiManager(threading.Thread):
             except KeyError:
                 return None
 
+    def pop_stream_data_from_stream_buffer_as_arrays(self,
+                                                     stream_buffer_name: Union[Literal[False], str] = None,
+                                                     fields: List[str] = None,
+                                                     max_items: Optional[int] = None,
+                                                     dtypes: Optional[dict] = None,
+                                                     structured: bool = False,
+                                                     skipped_records: Optional[list] = None):
+        """
+        Drain many records from the
+        `stream_buffer <https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/wiki/%60stream_buffer%60>`__
+        at once and return them as typed NumPy column arrays (FIFO).
+
+        Fields that Binance sends as numbers or booleans (timestamps, ids and flags like `E`, `T`, `t`, `u`, `m`,
+        `k.t`) become `int64`, prices and quantities `float64`. Drained records that do not contain all `fields` or
+        do not fit the dtypes are not part of the arrays, they get appended to `skipped_records` or their number gets
+        logged as a warning. This requires `NumPy <https://pypi.org/project/numpy>`__.
+
+        Invalid parameters raise before any record is drained. If the conversion fails, the drained records are put
+        back to the front of a `deque` `stream_buffer`.
+
+        Example for trades: `fields=["T", "p", "q", "m"]`, klines: `fields=["k.t", "k.o", "k.h", "k.l", "k.c", "k.v"]`,
+        bookTicker: `fields=["u", "b", "B", "a", "A"]`
+
+        :param stream_buffer_name: `False` to read from generic stream_buffer, the stream_id if you used True in
+                                   create_stream() or the string name of a shared stream_buffer.
+        :type stream_buffer_name: False or str
+        :param fields: Names of the fields to export, nested fields are addressed with a dot, e.g. `k.c`.
+        :type fields: list
+        :param max_items: Max number of records to drain, `None` drains the whole `stream_buffer`.
+        :type max_items: int or None
+        :param dtypes: Override the dtype of fields, e.g. `{"T": "float64"}`.
+        :type dtypes: dict
+        :param structured: Return one structured array instead of a dict of column arrays.
+        :type structured: bool
+        :param skipped_records: A list to which the drained records that are not part of the arrays get appended.
+        :type skipped_records: list
+        :return: dict of `numpy.ndarray`, `numpy.ndarray` or None if the `stream_buffer` does not exist
+        """
+        if stream_buffer_name is None or stream_buffer_name is False:
+            stream_buffer = self.stream_buffer
+            stream_buffer_lock = self.stream_buffer_lock
+        else:
+            try:
+                stream_buffer = self.stream_buffers[stream_buffer_name]
+                stream_buffer_lock = self.stream_buffer_locks[stream_buffer_name]
+            except KeyError:
+                return None
+        # raises before any record is drained
+        check_export_parameters(fields, dtypes=dtypes)
+        records = []
+        with stream_buffer_lock:
+            try:
+                while max_items is None or len(records) < max_items:
+                    records.append(stream_buffer.popleft())
+            except IndexError:
+                pass
+        try:
+            return records_to_arrays(records, fields=fields, dtypes=dtypes, structured=structured,
+                                     skipped_records=skipped_records)
+        except Exception:
+            # e.g. a field that holds a list, the drained records get back to the front of the `stream_buffer`
+            if isinstance(stream_buffer, deque):
+                with stream_buffer_lock:
+                    stream_buffer.extendleft(reversed(records))
+            raise
+
     def pop_stream_signal_from_stream_signal_buffer(self):
         """
         Get the oldest entry from
@@ -3798,7 +4720,7 @@ class BinanceWebSocketApiManager(threading.Thread):
                   str(stream_info['seconds_since_has_stopped']), "\r\n"
                   " current_receiving_speed:", str(current_receiving_speed), "\r\n" +
                   " processed_receives:", str(stream_info['processed_receives_total']), "\r\n" +
-                  " transmitted_payloads:", str(self.stream_list[stream_id]['processed_transmitted_total']), "\r\n" +
+                  " transmitted_payloads:", str(stream_info['processed_transmitted_total']), "\r\n" +
                   " stream_most_receives_per_second:",
                   str(stream_info['receives_statistic_last_second']['most_receives_per_second']), "\r\n"
                   " stream_receives_per_second:",
@@ -3843,6 +4765,7 @@ class BinanceWebSocketApiManager(threading.Thread):
         received_bytes_per_x_row = ""
         streams_with_stop_request_row = ""
         stream_buffer_row = ""
+        latency_row = ""
         highest_receiving_speed_row = f"{str(self.get_human_bytesize(self.receiving_speed_peak['value'], '/s'))} " \
                                       f"(reached at " \
                                       f"{self.get_date_of_timestamp(self.receiving_speed_peak['timestamp'])})"
@@ -3857,68 +4780,55 @@ class BinanceWebSocketApiManager(threading.Thread):
             add_string = ""
         else:
             add_string = f" {add_string}\r\n"
-        try:
-            with self.stream_list_lock:
-                logger.debug(f"BinanceWebSocketApiManager.print_summary() - `stream_list_lock` was entered!")
-                temp_stream_list = copy.deepcopy(self.stream_list)
-                logger.debug(f"BinanceWebSocketApiManager.print_summary() - Leaving `stream_list_lock`!")
-        except RuntimeError:
-            return ""
-        except TypeError:
-            return ""
-        for stream_id in temp_stream_list:
+        for stream_id, stream_snapshot in self.get_stream_snapshots().items():
             stream_row_color_prefix = ""
             stream_row_color_suffix = ""
-            current_receiving_speed += self.get_current_receiving_speed(stream_id)
+            current_receiving_speed += stream_snapshot.get('receiving_speed', 0)
             stream_statistic = self.get_stream_statistic(stream_id)
-            if self.stream_list[stream_id]['status'] == "running":
+            if stream_statistic is None:
+                continue
+            if stream_snapshot['status'] == "running":
                 active_streams += 1
                 all_receives_per_second += stream_statistic['stream_receives_per_second']
-                try:
-                    with self.stream_list_lock:
-                        logger.debug(f"BinanceWebSocketApiManager.print_summary() - `stream_list_lock` was entered!")
-                        for reconnect_timestamp in self.stream_list[stream_id]['logged_reconnects']:
-                            if (time.time() - reconnect_timestamp) < 1:
-                                stream_row_color_prefix = "\033[1m\033[31m"
-                                stream_row_color_suffix = "\033[0m"
-                            elif (time.time() - reconnect_timestamp) < 2:
-                                stream_row_color_prefix = "\033[1m\033[33m"
-                                stream_row_color_suffix = "\033[0m"
-                            elif (time.time() - reconnect_timestamp) < 4:
-                                stream_row_color_prefix = "\033[1m\033[32m"
-                                stream_row_color_suffix = "\033[0m"
-                        logger.debug(f"BinanceWebSocketApiManager.print_summary() - Leaving `stream_list_lock`!")
-                except KeyError:
-                    pass
-            elif self.stream_list[stream_id]['status'] == "stopped":
+                if stream_snapshot['last_reconnect'] is not None:
+                    if (time.time() - stream_snapshot['last_reconnect']) < 1:
+                        stream_row_color_prefix = "\033[1m\033[31m"
+                        stream_row_color_suffix = "\033[0m"
+                    elif (time.time() - stream_snapshot['last_reconnect']) < 2:
+                        stream_row_color_prefix = "\033[1m\033[33m"
+                        stream_row_color_suffix = "\033[0m"
+                    elif (time.time() - stream_snapshot['last_reconnect']) < 4:
+                        stream_row_color_prefix = "\033[1m\033[32m"
+                        stream_row_color_suffix = "\033[0m"
+            elif stream_snapshot['status'] == "stopped":
                 stopped_streams += 1
                 stream_row_color_prefix = "\033[1m\033[33m"
                 stream_row_color_suffix = "\033[0m"
-            elif self.stream_list[stream_id]['status'] == "restarting":
+            elif stream_snapshot['status'] == "restarting":
                 restarting_streams += 1
                 stream_row_color_prefix = "\033[1m\033[33m"
                 stream_row_color_suffix = "\033[0m"
-            elif "crashed" in self.stream_list[stream_id]['status']:
+            elif "crashed" in stream_snapshot['status']:
                 crashed_streams += 1
                 stream_row_color_prefix = "\033[1m\033[31m"
                 stream_row_color_suffix = "\033[0m"
-            if self.stream_list[stream_id]['stream_label'] is not None:
-                if len(self.stream_list[stream_id]['stream_label']) > 18:
-                    stream_label = str(self.stream_list[stream_id]['stream_label'])[:13] + "..."
+            if stream_snapshot['stream_label'] is not None:
+                if len(stream_snapshot['stream_label']) > 18:
+                    stream_label = str(stream_snapshot['stream_label'])[:13] + "..."
                 else:
-                    stream_label = str(self.stream_list[stream_id]['stream_label'])
+                    stream_label = str(stream_snapshot['stream_label'])
             else:
-                stream_label = str(self.stream_list[stream_id]['stream_label'])
+                stream_label = str(stream_snapshot['stream_label'])
             stream_rows += stream_row_color_prefix + str(stream_id) + stream_row_color_suffix + " |" + \
                 self.fill_up_space_right(17, stream_label) + "|" + \
-                self.fill_up_space_left(8, self.get_stream_receives_last_second(stream_id)) + "|" + \
+                self.fill_up_space_left(8, stream_snapshot.get('receives_last_second', 0)) + "|" + \
                 self.fill_up_space_left(11, str(stream_statistic['stream_receives_per_second'].__round__(2))) + "|" + \
-                self.fill_up_space_left(8, self.stream_list[stream_id]['receives_statistic_last_second']['most_receives_per_second']) \
+                self.fill_up_space_left(8, stream_snapshot.get('most_receives_per_second', 0)) \
                 + "|" + stream_row_color_prefix + \
-                self.fill_up_space_left(8, str(len(self.stream_list[stream_id]['logged_reconnects']))) + \
+                self.fill_up_space_left(8, str(stream_snapshot['logged_reconnects_count'])) + \
                 stream_row_color_suffix + "\r\n "
-            if self.is_stop_request(stream_id) is True and \
-                    self.stream_list[stream_id]['status'] == "running":
+            if (stream_snapshot['stop_request'] is True or self.is_manager_stopping()) and \
+                    stream_snapshot['status'] == "running":
                 streams_with_stop_request += 1
         if streams_with_stop_request >= 1:
             stream_row_color_prefix = "\033[1m\033[33m"
@@ -3963,6 +4873,11 @@ class BinanceWebSocketApiManager(threading.Thread):
                                          ", status_code=" + str(binance_api_status_code) + " (last update " + \
                                          str(self.get_date_of_timestamp(self.binance_api_status['timestamp'])) + ")\r\n"
 
+            if self.enable_latency_histograms is True:
+                latency_statistic = self.get_latency_statistic()
+                latency_row = f" latency (receive - event time): p50={latency_statistic['p50_ms']}ms, " \
+                              f"p99={latency_statistic['p99_ms']}ms, p999={latency_statistic['p999_ms']}ms " \
+                              f"(clock_offset={round(self.clock_offset_ms, 3)}ms)\r\n"
             if title is not None:
                 first_row = str(self.fill_up_space_centered(96, f" {title} ", "=")) + "\r\n"
                 last_row = str(self.fill_up_space_centered(96, f" Powered by {self.get_user_agent()} ", "=")) + "\r\n"
@@ -3990,7 +4905,8 @@ class BinanceWebSocketApiManager(threading.Thread):
                     " current_receiving_speed: " + str(self.get_human_bytesize(current_receiving_speed, "/s")) + "\r\n" +
                     " average_receiving_speed: " + str(received_bytes_per_x_row) + "\r\n" +
                     " highest_receiving_speed: " + str(highest_receiving_speed_row) + "\r\n" +
-                    " total_receives: " + str(self.total_receives) + "\r\n"
+                    str(latency_row) +
+                    " total_receives: " + str(self.get_total_receives()) + "\r\n"
                     " total_received_bytes: " + str(total_received_bytes) + "\r\n"
                     " total_transmitted_payloads: " + str(self.total_transmitted) + "\r\n" +
                     " stream_buffer_maxlen: " + str(self.stream_buffer_maxlen) + "\r\n" +
@@ -4223,6 +5139,20 @@ class BinanceWebSocketApiManager(threading.Thread):
         """
         self.dex_user_address = binance_dex_user_address
 
+    def set_clock_offset(self, clock_offset_ms: float = 0.0) -> None:
+        """
+        Set the offset of the local clock to the clock of Binance (local minus Binance) in milliseconds that is used
+        to correct the latencies of `enable_latency_histograms`.
+
+        :param clock_offset_ms: Offset in milliseconds.
+        :type clock_offset_ms: float
+        :return: None
+        """
+        logger.info(f"BinanceWebSocketApiManager.set_clock_offset({clock_offset_ms})")
+        self.clock_offset_ms = clock_offset_ms
+        self.monotonic_time_offset = time.time() - time.monotonic()
+        return None
+
     def set_heartbeat(self, stream_id) -> None:
         """
         Set heartbeat for a specific thread (should only be done by the stream itself)
@@ -4231,10 +5161,7 @@ class BinanceWebSocketApiManager(threading.Thread):
         """
         logger.debug("BinanceWebSocketApiManager.set_heartbeat(" + str(stream_id) + ")")
         try:
-            with self.stream_list_lock:
-                logger.debug(f"BinanceWebSocketApiManager.set_heartbeat() - `stream_list_lock` was entered!")
-                self.stream_list[stream_id]['last_heartbeat'] = time.time()
-                logger.debug(f"BinanceWebSocketApiManager.set_heartbeat() - Leaving `stream_list_lock`!")
+            self.stream_metrics[stream_id].set_heartbeat()
         except KeyError:
             pass
         return None
@@ -4313,6 +5240,38 @@ class BinanceWebSocketApiManager(threading.Thread):
         self.socket_is_ready[stream_id] = True
         return True
 
+    def set_stream_subscription_names(self, stream_id: str = None, subscription_names=None) -> bool:
+        """
+        Set the subscriptions which are active on the connection of a CEX stream (e.g. after a reconnect).
+
+        The queued SUBSCRIBE and UNSUBSCRIBE payloads of the previous connection get dropped and the payloads to get
+        from `subscription_names` to the current channels and markets of the stream get queued.
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param subscription_names: The names of the active subscriptions, e.g. `bnbbtc@trade`.
+        :type subscription_names: set or list
+        :return: bool
+        """
+        channels = self.stream_list[stream_id]['channels']
+        markets = self.stream_list[stream_id]['markets']
+        channels = [channels] if type(channels) is str else list(channels)
+        markets = [markets] if type(markets) is str else list(markets)
+        stale_subscription_names = set(subscription_names) - self._get_subscription_names(channels, markets)
+        with self.stream_list_lock:
+            logger.debug(f"BinanceWebSocketApiManager.set_stream_subscription_names() - `stream_list_lock` was "
+                         f"entered!")
+            self.stream_list[stream_id]['payload'] = \
+                [item for item in self.stream_list[stream_id]['payload']
+                 if item.get('method') not in ("SUBSCRIBE", "UNSUBSCRIBE")]
+            self.stream_subscription_names[stream_id] = set(subscription_names) - stale_subscription_names
+            logger.debug(f"BinanceWebSocketApiManager.set_stream_subscription_names() - Leaving `stream_list_lock`!")
+        if len(stale_subscription_names) > 0:
+            # unsubscribed since the connection was opened
+            for item in self.split_payload(sorted(stale_subscription_names), "UNSUBSCRIBE"):
+                self.add_payload_to_stream(stream_id=stream_id, payload=item)
+        return self.subscribe_to_stream(stream_id=stream_id, markets=markets, channels=channels)
+
     def set_stream_label(self, stream_id, stream_label=None) -> bool:
         """
         Set a stream_label by stream_id
@@ -4341,37 +5300,30 @@ class BinanceWebSocketApiManager(threading.Thread):
         """
         self.keep_max_received_last_second_entries = number_of_max_entries
 
-    def split_payload(self, params, method, max_items_per_request=350):
+    def split_payload(self, params, method, max_items_per_request=None):
         """
-        Sending more than 8000 chars via websocket.send() leads to a connection loss, 350 list elements is a good limit
-        to keep the payload length under 8000 chars and avoid reconnects
+        Sending more than 8000 chars via websocket.send() leads to a connection loss, so the params are packed into as
+        few payloads as possible which stay below `max_send_payload_bytes` (8000) each.
 
         :param params: params of subscribe payload
         :type params: list
         :param method: SUBSCRIBE or UNSUBSCRIBE
         :type method: str
-        :param max_items_per_request: max size for params, if more it gets split
+        :param max_items_per_request: optional max size for params, if more it gets split
         :return: list or False
         """
         if self.is_exchange_type('cex'):
-            count_items = 0
-            add_params = []
             payload = []
-            for param in params:
-                add_params.append(param)
-                count_items += 1
-                if count_items > max_items_per_request:
+            for packed_payload in pack_payloads([{"method": method, "params": list(params), "id": None}],
+                                                max_payload_bytes=self.max_send_payload_bytes):
+                add_params = packed_payload['params']
+                step = max_items_per_request or len(add_params)
+                for index in range(0, len(add_params), step):
                     add_payload = {"method": method,
-                                   "params": add_params,
+                                   "params": add_params[index:index + step],
                                    "id": self.get_request_id()}
                     payload.append(add_payload)
-                    count_items = 0
-                    add_params = []
-            if len(add_params) > 0:
-                add_payload = {"method": method,
-                               "params": add_params,
-                               "id": self.get_request_id()}
-                payload.append(add_payload)
+            if len(payload) > 0:
                 return payload
             else:
                 logger.error(f"BinanceWebSocketApiManager.split_payload() CEX result is None!")
@@ -4388,6 +5340,8 @@ class BinanceWebSocketApiManager(threading.Thread):
         """
         Start the monitoring API server
 
+        The status for ICINGA/Nagios is served on `/status/icinga/` and the metrics for Prometheus on `/metrics`.
+
         Take a look into the
         `Wiki <https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/wiki/UNICORN-Monitoring-API-Service>`__
         to see how this works!
@@ -4426,6 +5380,17 @@ class BinanceWebSocketApiManager(threading.Thread):
                     pass
             except AttributeError as error_msg:
                 logger.debug(f"BinanceWebSocketApiManager.stop_manager() - AttributeError: {error_msg}")
+            # stop the event loop pool, `stop_manager()` can get called by the licensing manager before it exists
+            event_loop_pool = getattr(self, 'event_loop_pool', None)
+            if event_loop_pool is not None:
+                event_loop_pool.stop()
+            # close the frame recorders
+            frame_recorders_lock = getattr(self, 'frame_recorders_lock', None)
+            if frame_recorders_lock is not None:
+                with frame_recorders_lock:
+                    for frame_recorder in self.frame_recorders.values():
+                        frame_recorder.close()
+                    self.frame_recorders = {}
             # stop monitoring API services
             self.stop_monitoring_api()
             # stop restclient
@@ -4663,14 +5628,36 @@ class BinanceWebSocketApiManager(threading.Thread):
             logger.debug(f"BinanceWebSocketApiManager.subscribe_to_stream() - `stream_list_lock` was entered!")
             self.stream_list[stream_id]['markets'] = list(set(self.stream_list[stream_id]['markets'] + markets_new))
             logger.debug(f"BinanceWebSocketApiManager.subscribe_to_stream() - Leaving `stream_list_lock`!")
-        payload = self.create_payload(stream_id, "subscribe",
-                                      channels=self.stream_list[stream_id]['channels'],
-                                      markets=self.stream_list[stream_id]['markets'])
-        subscriptions = self.get_number_of_subscriptions(stream_id)
-        with self.stream_list_lock:
-            logger.debug(f"BinanceWebSocketApiManager.subscribe_to_stream() - `stream_list_lock` was entered!")
-            self.stream_list[stream_id]['subscriptions'] = subscriptions
-            logger.debug(f"BinanceWebSocketApiManager.subscribe_to_stream() - Leaving `stream_list_lock`!")
+        if self.is_exchange_type("cex"):
+            # only the difference to the current subscriptions of the connection gets sent
+            all_channels = self.stream_list[stream_id]['channels']
+            all_markets = self.stream_list[stream_id]['markets']
+            if stream_id in self.stream_subscription_names:
+                subscription_names = \
+                    self._get_subscription_names(channels, all_markets, all_channels=all_channels) | \
+                    self._get_subscription_names(all_channels, markets_new, all_markets=all_markets)
+            else:
+                subscription_names = self._get_subscription_names(all_channels, all_markets)
+            with self.stream_list_lock:
+                logger.debug(f"BinanceWebSocketApiManager.subscribe_to_stream() - `stream_list_lock` was entered!")
+                current_subscription_names = self.stream_subscription_names.setdefault(stream_id, set())
+                new_subscription_names = subscription_names - current_subscription_names
+                current_subscription_names.update(new_subscription_names)
+                self.stream_list[stream_id]['subscriptions'] = len(current_subscription_names)
+                logger.debug(f"BinanceWebSocketApiManager.subscribe_to_stream() - Leaving `stream_list_lock`!")
+            if len(new_subscription_names) > 0:
+                payload = self.split_payload(sorted(new_subscription_names), "SUBSCRIBE")
+            else:
+                payload = []
+        else:
+            payload = self.create_payload(stream_id, "subscribe",
+                                          channels=self.stream_list[stream_id]['channels'],
+                                          markets=self.stream_list[stream_id]['markets'])
+            subscriptions = self.get_number_of_subscriptions(stream_id)
+            with self.stream_list_lock:
+                logger.debug(f"BinanceWebSocketApiManager.subscribe_to_stream() - `stream_list_lock` was entered!")
+                self.stream_list[stream_id]['subscriptions'] = subscriptions
+                logger.debug(f"BinanceWebSocketApiManager.subscribe_to_stream() - Leaving `stream_list_lock`!")
         # control subscription limit:
         # https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/wiki/Binance-websocket-endpoint-configuration-overview
         if self.stream_list[stream_id]['subscriptions'] > self.max_subscriptions_per_stream:
@@ -4685,9 +5672,9 @@ class BinanceWebSocketApiManager(threading.Thread):
                          f"None!")
             return False
         try:
+            # the outbound scheduler of the stream merges and sends the payloads within the limits of binance
             for item in payload:
-                if self.send_with_stream(stream_id=stream_id, payload=item) is False:
-                    self.add_payload_to_stream(stream_id=stream_id, payload=item)
+                self.add_payload_to_stream(stream_id=stream_id, payload=item)
             logger.info(f"BinanceWebSocketApiManager.subscribe_to_stream({str(stream_id)}, {str(channels)}, "
                         f"{str(markets)}) finished ...")
             return True
@@ -4737,6 +5724,8 @@ class BinanceWebSocketApiManager(threading.Thread):
                 logger.debug(f"BinanceWebSocketApiManager.unsubscribe_from_stream() - `stream_list_lock` was entered!")
                 self.stream_list[stream_id]['markets'] = [self.stream_list[stream_id]['markets']]
                 logger.debug(f"BinanceWebSocketApiManager.unsubscribe_from_stream() - Leaving `stream_list_lock`!")
+        previous_channels = list(self.stream_list[stream_id]['channels'])
+        previous_markets = list(self.stream_list[stream_id]['markets'])
         for channel in channels:
             try:
                 with self.stream_list_lock:
@@ -4759,21 +5748,50 @@ class BinanceWebSocketApiManager(threading.Thread):
                                      f"`stream_list_lock`!")
                 except ValueError:
                     pass
-        payload = self.create_payload(stream_id, "unsubscribe", channels=channels, markets=markets)
+        if self.is_exchange_type("cex") and stream_id in self.stream_subscription_names:
+            # only the subscriptions which are really active on the connection get unsubscribed
+            removed_channels = [channel for channel in channels if channel in previous_channels]
+            removed_markets = [market for market in markets if market in previous_markets]
+            # global channels (e.g. `!miniTicker`) do not depend on the markets and global markets (e.g.
+            # `!ticker@arr`) not on the channels, so they only get unsubscribed if they get removed themselves
+            subscription_names = \
+                self._get_subscription_names(removed_channels,
+                                             [market for market in previous_markets
+                                              if "!" not in market or market in removed_markets],
+                                             all_channels=previous_channels) | \
+                self._get_subscription_names([channel for channel in previous_channels
+                                              if "!" not in channel or channel in removed_channels],
+                                             removed_markets, all_markets=previous_markets)
+            with self.stream_list_lock:
+                logger.debug(f"BinanceWebSocketApiManager.unsubscribe_from_stream() - `stream_list_lock` was "
+                             f"entered!")
+                current_subscription_names = self.stream_subscription_names[stream_id]
+                removed_subscription_names = subscription_names & current_subscription_names
+                current_subscription_names.difference_update(removed_subscription_names)
+                self.stream_list[stream_id]['subscriptions'] = len(current_subscription_names)
+                logger.debug(f"BinanceWebSocketApiManager.unsubscribe_from_stream() - Leaving `stream_list_lock`!")
+            if len(removed_subscription_names) > 0:
+                payload = self.split_payload(sorted(removed_subscription_names), "UNSUBSCRIBE")
+            else:
+                payload = []
+        else:
+            payload = self.create_payload(stream_id, "unsubscribe", channels=channels, markets=markets)
         if payload is None:
             logger.error(f"BinanceWebSocketApiManager.unsubscribe_from_stream({str(stream_id)}) - error_msg: Payload "
                          f"is None!")
             return False
         try:
+            # the outbound scheduler of the stream merges and sends the payloads within the limits of binance
             for item in payload:
-                if self.send_with_stream(stream_id=stream_id, payload=item) is False:
-                    self.add_payload_to_stream(stream_id=stream_id, payload=item)
-            subscriptions = self.get_number_of_subscriptions(stream_id)
-            with self.stream_list_lock:
-                logger.debug(f"BinanceWebSocketApiManager.unsubscribe_from_stream() - `stream_list_lock` was "
-                             f"entered!")
-                self.stream_list[stream_id]['subscriptions'] = subscriptions
-                logger.debug(f"BinanceWebSocketApiManager.unsubscribe_from_stream() - Leaving `stream_list_lock`!")
+                self.add_payload_to_stream(stream_id=stream_id, payload=item)
+            if not (self.is_exchange_type("cex") and stream_id in self.stream_subscription_names):
+                subscriptions = self.get_number_of_subscriptions(stream_id)
+                with self.stream_list_lock:
+                    logger.debug(f"BinanceWebSocketApiManager.unsubscribe_from_stream() - `stream_list_lock` was "
+                                 f"entered!")
+                    self.stream_list[stream_id]['subscriptions'] = subscriptions
+                    logger.debug(f"BinanceWebSocketApiManager.unsubscribe_from_stream() - Leaving "
+                                 f"`stream_list_lock`!")
             logger.info(f"BinanceWebSocketApiManager.unsubscribe_from_stream({str(stream_id)}, {str(channels)}, "
                         f"{str(markets)}) finished ...")
         except TypeError as error_msg:
@@ -4782,6 +5800,23 @@ class BinanceWebSocketApiManager(threading.Thread):
             return False
         return True
 
+    def update_clock_offset(self) -> Optional[float]:
+        """
+        Measure the offset of the local clock to the clock of Binance with a request of the server time and use it to
+        correct the latencies of `enable_latency_histograms`. The server time is compared to the middle of the round
+        trip. With `enable_latency_histograms=True` this is done every 10 minutes automatically.
+
+        :return: float (clock offset in milliseconds) or None
+        """
+        request_time = time.time()
+        server_time = self.restclient.get_server_time()
+        response_time = time.time()
+        if server_time is None:
+            logger.error(f"BinanceWebSocketApiManager.update_clock_offset() - Can not get the server time!")
+            return None
+        self.set_clock_offset(clock_offset_ms=(request_time + response_time) / 2 * 1000 - server_time)
+        return self.clock_offset_ms
+
     def wait_till_stream_has_started(self, stream_id, timeout: float = 0.0) -> bool:
         """
         Returns `True` as soon a specific stream has started and received its first stream data
@@ -4799,7 +5834,7 @@ class BinanceWebSocketApiManager(threading.Thread):
         logger.debug(f"BinanceWebSocketApiManager.wait_till_stream_has_started({stream_id}) with timeout {timeout} "
                      f"started!")
         try:
-            while self.stream_list[stream_id]['last_heartbeat'] is None:
+            while self.stream_metrics[stream_id].last_heartbeat is None:
                 if self.get_timestamp_unix() > timeout != 0.0:
                     logger.debug(
                         f"BinanceWebSocketApiManager.wait_till_stream_has_started({stream_id}) finished with `False`!")
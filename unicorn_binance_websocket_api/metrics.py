@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/metrics.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from typing import Optional, Tuple
+import logging
+import math
+import re
+import threading
+import time
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+EVENT_TIME_PATTERNS: dict = {str: re.compile(r'"E":(\d+)'), bytes: re.compile(rb'"E":(\d+)')}
+CHANNEL_PATTERNS: dict = {str: re.compile(r'"stream":"[^"@]*@([^"]+)"|"e":"([^"]+)"'),
+                          bytes: re.compile(rb'"stream":"[^"@]*@([^"]+)"|"e":"([^"]+)"')}
+
+
+def get_event_time_of_frame(frame) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Get the event time (`E`) and the channel of a received frame without parsing the JSON.
+
+    The channel is the part of the stream name behind the first `@` (e.g. "kline_1m" or "depth@100ms") or the event
+    type if the frame has no stream name.
+
+    :param frame: The received frame.
+    :type frame: str or bytes
+    :return: tuple (event_time in milliseconds or None, channel or None)
+    """
+    frame_type = str if isinstance(frame, str) else bytes
+    event_time = EVENT_TIME_PATTERNS[frame_type].search(frame)
+    if event_time is None:
+        return None, None
+    channel = CHANNEL_PATTERNS[frame_type].search(frame)
+    if channel is not None:
+        channel = channel.group(1) or channel.group(2)
+        if frame_type is bytes:
+            channel = channel.decode("utf-8")
+    return int(event_time.group(1)), channel
+
+
+class BinanceWebSocketApiLatencyHistogram(object):
+    """
+    Log-bucketed (HDR-style) histogram of latencies in microseconds.
+
+    Values below 32 get their own bucket, above every power of two is split into 16 linear buckets, so the relative
+    error of a percentile is below 3.2%. Recording a value is one `bit_length()` and one list increment.
+    """
+    __slots__ = ('counts',
+                 'count',
+                 'max_value',
+                 'negative_values',
+                 'sum_value')
+
+    SUB_BUCKETS: int = 16
+    BUCKETS: int = 640
+
+    def __init__(self):
+        self.counts: list = [0] * self.BUCKETS
+        self.count: int = 0
+        self.max_value: int = 0
+        self.negative_values: int = 0
+        self.sum_value: int = 0
+
+    @classmethod
+    def get_bucket_index(cls, value: int) -> int:
+        if value < 2 * cls.SUB_BUCKETS:
+            return value
+        exponent = value.bit_length() - 5
+        return min(cls.SUB_BUCKETS * exponent + (value >> exponent), cls.BUCKETS - 1)
+
+    @classmethod
+    def get_bucket_value(cls, index: int) -> int:
+        if index < 2 * cls.SUB_BUCKETS:
+            return index
+        exponent = index // cls.SUB_BUCKETS - 1
+        mantissa = index % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+        # middle of the bucket
+        return (mantissa << exponent) + (1 << exponent) // 2
+
+    def add(self, value: int) -> None:
+        """
+        Record a latency.
+
+        :param value: Latency in microseconds, negative values (clock skew) are recorded as 0 and counted.
+        :type value: int
+        :return: None
+        """
+        if value < 0:
+            self.negative_values += 1
+            value = 0
+        self.counts[self.get_bucket_index(value)] += 1
+        self.count += 1
+        self.sum_value += value
+        if value > self.max_value:
+            self.max_value = value
+        return None
+
+    def merge(self, histogram) -> None:
+        """
+        Add the values of another histogram to this histogram.
+
+        :param histogram: The histogram to add.
+        :type histogram: BinanceWebSocketApiLatencyHistogram
+        :return: None
+        """
+        counts = list(histogram.counts)
+        for index in range(self.BUCKETS):
+            self.counts[index] += counts[index]
+        self.count += histogram.count
+        self.sum_value += histogram.sum_value
+        self.max_value = max(self.max_value, histogram.max_value)
+        self.negative_values += histogram.negative_values
+        return None
+
+    def get_percentile(self, percentile: float) -> Optional[int]:
+        """
+        Get a percentile of the recorded latencies.
+
+        :param percentile: The percentile, e.g. 99.9
+        :type percentile: float
+        :return: int (microseconds) or None if nothing was recorded
+        """
+        return self.get_percentiles((percentile,))[0]
+
+    def get_percentiles(self, percentiles: tuple) -> list:
+        """
+        Get several percentiles of the recorded latencies with one pass over the buckets.
+
+        :param percentiles: Ascending percentiles, e.g. (50, 99, 99.9)
+        :type percentiles: tuple
+        :return: list of int (microseconds) or None if nothing was recorded
+        """
+        if self.count == 0:
+            return [None] * len(percentiles)
+        targets = [max(1, math.ceil(percentile / 100 * self.count)) for percentile in percentiles]
+        results = []
+        total = 0
+        for index, count in enumerate(self.counts):
+            if count == 0:
+                continue
+            total += count
+            while len(results) < len(targets) and total >= targets[len(results)]:
+                results.append(min(self.get_bucket_value(index), self.max_value))
+            if len(results) == len(targets):
+                break
+        while len(results) < len(targets):
+            results.append(self.max_value)
+        return results
+
+    def get_statistic(self) -> dict:
+        """
+        Get count, p50, p99, p999 and max in milliseconds.
+
+        :return: dict
+        """
+        p50, p99, p999 = self.get_percentiles((50, 99, 99.9))
+        return {'count': self.count,
+                'negative_values': self.negative_values,
+                'p50_ms': round(p50 / 1000, 3) if p50 is not None else None,
+                'p99_ms': round(p99 / 1000, 3) if p99 is not None else None,
+                'p999_ms': round(p999 / 1000, 3) if p999 is not None else None,
+                'max_ms': round(self.max_value / 1000, 3) if self.count else None}
+
+
+class BinanceWebSocketApiRollingWindow(object):
+    """
+    Fixed-size ring of per second counters (receives and bytes).
+
+    The bucket of a second is `second % size` and remembers the second it belongs to, a bucket of an older second is
+    reset by the writer when it gets reused. So nothing has to be pruned and adding a value is O(1), regardless of how
+    long the window is or how many windows exist.
+
+    :param size: How many seconds the window covers.
+    :type size: int
+    """
+    __slots__ = ('size',
+                 'seconds',
+                 'receives',
+                 'bytes')
+
+    def __init__(self, size: int = 6):
+        self.size: int = size
+        self.seconds: list = [-1] * size
+        self.receives: list = [0] * size
+        self.bytes: list = [0] * size
+
+    def add(self, second: int, receives: int = 0, size: int = 0) -> None:
+        """
+        Add receives and bytes to the bucket of a second.
+
+        :param second: Unix timestamp in seconds.
+        :type second: int
+        :param receives: Number of receives.
+        :type receives: int
+        :param size: Number of bytes.
+        :type size: int
+        :return: None
+        """
+        index = second % self.size
+        if self.seconds[index] != second:
+            self.seconds[index] = second
+            self.receives[index] = receives
+            self.bytes[index] = size
+        else:
+            self.receives[index] += receives
+            self.bytes[index] += size
+        return None
+
+    def get_receives(self, second: int) -> int:
+        """
+        Get the receives of a second.
+
+        :param second: Unix timestamp in seconds.
+        :type second: int
+        :return: int
+        """
+        index = second % self.size
+        receives = self.receives[index]
+        return receives if self.seconds[index] == second else 0
+
+    def get_bytes(self, second: int) -> int:
+        """
+        Get the received bytes of a second.
+
+        :param second: Unix timestamp in seconds.
+        :type second: int
+        :return: int
+        """
+        index = second % self.size
+        received_bytes = self.bytes[index]
+        return received_bytes if self.seconds[index] == second else 0
+
+    def get_entries(self, values: str = "receives", now: Optional[int] = None) -> dict:
+        """
+        Get the buckets which are still within the window as dict `{second: value}`.
+
+        :param values: "receives" or "bytes"
+        :type values: str
+        :param now: Unix timestamp in seconds the window ends with, default is now.
+        :type now: int
+        :return: dict
+        """
+        now = int(time.time()) if now is None else now
+        counters = self.receives if values == "receives" else self.bytes
+        entries = {}
+        for index in range(self.size):
+            second = self.seconds[index]
+            if now - self.size < second <= now:
+                entries[second] = counters[index]
+        return entries
+
+
+class BinanceWebSocketApiGlobalMetrics(object):
+    """
+    Per second counters of all streams of a manager.
+
+    The streams only write into their own `BinanceWebSocketApiStreamMetrics`, so the hot path takes no lock shared
+    by the streams. The totals get summed up on read from the rolling windows of the registered streams. The lock only
+    guards the registration, readers iterate the tuple of the registered streams which gets replaced and not changed.
+
+    :param keep_max_entries: How many seconds of the per second statistic should be kept.
+    :type keep_max_entries: int
+    """
+    __slots__ = ('lock',
+                 'keep_max_entries',
+                 'stream_metrics',
+                 'receiving_speed')
+
+    def __init__(self, keep_max_entries: int = 5):
+        self.lock: threading.Lock = threading.Lock()
+        self.keep_max_entries: int = keep_max_entries
+        self.stream_metrics: tuple = ()
+        self.receiving_speed: int = 0
+
+    def add_stream_metrics(self, stream_metrics) -> None:
+        """
+        Register the metrics of a stream.
+
+        :param stream_metrics: The metrics of the stream.
+        :type stream_metrics: BinanceWebSocketApiStreamMetrics
+        :return: None
+        """
+        with self.lock:
+            self.stream_metrics = self.stream_metrics + (stream_metrics,)
+        return None
+
+    def remove_stream_metrics(self, stream_metrics) -> None:
+        """
+        Unregister the metrics of a stream.
+
+        :param stream_metrics: The metrics of the stream.
+        :type stream_metrics: BinanceWebSocketApiStreamMetrics
+        :return: None
+        """
+        with self.lock:
+            self.stream_metrics = tuple(metrics for metrics in self.stream_metrics if metrics is not stream_metrics)
+        return None
+
+    def get_bytes(self, second: int) -> int:
+        """
+        Get the received bytes of all streams in a second.
+
+        :param second: Unix timestamp in seconds.
+        :type second: int
+        :return: int
+        """
+        return sum(stream_metrics.window.get_bytes(second) for stream_metrics in self.stream_metrics)
+
+    def get_receives(self, second: int) -> int:
+        """
+        Get the receives of all streams in a second.
+
+        :param second: Unix timestamp in seconds.
+        :type second: int
+        :return: int
+        """
+        return sum(stream_metrics.window.get_receives(second) for stream_metrics in self.stream_metrics)
+
+    def get_receives_last_second(self) -> int:
+        """
+        Get the number of receives of all streams in the last second.
+
+        :return: int
+        """
+        return self.get_receives(int(time.time()) - 1)
+
+    def get_receiving_speed(self) -> int:
+        """
+        Get the receiving speed of all streams in the last second in bytes, if nothing was received in the last second
+        the speed of the last second with receives is returned.
+
+        :return: int
+        """
+        last_second = int(time.time()) - 1
+        for second in range(last_second, last_second - self.keep_max_entries, -1):
+            received_bytes = self.get_bytes(second)
+            if received_bytes > 0:
+                self.receiving_speed = received_bytes
+                break
+        return self.receiving_speed
+
+
+class BinanceWebSocketApiStreamMetrics(object):
+    """
+    Hot path counters of a single stream.
+
+    Only the asyncio loop of the stream writes into this object, so no lock is needed. The per second statistic is
+    kept in a `BinanceWebSocketApiRollingWindow` which needs no pruning. Readers get consistent values by reading
+    single attributes.
+
+    :param keep_max_entries: How many seconds of the per second statistic should be kept.
+    :type keep_max_entries: int
+    :param global_metrics: The counters of the manager this stream gets registered in.
+    :type global_metrics: BinanceWebSocketApiGlobalMetrics
+    """
+    __slots__ = ('keep_max_entries',
+                 'last_heartbeat',
+                 'dropped_records_total',
+                 'processed_receives_total',
+                 'processed_transmitted_total',
+                 'received_bytes_total',
+                 'most_receives_per_second',
+                 'receiving_speed',
+                 'window',
+                 'global_metrics',
+                 'current_second',
+                 'latency_histogram',
+                 'latency_histograms')
+
+    def __init__(self, keep_max_entries: int = 5, global_metrics: Optional[BinanceWebSocketApiGlobalMetrics] = None):
+        self.keep_max_entries: int = keep_max_entries
+        self.last_heartbeat: float = None
+        self.dropped_records_total: int = 0
+        self.processed_receives_total: int = 0
+        self.processed_transmitted_total: int = 0
+        self.received_bytes_total: int = 0
+        self.most_receives_per_second: int = 0
+        self.receiving_speed: int = 0
+        self.window: BinanceWebSocketApiRollingWindow = BinanceWebSocketApiRollingWindow(size=keep_max_entries + 1)
+        self.global_metrics: Optional[BinanceWebSocketApiGlobalMetrics] = global_metrics
+        self.current_second: int = 0
+        self.latency_histogram: BinanceWebSocketApiLatencyHistogram = BinanceWebSocketApiLatencyHistogram()
+        self.latency_histograms: dict = {}
+        if global_metrics is not None:
+            global_metrics.add_stream_metrics(self)
+
+    def _start_new_second(self, second: int) -> None:
+        previous_second = self.current_second
+        receives = self.window.get_receives(previous_second)
+        if receives > self.most_receives_per_second:
+            self.most_receives_per_second = receives
+        received_bytes = self.window.get_bytes(previous_second)
+        if received_bytes > 0:
+            self.receiving_speed = received_bytes
+        self.current_second = second
+        return None
+
+    def _add(self, receives: int, size: int) -> None:
+        second = int(time.time())
+        if second != self.current_second:
+            self._start_new_second(second)
+        self.window.add(second, receives, size)
+        return None
+
+    def add_receive(self, size: int) -> None:
+        """
+        Count a received record (called by the stream itself).
+
+        :param size: Size of the received record in bytes.
+        :type size: int
+        :return: None
+        """
+        self.last_heartbeat = time.time()
+        self.processed_receives_total += 1
+        self.received_bytes_total += size
+        self._add(1, size)
+        return None
+
+    def add_bytes_per_second(self, size: int) -> None:
+        """
+        Add received bytes to the per second statistic only.
+
+        :param size: Amount of bytes.
+        :type size: int
+        :return: None
+        """
+        self._add(0, size)
+        return None
+
+    def add_receive_statistic(self) -> None:
+        """
+        Count a received record without its size.
+
+        :return: None
+        """
+        self.processed_receives_total += 1
+        self._add(1, 0)
+        return None
+
+    def add_dropped(self, count: int = 1) -> None:
+        """
+        Count records that got dropped by the backpressure policy of the stream.
+
+        :param count: Number of dropped records.
+        :type count: int
+        :return: None
+        """
+        self.dropped_records_total += count
+        return None
+
+    def add_latency(self, latency: int, channel: Optional[str] = None) -> None:
+        """
+        Record the latency of a record to the histogram of the stream and of its channel.
+
+        :param latency: Receive time minus event time in microseconds.
+        :type latency: int
+        :param channel: The channel of the record, e.g. "trade".
+        :type channel: str
+        :return: None
+        """
+        self.latency_histogram.add(latency)
+        if channel is not None:
+            try:
+                self.latency_histograms[channel].add(latency)
+            except KeyError:
+                self.latency_histograms[channel] = BinanceWebSocketApiLatencyHistogram()
+                self.latency_histograms[channel].add(latency)
+        return None
+
+    def add_transmitted(self) -> None:
+        """
+        Count a transmitted payload (called by the stream itself).
+
+        :return: None
+        """
+        self.processed_transmitted_total += 1
+        return None
+
+    def set_heartbeat(self) -> None:
+        """
+        Set the heartbeat of the stream to now.
+
+        :return: None
+        """
+        self.last_heartbeat = time.time()
+        return None
+
+    def get_latency_statistic(self) -> dict:
+        """
+        Get the latency statistic (receive time minus event time) of the stream and per channel.
+
+        :return: dict
+        """
+        statistic = self.latency_histogram.get_statistic()
+        statistic['channels'] = {channel: histogram.get_statistic()
+                                 for channel, histogram in dict(self.latency_histograms).items()}
+        return statistic
+
+    def get_most_receives_per_second(self) -> int:
+        """
+        Get the highest number of receives within one second.
+
+        :return: int
+        """
+        return max(self.most_receives_per_second, self.get_receives_last_second())
+
+    def get_receives_last_second(self) -> int:
+        """
+        Get the number of receives of the last second.
+
+        :return: int
+        """
+        return self.window.get_receives(int(time.time()) - 1)
+
+    def get_receiving_speed(self) -> int:
+        """
+        Get the receiving speed of the last second in bytes, if nothing was received in the last second the speed of
+        the last second with receives is returned.
+
+        :return: int
+        """
+        received_bytes = self.window.get_bytes(int(time.time()) - 1)
+        if received_bytes > 0:
+            return received_bytes
+        return self.receiving_speed
+
+    def get_stream_list_values(self) -> dict:
+        """
+        Get the values of this object in the format of the `stream_list` entries.
+
+        :return: dict
+        """
+        now = int(time.time())
+        return {'dropped_records_total': self.dropped_records_total,
+                'last_heartbeat': self.last_heartbeat,
+                'processed_receives_total': self.processed_receives_total,
+                'processed_transmitted_total': self.processed_transmitted_total,
+                'receives_statistic_last_second': {'most_receives_per_second': self.get_most_receives_per_second(),
+                                                   'entries': self.window.get_entries("receives", now)},
+                'transfer_rate_per_second': {'bytes': self.window.get_entries("bytes", now),
+                                             'speed': self.get_receiving_speed()}}
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/multiplexed_stream.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+
+from typing import Dict, List, Optional, Set, Union
+import logging
+import threading
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+
+def distribute_markets(markets: List[str],
+                       capacity: int,
+                       market_costs: int = 1,
+                       market_weights: Optional[Dict[str, float]] = None,
+                       shard_loads: Optional[List[float]] = None,
+                       shard_free_slots: Optional[List[int]] = None,
+                       reserved_slots: int = 0) -> List[List[str]]:
+    """
+    Distribute markets over shards so that no shard exceeds its free subscription slots and the expected message rate
+    (the sum of the weights) of the shards is balanced.
+
+    First as many new shards are opened as needed to take the markets which do not fit into the existing shards,
+    then the markets are placed with the heaviest first to the least loaded shard that has enough free slots.
+
+    :param markets: The markets to place.
+    :type markets: list
+    :param capacity: Subscription slots of a new shard.
+    :type capacity: int
+    :param market_costs: Subscription slots one market uses (the number of channels).
+    :type market_costs: int
+    :param market_weights: Expected message rate per market, markets without an entry get the weight 1.0.
+    :type market_weights: dict
+    :param shard_loads: Loads of already existing shards.
+    :type shard_loads: list
+    :param shard_free_slots: Free subscription slots of already existing shards.
+    :type shard_free_slots: list
+    :param reserved_slots: Slots of the first shard which are used by other subscriptions (global channels), only
+                           used if there are no existing shards.
+    :type reserved_slots: int
+    :return: list of lists of markets, one list per existing shard followed by one list per new shard
+    """
+    if market_costs > capacity - reserved_slots:
+        raise ValueError(f"One market needs {market_costs} subscriptions, but a stream has only {capacity} slots!")
+    market_weights = market_weights or {}
+    loads = list(shard_loads or [])
+    free_slots = list(shard_free_slots or [0] * len(loads))
+    shards = [[] for _ in loads]
+    fitting_markets = sum(slots // market_costs for slots in free_slots)
+    while fitting_markets < len(markets):
+        slots = capacity - reserved_slots if len(shards) == 0 else capacity
+        shards.append([])
+        loads.append(0.0)
+        free_slots.append(slots)
+        fitting_markets += slots // market_costs
+    for market in sorted(markets, key=lambda item: market_weights.get(item, 1.0), reverse=True):
+        candidates = [index for index in range(len(shards)) if free_slots[index] >= market_costs]
+        if candidates:
+            index = min(candidates, key=lambda item: loads[item])
+        else:
+            shards.append([])
+            loads.append(0.0)
+            free_slots.append(capacity)
+            index = len(shards) - 1
+        shards[index].append(market)
+        loads[index] += market_weights.get(market, 1.0)
+        free_slots[index] -= market_costs
+    return shards
+
+
+class BinanceWebSocketApiMultiplexedStream(object):
+    """
+    A logical stream of any number of channels and markets which is split over as many streams of the manager as
+    needed to stay below `max_subscriptions_per_stream`.
+
+    Every market with all its channels lives in exactly one shard, the markets are placed so that the expected message
+    rate (`market_weights`) of the shards is balanced. Global channels like `!miniTicker` are subscribed by the first
+    shard only, so every record is received once. All shards deliver to the same consumer: the same callback or, if
+    `stream_buffer_name` is `True`, a shared `stream_buffer` named by the `multiplexed_stream_id`.
+
+    Subscribing or unsubscribing markets only touches the shards which hold them, a new shard is only created if the
+    existing shards are full.
+
+    Use `BinanceWebSocketApiManager.create_multiplexed_stream()` to create an instance.
+
+    :param manager: The manager which runs the shards.
+    :type manager: BinanceWebSocketApiManager
+    :param channels: The channels of all markets.
+    :type channels: str, list, set
+    :param markets: The markets.
+    :type markets: str, list, set
+    :param market_weights: Expected message rate per market (e.g. trades per second), used to balance the shards.
+                           Markets without an entry get the weight 1.0.
+    :type market_weights: dict
+    :param max_subscriptions_per_stream: Subscription slots per shard, default is the limit of the manager.
+    :type max_subscriptions_per_stream: int
+    :param stream_label: Label of the multiplexed stream, the shards get the label `{stream_label}_{index}`.
+    :type stream_label: str
+    :param stream_buffer_name: `False` for the default `stream_buffer`, `True` for a shared `stream_buffer` named by
+                               the `multiplexed_stream_id` or a string.
+    :type stream_buffer_name: bool or str
+    :param create_stream_kwargs: Further parameters for `create_stream()`, e.g. `process_stream_data` or `output`.
+    :type create_stream_kwargs: dict
+    """
+    def __init__(self,
+                 manager,
+                 channels: Union[str, List[str], Set[str]] = None,
+                 markets: Union[str, List[str], Set[str]] = None,
+                 market_weights: Optional[Dict[str, float]] = None,
+                 max_subscriptions_per_stream: Optional[int] = None,
+                 stream_label: Optional[str] = None,
+                 stream_buffer_name: Union[bool, str] = False,
+                 **create_stream_kwargs):
+        self.manager = manager
+        self.multiplexed_stream_id: str = manager.get_new_uuid_id()
+        channels = [channels] if isinstance(channels, str) else list(channels or [])
+        self.global_channels: List[str] = [channel for channel in channels if "!" in channel]
+        self.channels: List[str] = [channel for channel in channels if "!" not in channel]
+        if len(self.channels) == 0:
+            raise ValueError(f"A multiplexed stream needs at least one channel which is not a global `!` channel!")
+        self.market_weights: Dict[str, float] = dict(market_weights or {})
+        self.max_subscriptions_per_stream: int = max_subscriptions_per_stream or \
+            manager.get_limit_of_subscriptions_per_stream()
+        self.stream_label: str = stream_label or self.multiplexed_stream_id
+        self.stream_buffer_name: Union[bool, str] = self.multiplexed_stream_id if stream_buffer_name is True \
+            else stream_buffer_name
+        self.create_stream_kwargs: dict = create_stream_kwargs
+        self.lock: threading.Lock = threading.Lock()
+        self.shards: List[dict] = []
+        self.shards_created: int = 0
+        self.market_shards: Dict[str, str] = {}
+        self.subscribe(markets)
+
+    def _add_markets(self, markets: List[str]) -> Dict[str, List[str]]:
+        shards = distribute_markets(markets,
+                                    capacity=self.max_subscriptions_per_stream,
+                                    market_costs=len(self.channels),
+                                    market_weights=self.market_weights,
+                                    shard_loads=[shard['load'] for shard in self.shards],
+                                    shard_free_slots=[self._get_free_slots(shard) for shard in self.shards],
+                                    reserved_slots=len(self.global_channels) if self.shards_created == 0 else 0)
+        new_markets_of_shards = {}
+        for index, shard_markets in enumerate(shards):
+            if len(shard_markets) == 0:
+                continue
+            if index < len(self.shards):
+                shard = self.shards[index]
+                new_markets_of_shards[shard['stream_id']] = shard_markets
+            else:
+                shard = {'stream_id': None,
+                         'channels': self.channels + (self.global_channels if self.shards_created == 0 else []),
+                         'markets': [],
+                         'load': 0.0}
+                self.shards.append(shard)
+            shard['markets'].extend(shard_markets)
+            shard['load'] += sum(self.market_weights.get(market, 1.0) for market in shard_markets)
+            if shard['stream_id'] is None:
+                shard['stream_id'] = self.manager.create_stream(channels=shard['channels'],
+                                                                markets=shard['markets'],
+                                                                stream_label=f"{self.stream_label}_"
+                                                                             f"{self.shards_created}",
+                                                                stream_buffer_name=self.stream_buffer_name,
+                                                                **self.create_stream_kwargs)
+                self.shards_created += 1
+                logger.info(f"BinanceWebSocketApiMultiplexedStream.subscribe() - Created shard "
+                            f"({shard['stream_id']}) of multiplexed stream {self.multiplexed_stream_id} with "
+                            f"{len(shard['markets'])} markets")
+            for market in shard_markets:
+                self.market_shards[market] = shard['stream_id']
+        return new_markets_of_shards
+
+    def _get_free_slots(self, shard: dict) -> int:
+        used_slots = len(shard['markets']) * len(self.channels) + \
+                     len([channel for channel in shard['channels'] if "!" in channel])
+        return self.max_subscriptions_per_stream - used_slots
+
+    def _normalize_market_weights(self, market_weights: Optional[Dict[str, float]]) -> Dict[str, float]:
+        return {self._normalize_markets(market)[0]: weight for market, weight in (market_weights or {}).items()}
+
+    def _normalize_markets(self, markets: Union[str, List[str], Set[str], None]) -> List[str]:
+        markets = [markets] if isinstance(markets, str) else list(markets or [])
+        if self.manager.is_exchange_type('dex'):
+            markets = [str(market).upper() for market in markets]
+        else:
+            markets = [str(market).lower() for market in markets]
+        return list(dict.fromkeys(markets))
+
+    def get_markets(self) -> List[str]:
+        """
+        Get all markets of the multiplexed stream.
+
+        :return: list
+        """
+        return list(self.market_shards)
+
+    def get_stream_id_of_market(self, market: str) -> Optional[str]:
+        """
+        Get the stream_id of the shard which holds a market.
+
+        :param market: The market.
+        :type market: str
+        :return: str or None
+        """
+        return self.market_shards.get(self._normalize_markets(market)[0])
+
+    def get_stream_ids(self) -> List[str]:
+        """
+        Get the stream_ids of all shards.
+
+        :return: list
+        """
+        return [shard['stream_id'] for shard in self.shards]
+
+    def get_shards(self) -> List[dict]:
+        """
+        Get the stream_id, channels, markets and expected load of all shards.
+
+        :return: list
+        """
+        with self.lock:
+            return [{'stream_id': shard['stream_id'],
+                     'channels': list(shard['channels']),
+                     'markets': list(shard['markets']),
+                     'load': shard['load']} for shard in self.shards]
+
+    def subscribe(self, markets: Union[str, List[str], Set[str]] = None,
+                  market_weights: Optional[Dict[str, float]] = None) -> bool:
+        """
+        Add markets to the multiplexed stream. They are added to the least loaded shards with free slots, new shards
+        are only created if the existing shards are full.
+
+        :param markets: The markets to add.
+        :type markets: str, list, set
+        :param market_weights: Expected message rates of the new markets.
+        :type market_weights: dict
+        :return: bool
+        """
+        with self.lock:
+            self.market_weights.update(self._normalize_market_weights(market_weights))
+            markets = [market for market in self._normalize_markets(markets) if market not in self.market_shards]
+            if len(markets) == 0:
+                return True
+            result = True
+            for stream_id, new_markets in self._add_markets(markets).items():
+                if self.manager.subscribe_to_stream(stream_id, markets=new_markets) is False:
+                    result = False
+            return result
+
+    def unsubscribe(self, markets: Union[str, List[str], Set[str]] = None) -> bool:
+        """
+        Remove markets from the multiplexed stream, only the shards which hold them get unsubscribed. A shard without
+        markets gets stopped.
+
+        :param markets: The markets to remove.
+        :type markets: str, list, set
+        :return: bool
+        """
+        with self.lock:
+            markets_of_shards = {}
+            for market in self._normalize_markets(markets):
+                stream_id = self.market_shards.pop(market, None)
+                if stream_id is not None:
+                    markets_of_shards.setdefault(stream_id, []).append(market)
+            result = True
+            for shard in list(self.shards):
+                removed_markets = markets_of_shards.get(shard['stream_id'])
+                if not removed_markets:
+                    continue
+                shard['markets'] = [market for market in shard['markets'] if market not in removed_markets]
+                shard['load'] -= sum(self.market_weights.get(market, 1.0) for market in removed_markets)
+                if len(shard['markets']) == 0 and len(shard['channels']) == len(self.channels):
+                    self.manager.stop_stream(shard['stream_id'])
+                    self.shards.remove(shard)
+                    logger.info(f"BinanceWebSocketApiMultiplexedStream.unsubscribe() - Stopped empty shard "
+                                f"{shard['stream_id']} of multiplexed stream {self.multiplexed_stream_id}")
+                elif self.manager.unsubscribe_from_stream(shard['stream_id'], markets=removed_markets) is False:
+                    result = False
+            return result
+
+    def stop(self) -> bool:
+        """
+        Stop all shards of the multiplexed stream.
+
+        :return: bool
+        """
+        with self.lock:
+            for shard in self.shards:
+                self.manager.stop_stream(shard['stream_id'])
+        return True
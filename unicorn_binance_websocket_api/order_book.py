@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/order_book.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+from bisect import bisect_left
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import logging
+import orjson
+import threading
+import time
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+
+class BinanceWebSocketApiOrderBookSide(object):
+    """
+    One side of an order book stored in two parallel arrays sorted by price, the best level is always the last
+    element. Bids are sorted by price, asks by negative price. Updates are O(log n) to find the level plus the
+    shift of the levels behind it, which are usually few because most updates are near the best price.
+
+    :param is_bid: `True` for the bids, `False` for the asks.
+    :type is_bid: bool
+    """
+    __slots__ = ('is_bid', 'keys', 'quantities')
+
+    def __init__(self, is_bid: bool = True):
+        self.is_bid: bool = is_bid
+        self.keys: List[float] = []
+        self.quantities: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _get_key(self, price: float) -> float:
+        return price if self.is_bid is True else -price
+
+    def clear(self) -> None:
+        self.keys.clear()
+        self.quantities.clear()
+
+    def update(self, price: float, quantity: float) -> None:
+        """
+        Set the quantity of a price level, a quantity of 0 removes the level.
+
+        :param price: Price of the level.
+        :type price: float
+        :param quantity: New quantity of the level.
+        :type quantity: float
+        :return: None
+        """
+        key = self._get_key(price)
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            if quantity == 0.0:
+                del self.keys[index]
+                del self.quantities[index]
+            else:
+                self.quantities[index] = quantity
+        elif quantity != 0.0:
+            self.keys.insert(index, key)
+            self.quantities.insert(index, quantity)
+        return None
+
+    def get_best(self) -> Optional[Tuple[float, float]]:
+        """
+        Get the best level in O(1).
+
+        :return: tuple (price, quantity) or None
+        """
+        if not self.keys:
+            return None
+        return self._get_key(self.keys[-1]), self.quantities[-1]
+
+    def get_levels(self, limit: Optional[int] = None) -> List[Tuple[float, float]]:
+        """
+        Get the best `limit` levels, best first.
+
+        :param limit: Number of levels, `None` for all.
+        :type limit: int
+        :return: list of tuples (price, quantity)
+        """
+        start = 0 if limit is None else max(len(self.keys) - limit, 0)
+        return [(self._get_key(self.keys[index]), self.quantities[index])
+                for index in range(len(self.keys) - 1, start - 1, -1)]
+
+    def get_quantity_up_to(self, price: float) -> float:
+        """
+        Get the summed quantity of all levels from the best price up to `price` (including). The border is found
+        with a binary search.
+
+        :param price: The worst price to include.
+        :type price: float
+        :return: float
+        """
+        return sum(self.quantities[bisect_left(self.keys, self._get_key(price)):])
+
+
+class BinanceWebSocketApiOrderBook(object):
+    """
+    A local order book of one symbol that gets synchronized with a snapshot and kept up to date with the diff depth
+    stream `<symbol>@depth@100ms`.
+
+    Updates that arrive before the snapshot are buffered. After the snapshot the sequence of the updates is
+    validated (`U`/`u` on spot, `pu` on futures), on a gap the book is marked as not synchronized and
+    `process_depth_update()` returns `False` so the owner can request a new snapshot. A snapshot that is older than
+    the buffered updates keeps the buffer and `apply_snapshot()` returns `False` to request a newer one.
+
+    :param symbol: The symbol of the order book.
+    :type symbol: str
+    :param futures: `True` for futures markets (validation with `pu`).
+    :type futures: bool
+    :param max_buffered_updates: Maximum number of updates buffered while waiting for a snapshot, the oldest ones get
+                                 dropped first.
+    :type max_buffered_updates: int
+    """
+    def __init__(self, symbol: str = None, futures: bool = False, max_buffered_updates: int = 1000):
+        self.symbol = symbol.upper()
+        self.futures = futures
+        self.asks = BinanceWebSocketApiOrderBookSide(is_bid=False)
+        self.bids = BinanceWebSocketApiOrderBookSide(is_bid=True)
+        self.buffered_updates: Deque[dict] = deque(maxlen=max_buffered_updates)
+        self.is_synchronized = False
+        self.last_update_id: Optional[int] = None
+        self.last_update_time: Optional[int] = None
+        self.lock = threading.Lock()
+        self.resyncs = 0
+
+    def _apply_update(self, depth_update: dict) -> None:
+        for price, quantity in depth_update['b']:
+            self.bids.update(float(price), float(quantity))
+        for price, quantity in depth_update['a']:
+            self.asks.update(float(price), float(quantity))
+        self.last_update_id = depth_update['u']
+        self.last_update_time = depth_update.get('E')
+        return None
+
+    def _is_first_update(self, depth_update: dict) -> bool:
+        if self.futures is True:
+            return depth_update['U'] <= self.last_update_id <= depth_update['u']
+        return depth_update['U'] <= self.last_update_id + 1 <= depth_update['u']
+
+    def _is_next_update(self, depth_update: dict) -> bool:
+        if self.futures is True:
+            return depth_update['pu'] == self.last_update_id
+        return depth_update['U'] == self.last_update_id + 1
+
+    def _set_out_of_sync(self, depth_updates: List[dict]) -> None:
+        """
+        Mark the book as not synchronized and buffer the updates which are not covered by the book.
+
+        :param depth_updates: The update which did not match the sequence and all updates received after it.
+        :type depth_updates: list
+        :return: None
+        """
+        logger.warning(f"BinanceWebSocketApiOrderBook({self.symbol}) - Gap in the depth updates (last_update_id="
+                       f"{self.last_update_id}, U={depth_updates[0]['U']}, u={depth_updates[0]['u']}), "
+                       f"resyncing ...")
+        self.is_synchronized = False
+        self.resyncs += 1
+        self.asks.clear()
+        self.bids.clear()
+        self.buffered_updates.extend(depth_updates)
+        return None
+
+    def apply_snapshot(self, snapshot: dict) -> bool:
+        """
+        Initialize the book with a snapshot (result of `get_order_book()`) and apply the buffered updates.
+
+        :param snapshot: dict with `lastUpdateId`, `bids` and `asks`
+        :type snapshot: dict
+        :return: bool - `False` if a new snapshot is needed
+        """
+        with self.lock:
+            self.asks.clear()
+            self.bids.clear()
+            for price, quantity in snapshot['bids']:
+                self.bids.update(float(price), float(quantity))
+            for price, quantity in snapshot['asks']:
+                self.asks.update(float(price), float(quantity))
+            self.last_update_id = snapshot['lastUpdateId']
+            self.is_synchronized = True
+            is_first_update = True
+            buffered_updates = list(self.buffered_updates)
+            self.buffered_updates.clear()
+            for index, depth_update in enumerate(buffered_updates):
+                if depth_update['u'] < self.last_update_id or \
+                        (self.futures is False and depth_update['u'] == self.last_update_id):
+                    # Already included in the snapshot
+                    continue
+                if (is_first_update is True and not self._is_first_update(depth_update)) or \
+                        (is_first_update is False and not self._is_next_update(depth_update)):
+                    # A stale snapshot or a gap in the buffer, the updates from here on stay buffered for the next
+                    # snapshot
+                    self._set_out_of_sync(buffered_updates[index:])
+                    return False
+                self._apply_update(depth_update)
+                is_first_update = False
+            if is_first_update is True:
+                # No buffered update was applied, the next update has to be checked as first update
+                self.is_synchronized = None
+            return True
+
+    def process_depth_update(self, depth_update: dict) -> bool:
+        """
+        Apply a received event of the diff depth stream.
+
+        :param depth_update: The `depthUpdate` event as dict.
+        :type depth_update: dict
+        :return: bool - `False` if a new snapshot is needed
+        """
+        with self.lock:
+            if self.is_synchronized is False:
+                self.buffered_updates.append(depth_update)
+                return True
+            if self.is_synchronized is None:
+                # The first update after the snapshot
+                if depth_update['u'] < self.last_update_id or \
+                        (self.futures is False and depth_update['u'] == self.last_update_id):
+                    return True
+                if not self._is_first_update(depth_update):
+                    self._set_out_of_sync([depth_update])
+                    return False
+                self.is_synchronized = True
+            elif not self._is_next_update(depth_update):
+                self._set_out_of_sync([depth_update])
+                return False
+            self._apply_update(depth_update)
+            return True
+
+    def is_ready(self) -> bool:
+        """
+        Is the book synchronized with the snapshot?
+
+        :return: bool
+        """
+        return self.is_synchronized is not False
+
+    def get_asks(self, limit: Optional[int] = None) -> List[Tuple[float, float]]:
+        """
+        Get the best `limit` ask levels, best first.
+
+        :param limit: Number of levels, `None` for all.
+        :type limit: int
+        :return: list of tuples (price, quantity)
+        """
+        with self.lock:
+            return self.asks.get_levels(limit=limit)
+
+    def get_bids(self, limit: Optional[int] = None) -> List[Tuple[float, float]]:
+        """
+        Get the best `limit` bid levels, best first.
+
+        :param limit: Number of levels, `None` for all.
+        :type limit: int
+        :return: list of tuples (price, quantity)
+        """
+        with self.lock:
+            return self.bids.get_levels(limit=limit)
+
+    def get_best_ask(self) -> Optional[Tuple[float, float]]:
+        """
+        Get the best ask level.
+
+        :return: tuple (price, quantity) or None
+        """
+        with self.lock:
+            return self.asks.get_best()
+
+    def get_best_bid(self) -> Optional[Tuple[float, float]]:
+        """
+        Get the best bid level.
+
+        :return: tuple (price, quantity) or None
+        """
+        with self.lock:
+            return self.bids.get_best()
+
+    def get_mid_price(self) -> Optional[float]:
+        """
+        Get the price in the middle of the best bid and the best ask.
+
+        :return: float or None
+        """
+        with self.lock:
+            best_bid = self.bids.get_best()
+            best_ask = self.asks.get_best()
+        if best_bid is None or best_ask is None:
+            return None
+        return (best_bid[0] + best_ask[0]) / 2
+
+    def get_spread(self) -> Optional[float]:
+        """
+        Get the difference between the best ask and the best bid.
+
+        :return: float or None
+        """
+        with self.lock:
+            best_bid = self.bids.get_best()
+            best_ask = self.asks.get_best()
+        if best_bid is None or best_ask is None:
+            return None
+        return best_ask[0] - best_bid[0]
+
+    def get_depth_within_bps(self, bps: float = 10.0) -> Optional[Tuple[float, float]]:
+        """
+        Get the summed bid and ask quantity within `bps` basis points of the mid price.
+
+        :param bps: Distance from the mid price in basis points (1 bps = 0.01%).
+        :type bps: float
+        :return: tuple (bid_quantity, ask_quantity) or None
+        """
+        with self.lock:
+            best_bid = self.bids.get_best()
+            best_ask = self.asks.get_best()
+            if best_bid is None or best_ask is None:
+                return None
+            mid_price = (best_bid[0] + best_ask[0]) / 2
+            distance = mid_price * bps / 10000
+            return (self.bids.get_quantity_up_to(mid_price - distance),
+                    self.asks.get_quantity_up_to(mid_price + distance))
+
+
+class BinanceWebSocketApiOrderBookManager(object):
+    """
+    Manage local order books: For each requested symbol it subscribes `<symbol>@depth@100ms` on one shared stream,
+    fetches the snapshot via the Websocket API (`api.spot.get_order_book()` or `api.futures.get_order_book()`)
+    and resyncs a book automatically if a gap in the update sequence is detected. As long as a book is not
+    synchronized, every received update repeats a snapshot request that got no response within 10 seconds.
+
+    .. code-block:: python
+
+        ubwa = BinanceWebSocketApiManager(exchange="binance.com")
+        api_stream = ubwa.create_stream(api=True, api_key=api_key, api_secret=api_secret)
+        order_books = BinanceWebSocketApiOrderBookManager(manager=ubwa, api_stream_id=api_stream)
+        order_books.add_order_book(symbol="BTCUSDT")
+        print(order_books.get_order_book(symbol="BTCUSDT").get_best_bid())
+
+    :param manager: The `BinanceWebSocketApiManager()` instance to use.
+    :type manager: BinanceWebSocketApiManager
+    :param api_stream_id: The Websocket API stream to request the snapshots, if `None` the only active Websocket API
+                          stream is used.
+    :type api_stream_id: str
+    :param update_speed: Update speed of the diff depth stream: "100ms" (default) or "1000ms".
+    :type update_speed: str
+    :param snapshot_limit: Number of levels of the snapshot, max 5000 on spot and 1000 on futures.
+    :type snapshot_limit: int
+    :param stream_label: Label of the depth stream.
+    :type stream_label: str
+    :param max_buffered_updates: Maximum number of updates a book buffers while waiting for a snapshot.
+    :type max_buffered_updates: int
+    """
+    def __init__(self,
+                 manager=None,
+                 api_stream_id: Optional[str] = None,
+                 update_speed: str = "100ms",
+                 snapshot_limit: int = 1000,
+                 stream_label: str = "order_books",
+                 max_buffered_updates: int = 1000):
+        self.manager = manager
+        self.api_stream_id = api_stream_id
+        self.update_speed = update_speed
+        self.snapshot_limit = snapshot_limit
+        self.stream_label = stream_label
+        self.max_buffered_updates = max_buffered_updates
+        self.futures = "futures" in self.manager.get_exchange()
+        self.order_books: Dict[str, BinanceWebSocketApiOrderBook] = {}
+        self.order_books_lock = threading.Lock()
+        self.pending_snapshots: Dict[str, float] = {}
+        self.stream_id: Optional[str] = None
+
+    def _get_api(self):
+        return self.manager.api.futures if self.futures is True else self.manager.api.spot
+
+    def _process_snapshot(self, symbol: str, response) -> None:
+        """
+        Callback for the responses of `get_order_book()`.
+
+        :param symbol: The symbol of the requested order book.
+        :type symbol: str
+        :param response: The response of the Websocket API.
+        :type response: str, bytes or dict
+        :return: None
+        """
+        self.pending_snapshots.pop(symbol, None)
+        if not isinstance(response, dict):
+            response = orjson.loads(response)
+        order_book = self.order_books.get(symbol)
+        if order_book is None:
+            return None
+        if response.get('status') != 200 or 'result' not in response:
+            logger.error(f"BinanceWebSocketApiOrderBookManager._process_snapshot({symbol}) - Invalid response: "
+                         f"{response}")
+            self.request_snapshot(symbol=symbol)
+            return None
+        if order_book.apply_snapshot(response['result']) is False:
+            self.request_snapshot(symbol=symbol)
+        else:
+            logger.info(f"BinanceWebSocketApiOrderBookManager._process_snapshot({symbol}) - Order book is "
+                        f"synchronized (lastUpdateId={response['result']['lastUpdateId']})")
+        return None
+
+    def _process_stream_data(self, stream_data) -> None:
+        """
+        Callback of the depth stream.
+
+        :param stream_data: A received record of the depth stream.
+        :type stream_data: dict
+        :return: None
+        """
+        if not isinstance(stream_data, dict):
+            stream_data = orjson.loads(stream_data)
+        depth_update = stream_data.get('data', stream_data)
+        if depth_update.get('e') != "depthUpdate":
+            return None
+        order_book = self.order_books.get(depth_update['s'])
+        if order_book is None:
+            return None
+        order_book.process_depth_update(depth_update)
+        if order_book.is_ready() is False:
+            # returns immediately if a snapshot request is pending for less than 10 seconds
+            self.request_snapshot(symbol=order_book.symbol)
+        return None
+
+    def add_order_book(self, symbol: str = None) -> BinanceWebSocketApiOrderBook:
+        """
+        Start a local order book for a symbol.
+
+        :param symbol: The symbol, e.g. "BTCUSDT"
+        :type symbol: str
+        :return: BinanceWebSocketApiOrderBook
+        """
+        symbol = symbol.upper()
+        with self.order_books_lock:
+            if symbol in self.order_books:
+                return self.order_books[symbol]
+            order_book = BinanceWebSocketApiOrderBook(symbol=symbol, futures=self.futures,
+                                                      max_buffered_updates=self.max_buffered_updates)
+            self.order_books[symbol] = order_book
+            channel = f"depth@{self.update_speed}"
+            if self.stream_id is None:
+                self.stream_id = self.manager.create_stream(channels=channel,
+                                                            markets=symbol.lower(),
+                                                            stream_label=self.stream_label,
+                                                            output="dict",
+                                                            process_stream_data=self._process_stream_data)
+            else:
+                self.manager.subscribe_to_stream(stream_id=self.stream_id, channels=channel, markets=symbol.lower())
+        self.request_snapshot(symbol=symbol)
+        return order_book
+
+    def get_order_book(self, symbol: str = None) -> Optional[BinanceWebSocketApiOrderBook]:
+        """
+        Get the local order book of a symbol.
+
+        :param symbol: The symbol, e.g. "BTCUSDT"
+        :type symbol: str
+        :return: BinanceWebSocketApiOrderBook or None
+        """
+        return self.order_books.get(symbol.upper())
+
+    def remove_order_book(self, symbol: str = None) -> bool:
+        """
+        Stop the local order book of a symbol.
+
+        :param symbol: The symbol, e.g. "BTCUSDT"
+        :type symbol: str
+        :return: bool
+        """
+        symbol = symbol.upper()
+        with self.order_books_lock:
+            if self.order_books.pop(symbol, None) is None:
+                return False
+            if self.stream_id is not None:
+                self.manager.unsubscribe_from_stream(stream_id=self.stream_id,
+                                                     channels=f"depth@{self.update_speed}",
+                                                     markets=symbol.lower())
+        return True
+
+    def request_snapshot(self, symbol: str = None) -> bool:
+        """
+        Request a new snapshot of an order book via the Websocket API. Only one request per symbol is pending at a
+        time, a request without response or a failed request gets repeated after 10 seconds.
+
+        :param symbol: The symbol, e.g. "BTCUSDT"
+        :type symbol: str
+        :return: bool
+        """
+        requested = self.pending_snapshots.get(symbol)
+        if requested is not None and time.time() - requested < 10:
+            return False
+        self.pending_snapshots[symbol] = time.time()
+        logger.info(f"BinanceWebSocketApiOrderBookManager.request_snapshot({symbol}) - Requesting snapshot ...")
+
+        def process_response(response, order_book_symbol=symbol):
+            self._process_snapshot(order_book_symbol, response)
+
+        result = self._get_api().get_order_book(symbol=symbol,
+                                                limit=self.snapshot_limit,
+                                                process_response=process_response,
+                                                stream_id=self.api_stream_id)
+        if result is False:
+            logger.error(f"BinanceWebSocketApiOrderBookManager.request_snapshot({symbol}) - Request failed, "
+                         f"retrying in 10 seconds ...")
+            return False
+        return True
+
+    def stop(self) -> bool:
+        """
+        Stop the depth stream of all order books.
+
+        :return: bool
+        """
+        with self.order_books_lock:
+            self.order_books.clear()
+            if self.stream_id is not None:
+                self.manager.stop_stream(stream_id=self.stream_id)
+                self.stream_id = None
+        return True
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/rate_limiter.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+from typing import List, Optional
+import asyncio
+import logging
+import orjson
+import time
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+MERGEABLE_METHODS: tuple = ("SUBSCRIBE", "UNSUBSCRIBE")
+
+
+def pack_payloads(payloads: list, max_payload_bytes: int = 8000) -> list:
+    """
+    Merge consecutive SUBSCRIBE and consecutive UNSUBSCRIBE payloads into as few messages as possible, every message
+    stays below `max_payload_bytes`. Duplicate params are removed, the order of the methods is kept, so a SUBSCRIBE
+    followed by an UNSUBSCRIBE of the same param stays valid. A merged message keeps the `id` of its first payload.
+
+    All other payloads (e.g. `LIST_SUBSCRIPTIONS`, DEX or API requests) are passed through unchanged.
+
+    :param payloads: Payloads in the order they got queued.
+    :type payloads: list
+    :param max_payload_bytes: Max size of a serialized message.
+    :type max_payload_bytes: int
+    :return: list
+    """
+    packed = []
+    size = 0
+    run_method = None
+    run_params = set()
+    for payload in payloads:
+        if not isinstance(payload, dict) \
+                or payload.get('method') not in MERGEABLE_METHODS \
+                or not isinstance(payload.get('params'), list):
+            packed.append(payload)
+            run_method = None
+            continue
+        if payload['method'] != run_method:
+            run_method = payload['method']
+            run_params = set()
+            size = 0
+        for param in payload['params']:
+            if param in run_params:
+                continue
+            run_params.add(param)
+            # quotes and comma of the param within the JSON list
+            param_size = len(param.encode("utf-8")) + 3
+            if size == 0 or size + param_size > max_payload_bytes:
+                packed.append({"method": run_method, "params": [param], "id": payload.get('id')})
+                size = len(orjson.dumps(packed[-1]))
+            else:
+                packed[-1]['params'].append(param)
+                size += param_size
+    return packed
+
+
+class BinanceWebSocketApiTokenBucket(object):
+    """
+    Token bucket rate limiter: `rate` tokens per second are added up to `capacity`, every sent message takes one
+    token.
+
+    With `capacity=1` the messages are evenly spaced, but the first message after a quiet period is sent at once.
+
+    :param rate: Tokens per second.
+    :type rate: float
+    :param capacity: Max number of tokens (burst).
+    :type capacity: float
+    """
+    __slots__ = ('rate', 'capacity', 'tokens', 'last_update')
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.last_update: float = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_update) * self.rate)
+        self.last_update = now
+        return None
+
+    def consume(self) -> bool:
+        """
+        Take a token if one is available.
+
+        :return: bool
+        """
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def get_wait_time(self) -> float:
+        """
+        Get the seconds until the next token is available.
+
+        :return: float
+        """
+        self._refill()
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class BinanceWebSocketApiOutboundScheduler(object):
+    """
+    Sends the payloads queued in `stream_list[stream_id]['payload']` of a stream within its own asyncio task, so
+    they are sent as soon as a token is free and not only between two received records.
+
+    Queued SUBSCRIBE/UNSUBSCRIBE payloads are packed with `pack_payloads()` right before sending, so payloads which
+    were queued while waiting for a token get merged into one message.
+
+    :param manager: The manager of the stream.
+    :type manager: BinanceWebSocketApiManager
+    :param stream_id: id of the stream
+    :type stream_id: str
+    :param websocket: The connection to send with.
+    :type websocket: BinanceWebSocketApiConnection
+    :param rate: Messages per second, `None` to send without limit (websocket API streams).
+    :type rate: float
+    :param capacity: Burst of the token bucket.
+    :type capacity: float
+    :param max_payload_bytes: Max size of a serialized message.
+    :type max_payload_bytes: int
+    """
+    def __init__(self,
+                 manager,
+                 stream_id: str,
+                 websocket,
+                 rate: Optional[float] = None,
+                 capacity: float = 1.0,
+                 max_payload_bytes: int = 8000):
+        self.manager = manager
+        self.stream_id: str = stream_id
+        self.websocket = websocket
+        self.token_bucket: Optional[BinanceWebSocketApiTokenBucket] = \
+            BinanceWebSocketApiTokenBucket(rate=rate, capacity=capacity) if rate is not None else None
+        self.max_payload_bytes: int = max_payload_bytes
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wake_event: Optional[asyncio.Event] = None
+        self.queue: list = []
+        self.sent_messages: int = 0
+
+    def _requeue(self) -> None:
+        if not self.queue:
+            return None
+        with self.manager.stream_list_lock:
+            try:
+                self.manager.stream_list[self.stream_id]['payload'] = \
+                    self.queue + list(self.manager.stream_list[self.stream_id]['payload'] or [])
+            except KeyError:
+                pass
+        self.queue = []
+        return None
+
+    def _take_queued_payloads(self) -> None:
+        with self.manager.stream_list_lock:
+            try:
+                payloads = self.manager.stream_list[self.stream_id]['payload']
+            except KeyError:
+                return None
+            if not payloads:
+                return None
+            self.manager.stream_list[self.stream_id]['payload'] = []
+        self.queue = pack_payloads(self.queue + list(payloads), max_payload_bytes=self.max_payload_bytes)
+        return None
+
+    def wake(self) -> None:
+        """
+        Wake the scheduler up after a payload was queued (thread safe).
+
+        :return: None
+        """
+        if self.loop is None or self.wake_event is None:
+            return None
+        try:
+            self.loop.call_soon_threadsafe(self.wake_event.set)
+        except RuntimeError:
+            # The loop is closed
+            pass
+        return None
+
+    async def run(self) -> None:
+        """
+        Send the queued payloads till the task gets cancelled. Unsent payloads are put back to the queue of the
+        stream, so they are sent after a reconnect.
+
+        :return: None
+        """
+        self.loop = asyncio.get_running_loop()
+        self.wake_event = asyncio.Event()
+        try:
+            while True:
+                self._take_queued_payloads()
+                if not self.queue:
+                    try:
+                        await asyncio.wait_for(self.wake_event.wait(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    self.wake_event.clear()
+                    continue
+                if self.token_bucket is not None:
+                    wait_time = self.token_bucket.get_wait_time()
+                    if wait_time > 0:
+                        await asyncio.sleep(wait_time)
+                        # merge the payloads queued in the meantime before sending
+                        continue
+                    self.token_bucket.consume()
+                logger.info(f"BinanceWebSocketApiOutboundScheduler.run({str(self.stream_id)}) - Sending payload: "
+                            f"{str(self.queue[0])}")
+                try:
+                    await self.websocket.send(orjson.dumps(self.queue[0]).decode("utf-8"))
+                except AttributeError as error_msg:
+                    logger.debug(f"BinanceWebSocketApiOutboundScheduler.run({str(self.stream_id)}) - AttributeError - "
+                                 f"error_msg: {str(error_msg)}")
+                    break
+                self.queue.pop(0)
+                self.sent_messages += 1
+        finally:
+            self._requeue()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/reconnect_scheduler.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+from collections import deque
+from typing import Optional
+import asyncio
+import logging
+import random
+import threading
+import time
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+
+class BinanceWebSocketApiReconnectScheduler(object):
+    """
+    Manager wide scheduler for the connection attempts of all streams.
+
+    Every stream waits for its own backoff after a disconnect: the delay doubles with every failed attempt from
+    `base_delay` up to `max_delay` and a random jitter of up to 50% spreads the streams which got disconnected at the
+    same time. A connection that was up for `stable_connection_time` seconds resets the backoff of its stream.
+
+    All attempts share a sliding window log of the connections opened within the last `window` seconds, a new
+    connection is only allowed while it holds less than `connections_per_window` entries (Binance allows 300
+    connections per 5 minutes per IP). If the free connections are scarce, the waiting streams with the highest
+    `reconnect_priority` get them first, streams with the same priority in the order they started to wait.
+
+    A `429` response pauses all attempts for `Retry-After` or `rate_limit_pause` seconds.
+
+    :param manager: The manager of the streams.
+    :type manager: BinanceWebSocketApiManager
+    :param connections_per_window: Max number of new connections within `window`.
+    :type connections_per_window: int
+    :param window: Time window of the connection limit in seconds.
+    :type window: float
+    :param base_delay: Backoff after the first failed attempt in seconds.
+    :type base_delay: float
+    :param max_delay: Max backoff in seconds.
+    :type max_delay: float
+    :param stable_connection_time: Seconds a connection has to be up to reset the backoff.
+    :type stable_connection_time: float
+    :param rate_limit_pause: Pause of all attempts after a `429` without `Retry-After` header in seconds.
+    :type rate_limit_pause: float
+    """
+    def __init__(self,
+                 manager,
+                 connections_per_window: int = 300,
+                 window: float = 300.0,
+                 base_delay: float = 0.1,
+                 max_delay: float = 60.0,
+                 stable_connection_time: float = 60.0,
+                 rate_limit_pause: float = 60.0):
+        self.manager = manager
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.stable_connection_time: float = stable_connection_time
+        self.rate_limit_pause: float = rate_limit_pause
+        self.connections_per_window: int = connections_per_window
+        self.window: float = window
+        self.connection_times: deque = deque()
+        self.lock = threading.Lock()
+        self.failures: dict = {}
+        self.next_attempts: dict = {}
+        self.connected_times: dict = {}
+        self.waiting: dict = {}
+        self.paused_until: float = 0.0
+
+    def _get_available_connections(self, now: float) -> int:
+        """
+        Remove the connections which left the window from the log and get the number of free connections. Has to be
+        called with `lock`.
+        """
+        while self.connection_times and self.connection_times[0] <= now - self.window:
+            self.connection_times.popleft()
+        return self.connections_per_window - len(self.connection_times)
+
+    def _get_wait_time(self, stream_id: str, now: float) -> float:
+        """
+        Get the seconds the stream has to wait for its next attempt, 0 if it can connect now. Has to be called with
+        `lock`.
+        """
+        wait_time = max(self.next_attempts.get(stream_id, 0.0), self.paused_until) - now
+        if wait_time > 0:
+            return wait_time
+        # the free connections go to the ready streams in the order of their priority
+        key = self.waiting[stream_id]
+        rank = 0
+        for waiting_stream_id, waiting_key in self.waiting.items():
+            if waiting_key < key and self.next_attempts.get(waiting_stream_id, 0.0) <= now:
+                rank += 1
+        available_connections = self._get_available_connections(now=now)
+        if rank < available_connections:
+            return 0.0
+        if not self.connection_times:
+            return self.window / self.connections_per_window
+        # wait until enough connections of the log left the window
+        index = min(rank - available_connections, len(self.connection_times) - 1)
+        return self.connection_times[index] + self.window - now
+
+    def get_backoff_delay(self, failures: int) -> float:
+        """
+        Get the backoff with jitter after `failures` failed attempts.
+
+        :param failures: Number of consecutive failed attempts.
+        :type failures: int
+        :return: float
+        """
+        if failures <= 0:
+            return 0.0
+        delay = min(self.max_delay, self.base_delay * 2 ** min(failures - 1, 32))
+        return random.uniform(delay / 2, delay)
+
+    def get_status(self) -> dict:
+        """
+        Get the state of the scheduler.
+
+        :return: dict
+        """
+        with self.lock:
+            now = time.monotonic()
+            return {'waiting_streams': len(self.waiting),
+                    'available_connections': self._get_available_connections(now=now),
+                    'paused_seconds': round(max(0.0, self.paused_until - now), 3),
+                    'failures': dict(self.failures)}
+
+    async def acquire(self, stream_id: str, priority: int = 0) -> bool:
+        """
+        Wait until the stream is allowed to open a connection.
+
+        :param stream_id: id of the stream
+        :type stream_id: str
+        :param priority: Streams with a higher priority connect first.
+        :type priority: int
+        :return: bool (`False` if the stream got a stop or crash request while waiting)
+        """
+        with self.lock:
+            self.waiting[stream_id] = (-priority, time.monotonic())
+        try:
+            while self.manager.is_stop_request(stream_id=stream_id) is False \
+                    and self.manager.is_crash_request(stream_id=stream_id) is False:
+                with self.lock:
+                    now = time.monotonic()
+                    wait_time = self._get_wait_time(stream_id=stream_id, now=now)
+                    if wait_time <= 0:
+                        self.connection_times.append(now)
+                        return True
+                await asyncio.sleep(min(max(wait_time, 0.01), 1.0))
+            return False
+        finally:
+            with self.lock:
+                self.waiting.pop(stream_id, None)
+
+    def report_connected(self, stream_id: str) -> None:
+        """
+        Report an established connection of the stream.
+
+        :param stream_id: id of the stream
+        :type stream_id: str
+        :return: None
+        """
+        with self.lock:
+            self.connected_times[stream_id] = time.monotonic()
+        return None
+
+    def report_disconnect(self, stream_id: str, rate_limited: bool = False,
+                          retry_after: Optional[float] = None) -> None:
+        """
+        Report a failed attempt or a lost connection of the stream and schedule its next attempt.
+
+        :param stream_id: id of the stream
+        :type stream_id: str
+        :param rate_limited: Binance responded with `429`.
+        :type rate_limited: bool
+        :param retry_after: Value of the `Retry-After` header in seconds.
+        :type retry_after: float
+        :return: None
+        """
+        now = time.monotonic()
+        with self.lock:
+            connected_time = self.connected_times.pop(stream_id, None)
+            if connected_time is not None and now - connected_time >= self.stable_connection_time:
+                self.failures[stream_id] = 0
+            failures = self.failures.get(stream_id, 0) + 1
+            self.failures[stream_id] = failures
+            self.next_attempts[stream_id] = now + self.get_backoff_delay(failures)
+            if rate_limited is True:
+                pause = retry_after if retry_after is not None else self.rate_limit_pause
+                self.paused_until = max(self.paused_until, now + pause)
+                logger.warning(f"BinanceWebSocketApiReconnectScheduler.report_disconnect(stream_id={stream_id}) - "
+                               f"Binance responded with 429, pausing all connection attempts for {pause} seconds!")
+        logger.debug(f"BinanceWebSocketApiReconnectScheduler.report_disconnect(stream_id={stream_id}) - failures="
+                     f"{failures}, next attempt in {round(self.next_attempts[stream_id] - now, 3)} seconds")
+        return None
+
+    def remove_stream(self, stream_id: str) -> None:
+        """
+        Remove the state of a stream.
+
+        :param stream_id: id of the stream
+        :type stream_id: str
+        :return: None
+        """
+        with self.lock:
+            self.failures.pop(stream_id, None)
+            self.next_attempts.pop(stream_id, None)
+            self.connected_times.pop(stream_id, None)
+            self.waiting.pop(stream_id, None)
+        return None
@@ -19,7 +19,7 @@
 # Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
 # All rights reserved.
 
-from unicorn_binance_rest_api import BinanceRestApiManager
+from unicorn_binance_rest_api import BinanceRestApiManager, BinanceAPIException
 from typing import Optional, Union, Tuple
 import logging
 import requests
@@ -272,6 +272,31 @@ class BinanceWebSocketApiRestclient(object):
             except TypeError:
                 return None, None
 
+    def get_server_time(self) -> Optional[int]:
+        """
+        Get the current server time of the exchange.
+
+        :return: server time in milliseconds or None
+        :rtype: Optional[int]
+        """
+        logger.debug(f"BinanceWebSocketApiRestclient.get_server_time()")
+        with self.threading_lock:
+            self._init_ubra()
+            try:
+                if "coin-futures" in self.exchange or "coin_futures" in self.exchange:
+                    response = self.ubra.futures_coin_time()
+                elif "futures" in self.exchange:
+                    response = self.ubra.futures_time()
+                else:
+                    response = self.ubra.get_server_time()
+            except (BinanceAPIException, requests.exceptions.RequestException) as error_msg:
+                logger.error(f"BinanceWebSocketApiRestclient.get_server_time() - error_msg: {error_msg}")
+                return None
+        try:
+            return int(response['serverTime'])
+        except (KeyError, TypeError):
+            return None
+
     def keepalive_listen_key(self, stream_id=None) -> Tuple[Union[str, None], Union[dict, None]]:
         """
         Ping a listenkey to keep it alive
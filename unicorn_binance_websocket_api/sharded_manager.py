@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/sharded_manager.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+from .manager import BinanceWebSocketApiManager
+from collections import deque
+from typing import Callable, Dict, List, Literal, Optional, Set, Union
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+WORKER_METHODS = ("create_stream",
+                  "get_stream_id_by_label",
+                  "get_stream_info",
+                  "get_stream_list",
+                  "get_stream_statistic",
+                  "get_total_received_bytes",
+                  "get_total_receives",
+                  "print_summary",
+                  "stop_manager",
+                  "stop_stream",
+                  "subscribe_to_stream",
+                  "unsubscribe_from_stream")
+
+
+def _run_worker(worker_id: int, manager_kwargs: dict, command_connection, stream_data_queue) -> None:
+    """
+    Main function of a worker process: Runs a `BinanceWebSocketApiManager()` and executes the commands received from
+    the parent `BinanceWebSocketApiShardedManager()`.
+
+    The received records are put to `stream_data_queue` as tuples of `(stream_token, stream_data)`, `stream_data`
+    is a list if the stream uses batching.
+    """
+    try:
+        manager = BinanceWebSocketApiManager(**manager_kwargs)
+    except Exception as error_msg:
+        command_connection.send((False, RuntimeError(f"Worker {worker_id} - {type(error_msg).__name__}: "
+                                                     f"{error_msg}")))
+        return None
+    command_connection.send((True, os.getpid()))
+    logger.info(f"BinanceWebSocketApiShardedManager worker {worker_id} started (pid={os.getpid()})")
+    while True:
+        try:
+            method, args, kwargs = command_connection.recv()
+        except (EOFError, OSError):
+            manager.stop_manager()
+            break
+        try:
+            if method == "create_stream":
+                stream_token = kwargs.pop('stream_token')
+
+                def process_stream_data(stream_data, token=stream_token):
+                    stream_data_queue.put((token, stream_data))
+
+                result = manager.create_stream(*args, process_stream_data=process_stream_data, **kwargs)
+            elif method in WORKER_METHODS:
+                result = getattr(manager, method)(*args, **kwargs)
+            else:
+                raise ValueError(f"Method `{method}` is not supported by the workers!")
+            command_connection.send((True, result))
+        except Exception as error_msg:
+            command_connection.send((False, error_msg))
+        if method == "stop_manager":
+            break
+    logger.info(f"BinanceWebSocketApiShardedManager worker {worker_id} stopped (pid={os.getpid()})")
+    return None
+
+
+class BinanceWebSocketApiShardedManager(object):
+    """
+    Spread the streams over multiple worker processes, each running its own `BinanceWebSocketApiManager()` and
+    with it the receive and decode loops of its streams. This instance provides the API to manage the streams and
+    gets the received records of all workers through one `multiprocessing.Queue`.
+
+    The records are transferred in batches (`batch_max_items=100` and `batch_max_delay_ms=10` by default) and get
+    delivered to `process_stream_data` or the `stream_buffer` of this instance. All callables that get passed on to
+    the workers (e.g. `stream_data_middleware`) must be picklable.
+
+    :param processes: Number of worker processes, default is the number of CPU cores.
+    :type processes: int
+    :param process_stream_data: Provide a function/method to process the received records of all streams. If not
+                                provided, the records get stored in the `stream_buffer`.
+    :type process_stream_data: function
+    :param start_method: The `multiprocessing` start method ("fork", "forkserver" or "spawn"), default is the
+                         default of the platform.
+    :type start_method: str
+    :param manager_kwargs: All other parameters are passed on to the `BinanceWebSocketApiManager()` of the workers.
+    """
+    def __init__(self,
+                 processes: Optional[int] = None,
+                 process_stream_data: Optional[Callable] = None,
+                 start_method: Optional[Literal['fork', 'forkserver', 'spawn']] = None,
+                 **manager_kwargs):
+        for not_picklable in ("process_stream_data_async", "process_asyncio_queue", "process_stream_signals",
+                              "ubra_manager"):
+            if manager_kwargs.get(not_picklable) is not None:
+                raise ValueError(f"Parameter `{not_picklable}` is not supported by "
+                                 f"BinanceWebSocketApiShardedManager()!")
+        self.processes = processes or os.cpu_count() or 1
+        self.process_stream_data = process_stream_data
+        self.manager_kwargs = manager_kwargs
+        self.context = multiprocessing.get_context(start_method)
+        self.stop_manager_request = False
+        self.stream_buffer = deque()
+        self.stream_buffers: Dict[str, deque] = {}
+        self.stream_consumers: Dict[str, dict] = {}
+        self.stream_data_queue = self.context.Queue()
+        self.stream_workers: Dict[str, int] = {}
+        self.worker_connections = []
+        self.worker_locks: List[threading.Lock] = []
+        self.worker_processes = []
+        self.worker_stream_counts: List[int] = []
+        for worker_id in range(0, self.processes):
+            parent_connection, worker_connection = self.context.Pipe()
+            process = self.context.Process(target=_run_worker,
+                                           args=(worker_id, manager_kwargs, worker_connection,
+                                                 self.stream_data_queue),
+                                           name=f"BinanceWebSocketApiShardedManager: worker={worker_id}",
+                                           daemon=True)
+            process.start()
+            self.worker_connections.append(parent_connection)
+            self.worker_locks.append(threading.Lock())
+            self.worker_processes.append(process)
+            self.worker_stream_counts.append(0)
+        for worker_id in range(0, self.processes):
+            success, result = self.worker_connections[worker_id].recv()
+            if success is False:
+                self.stop_manager()
+                raise result
+        self.stream_data_thread = threading.Thread(target=self._process_stream_data_queue,
+                                                   name=f"BinanceWebSocketApiShardedManager: stream_data_queue",
+                                                   daemon=True)
+        self.stream_data_thread.start()
+        logger.info(f"BinanceWebSocketApiShardedManager() - Started {self.processes} worker processes")
+
+    def __enter__(self):
+        logger.debug(f"Entering with-context of BinanceWebSocketApiShardedManager() ...")
+        return self
+
+    def __exit__(self, exc_type, exc_value, error_traceback):
+        logger.debug(f"Leaving with-context of BinanceWebSocketApiShardedManager() ...")
+        self.stop_manager()
+        if exc_type:
+            logger.critical(f"An exception occurred: {exc_type} - {exc_value} - {error_traceback}")
+
+    def _call_worker(self, worker_id: int, method: str, *args, **kwargs):
+        """
+        Execute a method of the `BinanceWebSocketApiManager()` of a worker and return its result.
+
+        :param worker_id: id of the worker
+        :type worker_id: int
+        :param method: Name of the method
+        :type method: str
+        :return: The result of the method, exceptions get raised in the parent process.
+        """
+        with self.worker_locks[worker_id]:
+            try:
+                self.worker_connections[worker_id].send((method, args, kwargs))
+                success, result = self.worker_connections[worker_id].recv()
+            except (BrokenPipeError, EOFError, OSError) as error_msg:
+                logger.error(f"BinanceWebSocketApiShardedManager._call_worker({worker_id}, {method}) - Worker is not "
+                             f"reachable: {error_msg}")
+                return None
+        if success is False:
+            raise result
+        return result
+
+    def _call_stream_worker(self, stream_id: str, method: str, *args, **kwargs):
+        """
+        Execute a method of the `BinanceWebSocketApiManager()` that runs the stream.
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param method: Name of the method
+        :type method: str
+        :return: The result of the method or None if the stream is unknown.
+        """
+        worker_id = self.stream_workers.get(stream_id)
+        if worker_id is None:
+            logger.error(f"BinanceWebSocketApiShardedManager.{method}() - Unknown stream_id: {stream_id}")
+            return None
+        return self._call_worker(worker_id, method, *args, stream_id=stream_id, **kwargs)
+
+    def _deliver(self, stream_token: str, stream_data) -> None:
+        """
+        Hand over the records received from a worker to the consumer of the stream.
+
+        :param stream_token: The token of the stream used for the transfer.
+        :type stream_token: str
+        :param stream_data: A record or a list of records.
+        :type stream_data: str, dict or list
+        :return: None
+        """
+        consumer = self.stream_consumers.get(stream_token)
+        if consumer is None:
+            return None
+        if consumer['batching'] is True or not isinstance(stream_data, list):
+            records = (stream_data, )
+        else:
+            records = stream_data
+        process_stream_data = consumer['process_stream_data'] or self.process_stream_data
+        if consumer['stream_buffer_name'] is not False:
+            self.stream_buffers[consumer['stream_buffer_name']].extend(records)
+        elif process_stream_data is not None:
+            for record in records:
+                process_stream_data(record)
+        else:
+            self.stream_buffer.extend(records)
+        return None
+
+    def _process_stream_data_queue(self) -> None:
+        """
+        Receive the records of all workers and deliver them.
+
+        :return: None
+        """
+        while self.stop_manager_request is False:
+            try:
+                stream_token, stream_data = self.stream_data_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            try:
+                self._deliver(stream_token=stream_token, stream_data=stream_data)
+            except Exception as error_msg:
+                logger.critical(f"BinanceWebSocketApiShardedManager._process_stream_data_queue() - Exception in "
+                                f"`process_stream_data`: {type(error_msg).__name__} - {error_msg}")
+        return None
+
+    def create_stream(self,
+                      channels: Union[str, List[str], Set[str], None] = None,
+                      markets: Union[str, List[str], Set[str], None] = None,
+                      stream_label: str = None,
+                      stream_buffer_name: Union[Literal[False], str] = False,
+                      process_stream_data: Optional[Callable] = None,
+                      **kwargs) -> Optional[str]:
+        """
+        Create a stream on the worker with the fewest streams.
+
+        All parameters not listed here are passed on to `BinanceWebSocketApiManager.create_stream()` of the worker.
+        `process_stream_data_async` and `process_asyncio_queue` are not supported.
+
+        :param channels: provide the channels you wish to stream
+        :type channels: str, list, set
+        :param markets: provide the markets you wish to stream
+        :type markets: str, list, set
+        :param stream_label: provide a stream_label to identify the stream
+        :type stream_label: str
+        :param stream_buffer_name: If `False` the data is going to get written to the default stream_buffer,
+                                   set to `True` to read the data via `pop_stream_data_from_stream_buffer(stream_id)`
+                                   or provide a string to create and use a shared stream_buffer and read it via
+                                   `pop_stream_data_from_stream_buffer('string')`.
+        :type stream_buffer_name: False or str
+        :param process_stream_data: Provide a function/method to process the received records of this stream. It
+                                    runs in the parent process.
+        :type process_stream_data: function
+        :return: stream_id or 'None'
+        """
+        for not_picklable in ("process_stream_data_async", "process_asyncio_queue"):
+            if kwargs.get(not_picklable) is not None:
+                raise ValueError(f"Parameter `{not_picklable}` is not supported by "
+                                 f"BinanceWebSocketApiShardedManager.create_stream()!")
+        worker_id = self.worker_stream_counts.index(min(self.worker_stream_counts))
+        stream_token = BinanceWebSocketApiManager.get_new_uuid_id()
+        batching = kwargs.get('batch_max_items') is not None or kwargs.get('batch_max_delay_ms') is not None
+        if batching is False:
+            kwargs['batch_max_items'] = 100
+            kwargs['batch_max_delay_ms'] = 10
+        self.stream_consumers[stream_token] = {'batching': batching,
+                                               'process_stream_data': process_stream_data,
+                                               'stream_buffer_name': stream_buffer_name}
+        stream_id = self._call_worker(worker_id, "create_stream", channels=channels, markets=markets,
+                                      stream_label=stream_label, stream_token=stream_token, **kwargs)
+        if stream_id is None:
+            del self.stream_consumers[stream_token]
+            return None
+        if stream_buffer_name is True:
+            self.stream_consumers[stream_token]['stream_buffer_name'] = stream_id
+        if self.stream_consumers[stream_token]['stream_buffer_name'] is not False:
+            self.stream_buffers.setdefault(self.stream_consumers[stream_token]['stream_buffer_name'], deque())
+        self.stream_workers[stream_id] = worker_id
+        self.worker_stream_counts[worker_id] += 1
+        logger.info(f"BinanceWebSocketApiShardedManager.create_stream() - Created stream {stream_id} on worker "
+                    f"{worker_id}")
+        return stream_id
+
+    def get_stream_id_by_label(self, stream_label: str = None) -> Optional[str]:
+        """
+        Get the stream_id of a specific stream by stream label
+
+        :param stream_label: stream_label of the stream you search
+        :type stream_label: str
+        :return: stream_id or None
+        """
+        for worker_id in range(0, self.processes):
+            stream_id = self._call_worker(worker_id, "get_stream_id_by_label", stream_label=stream_label)
+            if stream_id is not None:
+                return stream_id
+        return None
+
+    def get_stream_info(self, stream_id) -> Optional[dict]:
+        """
+        Get all infos about a specific stream
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :return: dict or None
+        """
+        return self._call_stream_worker(stream_id, "get_stream_info")
+
+    def get_stream_statistic(self, stream_id) -> Optional[dict]:
+        """
+        Get the statistics of a specific stream
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :return: dict or None
+        """
+        return self._call_stream_worker(stream_id, "get_stream_statistic")
+
+    def get_stream_list(self) -> dict:
+        """
+        Get the stream_list of all workers
+
+        :return: dict
+        """
+        stream_list = {}
+        for worker_id in range(0, self.processes):
+            stream_list.update(self._call_worker(worker_id, "get_stream_list") or {})
+        return stream_list
+
+    def get_stream_buffer_length(self, stream_buffer_name: Union[Literal[False], str] = False) -> int:
+        """
+        Get the current number of items in the `stream_buffer` of this instance.
+
+        :param stream_buffer_name: `False` to read from generic stream_buffer, the stream_id if you used True in
+                                   create_stream() or the string name of a shared stream_buffer.
+        :type stream_buffer_name: False or str
+        :return: int
+        """
+        if stream_buffer_name is False:
+            return len(self.stream_buffer)
+        try:
+            return len(self.stream_buffers[stream_buffer_name])
+        except KeyError:
+            return 0
+
+    def get_total_received_bytes(self) -> int:
+        """
+        Get number of total received bytes of all workers
+
+        :return: int
+        """
+        return sum(self._call_worker(worker_id, "get_total_received_bytes") or 0
+                   for worker_id in range(0, self.processes))
+
+    def get_total_receives(self) -> int:
+        """
+        Get the number of total receives of all workers
+
+        :return: int
+        """
+        return sum(self._call_worker(worker_id, "get_total_receives") or 0 for worker_id in range(0, self.processes))
+
+    def get_worker_id_by_stream_id(self, stream_id: str = None) -> Optional[int]:
+        """
+        Get the id of the worker process that runs a stream.
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :return: int or None
+        """
+        return self.stream_workers.get(stream_id)
+
+    def is_manager_stopping(self) -> bool:
+        """
+        Returns `True` if the manager has a stop request, 'False' if not.
+
+        :return: bool
+        """
+        return self.stop_manager_request
+
+    def pop_stream_data_from_stream_buffer(self,
+                                           stream_buffer_name: Union[Literal[False], str] = False,
+                                           mode="FIFO"):
+        """
+        Get oldest or latest entry from the `stream_buffer` of this instance and remove it.
+
+        :param stream_buffer_name: `False` to read from generic stream_buffer, the stream_id if you used True in
+                                   create_stream() or the string name of a shared stream_buffer.
+        :type stream_buffer_name: False or str
+        :param mode: How to read from the `stream_buffer` - "FIFO" (default) or "LIFO".
+        :type mode: str
+        :return: stream_data - str, dict or None
+        """
+        try:
+            if stream_buffer_name is False:
+                stream_buffer = self.stream_buffer
+            else:
+                stream_buffer = self.stream_buffers[stream_buffer_name]
+            if mode.upper() == "FIFO":
+                return stream_buffer.popleft()
+            elif mode.upper() == "LIFO":
+                return stream_buffer.pop()
+        except (IndexError, KeyError):
+            pass
+        return None
+
+    def print_summary(self, add_string: str = None, footer: str = None, title: str = None) -> None:
+        """
+        Print an overview of the streams of all workers
+
+        :param add_string: text to add to the output
+        :type add_string: str
+        :param footer: set a footer (last row) for print_summary output
+        :type footer: str
+        :param title: set a title (first row) for print_summary output
+        :type title: str
+        :return: None
+        """
+        for worker_id in range(0, self.processes):
+            worker_title = f"{title} - worker {worker_id}" if title is not None else f"worker {worker_id}"
+            print_text = self._call_worker(worker_id, "print_summary", add_string=add_string, disable_print=True,
+                                           footer=footer, title=worker_title)
+            if print_text is not None:
+                print(print_text)
+        return None
+
+    def stop_manager(self) -> bool:
+        """
+        Stop the workers with all their streams and the receiving thread of this instance.
+
+        :return: bool
+        """
+        logger.info(f"BinanceWebSocketApiShardedManager.stop_manager()")
+        for worker_id, process in enumerate(self.worker_processes):
+            if process.is_alive():
+                try:
+                    self._call_worker(worker_id, "stop_manager")
+                except Exception as error_msg:
+                    logger.error(f"BinanceWebSocketApiShardedManager.stop_manager() - Worker {worker_id}: "
+                                 f"{type(error_msg).__name__} - {error_msg}")
+        self.stop_manager_request = True
+        for process in self.worker_processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        for connection in self.worker_connections:
+            connection.close()
+        return True
+
+    def stop_stream(self, stream_id, delete_listen_key: bool = True) -> Optional[bool]:
+        """
+        Stop a specific stream
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param delete_listen_key: If True the listen_key will be deleted.
+        :type delete_listen_key: bool
+        :return: bool
+        """
+        result = self._call_stream_worker(stream_id, "stop_stream", delete_listen_key=delete_listen_key)
+        if result is True:
+            self.worker_stream_counts[self.stream_workers[stream_id]] -= 1
+            del self.stream_workers[stream_id]
+        return result
+
+    def subscribe_to_stream(self, stream_id: str = None, channels=None, markets=None) -> Optional[bool]:
+        """
+        Subscribe channels and/or markets to an existing stream
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param channels: provide the channels you wish to stream
+        :type channels: str, list, set
+        :param markets: provide the markets you wish to stream
+        :type markets: str, list, set
+        :return: bool
+        """
+        return self._call_stream_worker(stream_id, "subscribe_to_stream", channels=channels, markets=markets)
+
+    def unsubscribe_from_stream(self, stream_id: str = None, channels=None, markets=None) -> Optional[bool]:
+        """
+        Unsubscribe channels and/or markets from an existing stream
+
+        :param stream_id: id of a stream
+        :type stream_id: str
+        :param channels: provide the channels you wish to stream
+        :type channels: str, list, set
+        :param markets: provide the markets you wish to stream
+        :type markets: str, list, set
+        :return: bool
+        """
+        return self._call_stream_worker(stream_id, "unsubscribe_from_stream", channels=channels, markets=markets)
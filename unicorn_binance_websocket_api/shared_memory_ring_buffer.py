@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ¯\_(ツ)_/¯
+#
+# File: unicorn_binance_websocket_api/shared_memory_ring_buffer.py
+#
+# Part of ‘UNICORN Binance WebSocket API’
+# Project website: https://www.lucit.tech/unicorn-binance-websocket-api.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api
+# Documentation: https://unicorn-binance-websocket-api.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-websocket-api
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2019-2024, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+
+from multiprocessing import parent_process, resource_tracker, shared_memory
+from typing import Optional, Union
+import logging
+import orjson
+import os
+import struct
+import sys
+
+__logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
+
+logger = __logger__
+
+# Header of the shared memory: capacity, write position, number of written records, reserved position, overruns
+HEADER = struct.Struct("<QQQQQ")
+HEADER_SIZE = 64
+# Write position and number of written records, published together after a record is complete
+POSITIONS = struct.Struct("<QQ")
+POSITIONS_OFFSET = 8
+COUNTER = struct.Struct("<Q")
+RESERVED_POSITION_OFFSET = 24
+OVERRUNS_OFFSET = 32
+# Header of a record: length of the payload, type of the payload
+RECORD_HEADER = struct.Struct("<IB")
+RECORD_TYPE_BYTES = 0
+RECORD_TYPE_STR = 1
+RECORD_TYPE_JSON = 2
+WRAP_MARKER = 0xFFFFFFFF
+
+
+class BinanceWebSocketApiSharedMemoryRingBuffer(object):
+    """
+    A `stream_buffer` in `multiprocessing.shared_memory` that can be read from other processes.
+
+    The buffer is a ring of length prefixed records with one producer (the process that created it) and any number
+    of consumers. Each instance has its own read cursor, so every consumer process receives every record. The
+    producer never waits for the consumers: if a consumer falls behind by more than the size of the ring, it skips
+    to the newest position and the skipped part is counted in `overruns` of the instance and in the shared counter
+    returned by `get_overruns()`.
+
+    Before the producer overwrites a part of the ring it publishes the end of the reserved part, after the record is
+    complete it publishes the new write position. A consumer validates its copy of a record against the reservation
+    (like a seqlock), so a record that got overwritten while it was copied is never returned.
+
+    `str` and `bytes` are stored as they are, all other records (e.g. `dict`) are stored as JSON and returned as
+    `dict`.
+
+    Create it in the producer process:
+
+    .. code-block:: python
+
+        ubwa.create_shared_memory_stream_buffer(stream_buffer_name="trades")
+        ubwa.create_stream(channels="trade", markets="btcusdt", stream_buffer_name="trades")
+
+    and attach to it in the consumer processes:
+
+    .. code-block:: python
+
+        stream_buffer = BinanceWebSocketApiSharedMemoryRingBuffer(name="ubwa_trades", create=False)
+        stream_data = stream_buffer.popleft()
+
+    :param name: Name of the shared memory block. If `None` a random name is used.
+    :type name: str
+    :param size: Size of the ring in bytes (only used with `create=True`).
+    :type size: int
+    :param create: `True` to create a new shared memory block, `False` to attach to an existing one.
+    :type create: bool
+    :param read_from_start: Start reading at the oldest available record instead of the newest position.
+    :type read_from_start: bool
+    """
+    def __init__(self,
+                 name: Optional[str] = None,
+                 size: int = 64 * 1024 * 1024,
+                 create: bool = True,
+                 read_from_start: bool = False):
+        self.is_producer = create
+        if create is True:
+            if size <= RECORD_HEADER.size:
+                raise ValueError(f"The size of the ring buffer is too small: {size}")
+            self.shared_memory = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + size)
+            self.capacity = size
+            HEADER.pack_into(self.shared_memory.buf, 0, self.capacity, 0, 0, 0, 0)
+        else:
+            # Only the producer is allowed to unlink the shared memory block
+            if sys.version_info >= (3, 13):
+                self.shared_memory = shared_memory.SharedMemory(name=name, create=False, track=False)
+            else:
+                self.shared_memory = shared_memory.SharedMemory(name=name, create=False)
+                if os.name == "posix" and parent_process() is None:
+                    # Child processes of `multiprocessing` share the resource tracker of their parent, the resource
+                    # tracker of any other process would unlink the block when the process exits
+                    try:
+                        resource_tracker.unregister(f"/{self.shared_memory.name}", "shared_memory")
+                    except Exception as error_msg:
+                        logger.debug(f"BinanceWebSocketApiSharedMemoryRingBuffer() - Unregister failed: {error_msg}")
+            self.capacity = HEADER.unpack_from(self.shared_memory.buf, 0)[0]
+        self.buffer = self.shared_memory.buf
+        self.data = self.buffer[HEADER_SIZE:HEADER_SIZE + self.capacity]
+        self.write_position = 0
+        self.records_written = 0
+        self.overruns = 0
+        if read_from_start is True:
+            self.read_position, self.records_read = 0, 0
+            self._check_overrun(self._get_reserved_position())
+        else:
+            self.read_position, self.records_read = POSITIONS.unpack_from(self.buffer, POSITIONS_OFFSET)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __len__(self) -> int:
+        return max(self._get_records_written() - self.records_read, 0)
+
+    @property
+    def maxlen(self) -> None:
+        return None
+
+    @property
+    def name(self) -> str:
+        return self.shared_memory.name
+
+    def _get_records_written(self) -> int:
+        return HEADER.unpack_from(self.buffer, 0)[2]
+
+    def _get_write_position(self) -> int:
+        return HEADER.unpack_from(self.buffer, 0)[1]
+
+    def _get_reserved_position(self) -> int:
+        return COUNTER.unpack_from(self.buffer, RESERVED_POSITION_OFFSET)[0]
+
+    def _check_overrun(self, reserved_position: int) -> bool:
+        """
+        Move the read cursor to the newest position if the producer has overwritten or is overwriting unread data.
+
+        :param reserved_position: The end of the part of the ring the producer has reserved for writing.
+        :type reserved_position: int
+        :return: bool
+        """
+        if reserved_position - self.read_position > self.capacity:
+            self.overruns += 1
+            # Several consumers can overrun at the same time, so the shared counter is a lower bound
+            COUNTER.pack_into(self.buffer, OVERRUNS_OFFSET, self.get_overruns() + 1)
+            logger.debug(f"BinanceWebSocketApiSharedMemoryRingBuffer({self.name}) - Overrun, skipping "
+                         f"{reserved_position - self.read_position} bytes!")
+            self.read_position, self.records_read = POSITIONS.unpack_from(self.buffer, POSITIONS_OFFSET)
+            return True
+        return False
+
+    @staticmethod
+    def _encode(stream_data) -> tuple:
+        if isinstance(stream_data, bytes):
+            return stream_data, RECORD_TYPE_BYTES
+        elif isinstance(stream_data, str):
+            return stream_data.encode("utf-8"), RECORD_TYPE_STR
+        elif isinstance(stream_data, (bytearray, memoryview)):
+            return bytes(stream_data), RECORD_TYPE_BYTES
+        return orjson.dumps(stream_data), RECORD_TYPE_JSON
+
+    @staticmethod
+    def _decode(payload: bytes, record_type: int) -> Union[bytes, str, dict]:
+        if record_type == RECORD_TYPE_STR:
+            return payload.decode("utf-8")
+        elif record_type == RECORD_TYPE_JSON:
+            return orjson.loads(payload)
+        return payload
+
+    def append(self, stream_data) -> None:
+        """
+        Write a record to the ring (producer only).
+
+        :param stream_data: The record.
+        :type stream_data: str, bytes or dict
+        :return: None
+        """
+        if self.is_producer is False:
+            raise RuntimeError(f"Only the creator of the ring buffer can write to it!")
+        payload, record_type = self._encode(stream_data)
+        size = RECORD_HEADER.size + len(payload)
+        if size > self.capacity:
+            raise ValueError(f"The record with {size} bytes is larger than the ring buffer ({self.capacity} bytes)!")
+        offset = self.write_position % self.capacity
+        skipped = self.capacity - offset if offset + size > self.capacity else 0
+        # The reservation gets published before the ring is overwritten, the consumers validate their copies with it
+        COUNTER.pack_into(self.buffer, RESERVED_POSITION_OFFSET, self.write_position + skipped + size)
+        if skipped > 0:
+            # Records do not wrap around, the rest of the ring gets skipped
+            if skipped >= RECORD_HEADER.size:
+                RECORD_HEADER.pack_into(self.data, offset, WRAP_MARKER, 0)
+            self.write_position += skipped
+            offset = 0
+        RECORD_HEADER.pack_into(self.data, offset, len(payload), record_type)
+        self.data[offset + RECORD_HEADER.size:offset + size] = payload
+        self.records_written += 1
+        self.write_position += size
+        # The write position gets published after the record is complete
+        POSITIONS.pack_into(self.buffer, POSITIONS_OFFSET, self.write_position, self.records_written)
+
+    def extend(self, stream_data_batch) -> None:
+        """
+        Write a list of records to the ring (producer only).
+
+        :param stream_data_batch: The records.
+        :type stream_data_batch: list
+        :return: None
+        """
+        for stream_data in stream_data_batch:
+            self.append(stream_data)
+
+    def clear(self) -> None:
+        """
+        Skip all unread records of this instance.
+
+        :return: None
+        """
+        self.read_position, self.records_read = POSITIONS.unpack_from(self.buffer, POSITIONS_OFFSET)
+
+    def get_overruns(self) -> int:
+        """
+        Get the number of overruns of all consumers of the ring.
+
+        :return: int
+        """
+        return COUNTER.unpack_from(self.buffer, OVERRUNS_OFFSET)[0]
+
+    def popleft(self) -> Union[bytes, str, dict]:
+        """
+        Get the oldest unread record of this instance.
+
+        :return: stream_data - raises `IndexError` if there is no unread record.
+        """
+        while True:
+            write_position = self._get_write_position()
+            if self.read_position >= write_position:
+                raise IndexError("pop from an empty ring buffer")
+            if self._check_overrun(self._get_reserved_position()) is True:
+                continue
+            offset = self.read_position % self.capacity
+            if self.capacity - offset < RECORD_HEADER.size:
+                self.read_position += self.capacity - offset
+                continue
+            length, record_type = RECORD_HEADER.unpack_from(self.data, offset)
+            if length == WRAP_MARKER:
+                self.read_position += self.capacity - offset
+                continue
+            end = offset + RECORD_HEADER.size + length
+            if end > self.capacity:
+                # The header got overwritten while reading it
+                self._check_overrun(self._get_reserved_position())
+                continue
+            payload = bytes(self.data[offset + RECORD_HEADER.size:end])
+            if self._check_overrun(self._get_reserved_position()) is True:
+                # The producer has reserved the part of the record while it got copied
+                continue
+            self.read_position += RECORD_HEADER.size + length
+            self.records_read += 1
+            return self._decode(payload, record_type)
+
+    def pop(self) -> Union[bytes, str, dict]:
+        """
+        Get the newest record and skip all older unread records of this instance.
+
+        :return: stream_data - raises `IndexError` if there is no unread record.
+        """
+        stream_data = self.popleft()
+        while True:
+            try:
+                stream_data = self.popleft()
+            except IndexError:
+                return stream_data
+
+    def close(self) -> None:
+        """
+        Close the access of this instance to the shared memory block.
+
+        :return: None
+        """
+        self.data.release()
+        self.buffer = None
+        self.shared_memory.close()
+
+    def unlink(self) -> None:
+        """
+        Destroy the shared memory block (producer only, call `close()` before).
+
+        :return: None
+        """
+        if self.is_producer is True:
+            self.shared_memory.unlink()
@@ -20,16 +20,39 @@
 # All rights reserved.
 
 from .connection import BinanceWebSocketApiConnection
+from .connection_rotation import BinanceWebSocketApiConnectionRotation
 from .exceptions import *
+from .frame_recorder import BinanceWebSocketApiReplayConnection
+from .rate_limiter import BinanceWebSocketApiOutboundScheduler
 from unicorn_fy.unicorn_fy import UnicornFy
 import asyncio
 import orjson
 import logging
+import random
+import time
+import websockets
 
 __logger__: logging.getLogger = logging.getLogger("unicorn_binance_websocket_api")
 
 logger = __logger__
 
+# Maps the exchange to the matching `UnicornFy` method, exchanges that are not listed are delivered as received.
+UNICORN_FY_METHODS: dict = {"binance.com": "binance_com_websocket",
+                            "binance.com-testnet": "binance_com_websocket",
+                            "binance.com-margin": "binance_com_margin_websocket",
+                            "binance.com-margin-testnet": "binance_com_margin_websocket",
+                            "binance.com-isolated_margin": "binance_com_isolated_margin_websocket",
+                            "binance.com-isolated_margin-testnet": "binance_com_isolated_margin_websocket",
+                            "binance.com-futures": "binance_com_futures_websocket",
+                            "binance.com-futures-testnet": "binance_com_futures_websocket",
+                            "binance.com-coin-futures": "binance_com_coin_futures_websocket",
+                            "binance.com-coin_futures": "binance_com_coin_futures_websocket",
+                            "binance.je": "binance_je_websocket",
+                            "binance.us": "binance_us_websocket",
+                            "trbinance.com": "trbinance_com_websocket",
+                            "binance.org": "binance_org_websocket",
+                            "binance.org-testnet": "binance_org_websocket"}
+
 
 class BinanceWebSocketApiSocket(object):
     def __init__(self, manager, stream_id, channels, markets):
@@ -39,9 +62,29 @@ class BinanceWebSocketApiSocket(object):
         self.markets = markets
         self.symbols = self.manager.stream_list[self.stream_id]['symbols']
         self.output = self.manager.stream_list[self.stream_id]['output']
+        self.api = self.manager.stream_list[self.stream_id]['api']
+        self.stream_buffer_name = self.manager.stream_list[self.stream_id].get('stream_buffer_name', False)
         self.unicorn_fy = UnicornFy()
         self.exchange = manager.get_exchange()
         self.websocket = None
+        self.raw_data_type = self.manager.stream_list[self.stream_id].get('raw_data_type') or "str"
+        self.receive_bytes = True if self.raw_data_type == "bytes" or self.raw_data_type == "memoryview" else False
+        self.error_marker = b"error" if self.receive_bytes is True else "error"
+        self.result_marker = b"result" if self.receive_bytes is True else "result"
+        self.process_stream_data_pipeline = None
+        self.process_stream_data_middleware = None
+        self.build_stream_data_pipeline()
+        self.batch_max_items = self.manager.stream_list[self.stream_id].get('batch_max_items')
+        self.batch_max_delay_ms = self.manager.stream_list[self.stream_id].get('batch_max_delay_ms')
+        self.batching = self.batch_max_items is not None or self.batch_max_delay_ms is not None
+        self.batch_max_delay = (self.batch_max_delay_ms or 100) / 1000
+        self.batch = []
+        self.batch_start_time = 0.0
+        self.backpressure_policy = self.manager.stream_list[self.stream_id].get('backpressure_policy')
+        self.outbound_scheduler = None
+        self.outbound_scheduler_task = None
+        self.rotation = None
+        self.rotation_time = None
 
     async def __aenter__(self):
         logger.debug(f"Entering asynchronous with-context of BinanceWebSocketApiSocket() ...")
@@ -62,18 +105,24 @@ class BinanceWebSocketApiSocket(object):
     async def start_socket(self):
         logger.info(f"BinanceWebSocketApiSocket.start_socket({str(self.stream_id)}, {str(self.channels)}, "
                     f"{str(self.markets)})")
+        if self.manager.stream_list[self.stream_id].get('replay_file') is not None:
+            connection = BinanceWebSocketApiReplayConnection
+        else:
+            connection = BinanceWebSocketApiConnection
         try:
-            async with BinanceWebSocketApiConnection(self.manager,
-                                                     self.stream_id,
-                                                     self.channels,
-                                                     self.markets,
-                                                     symbols=self.symbols) as self.websocket:
+            async with connection(self.manager,
+                                  self.stream_id,
+                                  self.channels,
+                                  self.markets,
+                                  symbols=self.symbols) as self.websocket:
                 if self.websocket is None:
                     raise StreamIsRestarting(stream_id=self.stream_id, reason="websocket is None")
                 if self.manager.stream_list[self.stream_id]['status'] == "restarting":
                     self.manager.increase_reconnect_counter(self.stream_id)
                 self.manager.stream_list[self.stream_id]['status'] = "running"
                 self.manager.stream_list[self.stream_id]['has_stopped'] = None
+                self.start_outbound_scheduler(self.websocket)
+                self.rotation_time = self.get_rotation_time()
                 self.manager.set_socket_is_ready(stream_id=self.stream_id)
                 self.manager.send_stream_signal(signal_type="CONNECT", stream_id=self.stream_id)
                 self.manager.stream_list[self.stream_id]['last_stream_signal'] = "CONNECT"
@@ -81,149 +130,41 @@ class BinanceWebSocketApiSocket(object):
                         and self.manager.is_crash_request(self.stream_id) is False:
                     self.manager.set_heartbeat(self.stream_id)
                     try:
-                        while self.manager.stream_list[self.stream_id]['payload']:
-                            logger.info(f"BinanceWebSocketApiSocket.start_socket({str(self.stream_id)}, "
-                                        f"{str(self.channels)}, {str(self.markets)} - Sending payload started ...")
-                            payload = []
-                            try:
-                                payload = self.manager.stream_list[self.stream_id]['payload'].pop(0)
-                            except IndexError as error_msg:
-                                logger.debug(f"BinanceWebSocketApiSocket.start_socket() IndexError: {error_msg}")
-                            logger.info(f"BinanceWebSocketApiSocket.start_socket({str(self.stream_id)}, "
-                                        f"{str(self.channels)}, {str(self.markets)} - Sending payload: {str(payload)}")
-                            try:
-                                await self.websocket.send(orjson.dumps(payload).decode("utf-8"))
-                            except AttributeError as error_msg:
-                                logger.debug(f"BinanceWebSocketApiManager._create_stream_thread() "
-                                             f"stream_id={str(self.stream_id)}  - AttributeError `error: 18` - "
-                                             f"error_msg: {str(error_msg)}")
-                            # To avoid a ban we respect the limits of binance:
-                            # https://github.com/binance-exchange/binance-official-api-docs/blob/5fccfd572db2f530e25e302c02be5dec12759cf9/CHANGELOG.md#2020-04-23
-                            # Limit: max 5 messages per second inclusive pings/pong
-                            # Websocket API does not seem to have this restriction!
-                            if self.manager.stream_list[self.stream_id]['api'] is False:
-                                max_subscriptions_per_second = self.manager.max_send_messages_per_second - \
-                                                               self.manager.max_send_messages_per_second_reserve
-                                idle_time = 1/max_subscriptions_per_second
-                                await asyncio.sleep(idle_time)
-
-                        received_stream_data_json = await self.websocket.receive()
+                        receive_timeout = None
+                        if self.batch:
+                            receive_timeout = self.batch_start_time + self.batch_max_delay - time.monotonic()
+                            if receive_timeout <= 0:
+                                await self.flush_batch()
+                                receive_timeout = None
+                        received_stream_data_json = await self.receive(timeout=receive_timeout)
                         if received_stream_data_json is not None:
-                            if self.output == "UnicornFy":
-                                if self.manager.stream_list[self.stream_id]['api'] is False:
-                                    if self.exchange == "binance.com":
-                                        received_stream_data = self.unicorn_fy.binance_com_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.com-testnet":
-                                        received_stream_data = self.unicorn_fy.binance_com_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.com-margin":
-                                        received_stream_data = self.unicorn_fy.binance_com_margin_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.com-margin-testnet":
-                                        received_stream_data = self.unicorn_fy.binance_com_margin_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.com-isolated_margin":
-                                        received_stream_data = self.unicorn_fy.binance_com_isolated_margin_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.com-isolated_margin-testnet":
-                                        received_stream_data = self.unicorn_fy.binance_com_isolated_margin_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.com-futures":
-                                        received_stream_data = self.unicorn_fy.binance_com_futures_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.com-futures-testnet":
-                                        received_stream_data = self.unicorn_fy.binance_com_futures_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.com-coin-futures" \
-                                            or self.exchange == "binance.com-coin_futures":
-                                        received_stream_data = self.unicorn_fy.binance_com_coin_futures_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.je":
-                                        received_stream_data = self.unicorn_fy.binance_je_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.us":
-                                        received_stream_data = self.unicorn_fy.binance_us_websocket(received_stream_data_json)
-                                    elif self.exchange == "trbinance.com":
-                                        received_stream_data = self.unicorn_fy.trbinance_com_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.org":
-                                        received_stream_data = self.unicorn_fy.binance_org_websocket(received_stream_data_json)
-                                    elif self.exchange == "binance.org-testnet":
-                                        received_stream_data = self.unicorn_fy.binance_org_websocket(received_stream_data_json)
-                                    else:
-                                        received_stream_data = received_stream_data_json
-                                else:
-                                    # WS API does not need to get unicornfied, just turn it into a dict:
-                                    received_stream_data = orjson.loads(received_stream_data_json)
-                            elif self.output == "dict":
-                                received_stream_data = orjson.loads(received_stream_data_json)
-                            else:
-                                received_stream_data = received_stream_data_json
-                            if self.manager.stream_list[self.stream_id]['api'] is True:
-                                return_response_by_request_id = None
-                                with self.manager.return_response_lock:
-                                    for request_id in self.manager.return_response:
-                                        if request_id in received_stream_data_json:
-                                            return_response_by_request_id = request_id
-                                            break
-                                if return_response_by_request_id is not None:
-                                    self.manager.return_response[return_response_by_request_id]['response_value'] = received_stream_data
-                                    self.manager.return_response[return_response_by_request_id]['event_return_response'].set()
-                                    continue
-                                process_by_request_id = None
-                                with self.manager.process_response_lock:
-                                    for request_id in self.manager.process_response:
-                                        if request_id in received_stream_data_json:
-                                            process_by_request_id = request_id
-                                            break
-                                if process_by_request_id is not None:
-                                    self.manager.process_response[process_by_request_id]['callback_function'](received_stream_data)
-                                    with self.manager.process_response_lock:
-                                        del self.manager.process_response[process_by_request_id]
+                            received_stream_data = self.process_stream_data_pipeline(received_stream_data_json)
+                            if self.api is True:
+                                # Responses get routed by their `id` before any middleware can drop them
+                                if self.route_response(received_stream_data, received_stream_data_json) is True:
                                     continue
-                            try:
-                                stream_buffer_name = self.manager.stream_list[self.stream_id]['stream_buffer_name']
-                            except KeyError:
-                                stream_buffer_name = False
-                            if stream_buffer_name is not False:
-                                # if create_stream() got a stram_buffer_name -> use it
-                                self.manager.add_to_stream_buffer(received_stream_data,
-                                                                  stream_buffer_name=stream_buffer_name)
-                            elif self.manager.specific_process_asyncio_queue[self.stream_id] is not None:
-                                # if create_stream() got a asyncio consumer task for the asyncio queue -> use it
-                                logger.debug(f"BinanceWebSocketApiSocket.start_socket() - Received data set from "
-                                             f"stream_id={self.stream_id} transferred to `asyncio_queue`!")
-                                await self.manager.asyncio_queue[self.stream_id].put(received_stream_data)
-                            elif self.manager.specific_process_stream_data[self.stream_id] is not None:
-                                # if create_stream() got a callback function -> use it
-                                logger.debug(f"BinanceWebSocketApiSocket.start_socket() - Received data set from "
-                                             f"stream_id={self.stream_id} transferred to `process_stream_data`!")
-                                self.manager.specific_process_stream_data[self.stream_id](received_stream_data)
-                            elif self.manager.specific_process_stream_data_async[self.stream_id] is not None:
-                                # if create_stream() got an asynchronous callback function -> use it
-                                logger.debug(f"BinanceWebSocketApiSocket.start_socket() - Received data set from "
-                                             f"stream_id={self.stream_id} transferred to "
-                                             f"`process_stream_data_async`!")
-                                await self.manager.specific_process_stream_data_async[self.stream_id](received_stream_data)
+                                if self.process_stream_data_middleware is not None:
+                                    received_stream_data = self.process_stream_data_middleware(received_stream_data)
+                            if received_stream_data is None:
+                                # A middleware dropped this record
+                                continue
+                            if self.batching is True:
+                                if not self.batch:
+                                    self.batch_start_time = time.monotonic()
+                                self.batch.append(received_stream_data)
+                                if self.batch_max_items is not None and len(self.batch) >= self.batch_max_items:
+                                    await self.flush_batch()
                             else:
-                                if self.manager.process_asyncio_queue is not None:
-                                    # if global asyncio consumer task for the asyncio queue -> use it
-                                    logger.debug(f"BinanceWebSocketApiSocket.start_socket() - Received data set from "
-                                                 f"stream_id={self.stream_id} transferred to `asyncio_queue`!")
-                                    await self.manager.asyncio_queue[self.stream_id].put(received_stream_data)
-                                elif self.manager.process_stream_data is not None:
-                                    # if global callback function -> use it
-                                    logger.debug(f"BinanceWebSocketApiSocket.start_socket() - Received data set from "
-                                                 f"stream_id={self.stream_id} transferred to `process_stream_data`!")
-                                    self.manager.process_stream_data(received_stream_data)
-                                elif self.manager.process_stream_data_async is not None:
-                                    # if global async callback function -> use it
-                                    logger.debug(f"BinanceWebSocketApiSocket.start_socket() - Received data set from "
-                                                 f"stream_id={self.stream_id} transferred to "
-                                                 f"`process_stream_data_async`!")
-                                    await self.manager.process_stream_data_async(received_stream_data)
-                                else:
-                                    # If nothing else is used, write to global stream_buffer
-                                    logger.debug(f"BinanceWebSocketApiSocket.start_socket() - Received data set from "
-                                                 f"stream_id={self.stream_id} transferred to `stream_buffer`!")
-                                    self.manager.add_to_stream_buffer(received_stream_data)
-
-                            if "error" in received_stream_data_json:
+                                await self.deliver(received_stream_data)
+
+                            if self.error_marker in received_stream_data_json:
+                                received_stream_data_json = self._decode(received_stream_data_json)
                                 logger.error("BinanceWebSocketApiSocket.start_socket(" +
                                              str(self.stream_id) + ") "
                                              "- Received error message: " + str(received_stream_data_json))
                                 self.manager.add_to_ringbuffer_error(received_stream_data_json)
-                            elif "result" in received_stream_data_json:
+                            elif self.result_marker in received_stream_data_json:
+                                received_stream_data_json = self._decode(received_stream_data_json)
                                 logger.debug("BinanceWebSocketApiSocket.start_socket(" +
                                              str(self.stream_id) + ") "
                                              "- Received result message: " + str(received_stream_data_json))
@@ -242,6 +183,18 @@ class BinanceWebSocketApiSocket(object):
                                      f"asyncio.TimeoutError (This is no ERROR, its exactly what we want!)")
                         continue
         finally:
+            await self.stop_outbound_scheduler()
+            if self.rotation is not None:
+                if self.rotation.switch_time is None:
+                    await self.rotation.abort(restore_outbound_scheduler=False)
+                self.rotation = None
+            if self.batch:
+                batch_size = len(self.batch)
+                try:
+                    await self.flush_batch()
+                except Exception as error_msg:
+                    logger.error(f"BinanceWebSocketApiSocket.start_socket({str(self.stream_id)}) - Can not deliver "
+                                 f"the last batch of {batch_size} records - error_msg: {error_msg}")
             try:
                 if self.manager.stream_list[self.stream_id]['last_stream_signal'] == "FIRST_RECEIVED_DATA" \
                         or self.manager.stream_list[self.stream_id]['last_stream_signal'] == "CONNECT":
@@ -254,8 +207,367 @@ class BinanceWebSocketApiSocket(object):
                 except AttributeError as error_msg:
                     logger.debug(f"BinanceWebSocketApiSocket.__aexit__() - error_msg: {error_msg}")
 
+    def get_rotation_time(self):
+        """
+        Get the monotonic time of the next connection rotation, `None` if the connection does not get rotated.
+
+        The rotation starts between `connection_rotation_margin` and twice this time before the connection reaches
+        `connection_max_age`, so streams which got connected at the same time do not rotate at the same time.
+
+        :return: float or None
+        """
+        if self.api is True \
+                or self.manager.connection_max_age is None \
+                or self.manager.stream_list[self.stream_id].get('replay_file') is not None:
+            return None
+        margin = self.manager.connection_rotation_margin
+        return time.monotonic() + self.manager.connection_max_age - margin - random.uniform(0, margin)
+
+    async def receive(self, timeout: float = None):
+        """
+        Receive the next frame of the stream, a connection rotation is done transparently.
+
+        :param timeout: Max seconds to wait for a frame.
+        :type timeout: float
+        :return: The received frame or `None`
+        """
+        if self.rotation is None:
+            if self.rotation_time is None or time.monotonic() < self.rotation_time:
+                return await self.websocket.receive(timeout=timeout)
+            self.rotation = BinanceWebSocketApiConnectionRotation(
+                self,
+                overlap=self.manager.connection_rotation_overlap)
+            self.rotation.start()
+        if self.rotation.switch_time is not None:
+            # deduplicate the frames of the new connection which were delivered by the old connection, only the
+            # delivered frames get counted and recorded
+            if self.rotation.buffer:
+                received_data, receive_time = self.rotation.buffer.popleft()
+            else:
+                received_data, receive_time = await self.websocket.receive_frame(timeout=timeout)
+            if self.rotation.is_duplicate(received_data, receive_time=receive_time) is True:
+                received_data = None
+            else:
+                self.websocket.add_frame(received_data, receive_time)
+            if self.rotation.is_over() is True:
+                self.rotation = None
+            return received_data
+        if self.rotation.failed is True:
+            await self.rotation.abort()
+            self.rotation = None
+            self.rotation_time = time.monotonic() + self.manager.connection_rotation_margin / 10
+            return None
+        if self.rotation.is_live() is True:
+            await self.switch_connection()
+            return None
+        try:
+            # the timeout keeps the rotation going on quiet streams
+            received_data = await self.websocket.receive(timeout=min(timeout or 1.0, 1.0))
+        except websockets.ConnectionClosed:
+            if self.rotation.is_connected() is True:
+                await self.switch_connection()
+                return None
+            raise
+        self.rotation.add_delivered(received_data)
+        return received_data
+
+    def start_outbound_scheduler(self, websocket) -> None:
+        """
+        Start the outbound scheduler which sends the queued payloads of the stream via `websocket`.
+
+        :param websocket: The connection to send with.
+        :type websocket: BinanceWebSocketApiConnection
+        :return: None
+        """
+        # To avoid a ban we respect the limits of binance:
+        # https://github.com/binance-exchange/binance-official-api-docs/blob/5fccfd572db2f530e25e302c02be5dec12759cf9/CHANGELOG.md#2020-04-23
+        # Limit: max 5 messages per second inclusive pings/pong
+        # Websocket API does not seem to have this restriction!
+        if self.api is False:
+            send_rate = self.manager.max_send_messages_per_second - \
+                        self.manager.max_send_messages_per_second_reserve
+        else:
+            send_rate = None
+        self.outbound_scheduler = BinanceWebSocketApiOutboundScheduler(
+            self.manager,
+            self.stream_id,
+            websocket,
+            rate=send_rate,
+            max_payload_bytes=self.manager.max_send_payload_bytes)
+        self.outbound_scheduler_task = asyncio.ensure_future(self.outbound_scheduler.run())
+        return None
+
+    async def stop_outbound_scheduler(self) -> None:
+        """
+        Stop the outbound scheduler, unsent payloads stay in the queue of the stream.
+
+        :return: None
+        """
+        if self.outbound_scheduler_task is None:
+            return None
+        self.outbound_scheduler_task.cancel()
+        try:
+            await self.outbound_scheduler_task
+        except asyncio.CancelledError:
+            pass
+        except Exception as error_msg:
+            logger.debug(f"BinanceWebSocketApiSocket.stop_outbound_scheduler({str(self.stream_id)}) - Outbound "
+                         f"scheduler stopped with {type(error_msg).__name__} - error_msg: {error_msg}")
+        self.outbound_scheduler_task = None
+        return None
+
+    async def switch_connection(self) -> None:
+        """
+        Switch the delivery over to the replacement connection of the rotation and close the old connection.
+
+        :return: None
+        """
+        await self.rotation.switch()
+        old_websocket = self.websocket
+        self.websocket = self.rotation.connection
+        self.rotation_time = self.get_rotation_time()
+        try:
+            await old_websocket.close()
+        except Exception as error_msg:
+            logger.debug(f"BinanceWebSocketApiSocket.switch_connection({str(self.stream_id)}) - Can not close the old "
+                         f"connection: {type(error_msg).__name__} - error_msg: {error_msg}")
+        with self.manager.stream_list_lock:
+            self.manager.stream_list[self.stream_id]['connection_rotations'] = \
+                self.manager.stream_list[self.stream_id].get('connection_rotations', 0) + 1
+        logger.info(f"BinanceWebSocketApiSocket.switch_connection({str(self.stream_id)}) - Switched over to the "
+                    f"replacement connection, {len(self.rotation.buffer)} buffered frames")
+        return None
+
+    def build_stream_data_pipeline(self) -> None:
+        """
+        Resolve the decoder and the middleware of this stream once and store the resulting callable in
+        `self.process_stream_data_pipeline`.
+
+        The pipeline converts a received frame into the configured `output` format ('raw_data', 'dict' or
+        'UnicornFy') and passes the result through all middleware functions of the stream. A middleware can return
+        `None` to drop the record.
+
+        Streams of the Websocket API only get the decoder in `self.process_stream_data_pipeline`, their middleware is
+        stored in `self.process_stream_data_middleware` and gets applied after `route_response()`, so a middleware
+        can not drop or modify the response of a pending request.
+
+        :return: None
+        """
+        if self.output == "UnicornFy":
+            if self.api is True:
+                # WS API does not need to get unicornfied, just turn it into a dict:
+                decoder = orjson.loads
+            else:
+                try:
+                    decoder = getattr(self.unicorn_fy, UNICORN_FY_METHODS[self.exchange])
+                except KeyError:
+                    decoder = None
+        elif self.output == "dict":
+            decoder = orjson.loads
+        elif self.raw_data_type == "memoryview":
+            decoder = memoryview
+        else:
+            decoder = None
+        middleware = tuple(self.manager.stream_data_middleware.get(self.stream_id) or ())
+        self.process_stream_data_middleware = None
+        if not middleware or self.api is True:
+            if decoder is None:
+                self.process_stream_data_pipeline = _pass_through
+            else:
+                self.process_stream_data_pipeline = decoder
+            if not middleware:
+                return None
+
+        def apply_middleware(stream_data):
+            for stage in middleware:
+                stream_data = stage(stream_data)
+                if stream_data is None:
+                    return None
+            return stream_data
+
+        if self.api is True:
+            self.process_stream_data_middleware = apply_middleware
+            return None
+
+        def pipeline(stream_data):
+            if decoder is not None:
+                stream_data = decoder(stream_data)
+            return apply_middleware(stream_data)
+
+        self.process_stream_data_pipeline = pipeline
+        return None
+
+    async def deliver(self, stream_data, is_batch: bool = False) -> None:
+        """
+        Hand over a received record or a batch (list) of received records to the consumer of this stream.
+
+        :param stream_data: The converted stream data or a list of it if `is_batch` is `True`.
+        :type stream_data: str, dict or list
+        :param is_batch: Set to `True` if `stream_data` is a batch.
+        :type is_batch: bool
+        :return: None
+        """
+        if self.stream_buffer_name is not False:
+            # if create_stream() got a stram_buffer_name -> use it
+            if self.backpressure_policy == "block":
+                await self.wait_for_stream_buffer(self.manager.stream_buffers[self.stream_buffer_name])
+            if is_batch is True:
+                self.manager.add_batch_to_stream_buffer(stream_data, stream_buffer_name=self.stream_buffer_name,
+                                                        stream_id=self.stream_id)
+            else:
+                self.manager.add_to_stream_buffer(stream_data, stream_buffer_name=self.stream_buffer_name,
+                                                  stream_id=self.stream_id)
+        elif self.manager.specific_process_asyncio_queue[self.stream_id] is not None:
+            # if create_stream() got a asyncio consumer task for the asyncio queue -> use it
+            logger.debug(f"BinanceWebSocketApiSocket.deliver() - Received data set from "
+                         f"stream_id={self.stream_id} transferred to `asyncio_queue`!")
+            await self.put_to_asyncio_queue(stream_data)
+        elif self.manager.specific_process_stream_data[self.stream_id] is not None:
+            # if create_stream() got a callback function -> use it
+            logger.debug(f"BinanceWebSocketApiSocket.deliver() - Received data set from "
+                         f"stream_id={self.stream_id} transferred to `process_stream_data`!")
+            self.manager.specific_process_stream_data[self.stream_id](stream_data)
+        elif self.manager.specific_process_stream_data_async[self.stream_id] is not None:
+            # if create_stream() got an asynchronous callback function -> use it
+            logger.debug(f"BinanceWebSocketApiSocket.deliver() - Received data set from "
+                         f"stream_id={self.stream_id} transferred to `process_stream_data_async`!")
+            await self.manager.specific_process_stream_data_async[self.stream_id](stream_data)
+        else:
+            if self.manager.process_asyncio_queue is not None:
+                # if global asyncio consumer task for the asyncio queue -> use it
+                logger.debug(f"BinanceWebSocketApiSocket.deliver() - Received data set from "
+                             f"stream_id={self.stream_id} transferred to `asyncio_queue`!")
+                await self.put_to_asyncio_queue(stream_data)
+            elif self.manager.process_stream_data is not None:
+                # if global callback function -> use it
+                logger.debug(f"BinanceWebSocketApiSocket.deliver() - Received data set from "
+                             f"stream_id={self.stream_id} transferred to `process_stream_data`!")
+                self.manager.process_stream_data(stream_data)
+            elif self.manager.process_stream_data_async is not None:
+                # if global async callback function -> use it
+                logger.debug(f"BinanceWebSocketApiSocket.deliver() - Received data set from "
+                             f"stream_id={self.stream_id} transferred to `process_stream_data_async`!")
+                await self.manager.process_stream_data_async(stream_data)
+            else:
+                # If nothing else is used, write to global stream_buffer
+                logger.debug(f"BinanceWebSocketApiSocket.deliver() - Received data set from "
+                             f"stream_id={self.stream_id} transferred to `stream_buffer`!")
+                if self.backpressure_policy == "block":
+                    await self.wait_for_stream_buffer(self.manager.stream_buffer)
+                if is_batch is True:
+                    self.manager.add_batch_to_stream_buffer(stream_data, stream_id=self.stream_id)
+                else:
+                    self.manager.add_to_stream_buffer(stream_data, stream_id=self.stream_id)
+        return None
+
+    async def put_to_asyncio_queue(self, stream_data) -> None:
+        """
+        Put a record into the `asyncio_queue` of the stream according to its backpressure policy.
+
+        :param stream_data: The converted stream data or a list of it.
+        :type stream_data: str, dict or list
+        :return: None
+        """
+        asyncio_queue = self.manager.asyncio_queue[self.stream_id]
+        if self.backpressure_policy is None or self.backpressure_policy == "block":
+            # Waits while the queue is full, so the socket is not read (TCP backpressure)
+            await asyncio_queue.put(stream_data)
+        elif self.backpressure_policy == "coalesce_by_key":
+            dropped_records = asyncio_queue.put_nowait(stream_data)
+            if dropped_records:
+                self.manager.increase_dropped_records_counter(stream_id=self.stream_id, count=dropped_records)
+        elif self.backpressure_policy == "drop_newest":
+            try:
+                asyncio_queue.put_nowait(stream_data)
+            except asyncio.QueueFull:
+                self.manager.increase_dropped_records_counter(stream_id=self.stream_id)
+        else:
+            if asyncio_queue.full():
+                asyncio_queue.get_nowait()
+                asyncio_queue.task_done()
+                self.manager.increase_dropped_records_counter(stream_id=self.stream_id)
+            asyncio_queue.put_nowait(stream_data)
+        return None
+
+    async def wait_for_stream_buffer(self, stream_buffer) -> None:
+        """
+        Wait until the `stream_buffer` has space again, the socket is not read in the meantime (TCP backpressure).
+
+        :param stream_buffer: The `stream_buffer` the stream writes to.
+        :type stream_buffer: BinanceWebSocketApiStreamBuffer
+        :return: None
+        """
+        is_full = getattr(stream_buffer, "is_full", None)
+        if is_full is None:
+            return None
+        while is_full() is True:
+            self.raise_exceptions()
+            await asyncio.sleep(0.01)
+        return None
+
+    async def flush_batch(self) -> None:
+        """
+        Deliver the collected batch and start a new one.
+
+        :return: None
+        """
+        if not self.batch:
+            return None
+        batch = self.batch
+        self.batch = []
+        await self.deliver(batch, is_batch=True)
+        return None
+
+    def route_response(self, stream_data, stream_data_json) -> bool:
+        """
+        Hand over a response of the Websocket API to the waiting request (`return_response`) or to its callback
+        function (`process_response`).
+
+        The `id` of the response gets extracted once and is looked up in the dicts of the pending requests.
+
+        :param stream_data: The converted stream data.
+        :type stream_data: str, bytes, memoryview or dict
+        :param stream_data_json: The received data.
+        :type stream_data_json: str or bytes
+        :return: bool - `True` if the response was routed, `False` if it has to get delivered as usual.
+        """
+        if isinstance(stream_data, dict):
+            request_id = stream_data.get('id')
+        else:
+            try:
+                request_id = orjson.loads(stream_data_json).get('id')
+            except (orjson.JSONDecodeError, AttributeError):
+                return False
+        if request_id is None:
+            return False
+        try:
+            with self.manager.return_response_lock:
+                return_response = self.manager.return_response.get(request_id)
+                if return_response is not None:
+                    return_response['response_value'] = stream_data
+                    return_response['event_return_response'].set()
+                    return True
+            with self.manager.process_response_lock:
+                process_response = self.manager.process_response.pop(request_id, None)
+        except TypeError:
+            # unhashable `id`
+            return False
+        if process_response is not None:
+            process_response['callback_function'](stream_data)
+            return True
+        return False
+
+    def _decode(self, data):
+        if self.receive_bytes is True:
+            return data.decode("utf-8")
+        return data
+
     def raise_exceptions(self):
         if self.manager.is_stop_request(self.stream_id):
             raise StreamIsStopping(stream_id=self.stream_id, reason="stop request")
         if self.manager.is_crash_request(self.stream_id):
             raise StreamIsCrashing(stream_id=self.stream_id, reason="crash request")
+
+
+def _pass_through(stream_data):
+    return stream_data
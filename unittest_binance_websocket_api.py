@@ -23,14 +23,43 @@ from unicorn_binance_websocket_api.exceptions import *
 from unicorn_binance_websocket_api.restserver import BinanceWebSocketApiRestServer
 from unicorn_binance_websocket_api.restclient import BinanceWebSocketApiRestclient
 from unicorn_binance_websocket_api.licensing_manager import LucitLicensingManager, NoValidatedLucitLicense
+from unicorn_binance_websocket_api.metrics import BinanceWebSocketApiGlobalMetrics, BinanceWebSocketApiLatencyHistogram, \
+    BinanceWebSocketApiRollingWindow, BinanceWebSocketApiStreamMetrics, get_event_time_of_frame
+from unicorn_binance_websocket_api.order_book import BinanceWebSocketApiOrderBook, BinanceWebSocketApiOrderBookManager
+from unicorn_binance_websocket_api.bars import BinanceWebSocketApiBarAggregator
+from unicorn_binance_websocket_api import columnar
+from unicorn_binance_websocket_api.buffers import BinanceWebSocketApiCoalescingQueue, \
+    BinanceWebSocketApiConflationBuffer, BinanceWebSocketApiStreamBuffer, get_record_key
+from unicorn_binance_websocket_api.frame_recorder import BinanceWebSocketApiFrameRecorder, read_frames
+from unicorn_binance_websocket_api.event_loop_pool import BinanceWebSocketApiEventLoopPool
+from unicorn_binance_websocket_api.multiplexed_stream import distribute_markets
+from unicorn_binance_websocket_api.rate_limiter import BinanceWebSocketApiOutboundScheduler, \
+    BinanceWebSocketApiTokenBucket, pack_payloads
+from unicorn_binance_websocket_api.connection_rotation import BinanceWebSocketApiConnectionRotation
+from unicorn_binance_websocket_api.reconnect_scheduler import BinanceWebSocketApiReconnectScheduler
+from unicorn_binance_websocket_api.shared_memory_ring_buffer import BinanceWebSocketApiSharedMemoryRingBuffer
+from unicorn_binance_websocket_api import shared_memory_ring_buffer
+from unicorn_binance_websocket_api.api.futures import BinanceWebSocketApiApiFutures
+from unicorn_binance_websocket_api.api.spot import BinanceWebSocketApiApiSpot
+from unicorn_binance_websocket_api.connection import BinanceWebSocketApiClientProtocol
+from unicorn_binance_websocket_api.sockets import BinanceWebSocketApiSocket
+from unicorn_binance_websocket_api import sockets
+from unicorn_binance_websocket_api import sharded_manager
 from unicorn_binance_rest_api import BinanceRestApiManager
 import asyncio
+import collections
 import logging
+import multiprocessing
+import orjson
+import queue
 import unittest
 import os
 import platform
 import time
 import threading
+import types
+import unittest.mock
+import websockets
 
 import tracemalloc
 tracemalloc.start(25)
@@ -64,6 +93,95 @@ def processing_of_new_data(data):
     print(f"`processing_of_new_data()` test - Received: {data}")
 
 
+class SocketTestManager(object):
+    """
+    The parts of `BinanceWebSocketApiManager` that `BinanceWebSocketApiSocket` uses, to run a socket without network
+    and license. Delivered records are collected in `records`.
+    """
+    def __init__(self, stream_id="stream", **stream):
+        self.exchange = "binance.com"
+        self.stream_list = {stream_id: {'symbols': None, 'output': "raw_data", 'api': False,
+                                        'stream_buffer_name': False, 'status': "starting", 'has_stopped': None,
+                                        'payload': [], 'last_stream_signal': None, 'last_received_data_record': None,
+                                        'stop_request': False, 'crash_request': False, 'reconnect_priority': 0,
+                                        'connection_rotations': 0, 'replay_file': None}}
+        self.stream_list[stream_id].update(stream)
+        self.stream_list_lock = threading.Lock()
+        self.stream_data_middleware = {stream_id: []}
+        self.stream_metrics = {stream_id: BinanceWebSocketApiStreamMetrics()}
+        self.records = []
+        self.specific_process_asyncio_queue = {stream_id: None}
+        self.specific_process_stream_data = {stream_id: self.records.append}
+        self.specific_process_stream_data_async = {stream_id: None}
+        self.process_asyncio_queue = None
+        self.process_stream_data = None
+        self.process_stream_data_async = None
+        self.return_response = {}
+        self.return_response_lock = threading.Lock()
+        self.process_response = {}
+        self.process_response_lock = threading.Lock()
+        self.errors = []
+        self.results = []
+        self.max_send_messages_per_second = 5
+        self.max_send_messages_per_second_reserve = 2
+        self.max_send_payload_bytes = 8000
+        self.connection_max_age = None
+        self.connection_rotation_margin = 900
+        self.connection_rotation_overlap = 5.0
+        self.reconnect_scheduler = BinanceWebSocketApiReconnectScheduler(manager=self)
+        self.sockets = {}
+        self.stream_subscription_names = {}
+
+    def add_to_ringbuffer_error(self, error):
+        self.errors.append(error)
+
+    def add_to_ringbuffer_result(self, result):
+        self.results.append(result)
+
+    def get_exchange(self):
+        return self.exchange
+
+    def is_crash_request(self, stream_id):
+        return self.stream_list[stream_id]['crash_request']
+
+    def is_stop_request(self, stream_id):
+        return self.stream_list[stream_id]['stop_request']
+
+    def stop_stream(self, stream_id, delete_listen_key=True):
+        self.stream_list[stream_id]['stop_request'] = True
+
+    def increase_dropped_records_counter(self, stream_id, count=1):
+        pass
+
+    def increase_reconnect_counter(self, stream_id):
+        pass
+
+    def send_stream_signal(self, **kwargs):
+        pass
+
+    def set_heartbeat(self, stream_id):
+        pass
+
+    def set_socket_is_not_ready(self, stream_id):
+        pass
+
+    def set_socket_is_ready(self, stream_id):
+        pass
+
+    def run_socket(self, stream_id="stream", channels=None, markets=None):
+        socket = BinanceWebSocketApiSocket(self, stream_id, channels or [], markets or [])
+
+        async def run():
+            async with socket:
+                try:
+                    await socket.start_socket()
+                except StreamIsStopping:
+                    pass
+
+        asyncio.run(run())
+        return socket
+
+
 def is_github_action_env():
     try:
         print(f"{os.environ[f'LUCIT_LICENSE_TOKEN']}")
@@ -236,6 +354,12 @@ class TestBinanceComManager(unittest.TestCase):
         self.__class__.ubwa.unsubscribe_from_stream(stream_id, channels=['trade'])
         time.sleep(6)
         self.__class__.ubwa.get_monitoring_status_icinga()
+        prometheus_metrics = self.__class__.ubwa.get_monitoring_status_prometheus()
+        self.assertIn(f'ubwa_stream_up{{stream_id="{stream_id}",stream_label="test_stream"}}', prometheus_metrics)
+        stream_snapshot = self.__class__.ubwa.get_stream_snapshot(stream_id, include=("markets",))
+        self.assertEqual(stream_snapshot['stream_label'], "test_stream")
+        self.assertNotIn('last_received_data_record', stream_snapshot)
+        self.assertIn('markets', stream_snapshot)
         self.__class__.ubwa.print_summary(title="Unittests")
         self.__class__.ubwa.print_stream_info(stream_id, title="Unittests")
 
@@ -968,6 +1092,1349 @@ class TestApiLive(unittest.TestCase):
         time.sleep(1)
 
 
+class TestStreamDataPipeline(unittest.TestCase):
+    trade_frame = ('{"stream":"btcusdt@trade","data":{"e":"trade","E":1,"s":"BTCUSDT","t":1,"p":"1.0","q":"2.0",'
+                   '"b":1,"a":2,"T":1,"m":true,"M":true}}')
+
+    def test_decoder_resolution(self):
+        print(f"test_decoder_resolution():")
+        socket = BinanceWebSocketApiSocket(SocketTestManager(output="raw_data"), "stream", [], [])
+        self.assertEqual(socket.process_stream_data_pipeline(self.trade_frame), self.trade_frame)
+        socket = BinanceWebSocketApiSocket(SocketTestManager(output="dict"), "stream", [], [])
+        self.assertEqual(socket.process_stream_data_pipeline(self.trade_frame)['data']['p'], "1.0")
+        socket = BinanceWebSocketApiSocket(SocketTestManager(output="raw_data", raw_data_type="memoryview"),
+                                           "stream", [], [])
+        self.assertEqual(socket.process_stream_data_pipeline(b'{"e":"trade"}').tobytes(), b'{"e":"trade"}')
+        socket = BinanceWebSocketApiSocket(SocketTestManager(output="UnicornFy"), "stream", [], [])
+        self.assertEqual(socket.process_stream_data_pipeline(self.trade_frame)['price'], "1.0")
+        # the responses of the WS API only get converted to a dict
+        socket = BinanceWebSocketApiSocket(SocketTestManager(output="UnicornFy", api=True), "stream", [], [])
+        self.assertEqual(socket.process_stream_data_pipeline('{"id":1,"status":200}'), {'id': 1, 'status': 200})
+        # exchanges without a UnicornFy method deliver the raw data
+        manager = SocketTestManager(output="UnicornFy")
+        manager.exchange = "unknown.exchange"
+        socket = BinanceWebSocketApiSocket(manager, "stream", [], [])
+        self.assertEqual(socket.process_stream_data_pipeline(self.trade_frame), self.trade_frame)
+
+    def test_middleware_chain(self):
+        print(f"test_middleware_chain():")
+        manager = SocketTestManager(output="dict")
+        manager.stream_data_middleware["stream"] = [lambda stream_data: stream_data['data'],
+                                                    lambda stream_data: None if stream_data['p'] == "2.0" else
+                                                    stream_data]
+        socket = BinanceWebSocketApiSocket(manager, "stream", [], [])
+        self.assertEqual(socket.process_stream_data_pipeline(self.trade_frame)['p'], "1.0")
+        self.assertIsNone(socket.process_stream_data_pipeline(self.trade_frame.replace('"1.0"', '"2.0"')))
+        # a running socket uses an added middleware with the next record, after the existing middleware
+        manager.sockets["stream"] = socket
+        self.assertTrue(BinanceWebSocketApiManager.add_stream_data_middleware(manager, "stream",
+                                                                              lambda stream_data: stream_data['s']))
+        self.assertEqual(socket.process_stream_data_pipeline(self.trade_frame), "BTCUSDT")
+        self.assertFalse(BinanceWebSocketApiManager.add_stream_data_middleware(manager, "unknown", len))
+        self.assertFalse(BinanceWebSocketApiManager.add_stream_data_middleware(manager, "stream", None))
+        # a stream without an active socket gets the middleware with the next connect
+        del manager.sockets["stream"]
+        self.assertTrue(BinanceWebSocketApiManager.add_stream_data_middleware(manager, "stream", str.lower))
+        self.assertEqual(socket.process_stream_data_pipeline(self.trade_frame), "BTCUSDT")
+        socket.build_stream_data_pipeline()
+        self.assertEqual(socket.process_stream_data_pipeline(self.trade_frame), "btcusdt")
+
+
+class BatchingTestConnection(object):
+    """
+    Replaces `BinanceWebSocketApiConnection`, the `frames` are received as tuples of `(seconds after the connect,
+    frame)` and the stream gets stopped after the last frame.
+    """
+    def __init__(self, frames, manager, stream_id, channels, markets, symbols=None):
+        self.frames = list(frames)
+        self.manager = manager
+        self.stream_id = stream_id
+        self.start_time = None
+
+    async def __aenter__(self):
+        self.start_time = time.monotonic()
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        pass
+
+    async def close(self):
+        pass
+
+    async def send(self, data):
+        pass
+
+    async def receive(self, timeout=None):
+        if not self.frames:
+            self.manager.stop_stream(self.stream_id)
+            return None
+        delay = self.start_time + self.frames[0][0] - time.monotonic()
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(max(timeout, 0))
+            raise asyncio.TimeoutError
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self.frames.pop(0)[1]
+
+
+class TestBatching(unittest.TestCase):
+    @staticmethod
+    def receive(frame_times, **stream):
+        frames = [(frame_time, f'{{"e":"trade","t":{index}}}') for index, frame_time in enumerate(frame_times)]
+        manager = SocketTestManager(output="dict", **stream)
+        delivery_times = []
+
+        def process_stream_data(stream_data):
+            manager.records.append([record['t'] for record in stream_data])
+            delivery_times.append(time.monotonic())
+
+        def connection(*args, **kwargs):
+            return BatchingTestConnection(frames, *args, **kwargs)
+
+        manager.specific_process_stream_data["stream"] = process_stream_data
+        start_time = time.monotonic()
+        with unittest.mock.patch.object(sockets, "BinanceWebSocketApiConnection", connection):
+            manager.run_socket()
+        return manager.records, [delivery_time - start_time for delivery_time in delivery_times]
+
+    def test_size_flush(self):
+        print(f"test_size_flush():")
+        batches, _ = self.receive([0.0, 0.0, 0.0, 0.0, 0.0], batch_max_items=2)
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
+
+    def test_delay_flush(self):
+        print(f"test_delay_flush():")
+        batches, delivery_times = self.receive([0.0, 0.01, 0.5], batch_max_delay_ms=100)
+        self.assertEqual(batches, [[0, 1], [2]])
+        # the first batch gets delivered by the timeout while waiting for the next frame
+        self.assertGreaterEqual(delivery_times[0], 0.09)
+        self.assertLess(delivery_times[0], 0.4)
+        self.assertGreaterEqual(delivery_times[1], 0.5)
+
+    def test_flush_on_exit(self):
+        print(f"test_flush_on_exit():")
+        batches, _ = self.receive([0.0, 0.0, 0.0], batch_max_items=100, batch_max_delay_ms=60000)
+        self.assertEqual(batches, [[0, 1, 2]])
+
+
+class TestClientProtocol(unittest.TestCase):
+    @staticmethod
+    def receive_messages(messages, count, max_size=2 ** 20):
+        # Receive the messages of a local websocket server with the protocol of the `bytes` and `memoryview` streams
+        async def send_messages(websocket, *args):
+            for message in messages:
+                await websocket.send(message)
+            await websocket.wait_closed()
+
+        async def run():
+            received_messages = []
+            async with websockets.serve(send_messages, "127.0.0.1", 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                async with websockets.connect(f"ws://127.0.0.1:{port}", max_size=max_size,
+                                              create_protocol=BinanceWebSocketApiClientProtocol) as websocket:
+                    for _ in range(count):
+                        received_messages.append(await websocket.recv())
+            return received_messages
+
+        return asyncio.run(run())
+
+    def test_read_message(self):
+        print(f"test_read_message():")
+        messages = self.receive_messages(['{"e":"trade","p":"1.0"}', ['{"e":"trade",', '"p":"2.0"}'],
+                                          b'{"e":"trade","p":"3.0"}'], count=3)
+        # text frames are not decoded to `str` and fragmented messages get joined
+        self.assertEqual(messages, [b'{"e":"trade","p":"1.0"}', b'{"e":"trade","p":"2.0"}',
+                                    b'{"e":"trade","p":"3.0"}'])
+        socket = BinanceWebSocketApiSocket(SocketTestManager(output="dict", raw_data_type="bytes"), "stream", [], [])
+        self.assertEqual([socket.process_stream_data_pipeline(message)['p'] for message in messages],
+                         ["1.0", "2.0", "3.0"])
+        socket = BinanceWebSocketApiSocket(SocketTestManager(output="raw_data", raw_data_type="bytes"),
+                                           "stream", [], [])
+        self.assertIs(socket.process_stream_data_pipeline(messages[0]), messages[0])
+        socket = BinanceWebSocketApiSocket(SocketTestManager(output="raw_data", raw_data_type="memoryview"),
+                                           "stream", [], [])
+        stream_data = socket.process_stream_data_pipeline(messages[1])
+        self.assertIsInstance(stream_data, memoryview)
+        self.assertEqual(orjson.loads(stream_data), {'e': "trade", 'p': "2.0"})
+        socket = BinanceWebSocketApiSocket(SocketTestManager(output="UnicornFy", raw_data_type="bytes", api=True),
+                                           "stream", [], [])
+        self.assertEqual(socket.process_stream_data_pipeline(b'{"id":1,"status":200}'), {'id': 1, 'status': 200})
+
+    def test_read_message_max_size(self):
+        print(f"test_read_message_max_size():")
+        # the size of all fragments counts
+        with self.assertRaises(websockets.exceptions.ConnectionClosedError):
+            self.receive_messages([["0123456", "789abc"]], count=1, max_size=10)
+
+
+class TestStreamMetrics(unittest.TestCase):
+    def test_add_receive(self):
+        print(f"test_add_receive():")
+        metrics = BinanceWebSocketApiStreamMetrics()
+        self.assertIsNone(metrics.last_heartbeat)
+        metrics.add_receive(100)
+        metrics.add_receive(50)
+        metrics.add_transmitted()
+        self.assertEqual(metrics.processed_receives_total, 2)
+        self.assertEqual(metrics.received_bytes_total, 150)
+        self.assertEqual(metrics.processed_transmitted_total, 1)
+        self.assertIsNotNone(metrics.last_heartbeat)
+        values = metrics.get_stream_list_values()
+        self.assertEqual(sum(values['receives_statistic_last_second']['entries'].values()), 2)
+        self.assertEqual(sum(values['transfer_rate_per_second']['bytes'].values()), 150)
+
+    def test_outdated_entries_get_removed(self):
+        print(f"test_outdated_entries_get_removed():")
+        metrics = BinanceWebSocketApiStreamMetrics(keep_max_entries=5)
+        for second in range(100, 120):
+            metrics._start_new_second(second)
+            metrics.window.add(second, second - 99)
+        self.assertEqual(len(metrics.window.get_entries("receives", now=119)), 6)
+        self.assertEqual(metrics.window.get_receives(119), 20)
+        self.assertEqual(metrics.window.get_receives(113), 0)
+        self.assertEqual(metrics.most_receives_per_second, 19)
+
+    def test_rolling_window(self):
+        print(f"test_rolling_window():")
+        window = BinanceWebSocketApiRollingWindow(size=3)
+        window.add(10, 1, 100)
+        window.add(10, 1, 50)
+        window.add(11, 1, 10)
+        self.assertEqual(window.get_receives(10), 2)
+        self.assertEqual(window.get_bytes(10), 150)
+        self.assertEqual(window.get_entries("bytes", now=11), {10: 150, 11: 10})
+        # second 13 reuses the bucket of second 10
+        window.add(13, 1, 1)
+        self.assertEqual(window.get_receives(10), 0)
+        self.assertEqual(window.get_receives(13), 1)
+        self.assertEqual(window.get_entries("receives", now=14), {13: 1})
+
+    def test_global_metrics(self):
+        print(f"test_global_metrics():")
+        global_metrics = BinanceWebSocketApiGlobalMetrics()
+        metrics_1 = BinanceWebSocketApiStreamMetrics(global_metrics=global_metrics)
+        metrics_2 = BinanceWebSocketApiStreamMetrics(global_metrics=global_metrics)
+        metrics_1.add_receive(100)
+        metrics_2.add_receive(50)
+        metrics_2.add_receive_statistic()
+        second = int(time.time())
+        self.assertEqual(global_metrics.get_receives(second) + global_metrics.get_receives(second - 1), 3)
+        self.assertEqual(global_metrics.get_bytes(second) + global_metrics.get_bytes(second - 1), 150)
+        global_metrics.remove_stream_metrics(metrics_1)
+        self.assertEqual(global_metrics.stream_metrics, (metrics_2,))
+        self.assertEqual(global_metrics.get_bytes(second) + global_metrics.get_bytes(second - 1), 50)
+        # without receives in the last second the speed of the last second with receives is returned
+        global_metrics = BinanceWebSocketApiGlobalMetrics()
+        metrics_3 = BinanceWebSocketApiStreamMetrics(global_metrics=global_metrics)
+        metrics_3.window.add(int(time.time()) - 3, 2, 300)
+        self.assertEqual(global_metrics.get_receiving_speed(), 300)
+
+
+class TestEventLoopPool(unittest.TestCase):
+    def test_acquire_and_release_loop(self):
+        print(f"test_acquire_and_release_loop():")
+        pool = BinanceWebSocketApiEventLoopPool(size=2)
+        loop_1 = pool.acquire_loop()
+        loop_2 = pool.acquire_loop()
+        self.assertIsNot(loop_1, loop_2)
+        self.assertEqual(pool.streams_per_loop, [1, 1])
+        pool.release_loop(loop_1)
+        self.assertIs(pool.acquire_loop(), loop_1)
+        self.assertIs(pool.get_thread(loop_2), pool.threads[1])
+        pool.release_loop(loop_1)
+        pool.release_loop(loop_2)
+        pool.stop(timeout=1)
+        self.assertTrue(loop_1.is_closed())
+
+    def test_run_coroutine(self):
+        print(f"test_run_coroutine():")
+
+        async def get_thread_name():
+            await asyncio.sleep(0.01)
+            return threading.current_thread().name
+
+        pool = BinanceWebSocketApiEventLoopPool(size=1)
+        loop = pool.acquire_loop()
+        future = pool.run_coroutine(get_thread_name(), loop)
+        self.assertEqual(future.result(timeout=5), pool.threads[0].name)
+        pool.release_loop(loop)
+        pool.stop(timeout=1)
+
+    def test_invalid_size(self):
+        print(f"test_invalid_size():")
+        with self.assertRaises(ValueError):
+            BinanceWebSocketApiEventLoopPool(size=0)
+
+    def test_process_asyncio_queue_of_ended_stream(self):
+        print(f"test_process_asyncio_queue_of_ended_stream():")
+        manager = BinanceWebSocketApiManager.__new__(BinanceWebSocketApiManager)
+        manager.debug = False
+        manager.stream_list = {"stream": {'stop_request': False, 'crash_request': False, 'has_stopped': None,
+                                          'stream_label': None, 'api': True, 'backpressure_policy': None,
+                                          'asyncio_queue_maxsize': None}}
+        manager.stream_tasks = {}
+        manager.asyncio_queue = {}
+        consumer_calls = []
+
+        async def process_asyncio_queue(stream_id=None):
+            consumer_calls.append(stream_id)
+            await asyncio.sleep(60)
+
+        async def run_socket(stream_id, channels, markets):
+            manager.stream_list[stream_id]['stop_request'] = True
+            manager.stream_list[stream_id]['has_stopped'] = time.time()
+
+        manager.specific_process_asyncio_queue = {"stream": process_asyncio_queue}
+        manager._run_socket = run_socket
+        pool = BinanceWebSocketApiEventLoopPool(size=1)
+        loop = pool.acquire_loop()
+        try:
+            # a quick stop: the stream ended before its `process_asyncio_queue` got started on the shared loop
+            pool.run_coroutine(manager._run_stream("stream", [], []), loop).result(timeout=5)
+            future = pool.run_coroutine(manager._run_process_asyncio_queue(scope="specific", stream_id="stream"),
+                                        loop)
+            self.assertFalse(future.result(timeout=5))
+            self.assertEqual(consumer_calls, [])
+            self.assertEqual(manager.stream_tasks, {})
+        finally:
+            pool.release_loop(loop)
+            pool.stop(timeout=1)
+
+
+class ShardedWorkerTestManager(object):
+    """
+    Replaces the `BinanceWebSocketApiManager` of a sharded worker, each stream delivers its `records` at once.
+    """
+    def __init__(self, **kwargs):
+        self.stream_list = {}
+
+    def create_stream(self, channels=None, markets=None, stream_label=None, process_stream_data=None, records=(),
+                      **kwargs):
+        stream_id = f"stream_{len(self.stream_list)}"
+        self.stream_list[stream_id] = {'stream_label': stream_label, 'kwargs': kwargs}
+        for record in records:
+            process_stream_data(record)
+        return stream_id
+
+    def get_stream_list(self):
+        return self.stream_list
+
+    def stop_manager(self):
+        return True
+
+    def stop_stream(self, stream_id, delete_listen_key=True):
+        return self.stream_list.pop(stream_id, None) is not None
+
+
+class TestShardedManager(unittest.TestCase):
+    def setUp(self):
+        # one worker in a thread of this process instead of a worker process
+        parent_connection, worker_connection = multiprocessing.Pipe()
+        self.stream_data_queue = queue.Queue()
+        with unittest.mock.patch.object(sharded_manager, "BinanceWebSocketApiManager", ShardedWorkerTestManager):
+            self.worker_thread = threading.Thread(target=sharded_manager._run_worker,
+                                                  args=(0, {}, worker_connection, self.stream_data_queue))
+            self.worker_thread.start()
+            self.assertTrue(parent_connection.recv()[0])
+        manager = sharded_manager.BinanceWebSocketApiShardedManager.__new__(
+            sharded_manager.BinanceWebSocketApiShardedManager)
+        manager.processes = 1
+        manager.process_stream_data = None
+        manager.stop_manager_request = False
+        manager.stream_buffer = collections.deque()
+        manager.stream_buffers = {}
+        manager.stream_consumers = {}
+        manager.stream_data_queue = self.stream_data_queue
+        manager.stream_workers = {}
+        manager.worker_connections = [parent_connection]
+        manager.worker_locks = [threading.Lock()]
+        manager.worker_processes = []
+        manager.worker_stream_counts = [0]
+        self.manager = manager
+
+    def tearDown(self):
+        self.manager.stop_manager()
+        self.worker_thread.join(timeout=5)
+
+    def test_command_dispatch(self):
+        print(f"test_command_dispatch():")
+        stream_id = self.manager.create_stream(channels="trade", markets="btcusdt", stream_label="trades")
+        self.assertEqual(self.manager.get_worker_id_by_stream_id(stream_id), 0)
+        self.assertEqual(self.manager.worker_stream_counts, [1])
+        stream_list = self.manager.get_stream_list()
+        self.assertEqual(stream_list[stream_id]['stream_label'], "trades")
+        # without batching parameters the transfer gets batched by default
+        self.assertEqual(stream_list[stream_id]['kwargs'], {'batch_max_items': 100, 'batch_max_delay_ms': 10})
+        with self.assertRaises(ValueError):
+            self.manager._call_worker(0, "get_listen_key_from_restclient")
+        self.assertIsNone(self.manager.get_stream_info("unknown"))
+        self.assertTrue(self.manager.stop_stream(stream_id))
+        self.assertEqual(self.manager.worker_stream_counts, [0])
+        self.assertEqual(self.manager.stream_workers, {})
+
+    def test_record_forwarding(self):
+        print(f"test_record_forwarding():")
+        stream_id = self.manager.create_stream(channels="trade", markets="btcusdt", stream_buffer_name=True,
+                                               records=[["a", "b"], ["c"]])
+        received_batches = []
+        self.manager.create_stream(channels="trade", markets="ethusdt", batch_max_items=2,
+                                   process_stream_data=received_batches.append, records=[["d", "e"]])
+        self.manager.create_stream(channels="trade", markets="bnbusdt", records=["f"])
+        while not self.stream_data_queue.empty():
+            self.manager._deliver(*self.stream_data_queue.get())
+        # the default batches of the transfer get split, batches of the user stay batches
+        self.assertEqual([self.manager.pop_stream_data_from_stream_buffer(stream_id) for _ in range(3)],
+                         ["a", "b", "c"])
+        self.assertEqual(received_batches, [["d", "e"]])
+        self.assertEqual(self.manager.pop_stream_data_from_stream_buffer(), "f")
+        self.assertIsNone(self.manager.pop_stream_data_from_stream_buffer())
+
+
+class TestSharedMemoryRingBuffer(unittest.TestCase):
+    def setUp(self):
+        self.producer = BinanceWebSocketApiSharedMemoryRingBuffer(size=64)
+        self.consumer = BinanceWebSocketApiSharedMemoryRingBuffer(name=self.producer.name, create=False)
+
+    def tearDown(self):
+        self.consumer.close()
+        self.producer.close()
+        self.producer.unlink()
+
+    def test_append_and_popleft(self):
+        print(f"test_append_and_popleft():")
+        self.producer.append("text")
+        self.producer.extend([b"bytes", {'e': "trade"}])
+        self.assertEqual(len(self.consumer), 3)
+        self.assertEqual(self.consumer.popleft(), "text")
+        self.assertEqual(self.consumer.popleft(), b"bytes")
+        self.assertEqual(self.consumer.popleft(), {'e': "trade"})
+        with self.assertRaises(IndexError):
+            self.consumer.popleft()
+        self.assertEqual(self.producer.popleft(), "text")
+
+    def test_wrap_around_and_overrun(self):
+        print(f"test_wrap_around_and_overrun():")
+        for index in range(0, 5):
+            self.producer.append(f"record-{index:03}")
+            self.assertEqual(self.consumer.popleft(), f"record-{index:03}")
+        for index in range(0, 10):
+            self.producer.append(f"record-{index:03}")
+        with self.assertRaises(IndexError):
+            self.consumer.popleft()
+        self.assertEqual(self.consumer.overruns, 1)
+        self.producer.append("record-new")
+        self.assertEqual(self.consumer.popleft(), "record-new")
+        self.assertEqual(self.producer.get_overruns(), 1)
+
+    def test_reserved_record_is_not_read(self):
+        print(f"test_reserved_record_is_not_read():")
+        for index in range(0, 4):
+            self.producer.append(f"record-{index:03}")
+        self.assertEqual(self.consumer.popleft(), "record-000")
+        # the producer has reserved the part of the ring with the next unread record and is overwriting it
+        reserved_position = self.consumer.read_position + self.consumer.capacity + 1
+        shared_memory_ring_buffer.COUNTER.pack_into(self.producer.buffer,
+                                                    shared_memory_ring_buffer.RESERVED_POSITION_OFFSET,
+                                                    reserved_position)
+        with self.assertRaises(IndexError):
+            self.consumer.popleft()
+        self.assertEqual(self.consumer.overruns, 1)
+        self.assertEqual(self.producer.get_overruns(), 1)
+
+    def test_only_producer_writes(self):
+        print(f"test_only_producer_writes():")
+        with self.assertRaises(RuntimeError):
+            self.consumer.append("text")
+
+
+class TestBackpressurePolicies(unittest.TestCase):
+    def test_drop_oldest(self):
+        print(f"test_drop_oldest():")
+        stream_buffer = BinanceWebSocketApiStreamBuffer(maxlen=2, backpressure_policy="drop_oldest")
+        self.assertEqual(stream_buffer.extend([1, 2, 3]), 1)
+        self.assertEqual(stream_buffer.popleft(), 2)
+        self.assertEqual(stream_buffer.dropped_records, 1)
+
+    def test_drop_newest(self):
+        print(f"test_drop_newest():")
+        stream_buffer = BinanceWebSocketApiStreamBuffer(maxlen=2, backpressure_policy="drop_newest")
+        self.assertEqual(stream_buffer.extend([1, 2, 3]), 1)
+        self.assertEqual(stream_buffer.pop(), 2)
+        self.assertEqual(len(stream_buffer), 1)
+
+    def test_block(self):
+        print(f"test_block():")
+        stream_buffer = BinanceWebSocketApiStreamBuffer(maxlen=2, backpressure_policy="block")
+        self.assertEqual(stream_buffer.extend([1, 2, 3]), 0)
+        self.assertTrue(stream_buffer.is_full())
+        self.assertEqual(len(stream_buffer), 3)
+
+    def test_coalesce_by_key(self):
+        print(f"test_coalesce_by_key():")
+        stream_buffer = BinanceWebSocketApiStreamBuffer(backpressure_policy="coalesce_by_key")
+        stream_buffer.append('{"stream":"btcusdt@bookTicker","data":{"b":"1"}}')
+        stream_buffer.append({'stream': "ethusdt@bookTicker", 'data': {'b': "2"}})
+        stream_buffer.append('{"stream":"btcusdt@bookTicker","data":{"b":"3"}}')
+        self.assertEqual(len(stream_buffer), 2)
+        self.assertEqual(stream_buffer.dropped_records, 1)
+        self.assertEqual(stream_buffer.popleft(), '{"stream":"btcusdt@bookTicker","data":{"b":"3"}}')
+        with self.assertRaises(ValueError):
+            BinanceWebSocketApiStreamBuffer(backpressure_policy="unknown")
+
+    def test_coalesce_by_key_all_market_stream(self):
+        print(f"test_coalesce_by_key_all_market_stream():")
+        stream_buffer = BinanceWebSocketApiStreamBuffer(backpressure_policy="coalesce_by_key")
+        stream_buffer.append('{"stream":"!bookTicker","data":{"s":"BTCUSDT","b":"1"}}')
+        stream_buffer.append('{"stream":"!bookTicker","data":{"s":"ETHUSDT","b":"2"}}')
+        self.assertEqual(len(stream_buffer), 2)
+        self.assertEqual(stream_buffer.dropped_records, 0)
+        stream_buffer.append('{"stream":"!bookTicker","data":{"s":"BTCUSDT","b":"3"}}')
+        self.assertEqual(len(stream_buffer), 2)
+        self.assertEqual(stream_buffer.dropped_records, 1)
+        self.assertEqual(get_record_key({'stream_type': "!bookTicker", 'symbol': "BTCUSDT"}),
+                         ("!bookTicker", "BTCUSDT"))
+
+    def test_coalescing_queue(self):
+        print(f"test_coalescing_queue():")
+
+        async def fill_queue():
+            queue = BinanceWebSocketApiCoalescingQueue(maxsize=2)
+            dropped_records = 0
+            for stream_data in ({'s': "BTCUSDT", 'e': "24hrTicker", 'c': 1},
+                                {'s': "ETHUSDT", 'e': "24hrTicker", 'c': 2},
+                                {'s': "BTCUSDT", 'e': "24hrTicker", 'c': 3},
+                                {'s': "BNBUSDT", 'e': "24hrTicker", 'c': 4}):
+                dropped_records += queue.put_nowait(stream_data)
+            return dropped_records, [queue.get_nowait() for _ in range(queue.qsize())]
+
+        dropped_records, records = asyncio.run(fill_queue())
+        self.assertEqual(dropped_records, 2)
+        self.assertEqual([record['c'] for record in records], [2, 4])
+
+
+class TestConflationBuffer(unittest.TestCase):
+    def test_drain_changed_keys(self):
+        print(f"test_drain_changed_keys():")
+        stream_buffer = BinanceWebSocketApiConflationBuffer()
+        stream_buffer.extend([{'stream': "btcusdt@bookTicker", 'data': {'b': "1"}},
+                              {'stream': "ethusdt@bookTicker", 'data': {'b': "2"}},
+                              {'stream': "btcusdt@bookTicker", 'data': {'b': "3"}}])
+        self.assertEqual(len(stream_buffer), 2)
+        self.assertEqual(stream_buffer.dropped_records, 1)
+        self.assertEqual(stream_buffer.drain(), {'btcusdt@bookTicker': {'stream': "btcusdt@bookTicker",
+                                                                         'data': {'b': "3"}},
+                                                 'ethusdt@bookTicker': {'stream': "ethusdt@bookTicker",
+                                                                         'data': {'b': "2"}}})
+        self.assertEqual(stream_buffer.drain(), {})
+        stream_buffer.append({'stream': "ethusdt@bookTicker", 'data': {'b': "4"}})
+        self.assertEqual(stream_buffer.popleft()['data']['b'], "4")
+        self.assertEqual(stream_buffer.get("btcusdt@bookTicker")['data']['b'], "3")
+        with self.assertRaises(IndexError):
+            stream_buffer.popleft()
+
+    def test_all_market_stream(self):
+        print(f"test_all_market_stream():")
+        stream_buffer = BinanceWebSocketApiConflationBuffer()
+        stream_buffer.extend([{'stream': "!bookTicker", 'data': {'s': "BTCUSDT", 'b': "1"}},
+                              {'stream': "!bookTicker", 'data': {'s': "ETHUSDT", 'b': "2"}},
+                              {'stream': "!bookTicker", 'data': {'s': "BTCUSDT", 'b': "3"}}])
+        self.assertEqual(len(stream_buffer), 2)
+        self.assertEqual(stream_buffer.dropped_records, 1)
+        self.assertEqual(sorted(stream_buffer.keys()), [("!bookTicker", "BTCUSDT"), ("!bookTicker", "ETHUSDT")])
+        self.assertEqual(stream_buffer.get(("!bookTicker", "BTCUSDT"))['data']['b'], "3")
+        self.assertEqual(stream_buffer.get(("!bookTicker", "ETHUSDT"))['data']['b'], "2")
+
+    def test_record_key(self):
+        print(f"test_record_key():")
+        stream_buffer = BinanceWebSocketApiConflationBuffer(record_key=lambda stream_data: stream_data['s'])
+        stream_buffer.append({'s': "BTCUSDT", 'b': "1"})
+        stream_buffer.append({'s': "BTCUSDT", 'b': "2"})
+        self.assertEqual(stream_buffer.keys(), ["BTCUSDT"])
+        self.assertEqual(stream_buffer.pop(), {'s': "BTCUSDT", 'b': "2"})
+
+
+class TestOrderBook(unittest.TestCase):
+    snapshot = {'lastUpdateId': 100,
+                'bids': [["99.0", "1.0"], ["98.0", "2.0"], ["97.0", "3.0"]],
+                'asks': [["101.0", "1.5"], ["102.0", "2.5"]]}
+
+    def test_spot_sync_and_queries(self):
+        print(f"test_spot_sync_and_queries():")
+        order_book = BinanceWebSocketApiOrderBook(symbol="btcusdt")
+        self.assertTrue(order_book.process_depth_update({'e': "depthUpdate", 'U': 95, 'u': 100, 'b': [], 'a': []}))
+        self.assertTrue(order_book.process_depth_update({'e': "depthUpdate", 'U': 101, 'u': 102,
+                                                         'b': [["99.0", "0"], ["99.5", "4.0"]], 'a': []}))
+        self.assertFalse(order_book.is_ready())
+        self.assertTrue(order_book.apply_snapshot(self.snapshot))
+        self.assertEqual(order_book.get_best_bid(), (99.5, 4.0))
+        self.assertEqual(order_book.get_best_ask(), (101.0, 1.5))
+        self.assertEqual(order_book.get_bids(limit=2), [(99.5, 4.0), (98.0, 2.0)])
+        self.assertEqual(order_book.get_asks(), [(101.0, 1.5), (102.0, 2.5)])
+        self.assertEqual(order_book.get_spread(), 1.5)
+        self.assertTrue(order_book.process_depth_update({'e': "depthUpdate", 'U': 103, 'u': 103, 'b': [],
+                                                         'a': [["100.5", "1.0"]]}))
+        self.assertEqual(order_book.get_best_ask(), (100.5, 1.0))
+        self.assertEqual(order_book.get_depth_within_bps(bps=200), (6.0, 5.0))
+
+    def test_spot_gap_triggers_resync(self):
+        print(f"test_spot_gap_triggers_resync():")
+        order_book = BinanceWebSocketApiOrderBook(symbol="BTCUSDT")
+        order_book.apply_snapshot(self.snapshot)
+        self.assertTrue(order_book.process_depth_update({'e': "depthUpdate", 'U': 99, 'u': 101, 'b': [], 'a': []}))
+        self.assertFalse(order_book.process_depth_update({'e': "depthUpdate", 'U': 105, 'u': 106, 'b': [], 'a': []}))
+        self.assertFalse(order_book.is_ready())
+        self.assertEqual(order_book.resyncs, 1)
+        self.assertIsNone(order_book.get_best_bid())
+
+    def test_futures_sequence(self):
+        print(f"test_futures_sequence():")
+        order_book = BinanceWebSocketApiOrderBook(symbol="BTCUSDT", futures=True)
+        order_book.apply_snapshot(self.snapshot)
+        self.assertTrue(order_book.process_depth_update({'e': "depthUpdate", 'U': 98, 'u': 103, 'pu': 97,
+                                                         'b': [["99.0", "5.0"]], 'a': []}))
+        self.assertTrue(order_book.process_depth_update({'e': "depthUpdate", 'U': 104, 'u': 110, 'pu': 103,
+                                                         'b': [], 'a': []}))
+        self.assertEqual(order_book.get_best_bid(), (99.0, 5.0))
+        self.assertFalse(order_book.process_depth_update({'e': "depthUpdate", 'U': 112, 'u': 115, 'pu': 111,
+                                                          'b': [], 'a': []}))
+
+    def test_stale_snapshot_keeps_buffer(self):
+        print(f"test_stale_snapshot_keeps_buffer():")
+        order_book = BinanceWebSocketApiOrderBook(symbol="BTCUSDT", max_buffered_updates=3)
+        for first_update_id in range(103, 113, 2):
+            order_book.process_depth_update({'e': "depthUpdate", 'U': first_update_id, 'u': first_update_id + 1,
+                                             'b': [["99.0", str(first_update_id)]], 'a': []})
+        self.assertEqual([depth_update['U'] for depth_update in order_book.buffered_updates], [107, 109, 111])
+        self.assertFalse(order_book.apply_snapshot(self.snapshot))
+        self.assertFalse(order_book.is_ready())
+        self.assertEqual(len(order_book.buffered_updates), 3)
+        self.assertTrue(order_book.apply_snapshot({'lastUpdateId': 108, 'bids': [], 'asks': []}))
+        self.assertEqual(order_book.get_best_bid(), (99.0, 111.0))
+        self.assertEqual(order_book.last_update_id, 112)
+
+    def test_manager_repeats_snapshot_request(self):
+        print(f"test_manager_repeats_snapshot_request():")
+        requests = []
+
+        def get_order_book(symbol, limit, process_response, stream_id):
+            requests.append(process_response)
+            return True
+
+        api = types.SimpleNamespace(spot=types.SimpleNamespace(get_order_book=get_order_book))
+        manager = types.SimpleNamespace(api=api, get_exchange=lambda: "binance.com",
+                                        create_stream=lambda **kwargs: "stream")
+        order_book_manager = BinanceWebSocketApiOrderBookManager(manager=manager)
+        order_book_manager.add_order_book(symbol="BTCUSDT")
+        depth_update = {'e': "depthUpdate", 's': "BTCUSDT", 'U': 101, 'u': 102, 'b': [], 'a': []}
+        order_book_manager._process_stream_data(depth_update)
+        self.assertEqual(len(requests), 1)
+        order_book_manager.pending_snapshots["BTCUSDT"] -= 10
+        order_book_manager._process_stream_data(depth_update)
+        self.assertEqual(len(requests), 2)
+        requests[1]({'status': 200, 'result': self.snapshot})
+        self.assertTrue(order_book_manager.get_order_book("BTCUSDT").is_ready())
+        self.assertEqual(order_book_manager.pending_snapshots, {})
+
+
+class TestBarAggregator(unittest.TestCase):
+    def test_time_bars(self):
+        print(f"test_time_bars():")
+        bars = []
+        bar_aggregator = BinanceWebSocketApiBarAggregator(bar_type="time", bar_size=5, process_bar=bars.append)
+        bar_aggregator.process_stream_data('{"e":"aggTrade","s":"BTCUSDT","p":"10.0","q":"1.0","T":1000}')
+        bar_aggregator.process_stream_data({'stream': "btcusdt@aggTrade",
+                                            'data': {'e': "aggTrade", 's': "BTCUSDT", 'p': "12.0", 'q': "2.0",
+                                                     'T': 4999}})
+        self.assertEqual(bar_aggregator.get_partial_bar("btcusdt")['high'], 12.0)
+        bar_aggregator.process_stream_data({'event_type': "trade", 'symbol': "BTCUSDT", 'price': "9.0",
+                                            'quantity': "1.0", 'trade_time': 5000})
+        self.assertEqual(len(bars), 1)
+        self.assertEqual((bars[0]['open'], bars[0]['high'], bars[0]['low'], bars[0]['close']), (10.0, 12.0, 10.0, 12.0))
+        self.assertEqual((bars[0]['open_time'], bars[0]['close_time'], bars[0]['volume']), (0, 4999, 3.0))
+        self.assertEqual(bar_aggregator.close_due_bars(now=9000), [])
+        self.assertEqual(bar_aggregator.close_due_bars(now=10500)[0]['close'], 9.0)
+        self.assertIsNone(bar_aggregator.get_partial_bar("BTCUSDT"))
+        # trades of closed bars do not open a bar again
+        self.assertIsNone(bar_aggregator.add_trade("BTCUSDT", 8.0, 1.0, 9999))
+        self.assertIsNone(bar_aggregator.add_trade("BTCUSDT", 8.0, 1.0, 4000))
+        self.assertEqual(bar_aggregator.late_trades, 2)
+        self.assertIsNone(bar_aggregator.get_partial_bar("BTCUSDT"))
+        bar_aggregator.add_trade("BTCUSDT", 8.0, 1.0, 10000)
+        self.assertEqual(bar_aggregator.get_partial_bar("BTCUSDT")['open_time'], 10000)
+
+    def test_close_due_bars_with_clock_offset(self):
+        print(f"test_close_due_bars_with_clock_offset():")
+        # the local clock is 10 seconds ahead of the clock of Binance
+        manager = types.SimpleNamespace(clock_offset_ms=10000.0)
+        bar_aggregator = BinanceWebSocketApiBarAggregator(bar_type="time", bar_size=5, manager=manager,
+                                                          process_bar=lambda bar: None)
+        bar_aggregator.add_trade("BTCUSDT", 10.0, 1.0, int(time.time() * 1000) - 10000)
+        self.assertEqual(bar_aggregator.close_due_bars(), [])
+        manager.clock_offset_ms = 0.0
+        self.assertEqual(len(bar_aggregator.close_due_bars()), 1)
+
+    def test_volume_and_tick_bars(self):
+        print(f"test_volume_and_tick_bars():")
+        volume_bars = BinanceWebSocketApiBarAggregator(bar_type="quote_volume", bar_size=100)
+        tick_bars = BinanceWebSocketApiBarAggregator(bar_type="tick", bar_size=2)
+        closed_volume_bars = []
+        closed_tick_bars = []
+        for trade_time, price in enumerate((10.0, 11.0, 12.0, 13.0)):
+            closed_volume_bars.append(volume_bars.add_trade("BTCUSDT", price, 4.0, trade_time))
+            closed_tick_bars.append(tick_bars.add_trade("BTCUSDT", price, 4.0, trade_time))
+        self.assertEqual([bar['quote_volume'] for bar in closed_volume_bars if bar is not None], [132.0])
+        self.assertEqual([bar['close'] for bar in closed_tick_bars if bar is not None], [11.0, 13.0])
+        with self.assertRaises(ValueError):
+            BinanceWebSocketApiBarAggregator(bar_type="range")
+
+
+class TestColumnarExport(unittest.TestCase):
+    records = ['{"e":"trade","E":1000,"s":"BTCUSDT","t":1,"p":"10.5","q":"2.0","T":999,"m":true}',
+               b'{"result":null,"id":1}',
+               {'stream': "btcusdt@trade",
+                'data': {'e': "trade", 'E': 1001, 's': "BTCUSDT", 't': 2, 'p': "11.0", 'q': "0.5", 'T': 1000,
+                         'm': False}}]
+
+    @unittest.skipIf(columnar.numpy is None, "NumPy is not installed")
+    def test_records_to_arrays(self):
+        print(f"test_records_to_arrays():")
+        arrays = columnar.records_to_arrays(self.records, fields=["T", "p", "q", "m"])
+        self.assertEqual(arrays['T'].dtype.name, "int64")
+        self.assertEqual(arrays['p'].dtype.name, "float64")
+        self.assertEqual(arrays['T'].tolist(), [999, 1000])
+        self.assertEqual(arrays['p'].tolist(), [10.5, 11.0])
+        self.assertEqual(arrays['m'].tolist(), [1, 0])
+        structured = columnar.records_to_arrays(self.records, fields=["t", "q"], structured=True)
+        self.assertEqual(structured['q'].tolist(), [2.0, 0.5])
+        klines = columnar.records_to_arrays(['{"e":"kline","k":{"t":60000,"c":"3.5"}}'], fields=["k.t", "k.c"])
+        self.assertEqual((klines['k.t'][0], klines['k.c'][0]), (60000, 3.5))
+
+    @unittest.skipIf(columnar.numpy is None, "NumPy is not installed")
+    def test_records_to_arrays_book_ticker(self):
+        print(f"test_records_to_arrays_book_ticker():")
+        records = ['{"stream":"!bookTicker","data":{"u":400900217,"s":"BNBUSDT","b":"25.35","B":"31.21",'
+                   '"a":"25.36","A":"40.66"}}',
+                   '{"result":null,"id":1}',
+                   '{"u":400900218,"s":"BTCUSDT","b":"x","B":"1.0","a":"2.0","A":"3.0"}']
+        skipped_records = []
+        arrays = columnar.records_to_arrays(records, fields=["u", "b", "B", "a", "A"],
+                                            skipped_records=skipped_records)
+        self.assertEqual(arrays['u'].dtype.name, "int64")
+        self.assertEqual(arrays['a'].dtype.name, "float64")
+        self.assertEqual(arrays['a'].tolist(), [25.36])
+        self.assertEqual(skipped_records, records[1:])
+        aggregate_trades = columnar.records_to_arrays(['{"e":"aggTrade","a":26129,"p":"0.01633102"}'],
+                                                      fields=["a", "p"])
+        self.assertEqual(aggregate_trades['a'].dtype.name, "int64")
+        with self.assertRaises(ValueError):
+            columnar.records_to_arrays(['{"e":"depthUpdate","a":[["0.0026","100"]]}'], fields=["a"])
+
+    @unittest.skipIf(columnar.numpy is not None, "NumPy is installed")
+    def test_records_to_arrays_without_numpy(self):
+        print(f"test_records_to_arrays_without_numpy():")
+        with self.assertRaises(ImportError):
+            columnar.records_to_arrays(self.records, fields=["p"])
+
+    def get_manager(self):
+        # the stream_buffer of a manager without connections and licensing
+        manager = BinanceWebSocketApiManager.__new__(BinanceWebSocketApiManager)
+        manager.stream_buffer = collections.deque(self.records)
+        manager.stream_buffer_lock = threading.Lock()
+        return manager
+
+    def test_pop_as_arrays_keeps_records_on_errors(self):
+        print(f"test_pop_as_arrays_keeps_records_on_errors():")
+        manager = self.get_manager()
+        with unittest.mock.patch.object(columnar, "numpy", None):
+            with self.assertRaises(ImportError):
+                manager.pop_stream_data_from_stream_buffer_as_arrays(fields=["p"])
+        self.assertEqual(list(manager.stream_buffer), self.records)
+
+    @unittest.skipIf(columnar.numpy is None, "NumPy is not installed")
+    def test_pop_as_arrays_keeps_records_on_errors_with_numpy(self):
+        print(f"test_pop_as_arrays_keeps_records_on_errors_with_numpy():")
+        manager = self.get_manager()
+        with self.assertRaises(ValueError):
+            manager.pop_stream_data_from_stream_buffer_as_arrays(fields=[])
+        with self.assertRaises(TypeError):
+            manager.pop_stream_data_from_stream_buffer_as_arrays(fields=["p"], dtypes={'p': "no_dtype"})
+        self.assertEqual(list(manager.stream_buffer), self.records)
+        # a field holding a list fails after the drain, the records get back in front of newer records
+        manager.stream_buffer.appendleft('{"e":"depthUpdate","a":[["0.0026","100"]]}')
+        manager.stream_buffer.append("newer")
+        expected = list(manager.stream_buffer)
+        with self.assertRaises(ValueError):
+            manager.pop_stream_data_from_stream_buffer_as_arrays(fields=["a"], max_items=2)
+        self.assertEqual(list(manager.stream_buffer), expected)
+        arrays = manager.pop_stream_data_from_stream_buffer_as_arrays(fields=["p"], max_items=4)
+        self.assertEqual(arrays['p'].tolist(), [10.5, 11.0])
+        self.assertEqual(list(manager.stream_buffer), ["newer"])
+
+
+class TestApiResponseRouting(unittest.TestCase):
+    def setUp(self):
+        # the responses get routed by the socket as soon as the request is sent
+        self.manager = SocketTestManager(output="dict", api=True)
+        self.socket = BinanceWebSocketApiSocket(self.manager, "stream", [], [])
+        self.manager.send_api_request = types.MethodType(BinanceWebSocketApiManager.send_api_request, self.manager)
+        self.manager.send_with_stream = self.send_with_stream
+        self.manager.add_payload_to_stream = lambda stream_id, payload: self.queued_payloads.append(payload)
+        self.sent_payloads = []
+        self.queued_payloads = []
+        self.socket_is_ready = True
+
+    def send_with_stream(self, stream_id, payload):
+        if self.socket_is_ready is False:
+            return False
+        # the waiter or the callback must be registered before the request is sent
+        self.assertTrue(payload['id'] in self.manager.return_response or payload['id'] in self.manager.process_response)
+        self.sent_payloads.append(payload)
+        self.route(payload['id'])
+        return True
+
+    def route(self, request_id):
+        response = orjson.dumps({'id': request_id, 'status': 200, 'result': {}})
+        return self.socket.route_response(orjson.loads(response), response)
+
+    def test_return_response(self):
+        print(f"test_return_response():")
+        for api in (BinanceWebSocketApiApiSpot(manager=self.manager),
+                    BinanceWebSocketApiApiFutures(manager=self.manager)):
+            response = api.ping(request_id=f"{type(api).__name__}", return_response=True, stream_id="stream")
+            self.assertEqual(response, {'id': type(api).__name__, 'status': 200, 'result': {}})
+        self.assertEqual([payload['method'] for payload in self.sent_payloads], ["ping", "ping"])
+        self.assertEqual(self.manager.return_response, {})
+
+    def test_process_response(self):
+        print(f"test_process_response():")
+        responses = []
+        spot = BinanceWebSocketApiApiSpot(manager=self.manager)
+        self.assertTrue(spot.ping(request_id="1", process_response=responses.append, stream_id="stream"))
+        self.assertEqual(responses, [{'id': "1", 'status': 200, 'result': {}}])
+        self.assertEqual(self.manager.process_response, {})
+        # a queued request gets its response after the reconnect
+        self.socket_is_ready = False
+        self.assertTrue(spot.ping(request_id="2", process_response=responses.append, stream_id="stream"))
+        self.assertEqual([payload['id'] for payload in self.queued_payloads], ["2"])
+        self.assertTrue(self.route("2"))
+        self.assertEqual(responses[-1]['id'], "2")
+        # a response without a pending request gets delivered as usual
+        self.assertFalse(self.route("2"))
+        self.assertFalse(self.socket.route_response({'e': "trade"}, '{"e":"trade"}'))
+
+    def test_route_raw_data(self):
+        print(f"test_route_raw_data():")
+        socket = BinanceWebSocketApiSocket(SocketTestManager(output="raw_data", api=True), "stream", [], [])
+        responses = []
+        socket.manager.process_response["1"] = {'callback_function': responses.append}
+        self.assertTrue(socket.route_response('{"id":"1","status":200}', '{"id":"1","status":200}'))
+        self.assertEqual(responses, ['{"id":"1","status":200}'])
+        self.assertFalse(socket.route_response("no json", "no json"))
+
+    def test_route_before_middleware(self):
+        print(f"test_route_before_middleware():")
+        manager = SocketTestManager(output="dict", api=True)
+        # the middleware drops every record, a response must still reach its pending request
+        manager.stream_data_middleware["stream"].append(lambda stream_data: None)
+        responses = []
+        manager.process_response["1"] = {'callback_function': responses.append}
+        frames = [(0.0, '{"id":"1","status":200,"result":{}}'), (0.0, '{"e":"trade","t":1}')]
+
+        def connection(*args, **kwargs):
+            return BatchingTestConnection(frames, *args, **kwargs)
+
+        with unittest.mock.patch.object(sockets, "BinanceWebSocketApiConnection", connection):
+            manager.run_socket()
+        self.assertEqual(responses, [{'id': "1", 'status': 200, 'result': {}}])
+        self.assertEqual(manager.records, [])
+
+
+class TestFrameRecorder(unittest.TestCase):
+    def test_record_and_read_frames(self):
+        print(f"test_record_and_read_frames():")
+        file_path = f"unittest_frames_{os.getpid()}.gz"
+        try:
+            frame_recorder = BinanceWebSocketApiFrameRecorder(file_path)
+            frame_recorder.write("stream_a", '{"e":"trade","p":"1.0"}', receive_time=10.0)
+            frame_recorder.write("stream_b", b'{"e":"trade","p":"2.0"}', receive_time=10.5)
+            frame_recorder.close()
+            frame_recorder = BinanceWebSocketApiFrameRecorder(file_path)
+            frame_recorder.write("stream_a", b'{"e":"trade","p":"3.0"}', receive_time=11.0)
+            frame_recorder.close()
+            self.assertEqual(len(list(read_frames(file_path))), 3)
+            self.assertEqual(list(read_frames(file_path, stream_id="stream_a")),
+                             [(10.0, "stream_a", b'{"e":"trade","p":"1.0"}'),
+                              (11.0, "stream_a", b'{"e":"trade","p":"3.0"}')])
+        finally:
+            os.remove(file_path)
+
+
+    def test_replay_through_start_socket(self):
+        print(f"test_replay_through_start_socket():")
+        file_path = f"unittest_replay_{os.getpid()}.gz"
+        try:
+            frame_recorder = BinanceWebSocketApiFrameRecorder(file_path)
+            frame_recorder.write("stream_a", '{"e":"trade","p":"1.0"}', receive_time=10.0)
+            frame_recorder.write("stream_b", '{"e":"trade","p":"2.0"}', receive_time=10.1)
+            frame_recorder.write("stream_a", '{"e":"trade","p":"3.0"}', receive_time=10.2)
+            frame_recorder.write("stream_a", '{"result":null,"id":1}', receive_time=10.3)
+            frame_recorder.close()
+            manager = SocketTestManager(output="dict", replay_file=file_path, replay_speed=None,
+                                        replay_stream_id="stream_a")
+            manager.run_socket()
+            self.assertEqual(manager.records, [{'e': "trade", 'p': "1.0"}, {'e': "trade", 'p': "3.0"},
+                                               {'result': None, 'id': 1}])
+            self.assertEqual(manager.results, ['{"result":null,"id":1}'])
+            self.assertTrue(manager.stream_list["stream"]['stop_request'])
+            self.assertEqual(manager.stream_list["stream"]['websocket_uri'], f"replay://{file_path}")
+            self.assertEqual(manager.stream_metrics["stream"].processed_receives_total, 3)
+        finally:
+            os.remove(file_path)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        print(f"test_percentiles():")
+        latency_histogram = BinanceWebSocketApiLatencyHistogram()
+        self.assertIsNone(latency_histogram.get_percentile(50))
+        for latency in range(1, 100001):
+            latency_histogram.add(latency)
+        latency_histogram.add(-5)
+        for percentile, expected in ((50, 50000), (99, 99000), (99.9, 99900)):
+            self.assertAlmostEqual(latency_histogram.get_percentile(percentile), expected, delta=expected * 0.032)
+        statistic = latency_histogram.get_statistic()
+        self.assertEqual((statistic['count'], statistic['negative_values'], statistic['max_ms']), (100001, 1, 100.0))
+        merged_histogram = BinanceWebSocketApiLatencyHistogram()
+        merged_histogram.merge(latency_histogram)
+        self.assertEqual(merged_histogram.get_statistic(), statistic)
+        self.assertEqual(merged_histogram.sum_value, latency_histogram.sum_value)
+        self.assertEqual(latency_histogram.sum_value, 100000 * 100001 // 2)
+
+    def test_prometheus_latency_summary(self):
+        print(f"test_prometheus_latency_summary():")
+        manager = BinanceWebSocketApiManager.__new__(BinanceWebSocketApiManager)
+        manager.exchange = "binance.com"
+        manager.version = "2.9.0.dev"
+        manager.start_time = time.time()
+        manager.total_transmitted = 0
+        manager.enable_latency_histograms = True
+        manager.stream_buffer = collections.deque()
+        manager.stream_buffers = {}
+        manager.asyncio_queue = {}
+        manager.stream_list = {"stream": {'status': "running", 'stream_label': None, 'subscriptions': 1,
+                                          'reconnects': 0}}
+        manager.stream_metrics = {"stream": BinanceWebSocketApiStreamMetrics()}
+        for method in ("get_total_receives", "get_total_received_bytes", "get_reconnects",
+                       "get_total_dropped_records", "get_current_receiving_speed_global"):
+            setattr(manager, method, lambda: 0)
+        manager.stream_metrics["stream"].add_latency(2000, "trade")
+        manager.stream_metrics["stream"].add_latency(4000, "trade")
+        prometheus_metrics = manager.get_monitoring_status_prometheus()
+        self.assertIn('# TYPE ubwa_stream_latency_seconds summary\n', prometheus_metrics)
+        self.assertIn('ubwa_stream_latency_seconds_sum{stream_id="stream",stream_label=""} 0.006\n',
+                      prometheus_metrics)
+        self.assertIn('ubwa_stream_latency_seconds_count{stream_id="stream",stream_label=""} 2\n',
+                      prometheus_metrics)
+        self.assertEqual(prometheus_metrics.count("# TYPE ubwa_stream_latency_seconds"), 1)
+
+    def test_stream_metrics_latency(self):
+        print(f"test_stream_metrics_latency():")
+        stream_metrics = BinanceWebSocketApiStreamMetrics()
+        stream_metrics.add_latency(2000, "trade")
+        stream_metrics.add_latency(30000, "depth@100ms")
+        statistic = stream_metrics.get_latency_statistic()
+        self.assertEqual(statistic['count'], 2)
+        self.assertEqual(statistic['channels']['trade']['p50_ms'], 2.0)
+
+    def test_get_event_time_of_frame(self):
+        print(f"test_get_event_time_of_frame():")
+        self.assertEqual(get_event_time_of_frame('{"stream":"btcusdt@depth@100ms","data":{"e":"depthUpdate",'
+                                                 '"E":1700000000123}}'), (1700000000123, "depth@100ms"))
+        self.assertEqual(get_event_time_of_frame(b'{"e":"trade","E":17,"s":"BTCUSDT"}'), (17, "trade"))
+        self.assertEqual(get_event_time_of_frame('{"result":null,"id":1}'), (None, None))
+
+
+class TestMultiplexedStream(unittest.TestCase):
+    def test_distribute_markets(self):
+        print(f"test_distribute_markets():")
+        markets = [f"market{index}" for index in range(2000)]
+        shards = distribute_markets(markets, capacity=1024, market_costs=3, reserved_slots=1)
+        self.assertEqual(len(shards), 6)
+        self.assertEqual(sorted(market for shard in shards for market in shard), sorted(markets))
+        self.assertLessEqual(len(shards[0]) * 3 + 1, 1024)
+        self.assertLessEqual(max(len(shard) for shard in shards) - min(len(shard) for shard in shards), 1)
+
+    def test_distribute_markets_by_weight(self):
+        print(f"test_distribute_markets_by_weight():")
+        shards = distribute_markets(["btcusdt", "ethusdt", "a", "b", "c", "d"], capacity=8, market_costs=2,
+                                    market_weights={"btcusdt": 10, "ethusdt": 10})
+        self.assertEqual(len(shards), 2)
+        self.assertNotEqual("btcusdt" in shards[0], "ethusdt" in shards[0])
+
+    def test_distribute_markets_to_existing_shards(self):
+        print(f"test_distribute_markets_to_existing_shards():")
+        shards = distribute_markets(["a", "b", "c"], capacity=4, market_costs=2, shard_loads=[5.0, 1.0],
+                                    shard_free_slots=[2, 2])
+        self.assertEqual(shards, [[], ["b"], ["a", "c"]])
+        with self.assertRaises(ValueError):
+            distribute_markets(["a"], capacity=2, market_costs=3)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_pack_payloads(self):
+        print(f"test_pack_payloads():")
+        payloads = [{"method": "SUBSCRIBE", "params": [f"market{index}@trade"], "id": index} for index in range(1000)]
+        payloads.append({"method": "LIST_SUBSCRIPTIONS", "id": 1000})
+        payloads.append({"method": "UNSUBSCRIBE", "params": ["market1@trade"], "id": 1001})
+        payloads.append({"method": "UNSUBSCRIBE", "params": ["market1@trade", "market2@trade"], "id": 1002})
+        packed = pack_payloads(payloads, max_payload_bytes=8000)
+        self.assertEqual([payload['method'] for payload in packed],
+                         ["SUBSCRIBE", "SUBSCRIBE", "SUBSCRIBE", "LIST_SUBSCRIPTIONS", "UNSUBSCRIBE"])
+        self.assertEqual(sum(len(payload['params']) for payload in packed[:3]), 1000)
+        self.assertEqual(packed[0]['id'], 0)
+        self.assertEqual(packed[4]['params'], ["market1@trade", "market2@trade"])
+        for payload in packed:
+            self.assertLessEqual(len(orjson.dumps(payload)), 8000)
+
+    def test_token_bucket(self):
+        print(f"test_token_bucket():")
+        token_bucket = BinanceWebSocketApiTokenBucket(rate=10, capacity=1)
+        self.assertTrue(token_bucket.consume())
+        self.assertFalse(token_bucket.consume())
+        self.assertGreater(token_bucket.get_wait_time(), 0.05)
+        time.sleep(0.11)
+        self.assertTrue(token_bucket.consume())
+
+    def test_outbound_scheduler(self):
+        print(f"test_outbound_scheduler():")
+
+        class Websocket:
+            def __init__(self):
+                self.sent = []
+
+            async def send(self, data):
+                self.sent.append(orjson.loads(data))
+
+        manager = types.SimpleNamespace(stream_list_lock=threading.Lock(), stream_list={"stream": {"payload": []}})
+        for index in range(100):
+            manager.stream_list["stream"]["payload"].append({"method": "SUBSCRIBE",
+                                                             "params": [f"market{index}@trade"],
+                                                             "id": index})
+        websocket = Websocket()
+        outbound_scheduler = BinanceWebSocketApiOutboundScheduler(manager, "stream", websocket, rate=3)
+
+        async def run():
+            task = asyncio.ensure_future(outbound_scheduler.run())
+            await asyncio.sleep(0.2)
+            manager.stream_list["stream"]["payload"].append({"method": "SUBSCRIBE", "params": ["a@trade"], "id": 100})
+            manager.stream_list["stream"]["payload"].append({"method": "SUBSCRIBE", "params": ["b@trade"], "id": 101})
+            outbound_scheduler.wake()
+            await asyncio.sleep(0.5)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(run())
+        self.assertEqual(len(websocket.sent), 2)
+        self.assertEqual(len(websocket.sent[0]['params']), 100)
+        self.assertEqual(websocket.sent[1]['params'], ["a@trade", "b@trade"])
+
+
+class TestSubscriptionNames(unittest.TestCase):
+    def test_get_subscription_names(self):
+        print(f"test_get_subscription_names():")
+        subscription_names = BinanceWebSocketApiManager._get_subscription_names(["trade", "!miniTicker"],
+                                                                                ["BTCUSDT", "ethusdt"])
+        self.assertEqual(subscription_names, {"btcusdt@trade", "ethusdt@trade", "!miniTicker@arr"})
+        subscription_names = BinanceWebSocketApiManager._get_subscription_names(["kline_1m"], ["bnbusdt"],
+                                                                                all_channels=["trade", "kline_1m"],
+                                                                                all_markets=["btcusdt", "bnbusdt"])
+        self.assertEqual(subscription_names, {"bnbusdt@kline_1m"})
+        self.assertEqual(BinanceWebSocketApiManager._get_subscription_names([], ["bnbusdt"]), set())
+
+    @staticmethod
+    def get_manager(channels, markets):
+        # the subscription methods of a manager without connections and licensing
+        manager = BinanceWebSocketApiManager.__new__(BinanceWebSocketApiManager)
+        manager.debug = False
+        manager.exchange = "binance.com"
+        manager.exchange_type = "cex"
+        manager.max_send_payload_bytes = 8000
+        manager.max_subscriptions_per_stream = 1024
+        manager.max_websocket_uri_length = 4096
+        manager.request_id = 0
+        manager.request_id_lock = threading.Lock()
+        manager.sockets = {}
+        manager.stream_list_lock = threading.Lock()
+        manager.stream_subscription_names = {}
+        manager.websocket_base_uri = "wss://stream.binance.com:9443/"
+        manager.stream_list = {"stream": {"channels": channels, "markets": markets, "payload": [], "subscriptions": 0,
+                                          "dex_user_address": None}}
+        return manager
+
+    @staticmethod
+    def get_queued_params(manager, method="SUBSCRIBE"):
+        return {param for payload in manager.stream_list["stream"]["payload"] if payload['method'] == method
+                for param in payload['params']}
+
+    @staticmethod
+    def connect(manager):
+        # the subscription part of `BinanceWebSocketApiConnection.__aenter__()`
+        uri = manager.create_websocket_uri(manager.stream_list["stream"]["channels"],
+                                           manager.stream_list["stream"]["markets"],
+                                           stream_id="stream")
+        manager.set_stream_subscription_names(stream_id="stream",
+                                              subscription_names=manager.get_websocket_uri_subscription_names(uri))
+        return uri
+
+    def test_create_websocket_uri_has_no_side_effects(self):
+        print(f"test_create_websocket_uri_has_no_side_effects():")
+        manager = self.get_manager(["trade"], ["btcusdt"])
+        self.connect(manager)
+        manager.subscribe_to_stream("stream", channels="kline_1m", markets="ethusdt")
+        payload = list(manager.stream_list["stream"]["payload"])
+        subscription_names = set(manager.stream_subscription_names["stream"])
+        uri = manager.create_websocket_uri(["trade"], ["bnbusdt"], stream_id="stream")
+        self.assertEqual(uri, "wss://stream.binance.com:9443/stream?streams=bnbusdt@trade")
+        self.assertEqual(manager.get_websocket_uri_subscription_names(uri), ["bnbusdt@trade"])
+        self.assertEqual(manager.stream_list["stream"]["payload"], payload)
+        self.assertEqual(manager.stream_subscription_names["stream"], subscription_names)
+        self.assertIsNone(manager.get_websocket_uri_subscription_names("wss://stream.binance.com:9443/ws/abc"))
+
+    def test_reconnect_resubscribes_current_set(self):
+        print(f"test_reconnect_resubscribes_current_set():")
+        manager = self.get_manager(["trade"], ["btcusdt"])
+        self.connect(manager)
+        manager.subscribe_to_stream("stream", channels="kline_1m", markets="ethusdt")
+        self.assertEqual(manager.stream_list["stream"]["subscriptions"], 4)
+        # the reconnect uses the current channels and markets of the stream
+        manager.max_websocket_uri_length = len("wss://stream.binance.com:9443/stream?streams=btcusdt@kline_1m")
+        uri = self.connect(manager)
+        self.assertEqual(uri, "wss://stream.binance.com:9443/stream?streams=btcusdt@kline_1m")
+        self.assertEqual(self.get_queued_params(manager), {"btcusdt@trade", "ethusdt@kline_1m", "ethusdt@trade"})
+        self.assertEqual(manager.stream_list["stream"]["subscriptions"], 4)
+        self.assertEqual(manager.get_number_of_subscriptions("stream"), 4)
+
+    def test_websocket_uri_length_cap(self):
+        print(f"test_websocket_uri_length_cap():")
+        markets = [f"market{index}usdt" for index in range(500)]
+        manager = self.get_manager(["trade", "kline_1m"], markets)
+        manager.max_websocket_uri_length = 1000
+        uri = self.connect(manager)
+        self.assertLessEqual(len(uri), 1000)
+        uri_names = set(uri.split("stream?streams=")[1].split("/"))
+        queued_names = self.get_queued_params(manager)
+        self.assertEqual(len(uri_names & queued_names), 0)
+        self.assertEqual(len(uri_names) + len(queued_names), 1000)
+        self.assertEqual(manager.stream_list["stream"]["subscriptions"], 1000)
+        manager.max_websocket_uri_length = 10
+        uri = self.connect(manager)
+        self.assertEqual(len(uri.split("stream?streams=")[1].split("/")), 1)
+
+    def test_unsubscribe_keeps_global_channels(self):
+        print(f"test_unsubscribe_keeps_global_channels():")
+        manager = self.get_manager(["trade", "!miniTicker"], ["btcusdt", "ethusdt"])
+        self.connect(manager)
+        self.assertEqual(manager.stream_subscription_names["stream"],
+                         {"btcusdt@trade", "ethusdt@trade", "!miniTicker@arr"})
+        manager.unsubscribe_from_stream("stream", markets="btcusdt")
+        self.assertEqual(self.get_queued_params(manager, method="UNSUBSCRIBE"), {"btcusdt@trade"})
+        self.assertEqual(manager.stream_subscription_names["stream"], {"ethusdt@trade", "!miniTicker@arr"})
+        manager.unsubscribe_from_stream("stream", channels="!miniTicker")
+        self.assertEqual(self.get_queued_params(manager, method="UNSUBSCRIBE"), {"btcusdt@trade", "!miniTicker@arr"})
+        self.assertEqual(manager.stream_subscription_names["stream"], {"ethusdt@trade"})
+
+
+class TestStreamSnapshot(unittest.TestCase):
+    def test_version(self):
+        print(f"test_version():")
+        manager = BinanceWebSocketApiManager.__new__(BinanceWebSocketApiManager)
+        manager.stream_list = {"stream": {'status': "running", 'stream_label': "trades", 'has_stopped': None,
+                                          'last_heartbeat': None, 'processed_receives_total': 0,
+                                          'logged_reconnects': [], 'markets': ["btcusdt"], 'api_secret': "secret"}}
+        manager.stream_list_lock = threading.Lock()
+        manager.stream_metrics = {"stream": BinanceWebSocketApiStreamMetrics()}
+        manager.stream_snapshot_excluded_fields = ('api_key', 'api_secret', 'last_received_data_record')
+        manager.stream_snapshot_counter_fields = ('dropped_records_total', 'last_heartbeat',
+                                                  'processed_receives_total', 'processed_transmitted_total')
+        manager.stream_snapshots = {}
+        manager.stream_snapshots_lock = threading.Lock()
+        stream_snapshot = manager.get_stream_snapshot("stream")
+        self.assertEqual(stream_snapshot['version'], 1)
+        self.assertNotIn('api_secret', stream_snapshot)
+        self.assertNotIn('markets', stream_snapshot)
+        # the live counters do not change the version
+        manager.stream_metrics["stream"].add_receive(100)
+        manager.stream_list["stream"]['processed_receives_total'] = 1
+        stream_snapshot = manager.get_stream_snapshot("stream", include=("markets",))
+        self.assertEqual(stream_snapshot['version'], 1)
+        self.assertEqual(stream_snapshot['processed_receives_total'], 1)
+        self.assertEqual(stream_snapshot['markets'], ["btcusdt"])
+        manager.stream_list["stream"]['status'] = "restarting"
+        manager.stream_list["stream"]['logged_reconnects'].append(time.time())
+        stream_snapshot = manager.get_stream_snapshot("stream")
+        self.assertEqual(stream_snapshot['version'], 2)
+        self.assertEqual(stream_snapshot['logged_reconnects_last_hour'], 1)
+        self.assertEqual(manager.get_stream_snapshot("stream")['version'], 2)
+
+
+class TestReconnectScheduler(unittest.TestCase):
+    @staticmethod
+    def get_manager():
+        return types.SimpleNamespace(is_stop_request=lambda stream_id: False, is_crash_request=lambda stream_id: False)
+
+    def test_backoff(self):
+        print(f"test_backoff():")
+        reconnect_scheduler = BinanceWebSocketApiReconnectScheduler(manager=self.get_manager(), base_delay=1.0,
+                                                                    max_delay=8.0)
+        self.assertEqual(reconnect_scheduler.get_backoff_delay(0), 0.0)
+        for failures, delay in ((1, 1.0), (3, 4.0), (10, 8.0)):
+            self.assertTrue(delay / 2 <= reconnect_scheduler.get_backoff_delay(failures) <= delay)
+        reconnect_scheduler.report_disconnect("stream")
+        reconnect_scheduler.report_disconnect("stream")
+        self.assertEqual(reconnect_scheduler.get_status()['failures'], {"stream": 2})
+        reconnect_scheduler.stable_connection_time = 0.0
+        reconnect_scheduler.report_connected("stream")
+        reconnect_scheduler.report_disconnect("stream")
+        self.assertEqual(reconnect_scheduler.get_status()['failures'], {"stream": 1})
+        reconnect_scheduler.remove_stream("stream")
+        self.assertEqual(reconnect_scheduler.get_status()['failures'], {})
+
+    def test_priority_and_rate_limit(self):
+        print(f"test_priority_and_rate_limit():")
+        reconnect_scheduler = BinanceWebSocketApiReconnectScheduler(manager=self.get_manager(),
+                                                                    connections_per_window=1, window=0.1)
+        connected = []
+
+        async def connect(stream_id, priority):
+            await reconnect_scheduler.acquire(stream_id, priority=priority)
+            connected.append(stream_id)
+
+        async def run():
+            await asyncio.gather(connect("low", 0), connect("user_data", 1), connect("high", 2))
+
+        reconnect_scheduler.connection_times.append(time.monotonic())
+        asyncio.run(run())
+        self.assertEqual(connected, ["high", "user_data", "low"])
+        reconnect_scheduler.report_disconnect("low", rate_limited=True, retry_after=30)
+        self.assertGreater(reconnect_scheduler.get_status()['paused_seconds'], 29)
+
+    def test_sliding_window(self):
+        print(f"test_sliding_window():")
+        reconnect_scheduler = BinanceWebSocketApiReconnectScheduler(manager=self.get_manager(),
+                                                                    connections_per_window=3, window=300.0)
+        reconnect_scheduler.connection_times.extend([100.0, 200.0])
+        reconnect_scheduler.waiting = {"stream_1": (0, 1.0), "stream_2": (0, 2.0), "stream_3": (0, 3.0)}
+        self.assertEqual(reconnect_scheduler._get_wait_time("stream_1", now=250.0), 0.0)
+        self.assertEqual(reconnect_scheduler._get_wait_time("stream_2", now=250.0), 150.0)
+        self.assertEqual(reconnect_scheduler._get_wait_time("stream_3", now=250.0), 250.0)
+        # the oldest connection left the window
+        self.assertEqual(reconnect_scheduler._get_wait_time("stream_2", now=400.0), 0.0)
+        self.assertEqual(list(reconnect_scheduler.connection_times), [200.0])
+        # never more than `connections_per_window` within the window, no matter how long it was idle
+        reconnect_scheduler.connection_times.clear()
+        reconnect_scheduler.waiting = {}
+        connected = []
+
+        async def run():
+            for index in range(5):
+                stream_id = f"stream_{index}"
+                task = asyncio.create_task(reconnect_scheduler.acquire(stream_id))
+                await asyncio.sleep(0.05)
+                if task.done() is True:
+                    connected.append(stream_id)
+                else:
+                    task.cancel()
+
+        asyncio.run(run())
+        self.assertEqual(connected, ["stream_0", "stream_1", "stream_2"])
+        self.assertEqual(reconnect_scheduler.get_status()['available_connections'], 0)
+
+
+class TestConnectionRotation(unittest.TestCase):
+    def test_deduplication(self):
+        print(f"test_deduplication():")
+        manager = types.SimpleNamespace(stream_list={"stream": {"payload": []}})
+        socket = types.SimpleNamespace(manager=manager, stream_id="stream", outbound_scheduler=None)
+        rotation = BinanceWebSocketApiConnectionRotation(socket, overlap=5.0)
+        self.assertFalse(rotation.is_live())
+        # frames delivered before the replacement connection gets opened are not remembered
+        rotation.add_delivered('{"E":0}')
+        self.assertEqual(len(rotation.delivered), 0)
+        rotation.record_delivered = True
+        rotation.add_delivered('{"E":1}')
+        rotation.add_delivered('{"E":1}')
+        rotation.add_delivered(memoryview(b'{"E":2}'))
+        self.assertTrue(rotation.is_duplicate('{"E":1}'))
+        self.assertTrue(rotation.is_duplicate(b'{"E":1}'))
+        self.assertFalse(rotation.is_duplicate('{"E":1}'))
+        self.assertTrue(rotation.is_duplicate(memoryview(b'{"E":2}')))
+        self.assertFalse(rotation.is_duplicate('{"E":3}'))
+        # delivered frames older than `overlap` get dropped
+        rotation.add_delivered('{"E":4}')
+        self.assertFalse(rotation.is_duplicate('{"E":4}', receive_time=time.monotonic() + 6.0))
+        self.assertEqual(len(rotation.delivered), 0)
+        self.assertEqual(len(rotation.delivered_times), 0)
+        self.assertEqual(len(rotation.matched), 0)
+        rotation.connection = object()
+        rotation.connected_time = time.monotonic() - 5.0
+        manager.stream_list["stream"]["payload"].append({"method": "SUBSCRIBE", "params": ["a@trade"], "id": 1})
+        self.assertFalse(rotation.is_live())
+        manager.stream_list["stream"]["payload"] = []
+        self.assertTrue(rotation.is_live())
+
+    def test_only_delivered_frames_are_counted(self):
+        print(f"test_only_delivered_frames_are_counted():")
+
+        class Connection(object):
+            def __init__(self, frames):
+                self.frames = list(frames)
+                self.added_frames = []
+
+            async def receive_frame(self, timeout=None):
+                return self.frames.pop(0), time.monotonic()
+
+            def add_frame(self, frame, receive_time):
+                self.added_frames.append(frame)
+
+        manager = SocketTestManager()
+        socket = BinanceWebSocketApiSocket(manager, "stream", ["trade"], ["btcusdt"])
+        socket.websocket = Connection(['{"E":3}'])
+        socket.rotation = BinanceWebSocketApiConnectionRotation(socket, overlap=60.0)
+        socket.rotation.record_delivered = True
+        socket.rotation.add_delivered('{"E":1}')
+        receive_time = time.monotonic()
+        socket.rotation.buffer.extend([('{"E":1}', receive_time), ('{"E":2}', receive_time)])
+        socket.rotation.switch_time = time.monotonic()
+
+        async def receive():
+            return [await socket.receive(timeout=1.0) for _ in range(3)]
+
+        self.assertEqual(asyncio.run(receive()), [None, '{"E":2}', '{"E":3}'])
+        self.assertEqual(socket.websocket.added_frames, ['{"E":2}', '{"E":3}'])
+        self.assertFalse(socket.rotation.is_over())
+
+    def test_abort_restores_subscriptions(self):
+        print(f"test_abort_restores_subscriptions():")
+        manager = TestSubscriptionNames.get_manager(["trade"], ["btcusdt", "ethusdt"])
+        TestSubscriptionNames.connect(manager)
+        socket = types.SimpleNamespace(manager=manager, stream_id="stream", outbound_scheduler=None)
+        rotation = BinanceWebSocketApiConnectionRotation(socket)
+        rotation.previous_subscription_names = set(manager.stream_subscription_names["stream"])
+        # the URI of the replacement connection has room for one subscription only
+        manager.max_websocket_uri_length = len("wss://stream.binance.com:9443/stream?streams=btcusdt@trade")
+        TestSubscriptionNames.connect(manager)
+        self.assertEqual(TestSubscriptionNames.get_queued_params(manager), {"ethusdt@trade"})
+        manager.stream_list["stream"]["markets"].remove("ethusdt")
+        asyncio.run(rotation.abort(restore_outbound_scheduler=False))
+        self.assertEqual(manager.stream_subscription_names["stream"], {"btcusdt@trade"})
+        self.assertEqual(TestSubscriptionNames.get_queued_params(manager), set())
+        self.assertEqual(TestSubscriptionNames.get_queued_params(manager, method="UNSUBSCRIBE"), {"ethusdt@trade"})
+        self.assertIsNone(rotation.previous_subscription_names)
+
+
 if __name__ == '__main__':
     try:
         unittest.main()